@@ -5,79 +5,735 @@ agents.py
 import json
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from threading import Lock
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils import BASE_URL,API_KEY,MODEL
-
+from . import events
+from .resilience import CircuitBreaker, LatencyHistogram, backoff_delay
 #from prompt import test_prompt
-from openai import OpenAI
 
-class Clients:
+# 连接池默认配置：同一进程内所有学生共享一个保持长连接的HTTP连接池
+POOL_CONFIG = {
+    "max_connections": 20,            # 连接池最大连接数
+    "max_keepalive_connections": 10,  # 最多保持的空闲长连接数
+    "keepalive_expiry": 30.0,         # 空闲长连接的保持时间（秒）
+    "connect_timeout": 5.0,           # 建立连接超时（秒）
+    "read_timeout": 60.0,             # 读取响应超时（秒）
+}
+
+# 请求延迟控制的默认配置
+RESILIENCE_CONFIG = {
+    "timeout_quantile": 0.99,   # 按该分位数的延迟推导单次请求超时
+    "timeout_factor": 3.0,      # 超时 = 分位数延迟 × 倍数，上限为read_timeout
+    "min_timeout": 2.0,         # 推导出的超时下限（秒）
+    "min_samples": 20,          # 延迟样本不足时使用read_timeout，也不发出对冲请求
+    "backoff_base": 0.5,        # 请求失败后第一次重试的退避上限（秒），之后逐次翻倍
+    "backoff_cap": 8.0,         # 退避上限（秒）
+    "hedge": False,             # 请求超过hedge_quantile分位数延迟仍未返回时，是否再发出一个相同请求
+    "hedge_quantile": 0.95,
+    "breaker_failures": 5,      # 连续失败多少次后熔断
+    "breaker_reset": 30.0,      # 熔断持续时间（秒），之后放行一次试探请求
+}
+
+# 每百万token的价格，用于估算LLM成本（默认按DeepSeek公开价格，单位为元）
+LLM_PRICING = {
+    "currency": "CNY",
+    "prompt": 2.0,          # 未命中缓存的输入token
+    "cached_prompt": 0.5,   # 命中前缀缓存的输入token
+    "completion": 8.0,      # 输出token
+}
+
+_shared_lock = Lock()
+_shared_client = None  # 进程级共享客户端
+_shared_pid = None     # 创建共享客户端的进程号，fork出的子进程需要重新创建
+
+
+def configure_pool(**options) -> dict:
+    """
+    修改连接池配置，下次获取共享客户端时按新配置重建
+    已经持有旧客户端的学生继续使用旧连接池，因此应在创建学生之前调用
+
+    Args:
+        **options: POOL_CONFIG中的配置项，如max_connections=50, read_timeout=30.0
+
+    Returns:
+        dict: 修改后的连接池配置
+    """
+    global _shared_client, _shared_pid
+    unknown = set(options) - set(POOL_CONFIG)
+    if unknown:
+        raise KeyError(f"未知的连接池配置项: {sorted(unknown)}")
+    with _shared_lock:
+        POOL_CONFIG.update(options)
+        _shared_client = None
+        _shared_pid = None
+    return dict(POOL_CONFIG)
+
+
+def configure_resilience(**options) -> dict:
+    """
+    修改请求延迟控制配置
+    超时、退避和对冲请求的配置立即生效；熔断器的配置在新建客户端时生效
+
+    Args:
+        **options: RESILIENCE_CONFIG中的配置项，如hedge=True, breaker_failures=3
+
+    Returns:
+        dict: 修改后的配置
+    """
+    unknown = set(options) - set(RESILIENCE_CONFIG)
+    if unknown:
+        raise KeyError(f"未知的延迟控制配置项: {sorted(unknown)}")
+    RESILIENCE_CONFIG.update(options)
+    return dict(RESILIENCE_CONFIG)
+
+
+def _is_timeout(error: Exception) -> bool:
+    """判断请求异常是否为超时"""
+    try:
+        from openai import APITimeoutError
+    except ImportError:
+        return isinstance(error, TimeoutError)
+    return isinstance(error, (APITimeoutError, TimeoutError))
+
+
+def get_shared_client() -> "Clients":
+    """
+    获取进程级共享的LLM客户端
+    首次调用时创建；在多进程批量模拟中，每个工作进程会各自创建一个客户端，
+    不会复用从父进程继承来的连接
+
+    Returns:
+        Clients: 共享客户端
+    """
+    global _shared_client, _shared_pid
+    pid = os.getpid()
+    if _shared_client is None or _shared_pid != pid:
+        with _shared_lock:
+            if _shared_client is None or _shared_pid != pid:
+                _shared_client = Clients(**POOL_CONFIG)
+                _shared_pid = pid
+    return _shared_client
+
+
+class CallStats:
+    """
+    按调用类型（schedule/leave等）统计LLM调用
+    记录每类调用的次数、估算的提示词token数（其中固定前缀部分单独统计）、
+    服务端返回的实际token用量，以及重试、解析失败、本地修复、请求异常和兜底结果的次数，
+    其中请求超时、对冲请求、熔断期间被拒绝的请求和需要正则提取JSON的回复单独计数，
+    规整后仍不满足日程软约束（课程数、进食时长等）的候选计入constraint_violations；
+    每次调用（含重试）的耗时累计到seconds并记入延迟直方图
+    """
+    FIELDS = ("calls", "prompt_tokens_est", "prefix_tokens_est",
+              "prompt_tokens", "completion_tokens", "cached_tokens",
+              "retries", "parse_failures", "repairs", "errors", "fallbacks",
+              "timeouts", "hedges", "short_circuits", "regex_fallbacks", "constraint_violations", "seconds")
+    LATENCY_QUANTILES = {"p50": 0.5, "p90": 0.9, "p95": 0.95, "p99": 0.99}
+
     def __init__(self) -> None:
-            
-        self.client = OpenAI(
-            base_url=BASE_URL["shubiaobiao"],
-            api_key=API_KEY["shubiaobiao"],
+        self.by_kind = {}
+        self.latency = {}  # 调用类型 -> 每次调用耗时的直方图桶计数
+        self._prefix_tokens = {}  # 固定前缀的token估算缓存
+        self._lock = Lock()
+
+    def _entry(self, kind: str) -> dict:
+        entry = self.by_kind.get(kind)
+        if entry is None:
+            entry = self.by_kind[kind] = dict.fromkeys(self.FIELDS, 0)
+            self.latency[kind] = [0] * LatencyHistogram.NUM_BUCKETS
+        return entry
+
+    def record_prompt(self, kind: str, prompt: str, prefix: str = None) -> int:
+        """
+        记录一次提示词
+
+        Args:
+            kind (str): 调用类型
+            prompt (str): 提示词（有前缀时为变化的后缀部分）
+            prefix (str): 固定前缀
+
+        Returns:
+            int: 本次提示词的估算token数
+        """
+        from .prompt import estimate_tokens
+        prefix_tokens = 0
+        if prefix:
+            prefix_tokens = self._prefix_tokens.get(prefix)
+            if prefix_tokens is None:
+                prefix_tokens = self._prefix_tokens[prefix] = estimate_tokens(prefix)
+        tokens = prefix_tokens + estimate_tokens(prompt)
+        with self._lock:
+            entry = self._entry(kind)
+            entry["calls"] += 1
+            entry["prompt_tokens_est"] += tokens
+            entry["prefix_tokens_est"] += prefix_tokens
+        return tokens
+
+    def record_usage(self, kind: str, usage) -> None:
+        """
+        记录服务端返回的token用量
+
+        Args:
+            kind (str): 调用类型
+            usage: 响应中的usage对象，可能为None
+        """
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        with self._lock:
+            entry = self._entry(kind)
+            entry["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            entry["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+            entry["cached_tokens"] += (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+    def record_event(self, kind: str, field: str) -> None:
+        """
+        记录一次调用过程中的事件
+
+        Args:
+            kind (str): 调用类型
+            field (str): FIELDS中除calls、token统计和seconds以外的一项，如retries、fallbacks
+        """
+        with self._lock:
+            self._entry(kind)[field] += 1
+
+    def record_latency(self, kind: str, seconds: float) -> None:
+        """
+        记录一次调用的耗时（含重试和退避）
+
+        Args:
+            kind (str): 调用类型
+            seconds (float): 耗时（秒）
+        """
+        bucket = LatencyHistogram.bucket_of(seconds)
+        with self._lock:
+            self._entry(kind)["seconds"] += seconds
+            self.latency[kind][bucket] += 1
+
+    def snapshot(self) -> dict:
+        """返回当前统计的副本，每类调用的latency为延迟直方图的桶计数"""
+        with self._lock:
+            return {kind: dict(entry, latency=list(self.latency[kind])) for kind, entry in self.by_kind.items()}
+
+    def since(self, before: dict) -> dict:
+        """
+        计算从某次快照以来的增量，用于统计单次模拟的用量
+
+        Args:
+            before (dict): snapshot()返回的快照
+
+        Returns:
+            dict: 各调用类型的增量，附带延迟分位数（毫秒）和估算成本；没有调用的类型不出现
+        """
+        result = {}
+        for kind, entry in self.snapshot().items():
+            base = before.get(kind, {})
+            delta = {field: entry[field] - base.get(field, 0) for field in self.FIELDS}
+            if not delta["calls"]:
+                continue
+            delta["seconds"] = round(delta["seconds"], 4)
+            base_latency = base.get("latency") or [0] * len(entry["latency"])
+            counts = [now - old for now, old in zip(entry["latency"], base_latency)]
+            latency_ms = {}
+            for name, q in self.LATENCY_QUANTILES.items():
+                value = LatencyHistogram.quantile_of(counts, q)
+                latency_ms[name] = round(value * 1000, 2) if value is not None else None
+            latency_ms["mean"] = round(delta["seconds"] * 1000 / sum(counts), 2) if sum(counts) else None
+            delta["latency_ms"] = latency_ms
+            delta["cost"] = estimate_cost(delta)
+            result[kind] = delta
+        return result
+
+
+def estimate_cost(usage: dict, pricing: dict = None) -> float:
+    """
+    按token用量估算成本，服务端没有返回用量时使用估算的提示词token数
+
+    Args:
+        usage (dict): CallStats中一类调用的统计
+        pricing (dict): 每百万token价格，默认为LLM_PRICING
+
+    Returns:
+        float: 成本（LLM_PRICING["currency"]）
+    """
+    pricing = pricing or LLM_PRICING
+    prompt = usage.get("prompt_tokens") or usage.get("prompt_tokens_est", 0)
+    cached = min(usage.get("cached_tokens", 0), prompt)
+    cost = ((prompt - cached) * pricing["prompt"] + cached * pricing["cached_prompt"]
+            + usage.get("completion_tokens", 0) * pricing["completion"]) / 1_000_000
+    return round(cost, 6)
+
+
+def merge_usage(usages) -> dict:
+    """
+    合并多次模拟的调用统计，按调用类型累加计数、token、耗时和成本（延迟分位数无法累加，不保留）
+
+    Args:
+        usages: 多个CallStats.since()的结果
+
+    Returns:
+        dict: 合并后的统计，格式与since()相同但不含latency_ms
+    """
+    merged = {}
+    for usage in usages:
+        for kind, entry in usage.items():
+            target = merged.setdefault(kind, dict.fromkeys(CallStats.FIELDS + ("cost",), 0))
+            for field in target:
+                target[field] += entry.get(field, 0)
+    for entry in merged.values():
+        entry["seconds"] = round(entry["seconds"], 4)
+        entry["cost"] = round(entry["cost"], 6)
+    return merged
+
+
+def summarize_usage(usage: dict, wall_seconds: float = None) -> dict:
+    """
+    汇总各类调用的统计，给出总调用数、token、成本、LLM耗时和各类调用的耗时占比
+    LLM耗时是各次调用耗时之和，并发请求（多线程创建学生、后台预取）时可能超过墙钟时间
+
+    Args:
+        usage (dict): CallStats.since()的结果
+        wall_seconds (float): 本次模拟的墙钟时间（秒），提供时附带LLM耗时与墙钟时间之比
+
+    Returns:
+        dict: 汇总结果
+    """
+    total_seconds = sum(entry["seconds"] for entry in usage.values())
+    calls = sum(entry["calls"] for entry in usage.values())
+    summary = {
+        "calls": calls,
+        "prompt_tokens": sum(entry["prompt_tokens"] or entry["prompt_tokens_est"] for entry in usage.values()),
+        "completion_tokens": sum(entry["completion_tokens"] for entry in usage.values()),
+        "cost": round(sum(entry["cost"] for entry in usage.values()), 6),
+        "currency": LLM_PRICING["currency"],
+        "llm_seconds": round(total_seconds, 4),
+        "seconds_share": {kind: round(entry["seconds"] / total_seconds, 4) if total_seconds else 0.0
+                          for kind, entry in usage.items()},
+        "fallback_rate": round(sum(entry["fallbacks"] for entry in usage.values()) / calls, 4) if calls else 0.0,
+    }
+    if wall_seconds is not None:
+        summary["wall_seconds"] = round(wall_seconds, 4)
+        summary["llm_wall_ratio"] = round(total_seconds / wall_seconds, 4) if wall_seconds else 0.0
+    return summary
+
+
+llm_stats = CallStats()  # 进程级LLM调用统计
+
+
+class ResponseSpec:
+    """
+    单类调用的响应规格
+    描述期望的输出结构、token预算、停止序列和是否使用JSON/结构化输出模式，
+    并提供本地校验与修复，修复成功时不再消耗重试
+    """
+    def __init__(self, kind: str, max_tokens: int, schema: dict = None, stop: list = None,
+                 json_mode: bool = False, validate=None, repair=None, fallback=None) -> None:
+        """
+        Args:
+            kind (str): 调用类型
+            max_tokens (int): 回复的token预算
+            schema (dict): 期望输出的JSON Schema，端点支持json_schema时随请求发送
+            stop (list): 停止序列
+            json_mode (bool): 端点支持时是否要求JSON对象输出（仅适用于顶层为对象的回复）
+            validate: 校验函数，接收解析后的对象，合法时返回（可规整后的）对象，否则返回None
+            repair: 修复函数，接收原始回复文本和解析结果，返回修复后的对象或None
+            fallback: 重试耗尽后返回的兜底结果
+        """
+        self.kind = kind
+        self.max_tokens = max_tokens
+        self.schema = schema
+        self.stop = stop
+        self.json_mode = json_mode
+        self.validate = validate or (lambda value: value)
+        self.repair = repair
+        self.fallback = fallback
+
+    def request_options(self, structured_output: str = None) -> dict:
+        """
+        生成该类调用的请求参数
+
+        Args:
+            structured_output (str): 端点支持的结构化输出模式，"json_schema"、"json_object"或None
+
+        Returns:
+            dict: 传给chat.completions.create的附加参数
+        """
+        options = {"max_tokens": self.max_tokens}
+        if self.stop:
+            options["stop"] = self.stop
+        if structured_output == "json_schema" and self.schema is not None:
+            options["response_format"] = {"type": "json_schema",
+                                          "json_schema": {"name": self.kind, "schema": self.schema}}
+        elif structured_output in ("json_schema", "json_object") and self.json_mode:
+            options["response_format"] = {"type": "json_object"}
+        return options
+
+    def parse(self, reply: str, transform):
+        """
+        解析、校验并在需要时本地修复回复
+
+        Args:
+            reply (str): LLM原始回复文本
+            transform: 将文本提取为JSON对象的函数
+
+        Returns:
+            tuple: (结果对象或None, 是否经过修复)
+        """
+        value = transform(reply)
+        if value is not None:
+            valid = self.validate(value)
+            if valid is not None:
+                return valid, False
+        if self.repair is not None:
+            repaired = self.repair(reply, value)
+            if repaired is not None:
+                valid = self.validate(repaired)
+                if valid is not None:
+                    return valid, True
+        return None, False
+
+
+def _validate_generic(value):
+    """通用校验：与原有规则一致，列表必须每项都含time和action"""
+    if isinstance(value, list):
+        if all(isinstance(item, dict) and "time" in item and "action" in item for item in value):
+            return value
+        return None
+    return value
+
+
+def _validate_leave(value):
+    """离座决策必须是{"action":"leave"}或{"action":"reverse"}"""
+    if isinstance(value, dict) and value.get("action") in ("leave", "reverse"):
+        return value
+    return None
+
+
+def _repair_leave(reply: str, value):
+    """
+    修复离座决策回复：补全被token预算截断的右花括号，或从文本中提取唯一出现的动作词
+    """
+    text = reply.strip()
+    if text.startswith("{") and not text.endswith("}"):
+        try:
+            return json.loads(text + "}")
+        except json.JSONDecodeError:
+            pass
+    found = {word for word in ("leave", "reverse") if word in text}
+    if len(found) == 1:  # 两个词都出现时无法判断，不做修复
+        return {"action": found.pop()}
+    return None
+
+
+def _validate_schedule(value):
+    """日程必须是非空列表且每项都含time和action"""
+    if isinstance(value, list) and value and \
+            all(isinstance(item, dict) and "time" in item and "action" in item for item in value):
+        return value
+    return None
+
+
+def _repair_schedule(reply: str, value):
+    """
+    修复日程回复：展开{"schedule":[...]}形式的包装，或截取文本中的JSON数组，
+    被token预算截断的数组丢弃最后不完整的一项后补全
+    """
+    if isinstance(value, dict):
+        lists = [item for item in value.values() if isinstance(item, list)]
+        if len(lists) == 1:
+            return lists[0]
+    start = reply.find("[")
+    if start == -1:
+        return None
+    end = reply.rfind("]")
+    candidates = [reply[start:end + 1]] if end > start else []
+    last_item = reply.rfind("}")
+    if last_item > start:
+        candidates.append(reply[start:last_item + 1] + "]")
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+LEAVE_SCHEMA = {"type": "object",
+                "properties": {"action": {"type": "string", "enum": ["leave", "reverse"]}},
+                "required": ["action"], "additionalProperties": False}
+SCHEDULE_SCHEMA = {"type": "array",
+                   "items": {"type": "object",
+                             "properties": {"time": {"type": "string"}, "action": {"type": "string"}},
+                             "required": ["time", "action"]}}
+
+# 各调用类型的响应规格
+RESPONSE_SPECS = {
+    # 合法回复只有{"action":"leave"}这么长，16个token的预算已足够限制回复长度；
+    # 不设停止序列：在右花括号处停止会截掉括号本身，几乎每个回复都要经过本地修复，repairs计数失去意义
+    "leave": ResponseSpec("leave", max_tokens=16, schema=LEAVE_SCHEMA, json_mode=True,
+                          validate=_validate_leave, repair=_repair_leave, fallback={"action": None}),
+    # 一天的日程约十几项，每项约15个token
+    "schedule": ResponseSpec("schedule", max_tokens=400, schema=SCHEDULE_SCHEMA,
+                             validate=_validate_schedule, repair=_repair_schedule, fallback=None),
+    "generic": ResponseSpec("generic", max_tokens=1000, validate=_validate_generic, fallback={"action": None}),
+}
+
+
+class Clients:
+    structured_output = None  # 端点支持的结构化输出模式，默认不使用
+
+    def __init__(self, max_connections=None, max_keepalive_connections=None, keepalive_expiry=None,
+                 connect_timeout=None, read_timeout=None, base_url=None, api_key=None, model=None,
+                 structured_output=None) -> None:
+        """
+        创建LLM客户端
+        客户端内部维护一个HTTP连接池，一般通过get_shared_client获取进程内共享的实例
+
+        Args:
+            max_connections (int): 连接池最大连接数，默认取POOL_CONFIG
+            max_keepalive_connections (int): 最多保持的空闲长连接数
+            keepalive_expiry (float): 空闲长连接的保持时间（秒）
+            connect_timeout (float): 建立连接超时（秒）
+            read_timeout (float): 读取响应超时（秒）
+            base_url (str): API地址，默认使用utils中的配置；config.LLM_BACKEND为"mock"时使用本地模拟服务
+            api_key (str): API密钥，默认使用utils中的配置
+            model (str): 模型名称，默认使用utils中的配置
+            structured_output (str): 端点支持的结构化输出模式，"json_schema"、"json_object"或None（不使用）
+        """
+        # openai和API配置在首次创建客户端时才导入，模拟核心模块可以在没有LLM依赖的环境中导入
+        import httpx
+        from openai import OpenAI
+        if base_url is None or api_key is None or model is None:
+            import config
+            if getattr(config, "LLM_BACKEND", "remote") == "mock":
+                # 本地模拟服务，不需要utils中的API配置
+                from .mock_llm import local_base_url
+                base_url = base_url if base_url is not None else (config.MOCK_LLM_URL or local_base_url())
+                api_key = api_key if api_key is not None else "mock"
+                model = model if model is not None else "mock"
+            else:
+                from utils import BASE_URL,API_KEY,MODEL
+                base_url = base_url if base_url is not None else BASE_URL["shubiaobiao"]
+                api_key = api_key if api_key is not None else API_KEY["shubiaobiao"]
+                model = model if model is not None else MODEL
+
+        def pick(value, key):
+            return value if value is not None else POOL_CONFIG[key]
+
+        self.model = model
+        self.structured_output = structured_output
+        self._init_resilience(pick(read_timeout, "read_timeout"))
+        self._http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=pick(max_connections, "max_connections"),
+                max_keepalive_connections=pick(max_keepalive_connections, "max_keepalive_connections"),
+                keepalive_expiry=pick(keepalive_expiry, "keepalive_expiry"),
+            ),
+            timeout=httpx.Timeout(pick(read_timeout, "read_timeout"),
+                                  connect=pick(connect_timeout, "connect_timeout")),
         )
+        # 重试由response/sample按延迟统计和退避策略控制，关闭SDK自带的立即重试
+        self.client = OpenAI(base_url=base_url, api_key=api_key, http_client=self._http_client, max_retries=0)
 
-    def response(self,prompt:str, max_retries=3):
+    def _init_resilience(self, read_timeout: float) -> None:
+        """
+        初始化延迟统计和熔断器
+
+        Args:
+            read_timeout (float): 单次请求的超时上限（秒）
+        """
+        self.read_timeout = read_timeout
+        self.latency = {}  # 调用类型 -> LatencyHistogram，成功请求的延迟
+        self.breaker = CircuitBreaker(RESILIENCE_CONFIG["breaker_failures"], RESILIENCE_CONFIG["breaker_reset"])
+        self._hedge_pool = None  # 对冲请求使用的线程池，第一次对冲时创建
+        self._resilience_lock = Lock()
+
+    def close(self) -> None:
+        """关闭连接池"""
+        self._http_client.close()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+
+    def _histogram(self, kind: str) -> LatencyHistogram:
+        histogram = self.latency.get(kind)
+        if histogram is None:
+            with self._resilience_lock:
+                histogram = self.latency.setdefault(kind, LatencyHistogram())
+        return histogram
+
+    def request_timeout(self, kind: str) -> float:
+        """
+        按该类调用的历史延迟推导单次请求超时
+        样本不足时使用read_timeout；否则为分位数延迟乘以倍数，限制在[min_timeout, read_timeout]内
+
+        Args:
+            kind (str): 调用类型
+
+        Returns:
+            float: 超时（秒）
+        """
+        config = RESILIENCE_CONFIG
+        histogram = self._histogram(kind)
+        if histogram.count < config["min_samples"]:
+            return self.read_timeout
+        timeout = histogram.quantile(config["timeout_quantile"]) * config["timeout_factor"]
+        return min(max(timeout, config["min_timeout"]), self.read_timeout)
+
+    def _create(self, kind: str, request: dict):
+        """
+        发出一次请求，开启对冲时若超过分位数延迟仍未返回则再发出一个相同请求，取先成功的结果
+
+        Args:
+            kind (str): 调用类型
+            request (dict): chat.completions.create的参数
+
+        Returns:
+            ChatCompletion: 响应
+        """
+        create = self.client.chat.completions.create
+        request["timeout"] = self.request_timeout(kind)
+        histogram = self._histogram(kind)
+        if not RESILIENCE_CONFIG["hedge"] or histogram.count < RESILIENCE_CONFIG["min_samples"]:
+            return create(**request)
+        with self._resilience_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=POOL_CONFIG["max_connections"],
+                                                      thread_name_prefix="llm-hedge")
+        first = self._hedge_pool.submit(create, **request)
+        try:
+            return first.result(timeout=histogram.quantile(RESILIENCE_CONFIG["hedge_quantile"]))
+        except FutureTimeout:
+            pass
+        llm_stats.record_event(kind, "hedges")
+        second = self._hedge_pool.submit(create, **request)
+        error = None
+        for future in as_completed((first, second)):
+            try:
+                return future.result()  # 较慢的请求继续在后台完成，结果被丢弃
+            except Exception as e:
+                error = e
+        raise error
+
+    def response(self,prompt:str, max_retries=3, prefix:str=None, kind:str="generic"):
+        """
+        请求LLM并解析为JSON
+        按调用类型的ResponseSpec设置token预算、停止序列和输出模式；
+        回复先在本地解析、校验和修复，只有无法修复时才消耗重试
+
+        Args:
+            prompt (str): 提示词；提供prefix时为变化的后缀部分，作为user消息发送
+            max_retries (int): 最大尝试次数
+            prefix (str): 固定的提示词前缀，作为system消息发送，便于服务端前缀缓存
+            kind (str): 调用类型（schedule/leave/generic），决定响应规格和统计分类
+
+        Returns:
+            解析后的dict或list，重试耗尽时返回该类型的兜底结果
+        """
+        results = self.sample(prompt, n=1, max_retries=max_retries, prefix=prefix, kind=kind)
+        if results:
+            return results[0]
+        # 返回兜底结构来避免程序崩溃
+        return RESPONSE_SPECS.get(kind, RESPONSE_SPECS["generic"]).fallback
+
+    def sample(self, prompt:str, n=1, max_retries=3, prefix:str=None, kind:str="generic") -> list:
+        """
+        在一次请求中获取n个候选回复（chat completions的n参数），逐个在本地解析、校验和修复
+        端点不支持n时只会返回一个候选，调用方应按实际返回数量处理；
+        单次请求的超时由历史延迟推导，请求失败后按带抖动的指数退避重试，端点熔断期间直接返回空列表
+
+        Args:
+            prompt (str): 提示词
+            n (int): 候选数量
+            max_retries (int): 最大尝试次数，所有候选都无法使用时才重试
+            prefix (str): 固定的提示词前缀
+            kind (str): 调用类型
+
+        Returns:
+            list: 合法的候选结果，重试耗尽时为空列表
+        """
+        start = time.perf_counter()
+        try:
+            return self._sample(prompt, n, max_retries, prefix, kind)
+        finally:
+            # 一次调用的耗时（含重试和退避），用于统计schedule/leave各自占用的时间
+            llm_stats.record_latency(kind, time.perf_counter() - start)
+
+    def _sample(self, prompt:str, n:int, max_retries:int, prefix:str, kind:str) -> list:
+        """sample的实现，参数含义相同"""
+        spec = RESPONSE_SPECS.get(kind, RESPONSE_SPECS["generic"])
+        if prefix:
+            messages = [{'role':'system','content':prefix}, {'role':'user','content':prompt}]
+        else:
+            messages = [{'role':'system','content':prompt}]
+        llm_stats.record_prompt(kind, prompt, prefix)
+        options = spec.request_options(self.structured_output)
+        if n > 1:
+            options["n"] = n
         for attempt in range(max_retries):
+            if not self.breaker.allow():
+                # 端点熔断期间不发出请求，直接交给调用方的本地兜底逻辑
+                llm_stats.record_event(kind, "short_circuits")
+                llm_stats.record_event(kind, "fallbacks")
+                events.log.debug("LLM端点熔断中，使用本地兜底逻辑")
+                return []
+            if attempt:
+                llm_stats.record_event(kind, "retries")
+            start = time.perf_counter()
             try:
-                response = self.client.chat.completions.create(
-                    model=MODEL,
-                    messages=[
-                        {'role':'system','content':prompt}
-                    ],
+                response = self._create(kind, dict(
+                    model=self.model,
+                    messages=messages,
                     stream=False,
                     temperature=0.7,  # 降低temperature以获得更一致的输出
-                    max_tokens=1000,
                     top_p=0.8,      # 降低top_p以获得更一致的输出
                     frequency_penalty=0.2,
-                    presence_penalty=0.2
-                )
-                reply = response.choices[0].message.content
-                
+                    presence_penalty=0.2,
+                    **options
+                ))
+            except Exception as e:
+                self.breaker.record_failure()
+                llm_stats.record_event(kind, "errors")
+                if _is_timeout(e):
+                    llm_stats.record_event(kind, "timeouts")
+                events.log.warning(f"尝试 {attempt + 1} 失败: {e}")
+                if attempt + 1 < max_retries:  # 请求失败后退避再重试，避免连续失败时立即重试
+                    time.sleep(backoff_delay(attempt + 1, RESILIENCE_CONFIG["backoff_base"], RESILIENCE_CONFIG["backoff_cap"]))
+                continue  # 继续下一次尝试
+            self.breaker.record_success()
+            self._histogram(kind).record(time.perf_counter() - start)
+
+            llm_stats.record_usage(kind, getattr(response, "usage", None))
+            results = []
+            for choice in response.choices:
+                reply = choice.message.content
                 if reply is None:
-                    print(f"LLM返回空响应，尝试 {attempt + 1}")
+                    llm_stats.record_event(kind, "parse_failures")
+                    events.log.warning(f"LLM返回空响应，尝试 {attempt + 1}")
                     continue
-                
-                # 尝试解析回复
-                parsed_reply = self._transform_to_json(reply)
-                
-                # 如果解析成功且包含必要的字段，返回结果
-                if parsed_reply is not None:
-                    if isinstance(parsed_reply, dict) and "action" in parsed_reply:
-                        return parsed_reply
-                    elif isinstance(parsed_reply, list):
-                        # 对于日程列表，检查是否包含必要字段
-                        if all(isinstance(item, dict) and "time" in item and "action" in item for item in parsed_reply):
-                            return parsed_reply
-                        else:
-                            print(f"LLM返回的列表格式不正确: {parsed_reply}")
-                            continue  # 继续尝试
-                    # 如果已经是正确的格式，直接返回
-                    return parsed_reply
-                else:
-                    print(f"无法解析LLM响应，尝试 {attempt + 1}")
+                # 本地解析、校验和修复
+                result, repaired = spec.parse(reply, lambda text: self._transform_to_json(text, warn=False, kind=kind))
+                if result is None:
+                    llm_stats.record_event(kind, "parse_failures")
+                    events.log.warning(f"无法解析LLM响应，尝试 {attempt + 1}: {reply[:200]}")
                     continue
-                
-            except Exception as e:
-                print(f"尝试 {attempt + 1} 失败: {e}")
-                if attempt == max_retries - 1:  # 如果是最后一次尝试
-                    print(f"LLM请求失败，经过 {max_retries} 次尝试")
-                    # 返回一个空的结构来避免程序崩溃
-                    if "日程" in prompt or "schedule" in prompt.lower():
-                        return []
-                    else:
-                        return {"action": None}
-                continue  # 继续下一次尝试
+                if repaired:
+                    llm_stats.record_event(kind, "repairs")
+                results.append(result)
+            if results:
+                return results
+
+        events.log.warning(f"LLM请求失败，经过 {max_retries} 次尝试")
+        llm_stats.record_event(kind, "fallbacks")
+        return []
 
-        return {"action": None}
-    
 #    def _test(self):
 #        print(self.response(test_prompt))
 
-    def _transform_to_json(self,llm_response):
+    def _transform_to_json(self,llm_response, warn=True, kind:str=None):
+        # kind不为None时，直接解析失败、需要从代码块或花括号中提取的回复计入该类调用的regex_fallbacks
         # 如果响应不是字符串，直接返回
         if not isinstance(llm_response, str):
             return llm_response
@@ -97,7 +753,10 @@ class Clients:
             if json_match:
                 json_content = json_match.group(1).strip()
                 try:
-                    return json.loads(json_content)
+                    value = json.loads(json_content)
+                    if kind is not None:
+                        llm_stats.record_event(kind, "regex_fallbacks")
+                    return value
                 except json.JSONDecodeError:
                     pass
 
@@ -108,13 +767,17 @@ class Clients:
             if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
                 json_content = llm_response[start_idx:end_idx+1]
                 try:
-                    return json.loads(json_content)
+                    value = json.loads(json_content)
+                    if kind is not None:
+                        llm_stats.record_event(kind, "regex_fallbacks")
+                    return value
                 except json.JSONDecodeError:
                     pass
 
             # 如果以上都失败，使用默认响应
-            print(f"JSON 解析失败，LLM响应: {llm_response[:200]}...")  # 只打印前200个字符
+            if warn:
+                events.log.warning(f"JSON 解析失败，LLM响应: {llm_response[:200]}...")  # 只打印前200个字符
             return None  # 返回None而不是{"action": None}，让调用者处理
         except Exception as e:
-            print(f"处理LLM响应时发生错误: {e}")
+            events.log.warning(f"处理LLM响应时发生错误: {e}")
             return None  # 返回None而不是{"action": None}，让调用者处理
\ No newline at end of file
@@ -0,0 +1,440 @@
+"""
+campus.py
+校园多图书馆模拟
+单个Library满员时，没有选到座位的学生只会计入不满意数，无法回答负载在多个自习场所之间如何分布。
+Campus同时运行多个图书馆（可分组放在多个工作进程中），每个tick：
+    - 各图书馆推进一个tick，没有选到座位的学生离开该图书馆，连同本馆空闲座位的摘要一起发给协调进程
+    - 路由器按学生的座位偏好和图书馆之间的距离，为每名学生选择满意度减去距离成本最高、仍有空位的图书馆，
+      全校都没有空位时留在原图书馆，计入全校不满意数
+    - 分流的学生作为下一个tick的到达批次发给目标图书馆，到达后按日程继续选座
+进程之间每个tick每个方向只交换一批消息，学生以检查点格式（不含座位）传递
+"""
+import math
+import multiprocessing as mp
+import os
+import random
+import time
+from datetime import timedelta
+
+from . import events
+from .agents import llm_stats, merge_usage, summarize_usage
+from .checkpoint import restore_student, student_state
+from .json_manager import JsonManager
+from .library import Library
+from .seats import Status
+from .students import StudentState
+
+# 图书馆配置的默认值，position为校园平面上的坐标（米）
+LIBRARY_DEFAULTS = {
+    "row": 20,
+    "column": 20,
+    "num_students": 200,
+    "humanities_rate": 0.3,
+    "science_rate": 0.3,
+    "position": (0, 0),
+    "limit_reversed_time": timedelta(hours=1),
+}
+
+
+def library_specs(libraries: list[dict]) -> list[dict]:
+    """
+    补全图书馆配置并分配全校唯一的学生ID区间
+
+    Args:
+        libraries (list[dict]): 图书馆配置，键见LIBRARY_DEFAULTS，另可指定name（默认library-序号）
+
+    Returns:
+        list[dict]: 补全后的配置，id_base为本馆学生ID的起点
+    """
+    specs = []
+    id_base = 0
+    for i, library in enumerate(libraries):
+        unknown = set(library) - set(LIBRARY_DEFAULTS) - {"name"}
+        if unknown:
+            raise KeyError(f"图书馆配置包含未知的键: {sorted(unknown)}，可选 {sorted(LIBRARY_DEFAULTS)}")
+        spec = {**LIBRARY_DEFAULTS, "name": f"library-{i}", **library}
+        spec["position"] = tuple(spec["position"])
+        spec["id_base"] = id_base
+        id_base += spec["num_students"]
+        specs.append(spec)
+    names = [spec["name"] for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"图书馆名称重复: {names}")
+    return specs
+
+
+def vacancy_summary(library: Library) -> list[list]:
+    """
+    空闲座位摘要：按(台灯, 插座, 靠窗)分组的空位数和最小拥挤参数，路由器据此估计学生能得到的最高满意度
+
+    Returns:
+        list[list]: [台灯, 插座, 靠窗, 空位数, 最小拥挤参数]
+    """
+    groups = {}
+    for seat in library.seats:
+        if seat.status == Status.vacant:
+            key = (seat.lamp, seat.socket, seat.window)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [1, seat.crowded_para]
+            else:
+                group[0] += 1
+                group[1] = min(group[1], seat.crowded_para)
+    return [[lamp, socket, window, count, crowded] for (lamp, socket, window), (count, crowded) in groups.items()]
+
+
+def group_satisfaction(preference: dict, group: list) -> float:
+    """空闲座位分组的满意度，规则与Student.calculate_seat_satisfaction一致"""
+    lamp, socket, window, _, crowded = group
+    satisfaction = 1
+    if lamp:
+        satisfaction += 3 * preference["lamp"]
+    if socket:
+        satisfaction += 3 * preference["socket"]
+    if window:
+        satisfaction += 1
+        satisfaction += 3 * (1 - crowded) * preference["space"]
+    return satisfaction
+
+
+class Router:
+    """
+    按偏好和距离为没有选到座位的学生选择图书馆
+    得分 = 目标图书馆空闲座位的最高满意度 - distance_weight × 距离，原图书馆的距离为0；
+    每分流一名学生即占用目标图书馆摘要中的一个空位，同一批次不会超额分流
+    """
+
+    def __init__(self, positions: dict, distance_weight: float = 0.005, max_distance: float = None) -> None:
+        """
+        Args:
+            positions (dict): 图书馆名称 -> 校园坐标（米）
+            distance_weight (float): 每米距离折合的满意度，默认每200米1分
+            max_distance (float): 学生愿意前往的最远距离，为None时不限
+        """
+        self.positions = dict(positions)
+        self.distance_weight = distance_weight
+        self.max_distance = max_distance
+
+    def distance(self, source: str, target: str) -> float:
+        """两个图书馆之间的直线距离"""
+        (x1, y1), (x2, y2) = self.positions[source], self.positions[target]
+        return math.hypot(x2 - x1, y2 - y1)
+
+    def route(self, overflow: dict, vacancies: dict) -> tuple[dict, list]:
+        """
+        为一个tick的所有离馆学生选择图书馆
+
+        Args:
+            overflow (dict): 图书馆名称 -> 本tick离开的学生状态列表
+            vacancies (dict): 图书馆名称 -> vacancy_summary()的结果，分流时会被修改
+
+        Returns:
+            tuple: (图书馆名称 -> 下一个tick到达的学生状态列表, 每名学生的(来源, 目标或None, 距离))
+        """
+        inbox = {name: [] for name in self.positions}
+        routes = []
+        for source, students in overflow.items():
+            for student in students:
+                best = None
+                for target, groups in vacancies.items():
+                    distance = self.distance(source, target)
+                    if self.max_distance is not None and distance > self.max_distance:
+                        continue
+                    for group in groups:
+                        if group[3] <= 0:
+                            continue
+                        score = group_satisfaction(student["preference"], group) - self.distance_weight * distance
+                        if best is None or score > best[0]:
+                            best = (score, target, group, distance)
+                if best is None:
+                    inbox[source].append(student)  # 全校没有空位，留在原图书馆等待
+                    routes.append((source, None, 0.0))
+                    continue
+                _, target, group, distance = best
+                group[3] -= 1
+                inbox[target].append(student)
+                routes.append((source, target, distance))
+        return inbox, routes
+
+
+class CampusNode:
+    """校园中的一个图书馆，在工作进程或主进程中运行"""
+
+    def __init__(self, spec: dict, seed=None, prefetch: bool = False) -> None:
+        """
+        Args:
+            spec (dict): library_specs()补全后的配置
+            seed: 建馆的随机数种子，为None时沿用当前的随机数状态
+            prefetch (bool): 是否开启离座决策预取
+        """
+        if seed is not None:
+            random.seed(f"{seed}-{spec['name']}")
+        self.name = spec["name"]
+        self.library = Library()
+        self.library.initialize_seats(spec["row"], spec["column"])
+        self.library.initialize_students(spec["num_students"], spec["humanities_rate"], spec["science_rate"])
+        for i, student in enumerate(self.library.students):
+            student.student_id = spec["id_base"] + i  # 学生可能被分流到其他图书馆，ID需全校唯一
+        self.library.set_limit_reversed_time(spec["limit_reversed_time"])
+        if prefetch:
+            self.library.enable_prefetch()
+        self.library.overflow = []
+        self.num_seats = len(self.library.seats)
+        self.peak_taken = 0
+        self.taken_sum = 0
+        self.ticks = 0
+
+    def admit(self, states: list[dict]) -> None:
+        """接收分流到本馆的学生，按到达顺序排在本馆学生之后"""
+        library = self.library
+        for item in states:
+            student = restore_student(item, [])
+            student.know_library_limit_reverse_time(library.limit_reversed_time)
+            library.students.append(student)
+
+    def step(self, incoming: list[dict]) -> dict:
+        """
+        接收到达的学生并推进一个tick
+
+        Args:
+            incoming (list[dict]): 到达本馆的学生状态
+
+        Returns:
+            dict: 本tick的统计、离开本馆的学生状态和空闲座位摘要
+        """
+        library = self.library
+        self.admit(incoming)
+        library.overflow.clear()
+        library.update()
+        departing = library.overflow
+        if departing:
+            leaving = {id(student) for student in departing}
+            library.students = [student for student in library.students if id(student) not in leaving]
+        states = []
+        for student in departing:
+            student.seat = None  # 离开本馆，不再持有原座位（选座失败时原座位已空出或被他人占用）
+            student.state = StudentState.GONE
+            states.append(student_state(student, {}))
+        taken = library.count_taken_seats()
+        self.peak_taken = max(self.peak_taken, taken)
+        self.taken_sum += taken
+        self.ticks += 1
+        record = {"time": library.current_time.strftime('%H:%M'),
+                  "taken": taken,
+                  "reversed_seats": library.count_reversed_seats(),
+                  "students": len(library.students),
+                  "unstisfied_num": library.unsatisfied,
+                  "cleared_seats": library.count_cleared_seat}
+        return {"record": record, "overflow": states, "vacancies": vacancy_summary(library)}
+
+    def summary(self) -> dict:
+        """本馆全天的容量指标"""
+        library = self.library
+        library.close()
+        return {"seats": self.num_seats,
+                "peak_taken": self.peak_taken,
+                "peak_occupancy": self.peak_taken / self.num_seats,
+                "mean_occupancy": self.taken_sum / (self.ticks * self.num_seats) if self.ticks else 0.0,
+                "turned_away": library.unsatisfied,
+                "cleared_seats": library.count_cleared_seat,
+                "students_at_close": len(library.students)}
+
+
+class _Host:
+    """一个进程中的一组图书馆"""
+
+    def __init__(self, specs: list[dict], seed, prefetch: bool, log_level) -> None:
+        events.configure_events(level=log_level)
+        self._llm_stats_before = llm_stats.snapshot()
+        self.nodes = {spec["name"]: CampusNode(spec, seed, prefetch) for spec in specs}
+
+    def step(self, inbox: dict) -> dict:
+        return {name: node.step(inbox.get(name, [])) for name, node in self.nodes.items()}
+
+    def finish(self) -> tuple[dict, dict]:
+        """各图书馆的容量指标和本进程的LLM用量"""
+        return ({name: node.summary() for name, node in self.nodes.items()},
+                llm_stats.since(self._llm_stats_before))
+
+
+def _serve(conn, specs: list[dict], seed, prefetch: bool, log_level) -> None:
+    """工作进程：建立一组图书馆，按协调进程的指令推进"""
+    try:
+        host = _Host(specs, seed, prefetch, log_level)
+        conn.send(None)  # 建馆完成
+        while True:
+            command, *args = conn.recv()
+            if command == "step":
+                conn.send(host.step(*args))
+            elif command == "finish":
+                conn.send(host.finish())
+            else:
+                break
+    finally:
+        conn.close()
+
+
+class Campus:
+    """
+    校园多图书馆模拟
+    图书馆按配置顺序轮流分配到工作进程，每个工作进程承载若干图书馆，数十个图书馆时无需每馆一个进程
+    """
+
+    def __init__(self, libraries: list[dict], workers: int = None, seed=None, distance_weight: float = 0.005,
+                 max_distance: float = None, prefetch: bool = False, log_level=None) -> None:
+        """
+        Args:
+            libraries (list[dict]): 图书馆配置，见library_specs
+            workers (int): 工作进程数，默认为min(图书馆数, CPU核数)；为0或平台不支持fork启动方式时在主进程中运行
+            seed: 随机数种子，每个图书馆以(种子, 名称)建馆，与所在进程无关；为None时沿用当前的随机数状态
+            distance_weight (float): 路由时每米距离折合的满意度
+            max_distance (float): 学生愿意前往的最远距离，为None时不限
+            prefetch (bool): 是否开启离座决策预取
+            log_level (events.Level): 文本日志级别，为None时沿用进程级设置
+        """
+        events.configure_events(level=log_level)
+        self._started_at = time.perf_counter()
+        self.specs = library_specs(libraries)
+        self.router = Router({spec["name"]: spec["position"] for spec in self.specs}, distance_weight, max_distance)
+        self.num_seats = sum(spec["row"] * spec["column"] for spec in self.specs)
+        if workers is None:
+            workers = min(len(self.specs), os.cpu_count() or 1)
+        if "fork" not in mp.get_all_start_methods():
+            workers = 0
+        workers = min(workers, len(self.specs))
+
+        self._workers = []
+        self._host = None
+        if workers:
+            ctx = mp.get_context("fork")  # 子进程继承LLM客户端等进程级配置
+            for w in range(workers):
+                parent, child = ctx.Pipe()
+                process = ctx.Process(target=_serve, args=(child, self.specs[w::workers], seed, prefetch, log_level),
+                                      daemon=True)
+                process.start()
+                child.close()
+                self._workers.append((process, parent))
+            for _, conn in self._workers:
+                conn.recv()
+        else:
+            self._host = _Host(self.specs, seed, prefetch, log_level)
+
+        self.inbox = {spec["name"]: [] for spec in self.specs}  # 下一个tick到达各图书馆的学生
+        self.stats = {spec["name"]: {"arrived": 0, "departed": 0} for spec in self.specs}
+        self.routed = 0
+        self.unsatisfied = 0  # 全校没有空位而无法分流的次数
+        self.route_distance = 0.0
+        self.ticks = []
+        self.time = None
+
+    def _broadcast(self, *command) -> list:
+        """向所有工作进程发送指令并等待全部完成"""
+        if self._host is not None:
+            return [getattr(self._host, command[0])(*command[1:])]
+        for _, conn in self._workers:
+            conn.send(command)
+        return [conn.recv() for _, conn in self._workers]
+
+    def step(self) -> dict:
+        """
+        所有图书馆推进一个tick并分流没有选到座位的学生
+
+        Returns:
+            dict: 本tick的全校记录，libraries为各图书馆的记录
+        """
+        results = {}
+        for batch in self._broadcast("step", self.inbox):
+            results.update(batch)
+        results = {spec["name"]: results[spec["name"]] for spec in self.specs}  # 按配置顺序路由，与进程分组无关
+        overflow = {name: result["overflow"] for name, result in results.items()}
+        vacancies = {name: result["vacancies"] for name, result in results.items()}
+        self.inbox, routes = self.router.route(overflow, vacancies)
+
+        moved = unsatisfied = 0
+        for source, target, distance in routes:
+            if target is None:
+                unsatisfied += 1
+            elif target != source:
+                moved += 1
+                self.route_distance += distance
+                self.stats[source]["departed"] += 1
+                self.stats[target]["arrived"] += 1
+        self.routed += moved
+        self.unsatisfied += unsatisfied
+        records = {name: result["record"] for name, result in results.items()}
+        taken = sum(record["taken"] for record in records.values())
+        self.time = next(iter(records.values()))["time"]
+        record = {"time": self.time,
+                  "taken": taken,
+                  "taken_rate": f" {taken} ({taken/self.num_seats*100:.1f}%)",
+                  "routed": moved,
+                  "unsatisfied": unsatisfied,
+                  "libraries": records}
+        self.ticks.append(record)
+        return record
+
+    def run(self, path: str = None) -> dict:
+        """
+        运行到午夜
+
+        Args:
+            path (str): 结果JSON路径，为None时不保存
+
+        Returns:
+            dict: 各图书馆和全校的容量指标，以及逐tick记录
+        """
+        try:
+            while self.time != "00:00":
+                self.step()
+            result = self.finish()
+        finally:
+            self.close()
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            jm = JsonManager(path, {})
+            jm.data = result  # 覆盖同名的旧文件
+            jm.save_json()
+        return result
+
+    def finish(self) -> dict:
+        """汇总各图书馆和全校的容量指标"""
+        libraries, usages = {}, []
+        for summaries, usage in self._broadcast("finish"):
+            libraries.update(summaries)
+            usages.append(usage)
+        libraries = {spec["name"]: dict(libraries[spec["name"]], **self.stats[spec["name"]]) for spec in self.specs}
+        peak = max((record["taken"] for record in self.ticks), default=0)
+        usage = merge_usage(usages)
+        campus = {"libraries": len(self.specs),
+                  "seats": self.num_seats,
+                  "students": sum(spec["num_students"] for spec in self.specs),
+                  "peak_taken": peak,
+                  "peak_occupancy": peak / self.num_seats,
+                  "mean_occupancy": (sum(record["taken"] for record in self.ticks) / (len(self.ticks) * self.num_seats)
+                                     if self.ticks else 0.0),
+                  "turned_away": sum(summary["turned_away"] for summary in libraries.values()),
+                  "routed": self.routed,
+                  "mean_route_distance": self.route_distance / self.routed if self.routed else 0.0,
+                  "unsatisfied": self.unsatisfied,
+                  "llm_usage": usage,
+                  "llm_summary": summarize_usage(usage, time.perf_counter() - self._started_at)}
+        return {"campus": campus, "libraries": libraries, "ticks": self.ticks}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """关闭工作进程，可重复调用"""
+        for process, conn in self._workers:
+            try:
+                conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+            process.join(timeout=5)
+            conn.close()
+        self._workers = []
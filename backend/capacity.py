@@ -0,0 +1,262 @@
+"""
+capacity.py
+图书馆最大容量的自适应搜索
+逐个学生数重复模拟的扫描方式在远离容量的学生数上浪费了大量模拟。
+CapacitySearch对学生数做带噪声的二分：每个候选学生数先模拟少量重复，
+按data_analysis中的指标计算均值的置信区间，区间仍跨越阈值时才追加重复，
+因此重复次数集中在容量附近的过渡区间；容量的置信区间足够窄时停止
+"""
+import glob
+import math
+import os
+from datetime import timedelta
+from statistics import NormalDist, fmean, stdev
+from typing import Callable, Dict, List
+
+from . import events
+from .data_analysis import (analyze_library_dynamic_capacity, analyze_seat_occupancy_rate,
+                            calculate_peak_pressure_score, get_final_unsatisfied_and_cleared)
+
+# 可用的目标指标: 名称 -> (由模拟数据和学生数计算指标的函数, 指标越大是否越好)
+METRICS: Dict[str, tuple] = {
+    "dynamic_capacity_ratio": (lambda data, n: analyze_library_dynamic_capacity(data, n)["dynamic_capacity_ratio"], True),
+    "peak_pressure_score": (lambda data, n: calculate_peak_pressure_score(data), False),
+    "final_unsatisfied": (lambda data, n: get_final_unsatisfied_and_cleared(data)[0], False),
+    "occupancy_rate": (lambda data, n: analyze_seat_occupancy_rate(data), False),
+}
+
+
+def t_critical(df: int, confidence: float) -> float:
+    """
+    t分布的双侧临界值
+    自由度1、2使用解析解，更大的自由度使用Cornish-Fisher展开（自由度3时误差小于1%）
+
+    Args:
+        df (int): 自由度
+        confidence (float): 置信水平，如0.95
+
+    Returns:
+        float: 临界值
+    """
+    p = (1 + confidence) / 2
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    return (z + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3))
+
+
+def mean_interval(values: List[float], confidence: float = 0.95) -> tuple[float, float, float]:
+    """
+    均值及其置信区间
+
+    Args:
+        values (list[float]): 重复模拟的指标值
+        confidence (float): 置信水平
+
+    Returns:
+        tuple: (均值, 下界, 上界)，只有一个值时区间为无穷宽
+    """
+    mean = fmean(values)
+    if len(values) < 2:
+        return mean, -math.inf, math.inf
+    half_width = t_critical(len(values) - 1, confidence) * stdev(values) / math.sqrt(len(values))
+    return mean, mean - half_width, mean + half_width
+
+
+def next_simulation_number(seats: int, students: int) -> int:
+    """
+    下一个未使用的模拟序号：simulations_base_path/{座位数}_seats_simulations中{学生数}-{序号}.json的最大序号+1，
+    与main.py和前端的规则一致，不会覆盖已有的模拟数据
+
+    Args:
+        seats (int): 座位数
+        students (int): 学生数
+
+    Returns:
+        int: 模拟序号，从1开始
+    """
+    from . import simulation  # 运行时读取，与Simulation写入的目录一致
+    folder = os.path.join(simulation.simulations_base_path, f"{seats}_seats_simulations")
+    numbers = []
+    for file_path in glob.glob(os.path.join(folder, f"{students}-*.json")):
+        try:
+            numbers.append(int(os.path.basename(file_path).split('-')[1].split('.')[0]))
+        except (IndexError, ValueError):
+            continue  # 文件名无法解析时跳过
+    return max(numbers, default=0) + 1
+
+
+def simulation_runner(row: int, column: int, simulation_number: Callable[[int, int], int] = None,
+                      limit_reversed_time: timedelta = None, **simulation_options) -> Callable[[int], List[Dict]]:
+    """
+    创建按学生数运行一次完整模拟的函数，供CapacitySearch使用
+
+    Args:
+        row (int): 座位行数
+        column (int): 座位列数
+        simulation_number (callable): (座位数, 学生数) -> 模拟序号，默认为next_simulation_number
+        limit_reversed_time (timedelta): 占座时间限制，默认沿用Simulation的1小时
+        **simulation_options: 传给Simulation的其他参数，如humanities_rate、log_level
+
+    Returns:
+        callable: 学生数 -> 模拟数据（第一项为头部信息）
+    """
+    from .simulation import Simulation
+    number_for = simulation_number or next_simulation_number
+
+    def run(num_students: int) -> List[Dict]:
+        sim = Simulation(row=row, column=column, num_students=num_students,
+                         simulation_number=number_for(row * column, num_students), **simulation_options)
+        if limit_reversed_time is not None:
+            sim.library.set_limit_reversed_time(limit_reversed_time)
+        sim.run(run_all=True)
+        return sim.jm.data
+
+    return run
+
+
+class CapacitySearch:
+    """
+    带噪声的二分容量搜索
+    容量定义为目标指标的均值仍满足阈值的最大学生数。每个候选学生数先模拟min_replicas次，
+    均值的置信区间完全落在阈值一侧时即判定，否则追加重复直到max_replicas，仍无法判定时按均值判定并视为过渡区间。
+    搜索在[满足阈值, 超过容量]的区间宽度不超过resolution时停止；
+    报告的置信区间为有把握满足阈值的最大学生数和有把握超过容量的最小学生数
+    """
+
+    def __init__(self, run: Callable[[int], List[Dict]], metric: str = "dynamic_capacity_ratio",
+                 threshold: float = 0.9, resolution: int = 1, min_replicas: int = 2, max_replicas: int = 8,
+                 confidence: float = 0.95) -> None:
+        """
+        Args:
+            run (callable): 学生数 -> 一次模拟的数据，见simulation_runner
+            metric (str): METRICS中的指标名称
+            threshold (float): 指标阈值，越大越好的指标要求不低于阈值，反之要求不高于阈值
+            resolution (int): 容量区间的目标宽度（学生数）
+            min_replicas (int): 每个学生数的最少重复次数
+            max_replicas (int): 每个学生数的最多重复次数
+            confidence (float): 置信水平
+        """
+        if metric not in METRICS:
+            raise KeyError(f"未知的指标: {metric}，可选 {sorted(METRICS)}")
+        self.run = run
+        self.metric = metric
+        self.threshold = threshold
+        self.resolution = max(1, resolution)
+        self.min_replicas = max(2, min_replicas)
+        self.max_replicas = max(self.min_replicas, max_replicas)
+        self.confidence = confidence
+        self.samples: Dict[int, List[float]] = {}  # 学生数 -> 各次重复的指标值
+
+    def _acceptable(self, value: float) -> bool:
+        return value >= self.threshold if METRICS[self.metric][1] else value <= self.threshold
+
+    def _sample(self, num_students: int) -> float:
+        """运行一次模拟并记录指标值"""
+        compute = METRICS[self.metric][0]
+        value = float(compute(self.run(num_students), num_students))
+        self.samples.setdefault(num_students, []).append(value)
+        return value
+
+    def evaluate(self, num_students: int) -> tuple[bool, bool]:
+        """
+        判定学生数是否在容量之内，区间跨越阈值时追加重复
+
+        Args:
+            num_students (int): 学生数
+
+        Returns:
+            tuple[bool, bool]: (是否满足阈值, 判定是否有把握)
+        """
+        values = self.samples.setdefault(num_students, [])
+        while True:
+            if len(values) >= self.min_replicas:
+                mean, low, high = mean_interval(values, self.confidence)
+                if self._acceptable(low) == self._acceptable(high):
+                    return self._acceptable(mean), True
+                if len(values) >= self.max_replicas:
+                    return self._acceptable(mean), False
+            self._sample(num_students)
+
+    def search(self, low: int, high: int) -> Dict:
+        """
+        在[low, high]内搜索容量
+
+        Args:
+            low (int): 搜索下界（学生数）
+            high (int): 搜索上界（学生数）
+
+        Returns:
+            dict: capacity为容量估计，interval为容量的置信区间，runs为总模拟次数，
+                  bracketed为容量是否落在搜索范围内，points为各学生数的重复次数、均值和置信区间
+        """
+        low_ok, _ = self.evaluate(low)
+        high_ok, _ = self.evaluate(high)
+        if not low_ok or high_ok:
+            # 容量不在搜索范围内，返回边界
+            capacity = high if high_ok else low - 1
+            events.log.warning(f"容量不在搜索范围[{low}, {high}]内，估计为{'不低于' if high_ok else '低于'}边界")
+            return self._result(capacity, bracketed=False)
+
+        lo, hi = low, high  # lo满足阈值，hi超过容量
+        while hi - lo > self.resolution:
+            mid = (lo + hi) // 2
+            ok, certain = self.evaluate(mid)
+            events.log.info(f"容量搜索: {mid}名学生{'满足' if ok else '超过'}阈值"
+                            f"（{len(self.samples[mid])}次重复{'' if certain else '，处于过渡区间'}）")
+            if ok:
+                lo = mid
+            else:
+                hi = mid
+        return self._result(lo, bracketed=True)
+
+    def _result(self, capacity: int, bracketed: bool) -> Dict:
+        points = {}
+        certain_ok, certain_over = [], []
+        for num_students, values in sorted(self.samples.items()):
+            mean, low, high = mean_interval(values, self.confidence)
+            points[num_students] = {"replicas": len(values), "mean": mean, "ci": (low, high)}
+            if self._acceptable(low) == self._acceptable(high):
+                (certain_ok if self._acceptable(mean) else certain_over).append(num_students)
+        # 有把握满足阈值的最大学生数到有把握超过容量的最小学生数之间
+        lower = max((n for n in certain_ok if n <= capacity), default=None)
+        upper = min((n for n in certain_over if n > capacity), default=None)
+        return {
+            "metric": self.metric,
+            "threshold": self.threshold,
+            "capacity": capacity,
+            "interval": (lower, upper),
+            "runs": sum(len(values) for values in self.samples.values()),
+            "bracketed": bracketed,
+            "points": points,
+        }
+
+
+def search_capacity(row: int, column: int, low: int = None, high: int = None, metric: str = "dynamic_capacity_ratio",
+                    threshold: float = 0.9, resolution: int = 1, min_replicas: int = 2, max_replicas: int = 8,
+                    confidence: float = 0.95, simulation_number: Callable[[int, int], int] = None,
+                    **simulation_options) -> Dict:
+    """
+    搜索指定座位规模的图书馆容量
+
+    Args:
+        row (int): 座位行数
+        column (int): 座位列数
+        low (int): 搜索下界，默认为座位数
+        high (int): 搜索上界，默认为座位数的2倍
+        metric, threshold, resolution, min_replicas, max_replicas, confidence: 见CapacitySearch
+        simulation_number (callable): (座位数, 学生数) -> 模拟序号
+        **simulation_options: 传给Simulation的其他参数
+
+    Returns:
+        dict: CapacitySearch.search的结果
+    """
+    seats = row * column
+    run = simulation_runner(row, column, simulation_number=simulation_number, **simulation_options)
+    searcher = CapacitySearch(run, metric=metric, threshold=threshold, resolution=resolution,
+                              min_replicas=min_replicas, max_replicas=max_replicas, confidence=confidence)
+    return searcher.search(seats if low is None else low, 2 * seats if high is None else high)
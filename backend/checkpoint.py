@@ -0,0 +1,205 @@
+"""
+checkpoint.py
+模拟状态检查点
+模拟数据文件只记录每个tick的座位状态，无法据此重建Library和Student对象。
+检查点保存继续运行所需的全部状态：时间、座位、学生（含日程和座位引用）、计数器、随机数状态
+和尚未取用的离座决策预取（学生ID），写为gzip压缩的JSON，先写临时文件再替换，中途崩溃不会留下损坏的检查点
+"""
+import gzip
+import json
+import os
+from array import array
+from datetime import datetime, timedelta
+
+from .library import Library
+from .seats import Seat, Status
+from .students import Student, StudentState, intern_archetype
+
+CHECKPOINT_VERSION = 1
+_DAY_ORIGIN = datetime(1900, 1, 1)  # 时间统一保存为距此的秒数
+
+
+def _seconds(value) -> int:
+    """datetime或timedelta转为整数秒"""
+    if isinstance(value, datetime):
+        value = value - _DAY_ORIGIN
+    return int(value.total_seconds())
+
+
+def seat_state(seat: Seat) -> list:
+    """
+    座位的检查点表示
+
+    Returns:
+        list: [x, y, 台灯, 插座, 靠窗, 状态, 使用者ID, 占用计时（秒）, 拥挤参数, 步长（秒）]
+    """
+    x, y = seat.coordinate
+    return [x, y, seat.lamp, seat.socket, seat.window, seat.status.value, seat.owner,
+            _seconds(seat.taken_time), seat.crowded_para, _seconds(seat.time_delta)]
+
+
+def restore_seat(item: list) -> Seat:
+    """由seat_state()的结果重建座位"""
+    x, y, lamp, socket, window, status, owner, taken_time, crowded, step = item
+    seat = Seat(x, y, lamp, socket, window)
+    seat.status = Status(status)
+    seat.owner = owner
+    seat.taken_time = _DAY_ORIGIN + timedelta(seconds=taken_time)
+    seat.crowded_para = crowded
+    seat.time_delta = timedelta(seconds=step)
+    return seat
+
+
+def student_state(student: Student, seat_index: dict) -> dict:
+    """
+    学生的检查点表示，日程保存为紧凑的秒数和动作编码
+
+    Args:
+        student (Student): 学生
+        seat_index (dict): id(座位) -> 座位下标
+
+    Returns:
+        dict: 学生状态
+    """
+    state = {
+        "id": student.student_id,
+        "para": student.student_para,
+        "preference": student.seat_preference,
+        "capacity": student.library_capacity,
+        "total": student.total_students,
+        "seat": None if student.seat is None else seat_index[id(student.seat)],
+        "state": student.state.value,
+        "satisfaction": student.satisfaction,
+        "clock": student._clock,
+        "step": student._step,
+        "limit": _seconds(student.limit_reverse_time),
+    }
+    if student._times is None:
+        state["raw_schedule"] = list(student._actions)  # 格式错误的日程原样保存
+    else:
+        state["times"] = student._times.tolist()
+        state["actions"] = list(student._actions)
+    return state
+
+
+def restore_student(item: dict, seats: list) -> Student:
+    """
+    由student_state()的结果重建学生，不请求LLM
+
+    Args:
+        item (dict): 学生状态
+        seats (list[Seat]): 已重建的座位，下标与检查点一致
+    """
+    student = Student.__new__(Student)
+    student.student_id = item["id"]
+    student._archetype = intern_archetype(item["para"], item["preference"])
+    student.library_capacity = item["capacity"]
+    student.total_students = item["total"]
+    student.seat = None if item["seat"] is None else seats[item["seat"]]
+    student.state = StudentState(item["state"])
+    student.satisfaction = item["satisfaction"]
+    student._clock = item["clock"]
+    student._step = item["step"]
+    student.limit_reverse_time = timedelta(seconds=item["limit"])
+    if "raw_schedule" in item:
+        student._times = None
+        student._actions = tuple(item["raw_schedule"])
+    else:
+        student._times = array('I', item["times"])
+        student._actions = bytes(item["actions"])
+    return student
+
+
+def library_state(library: Library) -> dict:
+    """
+    图书馆的检查点表示
+
+    Returns:
+        dict: 时间、计数器、平面图、座位、学生、未取用的预取学生ID和排队的学生ID
+    """
+    seat_index = {id(seat): s for s, seat in enumerate(library.seats)}
+    prefetcher = library.prefetcher
+    return {
+        "rows": getattr(library, "rows", None),
+        "columns": getattr(library, "columns", None),
+        "floor_plan": None if library.floor_plan is None else library.floor_plan.to_dict(),
+        "current_time": _seconds(library.current_time),
+        "time_delta": _seconds(library.time_delta),
+        "count": library._count,
+        "limit_reversed_time": _seconds(library.limit_reversed_time),
+        "unsatisfied": library.unsatisfied,
+        "count_cleared_seat": library.count_cleared_seat,
+        "seats": [seat_state(seat) for seat in library.seats],
+        "students": [student_state(student, seat_index) for student in library.students],
+        "prefetch": None if prefetcher is None else {"pending": prefetcher.pending_students(),
+                                                      "stats": dict(prefetcher.stats)},
+        "waitlist": None if library.waitlist is None else list(library.waitlist),
+    }
+
+
+def restore_library(state: dict) -> Library:
+    """
+    由library_state()的结果重建图书馆
+    开启过预取时重新开启，并为检查点时尚未取用的学生重新提交预取请求（提示词由相同状态构建，与原请求一致）
+    """
+    library = Library()
+    if state["rows"] is not None:
+        library.rows, library.columns = state["rows"], state["columns"]
+    library.current_time = _DAY_ORIGIN + timedelta(seconds=state["current_time"])
+    library.time_delta = timedelta(seconds=state["time_delta"])
+    library._count = state["count"]
+    library.limit_reversed_time = timedelta(seconds=state["limit_reversed_time"])
+    library.unsatisfied = state["unsatisfied"]
+    library.count_cleared_seat = state["count_cleared_seat"]
+    library.seats = [restore_seat(item) for item in state["seats"]]
+    library.seats_map = {seat.coordinate: seat for seat in library.seats}
+    library.invalidate_neighbour_graph()
+    if state.get("floor_plan") is not None:  # 座位与平面图的顺序一致，沿用平面图的邻接图（含同桌座位）
+        from .floorplan import FloorPlan
+        plan = state["floor_plan"]
+        library.floor_plan = FloorPlan(plan["grid"], plan["window_edges"], plan["name"])
+        library._graph = library.floor_plan.neighbour_graph()
+    library.students = [restore_student(item, library.seats) for item in state["students"]]
+    if state.get("waitlist") is not None:
+        library.enable_waitlist()
+        students = {student.student_id: student for student in library.students}
+        for student_id in state["waitlist"]:
+            library.waitlist[student_id] = students[student_id]
+    prefetch = state.get("prefetch")
+    if prefetch is not None:
+        library.resume_prefetch(prefetch)
+    return library
+
+
+def write_checkpoint(path: str, state: dict) -> None:
+    """
+    写入检查点，先写临时文件再原子替换
+
+    Args:
+        path (str): 检查点路径
+        state (dict): 检查点内容
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = path + ".tmp"
+    with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+        json.dump(dict(state, version=CHECKPOINT_VERSION), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+
+def read_checkpoint(path: str) -> dict:
+    """
+    读取检查点
+
+    Args:
+        path (str): 检查点路径
+
+    Returns:
+        dict: 检查点内容
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"不支持的检查点版本: {state.get('version')}")
+    return state
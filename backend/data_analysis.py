@@ -5,18 +5,9 @@ data_analysis.py
 import json
 import os
 import re
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend
 from typing import Dict, List, Tuple
 from config import simulations_base_path
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from datetime import datetime
-import pandas as pd
-
-# Configure font settings for proper character display on Windows
-plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans', 'Liberation Sans']  # Use fonts that support English characters properly
-plt.rcParams['axes.unicode_minus'] = False  # Used to properly display minus signs
+from .figure_cache import FigureManifest, compute_signature
 
 def analyze_seat_occupancy_rate(data: List[Dict]) -> float:
     """
@@ -342,6 +333,9 @@ def plot_analysis(seat_count: int, analysis_results: Dict, save_path: str = None
         print(f"No data available to plot analysis chart (Seat count: {seat_count})")
         return
     
+    from .plot import load_pyplot
+    plt = load_pyplot()  # 首次绘图时才导入matplotlib
+
     # Set English label support
     plt.rcParams['axes.unicode_minus'] = False  # Used to properly display minus signs
     
@@ -507,13 +501,15 @@ def average_similar_simulations(results: Dict) -> Dict:
     
     return new_results
 
-def run_analysis(seat_count: int, min_students: int = None, max_students: int = None, output_dir: str = None):
+def run_analysis(seat_count: int, min_students: int = None, max_students: int = None, output_dir: str = None, force: bool = False):
     """
     运行完整分析流程
+    参与分析的模拟文件和参数未变化时跳过重新绘制分析图
     :param seat_count: 座位数量
     :param min_students: 最小学生数
     :param max_students: 最大学生数
     :param output_dir: 输出目录
+    :param force: 是否忽略指纹缓存强制重新绘制
     """
     print(f"Starting analysis of simulation data for {seat_count} seats...")
     
@@ -553,6 +549,10 @@ def run_analysis(seat_count: int, min_students: int = None, max_students: int =
         print(f"No valid simulation data in specified range {min_students}-{max_students}")
         return None
     
+    # 记录参与分析的输入文件，用于计算图像指纹
+    simulations_folder = os.path.join(simulations_base_path, f"{seat_count}_seats_simulations")
+    input_files = [os.path.join(simulations_folder, name) for name in results['file_names']]
+
     # 对相同学生数的模拟进行平均处理
     results = average_similar_simulations(results)
     
@@ -573,8 +573,16 @@ def run_analysis(seat_count: int, min_students: int = None, max_students: int =
         seat_dir = os.path.join(output_dir, f"seats_{seat_count}")
         os.makedirs(seat_dir, exist_ok=True)
         
-        # 绘制并保存图表
-        plot_analysis(seat_count, results, save_path)
+        # 输入未变化时跳过绘制，否则绘制并保存图表
+        manifest = FigureManifest(seat_dir)
+        signature = compute_signature(input_files, {"kind": "analysis", "seat_count": seat_count,
+                                                    "min_students": min_students, "max_students": max_students,
+                                                    "dpi": 300})
+        if not force and manifest.is_fresh(save_path, signature):
+            print(f"Inputs unchanged, skipped analysis chart: {save_path}")
+        else:
+            plot_analysis(seat_count, results, save_path)
+            manifest.record(save_path, signature)
     else:
         print("No valid data to generate analysis chart")
         return None
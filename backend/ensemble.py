@@ -0,0 +1,339 @@
+"""
+ensemble.py
+多副本锁步模拟引擎
+同一座位/学生配置的R次重复模拟各自付出完整的逐学生Python开销。
+EnsembleEngine把R个副本的状态保存为首维为副本的NumPy数组（座位状态、学生状态、座位引用、日程动作表），
+每个tick的规则逻辑对所有副本同时以数组运算执行，输出与Simulation.step相同格式的逐副本数据。
+
+与逐对象引擎的对应关系：
+    - 清理、开始/结束、睡眠时的不满计数与学生处理顺序无关，整体计算；
+    - 离座、返回原座位、暂离学生检查座位和选座会读写座位状态，结果取决于学生处理顺序，
+      按学生下标逐个处理，每一步对所有副本向量化；
+    - 离座时是否占座使用Student._default_reverse_logic的规则（与LLM无响应时的兜底逻辑一致），
+      不请求LLM；日程仍在初始化时由各副本的学生生成
+因此结果与由LLM做离座决策的Simulation.run不可直接比较，数据文件头部以leave_decisions="rule"标明；
+在离座决策走兜底逻辑时，单副本的输出与Simulation逐tick一致
+"""
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import numpy as np
+
+from .agents import llm_stats, summarize_usage
+from .seats import Status
+from .students import ACTIONS, StudentState
+
+# 座位状态编码，与输出中的Status.value对应
+VACANT, TAKEN, RESERVED, SIGNED = 0, 1, 2, 3
+_STATUS_ORDER = (Status.vacant, Status.taken, Status.reverse, Status.signed)
+_STATUS_CODE = {status: code for code, status in enumerate(_STATUS_ORDER)}
+STATUS_VALUES = np.array([status.value for status in _STATUS_ORDER])
+
+# 学生状态编码
+SLEEP, LEARNING, AWAY, GONE = (StudentState.SLEEP.value, StudentState.LEARNING.value,
+                               StudentState.AWAY.value, StudentState.GONE.value)
+_STATE_BY_VALUE = {state.value: state for state in StudentState}
+
+# 动作类别：与Library.next_step_of_each_student的分支对应
+START, LEARN, END, AWAY_ACTION, OTHER = 0, 1, 2, 3, 4
+_ACTION_CATEGORY = {"start": START, "learn": LEARN, "end": END, "away": AWAY_ACTION}
+
+_DAY_ORIGIN = datetime(1900, 1, 1, 7)  # 座位占用计时的起点，与Library.clear_seat一致
+
+
+def satisfaction(preference, lamp, socket, window, crowded):
+    """
+    满意度，运算顺序与Student.calculate_seat_satisfaction相同以保证结果逐位一致
+
+    Args:
+        preference: 学生偏好，最后一维为(台灯, 插座, 空间)
+        lamp, socket, window, crowded: 座位属性，形状与preference去掉最后一维后可广播
+    """
+    result = 1 + np.where(lamp, 3 * preference[..., 0], 0.0)
+    result = result + np.where(socket, 3 * preference[..., 1], 0.0)
+    result = result + np.where(window, 1.0, 0.0)
+    return result + np.where(window, 3 * (1 - crowded) * preference[..., 2], 0.0)
+
+
+def reserve_rule(value, lawful, selfish, hour: int):
+    """离座时是否占座，规则与Student._default_reverse_logic一致"""
+    return (lawful & (value >= 3)) | (selfish & (value >= 4)) | ((11 <= hour <= 13) & (value >= 2))
+
+
+class EnsembleEngine:
+    """
+    R个副本锁步推进的模拟引擎
+    副本之间座位布局（坐标和顺序）和学生数必须相同，台灯、插座、学生原型和日程可以不同
+    """
+
+    def __init__(self, libraries: list) -> None:
+        """
+        从已初始化的图书馆读取初始状态
+
+        Args:
+            libraries (list[Library]): 每个副本的图书馆，座位和学生已初始化，时间一致
+        """
+        if not libraries:
+            raise ValueError("至少需要一个副本")
+        first = libraries[0]
+        self.coordinates = [seat.coordinate for seat in first.seats]
+        self.num_seats = len(self.coordinates)
+        self.num_students = len(first.students)
+        for library in libraries:
+            if [seat.coordinate for seat in library.seats] != self.coordinates or \
+                    len(library.students) != self.num_students or library.current_time != first.current_time:
+                raise ValueError("副本的座位布局、学生数和当前时间必须相同")
+        self.replicas = len(libraries)
+        self.current_time = first.current_time
+        self.time_delta = first.time_delta
+        self.seat_keys = [f"{x},{y}" for x, y in first.seats_map]  # 输出顺序与Library.seats_map一致
+        map_order = [self.coordinates.index(coordinate) for coordinate in first.seats_map]
+        self._map_order = np.array(map_order, dtype=np.intp)
+
+        self._load_seats(libraries)
+        self._load_students(libraries)
+        self.unsatisfied = np.array([library.unsatisfied for library in libraries], dtype=np.int64)
+        self.cleared = np.array([library.count_cleared_seat for library in libraries], dtype=np.int64)
+        self.limit_seconds = np.array([library.limit_reversed_time.total_seconds() for library in libraries])
+
+    def _load_seats(self, libraries: list) -> None:
+        """读取座位属性、状态和邻接关系"""
+        shape = (self.replicas, self.num_seats)
+        self.lamp = np.zeros(shape, dtype=bool)
+        self.socket = np.zeros(shape, dtype=bool)
+        self.window = np.zeros(shape, dtype=bool)
+        self.status = np.zeros(shape, dtype=np.int8)
+        self.taken_seconds = np.zeros(shape, dtype=np.int64)  # 标记状态累计的占座时长
+        self.crowded = np.zeros(shape)
+        for r, library in enumerate(libraries):
+            for s, seat in enumerate(library.seats):
+                self.lamp[r, s] = seat.lamp
+                self.socket[r, s] = seat.socket
+                self.window[r, s] = seat.window
+                self.status[r, s] = _STATUS_CODE[seat.status]
+                self.taken_seconds[r, s] = int((seat.taken_time - _DAY_ORIGIN).total_seconds())
+                self.crowded[r, s] = seat.crowded_para
+
+        # 邻居下标（不足的位置为-1）和邻居数，取自图书馆的邻接图（平面图中同桌的座位也是邻居）
+        self.neighbours = libraries[0].neighbour_graph().padded()
+        valid = self.neighbours >= 0
+        self.neighbour_count = valid.sum(axis=1)
+        safe = np.where(valid, self.neighbours, 0)
+        self._neighbour_valid = valid
+        self._neighbour_safe = safe
+        # 靠窗的邻居数在一天内不变
+        self.window_neighbours = (self.window[:, safe] & valid).sum(axis=2)
+
+    def _load_students(self, libraries: list) -> None:
+        """读取学生状态、座位引用、偏好和整天的动作表"""
+        shape = (self.replicas, self.num_students)
+        self.state = np.zeros(shape, dtype=np.int8)
+        self.seat_of = np.full(shape, -1, dtype=np.intp)
+        self.preference = np.zeros(shape + (3,))
+        self.lawful = np.zeros(shape, dtype=bool)
+        self.selfish = np.zeros(shape, dtype=bool)
+
+        # 到午夜为止的tick数，以及每个tick学生时钟对应的动作
+        ticks = 0
+        time = self.current_time
+        while True:
+            time += self.time_delta
+            ticks += 1
+            if time.strftime('%H:%M') == "00:00":
+                break
+        self.ticks = ticks
+        self.tick = 0
+        category = np.array([_ACTION_CATEGORY.get(action, OTHER) for action in ACTIONS], dtype=np.int8)
+        self.actions = np.zeros((self.replicas, self.num_students, ticks), dtype=np.int8)
+
+        for r, library in enumerate(libraries):
+            seat_index = {id(seat): s for s, seat in enumerate(library.seats)}
+            for n, student in enumerate(library.students):
+                self.state[r, n] = student.state.value
+                if student.seat is not None:
+                    self.seat_of[r, n] = seat_index[id(student.seat)]
+                preference = student.seat_preference
+                self.preference[r, n] = (preference["lamp"], preference["socket"], preference["space"])
+                self.lawful[r, n] = student.student_para["character"] == "守序"
+                self.selfish[r, n] = student.student_para["character"] == "利己"
+                clocks = student._clock + student._step * np.arange(1, ticks + 1)
+                if student._times is None or not student._actions:
+                    # 日程格式错误时为start，无日程时为end，与Student._action_at一致
+                    self.actions[r, n] = START if student._times is None else END
+                    continue
+                codes = np.frombuffer(student._actions, dtype=np.uint8)
+                positions = np.searchsorted(np.asarray(student._times), clocks, side="right")
+                self.actions[r, n] = category[codes[np.maximum(positions - 1, 0)]]
+
+    def step(self) -> None:
+        """推进一个tick，顺序与Library.update一致"""
+        status = self.status
+        # 清理超时的标记座位
+        cleared = (status == SIGNED) & (self.taken_seconds > self.limit_seconds[:, None])
+        status[cleared] = VACANT
+        self.cleared += cleared.sum(axis=1)
+
+        self.current_time += self.time_delta
+        action = self.actions[:, :, self.tick]
+        self.tick += 1
+        state = self.state.copy()  # 本tick开始时的学生状态，学生只修改自己的状态
+        seat_of = self.seat_of
+
+        # 与处理顺序无关的分支
+        self.state[(action == START) & (state == SLEEP)] = GONE
+        self.state[action == END] = SLEEP
+        self.unsatisfied += ((action == LEARN) & (state == SLEEP)).sum(axis=1)
+
+        # 读写座位状态的分支，按学生下标逐个处理
+        leaving = ((action == AWAY_ACTION) | (action == OTHER)) & (state == LEARNING)
+        checking = (action == OTHER) & (state == AWAY)
+        returning = (action == LEARN) & (state == AWAY)
+        choosing = (action == LEARN) & (state == GONE)
+        reserve = np.zeros_like(leaving)
+        if leaving.any():
+            r, n = np.nonzero(leaving)
+            reserve[r, n] = self._default_reserve(r, n, seat_of[r, n])
+        active = np.nonzero((leaving | checking | returning | choosing).any(axis=0))[0]
+        for n in active:
+            self._step_student(n, leaving[:, n], reserve[:, n], checking[:, n], returning[:, n], choosing[:, n])
+
+        # 座位计时、拥挤参数和违规标记
+        self.taken_seconds[status == SIGNED] += int(self.time_delta.total_seconds())
+        self._update_crowding()
+        status[status == RESERVED] = SIGNED
+
+    def _default_reserve(self, r, n, s):
+        """离座时是否占座，规则与Student._default_reverse_logic一致"""
+        value = satisfaction(self.preference[r, n], self.lamp[r, s], self.socket[r, s],
+                             self.window[r, s], self.crowded[r, s])
+        return reserve_rule(value, self.lawful[r, n], self.selfish[r, n], self.current_time.hour)
+
+    def _step_student(self, n, leaving, reserve, checking, returning, choosing) -> None:
+        """处理学生n在所有副本中的离座、检查、返回和选座"""
+        status = self.status
+        seat_of = self.seat_of[:, n]
+        if leaving.any():
+            r = np.nonzero(leaving)[0]
+            s = seat_of[r]
+            taken = status[r, s] == TAKEN  # Seat.leave只处理占用中的座位
+            status[r[taken], s[taken]] = np.where(reserve[r[taken]], RESERVED, VACANT)
+            self.state[r, n] = np.where(reserve[r], AWAY, GONE)
+        if checking.any():
+            r = np.nonzero(checking)[0]
+            s = seat_of[r]
+            lost = (s >= 0) & np.isin(status[r, np.maximum(s, 0)], (VACANT, TAKEN))
+            self.state[r[lost], n] = GONE  # 座位已被清理或被他人占用
+        if returning.any():
+            r = np.nonzero(returning)[0]
+            s = seat_of[r]
+            back = (s >= 0) & (status[r, np.maximum(s, 0)] == RESERVED)
+            status[r[back], s[back]] = TAKEN
+            self.state[r[back], n] = LEARNING
+            choosing = choosing.copy()
+            choosing[r[~back]] = True  # 无法回到原座位（已被清理、标记或占用）时选择新座位
+        if choosing.any():
+            r = np.nonzero(choosing)[0]
+            vacant = status[r] == VACANT
+            has_seat = vacant.any(axis=1)
+            self.unsatisfied[r[~has_seat]] += 1
+            r = r[has_seat]
+            if len(r):
+                scores = satisfaction(self.preference[r, n][:, None, :], self.lamp[r], self.socket[r],
+                                      self.window[r], self.crowded[r])
+                scores = np.where(vacant[has_seat], scores, -np.inf)
+                best = scores.argmax(axis=1)  # 第一个满意度最高的空闲座位，与逐个比较时严格大于的规则一致
+                status[r, best] = TAKEN
+                self.seat_of[r, n] = best
+                self.state[r, n] = LEARNING
+
+    def _update_crowding(self) -> None:
+        """计算拥挤参数，规则与Library.calculate_each_seat_crowded_para一致"""
+        occupied = (self.status != VACANT)[:, self._neighbour_safe] & self._neighbour_valid
+        crowded = occupied.sum(axis=2) - 0.5 * self.window_neighbours
+        count = self.neighbour_count
+        self.crowded = np.where(count > 0, crowded / np.maximum(count, 1), 0.0)
+
+    def snapshot(self) -> list[dict]:
+        """
+        当前tick各副本的输出，格式与Simulation.step写入的数据相同
+
+        Returns:
+            list[dict]: 每个副本一项
+        """
+        time = self.current_time.strftime('%H:%M')
+        values = STATUS_VALUES[self.status[:, self._map_order]].tolist()
+        taken = (self.status != VACANT).sum(axis=1).tolist()
+        reversed_seats = ((self.status == RESERVED) | (self.status == SIGNED)).sum(axis=1).tolist()
+        records = []
+        for r in range(self.replicas):
+            records.append({"time": time,
+                            "seats_taken_state": dict(zip(self.seat_keys, values[r])),
+                            "unstisfied_num": int(self.unsatisfied[r]),
+                            "cleared_seats": int(self.cleared[r]),
+                            "reversed_seats": reversed_seats[r],
+                            "taken_rate": f" {taken[r]} ({taken[r]/self.num_seats*100:.1f}%)"})
+        return records
+
+    def run(self) -> list[list[dict]]:
+        """
+        运行到午夜
+
+        Returns:
+            list[list[dict]]: 每个副本逐tick的输出
+        """
+        outputs = [[] for _ in range(self.replicas)]
+        while self.tick < self.ticks:
+            self.step()
+            for records, record in zip(outputs, self.snapshot()):
+                records.append(record)
+        return outputs
+
+
+def run_ensemble(replicas: int, row: int = 20, column: int = 20, num_students: int = 200,
+                 humanities_rate: float = 0.3, science_rate: float = 0.3, simulation_number: int = 1,
+                 limit_reversed_time: timedelta = None, save: bool = True, **simulation_options) -> list[list[dict]]:
+    """
+    以锁步引擎运行同一配置的多次重复模拟
+    每个副本独立初始化座位和学生（日程照常由LLM生成），之后的逐tick推进在EnsembleEngine中完成，
+    第i个副本的数据写入序号为simulation_number+i的模拟文件，格式与Simulation.run相同，
+    头部信息的ensemble字段注明副本数、副本序号和离座决策方式；
+    离座决策由本地规则给出而不请求LLM，见模块说明
+
+    Args:
+        replicas (int): 副本数
+        row, column, num_students, humanities_rate, science_rate: 见Simulation
+        simulation_number (int): 第一个副本的模拟序号
+        limit_reversed_time (timedelta): 占座时间限制，默认沿用Simulation的1小时
+        save (bool): 是否保存模拟文件
+        **simulation_options: 传给Simulation的其他参数，如log_level
+
+    Returns:
+        list[list[dict]]: 每个副本的模拟数据（第一项为头部信息）
+    """
+    from .simulation import Simulation
+    simulation_options["prefetch"] = False  # 离座决策不请求LLM，无需预取
+    simulations, usages, setup_seconds = [], [], []
+    for i in range(replicas):
+        started = perf_counter()
+        sim = Simulation(row=row, column=column, num_students=num_students, humanities_rate=humanities_rate,
+                         science_rate=science_rate, simulation_number=simulation_number + i, **simulation_options)
+        if limit_reversed_time is not None:
+            sim.library.set_limit_reversed_time(limit_reversed_time)
+        usages.append(llm_stats.since(sim._llm_stats_before))  # 只含本副本初始化时的日程请求
+        setup_seconds.append(perf_counter() - started)
+        simulations.append(sim)
+
+    started = perf_counter()
+    engine = EnsembleEngine([sim.library for sim in simulations])
+    outputs = engine.run()
+    run_seconds = (perf_counter() - started) / replicas  # 锁步运行的耗时均摊到各副本
+    for i, (sim, records) in enumerate(zip(simulations, outputs)):
+        sim.library.close()
+        header = sim.jm.data[0]
+        header["ensemble"] = {"replicas": replicas, "replica": i, "leave_decisions": "rule"}
+        header["llm_usage"] = usages[i]
+        header["llm_summary"] = summarize_usage(usages[i], setup_seconds[i] + run_seconds)
+        sim.jm.data.extend(records)
+        if save:
+            sim.jm.save_json()
+    return [sim.jm.data for sim in simulations]
@@ -0,0 +1,117 @@
+"""
+events.py
+模拟事件日志
+提供分级的文本日志和可选的结构化事件流（JSON Lines），替代模拟热路径中的print
+批量运行时把级别设为SILENT即为空输出，热路径只剩一次级别比较
+"""
+import json
+import sys
+import time
+from enum import IntEnum
+
+
+class Level(IntEnum):
+    """日志级别枚举，数值越大越重要"""
+    DEBUG = 10    # 逐学生、逐座位的详细过程
+    INFO = 20     # 模拟启动、保存等概要信息
+    WARNING = 30  # LLM响应异常、使用默认逻辑等
+    ERROR = 40    # 保存失败等错误
+    SILENT = 100  # 不输出任何文本日志
+
+
+class EventLog:
+    """
+    事件日志类
+    文本日志按级别过滤后写入stream；结构化事件（take/leave/reserve/sign/clear）
+    在打开事件流后以JSON Lines格式写入文件，每条带有模拟时间和墙钟时间戳
+    """
+    def __init__(self, level: Level = Level.INFO, stream=None) -> None:
+        """
+        Args:
+            level (Level): 文本日志的最低输出级别，默认为INFO
+            stream: 文本日志输出流，默认为sys.stdout
+        """
+        self.level = level
+        self.stream = stream
+        self.sim_time = None         # 当前模拟时间（datetime），由图书馆每次时间推进时更新
+        self.events_enabled = False  # 是否记录结构化事件，热路径先检查此标志
+        self._event_file = None
+
+    def enabled(self, level: Level) -> bool:
+        """判断指定级别的日志是否会被输出"""
+        return level >= self.level
+
+    def _write(self, level: Level, args, kwargs) -> None:
+        if level >= self.level:
+            print(*args, file=self.stream if self.stream is not None else sys.stdout, **kwargs)
+
+    def debug(self, *args, **kwargs) -> None:
+        """输出DEBUG级别日志，参数与print相同"""
+        self._write(Level.DEBUG, args, kwargs)
+
+    def info(self, *args, **kwargs) -> None:
+        """输出INFO级别日志"""
+        self._write(Level.INFO, args, kwargs)
+
+    def warning(self, *args, **kwargs) -> None:
+        """输出WARNING级别日志"""
+        self._write(Level.WARNING, args, kwargs)
+
+    def error(self, *args, **kwargs) -> None:
+        """输出ERROR级别日志"""
+        self._write(Level.ERROR, args, kwargs)
+
+    def open_event_stream(self, file_path: str) -> None:
+        """
+        打开结构化事件流，之后的事件以JSON Lines格式追加到文件
+
+        Args:
+            file_path (str): 事件流文件路径（.jsonl）
+        """
+        self.close_event_stream()
+        self._event_file = open(file_path, 'a', encoding='utf-8')
+        self.events_enabled = True
+
+    def close_event_stream(self) -> None:
+        """关闭结构化事件流"""
+        if self._event_file is not None:
+            self._event_file.close()
+        self._event_file = None
+        self.events_enabled = False
+
+    def event(self, kind: str, **fields) -> None:
+        """
+        记录一条结构化事件
+
+        Args:
+            kind (str): 事件类型（take/leave/reserve/sign/clear等）
+            **fields: 事件附带的字段，如座位坐标、学生ID
+        """
+        if not self.events_enabled:
+            return
+        record = {"event": kind,
+                  "sim_time": self.sim_time.strftime('%H:%M') if self.sim_time else None,
+                  "wall_time": time.time()}
+        record.update(fields)
+        self._event_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+log = EventLog()  # 进程级事件日志，各模块通过 events.log 访问
+
+
+def configure_events(level: Level = None, event_stream_path: str = None) -> EventLog:
+    """
+    配置进程级事件日志
+
+    Args:
+        level (Level): 文本日志级别，为None时保持不变
+        event_stream_path (str): 结构化事件流文件路径，为None时不改变事件流
+
+    Returns:
+        EventLog: 配置后的事件日志对象
+    """
+    if level is not None:
+        log.level = level
+    if event_stream_path is not None:
+        log.open_event_stream(event_stream_path)
+    return log
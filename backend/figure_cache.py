@@ -0,0 +1,90 @@
+"""
+figure_cache.py
+图像增量生成的指纹缓存
+为每张输出图像记录生成它的输入模拟文件哈希和绘图参数，
+当输入与参数都未变化时跳过重新渲染
+"""
+import hashlib
+import os
+
+from .json_manager import JsonManager
+
+MANIFEST_NAME = ".figure_manifest.json"  # 每个seats_<n>图像文件夹下的指纹清单文件名
+PLOT_VERSION = 1  # 绘图代码版本号，修改图表样式后递增以强制重新生成
+
+
+def file_digest(file_path: str) -> str:
+    """
+    计算文件内容的SHA-256哈希
+
+    Args:
+        file_path (str): 文件路径
+
+    Returns:
+        str: 十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_signature(input_files: list, params: dict) -> dict:
+    """
+    计算一张图像的输入指纹
+
+    Args:
+        input_files (list): 参与绘图的模拟JSON文件路径列表
+        params (dict): 影响图像内容的绘图参数
+
+    Returns:
+        dict: 包含输入文件哈希和绘图参数的指纹
+    """
+    return {
+        "version": PLOT_VERSION,
+        "inputs": {os.path.basename(path): file_digest(path) for path in sorted(input_files)},
+        "params": params
+    }
+
+
+class FigureManifest:
+    """
+    图像指纹清单
+    记录文件夹内每张图像对应的输入指纹，用于判断图像是否需要重新生成
+    """
+    def __init__(self, figure_folder: str) -> None:
+        """
+        Args:
+            figure_folder (str): 图像所在文件夹（如simulation_data/figures/seats_9）
+        """
+        self.figure_folder = figure_folder
+        self.jm = JsonManager(os.path.join(figure_folder, MANIFEST_NAME), {})
+        if not isinstance(self.jm.data, dict):  # 清单损坏时重新开始
+            self.jm.data = {}
+
+    def is_fresh(self, image_path: str, signature: dict) -> bool:
+        """
+        判断图像是否已由相同输入生成
+
+        Args:
+            image_path (str): 图像路径
+            signature (dict): 当前输入的指纹
+
+        Returns:
+            bool: 图像存在且指纹一致时返回True
+        """
+        if not os.path.exists(image_path):
+            return False
+        return self.jm.data.get(os.path.basename(image_path)) == signature
+
+    def record(self, image_path: str, signature: dict) -> None:
+        """
+        记录图像的输入指纹并保存清单
+
+        Args:
+            image_path (str): 图像路径
+            signature (dict): 生成该图像时的输入指纹
+        """
+        self.jm.data[os.path.basename(image_path)] = signature
+        self.jm.save_json()
@@ -0,0 +1,233 @@
+"""
+floorplan.py
+阅览室平面图与稀疏邻接图
+initialize_seats只能生成完整的行×列矩形，靠窗座位固定为坐标0或19的边缘，拥挤参数每个tick对每个座位
+用坐标元组在seats_map中查找8个邻居。FloorPlan从JSON/CSV的字符网格读取任意布局（过道、桌子、柱子、
+窗户、台灯和插座的位置），一次性构建座位和压缩稀疏行（CSR）格式的邻接图；
+拥挤参数和窗户的影响由稀疏矩阵与向量的乘积计算，不再逐座位查字典。
+
+网格字符（CSV中每个单元格为一个字符，空单元格为过道）：
+    N 普通座位   L 有台灯   S 有插座   B 台灯和插座都有   ? 按比例随机分配台灯和插座
+    . 过道   # 柱子或墙   T 桌子   W 窗户
+座位的邻居为周围8格中的座位，以及与其围坐同一张桌子（上下左右相邻、连成一片的T格）的座位；
+与窗户相邻（周围8格）或位于window_edges所列网格边缘的座位靠窗
+"""
+import csv
+import json
+import os
+
+import numpy as np
+
+from .seats import Seat
+
+SEAT_CODES = {"N": (False, False), "L": (True, False), "S": (False, True), "B": (True, True), "?": (None, None)}
+AISLE, PILLAR, TABLE, WINDOW = ".", "#", "T", "W"
+EDGES = ("top", "bottom", "left", "right")
+_DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+_SIDES = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+class NeighbourGraph:
+    """
+    座位邻接图，CSR格式：座位s的邻居为indices[indptr[s]:indptr[s+1]]
+    窗户的影响（靠窗的邻居数）在一天内不变，构建时计算一次
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, window: np.ndarray) -> None:
+        """
+        Args:
+            indptr (np.ndarray): 每个座位的邻居在indices中的起点，长度为座位数+1
+            indices (np.ndarray): 邻居下标
+            window (np.ndarray): 每个座位是否靠窗
+        """
+        self.indptr = np.asarray(indptr, dtype=np.intp)
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.size = len(self.indptr) - 1
+        self.degree = np.diff(self.indptr)
+        self._rows = np.repeat(np.arange(self.size), self.degree)  # 每条边的起点
+        self.window_neighbours = self.matvec(np.asarray(window, dtype=float))
+
+    @classmethod
+    def from_edges(cls, size: int, edges: dict, window) -> "NeighbourGraph":
+        """
+        由邻接表构建
+
+        Args:
+            size (int): 座位数
+            edges (dict): 座位下标 -> 邻居下标的集合
+            window: 每个座位是否靠窗
+        """
+        indptr = np.zeros(size + 1, dtype=np.intp)
+        indices = []
+        for s in range(size):
+            neighbours = sorted(edges.get(s, ()))
+            indices.extend(neighbours)
+            indptr[s + 1] = indptr[s] + len(neighbours)
+        return cls(indptr, np.array(indices, dtype=np.intp), window)
+
+    @classmethod
+    def from_seats(cls, seats: list[Seat]) -> "NeighbourGraph":
+        """按座位坐标的8邻域构建（没有平面图的图书馆，如手工搭建或从检查点恢复的座位）"""
+        index = {seat.coordinate: s for s, seat in enumerate(seats)}
+        edges = {}
+        for s, seat in enumerate(seats):
+            x, y = seat.coordinate
+            edges[s] = {index[(x + dx, y + dy)] for dx, dy in _DIRECTIONS if (x + dx, y + dy) in index}
+        return cls.from_edges(len(seats), edges, [seat.window for seat in seats])
+
+    def matvec(self, vector: np.ndarray) -> np.ndarray:
+        """邻接矩阵与向量的乘积：每个座位的邻居取值之和"""
+        return np.bincount(self._rows, weights=vector[self.indices], minlength=self.size)
+
+    def crowding(self, occupied: np.ndarray) -> np.ndarray:
+        """
+        拥挤参数，规则与逐座位计算时一致：(被占用的邻居数 - 0.5×靠窗的邻居数) / 邻居数，没有邻居时为0
+
+        Args:
+            occupied (np.ndarray): 每个座位是否被占用（非空闲）
+        """
+        crowded = self.matvec(np.asarray(occupied, dtype=float)) - 0.5 * self.window_neighbours
+        return np.where(self.degree > 0, crowded / np.maximum(self.degree, 1), 0.0)
+
+    def padded(self) -> np.ndarray:
+        """
+        定长的邻居表，供数组引擎使用
+
+        Returns:
+            np.ndarray: 形状为(座位数, 最大邻居数)，不足的位置为-1
+        """
+        width = int(self.degree.max()) if self.size else 0
+        table = np.full((self.size, width), -1, dtype=np.intp)
+        for s in range(self.size):
+            start, end = self.indptr[s], self.indptr[s + 1]
+            table[s, :end - start] = self.indices[start:end]
+        return table
+
+
+class FloorPlan:
+    """阅览室平面图：字符网格，座位按行优先的顺序编号"""
+
+    def __init__(self, grid: list, window_edges=(), name: str = None) -> None:
+        """
+        Args:
+            grid (list): 每行为一个字符串或单元格列表，字符含义见模块说明，行长可以不同
+            window_edges: 靠窗的网格边缘，取值见EDGES
+            name (str): 平面图名称
+        """
+        unknown = set(window_edges) - set(EDGES)
+        if unknown:
+            raise ValueError(f"未知的窗户边缘: {sorted(unknown)}，可选 {list(EDGES)}")
+        self.grid = [[(cell or AISLE).strip() or AISLE for cell in row] for row in grid]
+        for x, row in enumerate(self.grid):
+            for y, cell in enumerate(row):
+                if cell not in SEAT_CODES and cell not in (AISLE, PILLAR, TABLE, WINDOW):
+                    raise ValueError(f"平面图第{x + 1}行第{y + 1}列的字符无法识别: {cell!r}")
+        self.window_edges = tuple(window_edges)
+        self.name = name
+        self.rows = len(self.grid)
+        self.columns = max((len(row) for row in self.grid), default=0)
+        self.coordinates = [(x, y) for x, row in enumerate(self.grid) for y, cell in enumerate(row)
+                            if cell in SEAT_CODES]
+        self.window = [self._is_window(x, y) for x, y in self.coordinates]
+        self._graph = None
+
+    @classmethod
+    def rectangle(cls, row: int, column: int) -> "FloorPlan":
+        """完整的行×列矩形，座位的台灯和插座随机分配，四周边缘靠窗"""
+        return cls(["?" * column] * row, window_edges=EDGES, name=f"{row}*{column}")
+
+    def cell(self, x: int, y: int) -> str:
+        """网格中的字符，超出网格时为过道"""
+        if 0 <= x < self.rows and 0 <= y < len(self.grid[x]):
+            return self.grid[x][y]
+        return AISLE
+
+    def _is_window(self, x: int, y: int) -> bool:
+        edges = self.window_edges
+        if ("top" in edges and x == 0) or ("bottom" in edges and x == self.rows - 1) or \
+                ("left" in edges and y == 0) or ("right" in edges and y == self.columns - 1):
+            return True
+        return any(self.cell(x + dx, y + dy) == WINDOW for dx, dy in _DIRECTIONS)
+
+    def _tables(self) -> list[set]:
+        """每张桌子（上下左右相连的T格）周围的座位下标"""
+        index = {coordinate: s for s, coordinate in enumerate(self.coordinates)}
+        seen, tables = set(), []
+        for x, row in enumerate(self.grid):
+            for y, cell in enumerate(row):
+                if cell != TABLE or (x, y) in seen:
+                    continue
+                stack, seats = [(x, y)], set()
+                seen.add((x, y))
+                while stack:
+                    cx, cy = stack.pop()
+                    for dx, dy in _SIDES:
+                        nx, ny = cx + dx, cy + dy
+                        if self.cell(nx, ny) == TABLE and (nx, ny) not in seen:
+                            seen.add((nx, ny))
+                            stack.append((nx, ny))
+                        elif (nx, ny) in index:
+                            seats.add(index[(nx, ny)])
+                tables.append(seats)
+        return tables
+
+    def neighbour_graph(self) -> NeighbourGraph:
+        """座位邻接图，第一次调用时构建"""
+        if self._graph is None:
+            index = {coordinate: s for s, coordinate in enumerate(self.coordinates)}
+            edges = {}
+            for s, (x, y) in enumerate(self.coordinates):
+                edges[s] = {index[(x + dx, y + dy)] for dx, dy in _DIRECTIONS if (x + dx, y + dy) in index}
+            for seats in self._tables():
+                for s in seats:
+                    edges[s] |= seats - {s}
+            self._graph = NeighbourGraph.from_edges(len(self.coordinates), edges, self.window)
+        return self._graph
+
+    def build_seats(self, lamp_rate: float = 0.5, socket_rate: float = 0.5, rng=None) -> list[Seat]:
+        """
+        创建座位，?座位的台灯和插座按比例随机分配
+        先为所有座位各取一个台灯随机数、再各取一个插座随机数，矩形平面图与原先逐格生成时的随机序列一致
+
+        Args:
+            lamp_rate (float): ?座位有台灯的概率为1-lamp_rate（与initialize_seats一致）
+            socket_rate (float): ?座位有插座的概率为1-socket_rate
+            rng: 随机数生成器，默认为random模块
+
+        Returns:
+            list[Seat]: 座位，顺序与coordinates一致
+        """
+        import random
+        rng = rng or random
+        lamps = [rng.random() >= lamp_rate for _ in self.coordinates]
+        sockets = [rng.random() >= socket_rate for _ in self.coordinates]
+        seats = []
+        for s, (x, y) in enumerate(self.coordinates):
+            lamp, socket = SEAT_CODES[self.grid[x][y]]
+            seats.append(Seat(x, y, lamps[s] if lamp is None else lamp, sockets[s] if socket is None else socket,
+                              window=self.window[s]))
+        return seats
+
+    def to_dict(self) -> dict:
+        """可写入JSON（含检查点）的表示，load_floor_plan可读回"""
+        return {"name": self.name, "grid": ["".join(row) for row in self.grid], "window_edges": list(self.window_edges)}
+
+
+def load_floor_plan(path: str) -> FloorPlan:
+    """
+    读取平面图文件
+
+    Args:
+        path (str): .json文件（{"grid": [...], "window_edges": [...], "name": ...}）
+            或.csv文件（每个单元格一个字符，空单元格为过道）
+
+    Returns:
+        FloorPlan: 平面图
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if path.lower().endswith(".csv"):
+        with open(path, encoding="utf-8", newline="") as f:
+            return FloorPlan(list(csv.reader(f)), name=name)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return FloorPlan(data["grid"], data.get("window_edges", ()), data.get("name") or name)
@@ -0,0 +1,166 @@
+"""
+fork.py
+从共同前缀分支比较图书馆策略
+比较不同占座时限等策略时，每个变体都要重新模拟完全相同的上午，重复请求日程和离座决策。
+fork_simulation在分支时刻对模拟做一次快照，每个分支由快照重建图书馆、应用策略覆盖后运行到午夜：
+    - 日程在分支之间结构共享（学生的日程数组不可变，分支直接引用父模拟的对象），
+      并行时用fork启动的子进程按写时复制继承父进程中的快照和日程；
+    - 每个分支的数据文件只保存分支之后的tick，头部的fork字段引用父模拟数据文件中的共同前缀，
+      load_run读取时拼接为完整的模拟数据
+"""
+import multiprocessing as mp
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from . import events
+from .json_manager import JsonManager, open_fuc, test_form
+
+# 可覆盖的策略: 名称 -> 应用到图书馆的函数
+POLICY_OVERRIDES = {
+    "limit_reversed_time": lambda library, value: library.set_limit_reversed_time(value),
+}
+
+# 并行分支的子进程在fork时继承的父模拟，避免逐个分支序列化快照
+_parent = None
+_snapshot = None
+
+
+def _jsonable(value):
+    """策略值转为可写入头部的形式，timedelta写为"HH:MM" """
+    if isinstance(value, timedelta):
+        minutes = int(value.total_seconds()) // 60
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+    return value
+
+
+def branch_path(parent_path: str, name: str) -> str:
+    """分支数据文件路径：父模拟数据文件旁的forks/<父文件名>/<分支名>.json"""
+    directory, file_name = os.path.split(parent_path)
+    return os.path.join(directory, "forks", os.path.splitext(file_name)[0], f"{name}.json")
+
+
+def load_run(path: str) -> list[dict]:
+    """
+    读取模拟数据文件，分支文件会拼接父模拟中的共同前缀
+
+    Args:
+        path (str): 模拟数据文件路径
+
+    Returns:
+        list[dict]: 完整的模拟数据（第一项为头部信息）
+    """
+    data = open_fuc(test_form(path), path)
+    fork = data[0].get("fork")
+    if not fork:
+        return data
+    prefix_path = os.path.normpath(os.path.join(os.path.dirname(path), fork["prefix"]))
+    prefix = load_run(prefix_path)[1:1 + fork["prefix_records"]]
+    return [data[0]] + prefix + data[1:]
+
+
+def _branch_time(library, at: str) -> datetime:
+    """
+    分支时刻对应的模拟时间，须在时间步长的网格上且不早于图书馆的当前时间
+
+    Args:
+        library (Library): 父模拟的图书馆
+        at (str): "HH:MM"，"00:00"为当天结束
+
+    Returns:
+        datetime: 与library.current_time可比较的时间
+
+    Raises:
+        ValueError: 格式错误、不在网格上、不在开馆时间内或已经过去
+    """
+    day_start = datetime(1900, 1, 1, 7)
+    try:
+        target = datetime.strptime(at, '%H:%M')
+    except (TypeError, ValueError):
+        raise ValueError(f"分支时刻应为HH:MM格式: {at!r}") from None
+    if at == "00:00":
+        target += timedelta(days=1)
+    elif target < day_start:
+        raise ValueError(f"分支时刻{at}不在模拟时间07:00至00:00内")
+    if (target - day_start) % library.time_delta:
+        raise ValueError(f"分支时刻{at}不在{int(library.time_delta.total_seconds()) // 60}分钟的时间步长上")
+    if target < library.current_time:
+        raise ValueError(f"模拟已运行到{library.current_time.strftime('%H:%M')}，无法在{at}分支")
+    return target
+
+
+def _run_branch(name: str, overrides: dict, at: str) -> str:
+    """由快照运行一个分支，返回分支数据文件路径"""
+    from .simulation import Simulation
+    parent, snapshot = _parent, _snapshot
+    path = branch_path(parent.jm.file_path, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    jm = JsonManager(path, [])
+    header = {key: parent.jm.data[0][key] for key in ("test_name", "test_scale", "seat_info")}
+    header["fork"] = {"prefix": os.path.relpath(parent.jm.file_path, os.path.dirname(path)),
+                      "prefix_records": snapshot["records"], "at": at, "branch": name,
+                      "overrides": {key: _jsonable(value) for key, value in overrides.items()}}
+    jm.data = [header]  # 覆盖同名分支的旧文件
+    branch = Simulation._from_snapshot(snapshot, jm)
+    branch._started_at = time.perf_counter()  # 墙钟时间只计分支之后
+    for student, source in zip(branch.library.students, parent.library.students):
+        student._times, student._actions = source._times, source._actions  # 日程不可变，直接共享
+    for key, value in overrides.items():
+        POLICY_OVERRIDES[key](branch.library, value)
+    events.log.info(f"分支{name}从{at}开始运行: {header['fork']['overrides']}")
+    while branch.library.current_time.strftime('%H:%M') != "00:00":
+        branch.step()
+    branch.finish_run()  # 头部的LLM用量只含分支之后的请求
+    return path
+
+
+def fork_simulation(sim, at_time, overrides, parallel: bool = False, max_workers: int = None) -> dict:
+    """
+    将模拟推进到分支时刻，从同一快照运行多个策略变体
+
+    Args:
+        sim (Simulation): 父模拟，推进到分支时刻后停住，可继续运行作为基线
+        at_time: 分支时刻，"HH:MM"字符串或datetime
+        overrides: 分支名 -> 策略覆盖（POLICY_OVERRIDES中的名称 -> 值）的字典，或策略覆盖的列表（分支名为branch-序号）
+        parallel (bool): 是否在子进程中并行运行分支，平台不支持fork启动方式时顺序运行
+        max_workers (int): 并行时的进程数，默认为分支数
+
+    Returns:
+        dict: 分支名 -> 拼接共同前缀后的完整模拟数据
+    """
+    global _parent, _snapshot
+    if not isinstance(overrides, dict):
+        overrides = {f"branch-{i}": item for i, item in enumerate(overrides)}
+    for name, items in overrides.items():
+        unknown = set(items) - set(POLICY_OVERRIDES)
+        if unknown:
+            raise KeyError(f"分支{name}包含未知的策略: {sorted(unknown)}，可选 {sorted(POLICY_OVERRIDES)}")
+    at = at_time.strftime('%H:%M') if isinstance(at_time, datetime) else at_time
+    target = _branch_time(sim.library, at)  # 先检查，避免推进父模拟（并请求LLM）之后才报错
+    while sim.library.current_time < target:
+        sim.step()
+    sim.jm.save_json()  # 父模拟数据文件即为各分支引用的共同前缀
+
+    _parent, _snapshot = sim, sim.snapshot()
+    random_state = random.getstate()  # 顺序运行的分支会恢复快照中的随机数状态，结束后还原，父模拟可继续运行
+    try:
+        if parallel and len(overrides) > 1 and "fork" in mp.get_all_start_methods():
+            # 预取线程可能正持有锁（预取器、连接池等），fork出的子进程会继承已加锁的锁而死锁，
+            # 先停止预取，子进程由快照重新提交，父模拟在分支结束后恢复
+            prefetch = sim.library.pause_prefetch()
+            try:
+                with ProcessPoolExecutor(max_workers=max_workers or len(overrides),
+                                         mp_context=mp.get_context("fork")) as pool:
+                    futures = {name: pool.submit(_run_branch, name, items, at) for name, items in overrides.items()}
+                    paths = {name: future.result() for name, future in futures.items()}
+            finally:
+                if prefetch is not None:
+                    sim.library.resume_prefetch(prefetch)
+        else:
+            paths = {name: _run_branch(name, items, at) for name, items in overrides.items()}
+    finally:
+        _parent = _snapshot = None
+        random.setstate(random_state)
+    return {name: load_run(path) for name, path in paths.items()}
@@ -3,30 +3,31 @@
 import json
 import pickle
 import gzip
+from . import events
 
 def test_form(file_path:str)->str:
     '''用于检索文件类型'''
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
-            print("✅ 用 JSON 读取成功！")
+            events.log.debug("✅ 用 JSON 读取成功！")
             return 'utf-8'
     except UnicodeDecodeError:
-        print("❌ 不是 UTF-8 编码的文本文件，尝试二进制格式...")
+        events.log.debug("❌ 不是 UTF-8 编码的文本文件，尝试二进制格式...")
 
         # 尝试用 pickle 读取
         try:
             with open(file_path, 'rb') as f:
-                print("✅ 用 Pickle 读取成功！")
+                events.log.debug("✅ 用 Pickle 读取成功！")
             return 'rb'
         except Exception as e:
-            print(f"❌ 不是 Pickle 文件: {e}")
+            events.log.debug(f"❌ 不是 Pickle 文件: {e}")
 
             try:
                 with gzip.open(file_path, 'rt', encoding='utf-8') as f:
-                    print("✅ 用 Gzip + JSON 读取成功！")
+                    events.log.debug("✅ 用 Gzip + JSON 读取成功！")
                 return 'g'
             except Exception as e:
-                print(f"❌ 不是 Gzip 文件: {e}")
+                events.log.error(f"❌ 不是 Gzip 文件: {e}")
                 raise
 
 
@@ -42,8 +43,8 @@ def open_fuc(form,file_path):
         with gzip.open(file_path, 'rt', encoding='utf-8') as f:
             return json.load(f)
     else:
-        print('='*50)
-        print('FormError')
+        events.log.error('='*50)
+        events.log.error('FormError')
         raise ValueError("无法识别文件格式")
     
 
@@ -93,10 +94,10 @@ class JsonManager:
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
             with open(save_path, 'w', encoding='utf-8') as f:
                 json.dump(self.data, f, ensure_ascii=False, indent=2)
-                print(f'保存成功到{save_path}')
+                events.log.debug(f'保存成功到{save_path}')
             return True
         except Exception as e:
-            print(f"保存失败: {e}")
+            events.log.error(f"保存失败: {e}")
             return False
         
     def remove_json(self) -> bool:
@@ -1,8 +1,16 @@
 from .seats import Seat,Status
 from .students import Student,StudentState
+from .schedule import schedule_provider
 import random
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from threading import Thread, Lock
+from . import events
+from .profiler import NullProfiler
+from .prefetch import LeavePrefetcher
+
+# 学习状态下不会触发离座的动作：learn继续学习，start不处理，end直接进入休眠
+STAY_ACTIONS = ("learn", "start", "end")
 
 #Seat含有的属性：lamp,socket,x,y
 #Students含有的属性：lamp:float,socket:float,space:float///character="守序", schedule_type="正常", focus_type="中", course_situation="中"
@@ -26,6 +34,13 @@ class Library:
         self.unsatisfied = 0  # 不满意计数器，记录因没有座位而无法学习的学生数
         self.count_cleared_seat = 0
         self._lock = Lock()  # 线程锁，保证计数器和列表操作的线程安全
+        self.profiler = NullProfiler()  # 分阶段计时器，默认不记录
+        self.prefetcher = None  # 离座决策预取器，为None时离座时同步请求LLM
+        self.waitlist = None  # 等座队列（学生ID -> 学生，按排队先后），为None时不排队，见enable_waitlist
+        self._vacant = None  # 本tick的空闲座位数，在update中维护，为None时未知
+        self.floor_plan = None  # 座位所依据的平面图，手工搭建的座位为None
+        self._graph = None  # 座位邻接图的缓存，见neighbour_graph
+        self.overflow = None  # 校园模拟中收集本tick没有选到座位的学生，由路由器分流到其他图书馆；为None时不收集
     @staticmethod
     def _random_assign(random_num:int):
         """
@@ -43,29 +58,53 @@ class Library:
 
     def initialize_seats(self,row:int,column:int,lamp_rate:float=0.5,socket_rate:float=0.5):
         """
-        初始化座位系统，在20x20网格中创建400个座位
-        随机分配台灯和插座属性，边缘座位自动为靠窗座位
+        初始化座位系统，在row×column的矩形网格中创建座位
+        随机分配台灯和插座属性，四周边缘座位为靠窗座位
+
+        Args:
+            lamp_rate (float): 座位有台灯的概率为1-lamp_rate，默认为0.5
+            socket_rate (float): 座位有插座的概率为1-socket_rate，默认为0.5
+        """
+        from .floorplan import FloorPlan  # 邻接图依赖numpy，推迟到建馆时导入，不拖慢模拟核心的冷启动
+        self.initialize_floor_plan(FloorPlan.rectangle(row, column), lamp_rate, socket_rate)
+
+    def initialize_floor_plan(self,plan:"FloorPlan",lamp_rate:float=0.5,socket_rate:float=0.5):
+        """
+        按平面图初始化座位系统，座位的邻接图随平面图一次性构建
 
         Args:
-            lamp_rate (float): 座位有台灯的概率，默认为0.5
-            socket_rate (float): 座位有插座的概率，默认为0.5
+            plan (FloorPlan): 平面图，见floorplan.load_floor_plan
+            lamp_rate (float): 未指定设施的座位有台灯的概率为1-lamp_rate，默认为0.5
+            socket_rate (float): 未指定设施的座位有插座的概率为1-socket_rate，默认为0.5
         """
-        self.rows = row
-        self.columns = column
+        self.floor_plan = plan
+        self.rows = plan.rows
+        self.columns = plan.columns
         self.seats.clear()  # 清空现有座位列表
-        # 生成400个随机数用于决定是否分配台灯和插座
-        lamp_list = [lamp>=lamp_rate for lamp in self._random_assign(row*column)]  # 生成400个随机值
-        socket_list = [socket>=socket_rate for socket in self._random_assign(row*column)]
-        # 遍历20x20网格，创建每个座位
-        idx = 0
-        for x in range(row):
-            for y in range(column):
-                # 根据随机数决定是否分配台灯和插座
-                self.seats.append(Seat(x,y,lamp_list[idx],socket_list[idx]))
-                idx += 1
+        self.seats.extend(plan.build_seats(lamp_rate, socket_rate))
         # 构建座位坐标到座位对象的映射，便于后续查找
+        self.seats_map.clear()
         for seat in self.seats:
             self.seats_map[seat.coordinate] = seat
+        self._graph = plan.neighbour_graph()
+
+    def neighbour_graph(self) -> "NeighbourGraph":
+        """
+        座位邻接图（CSR格式），下标与self.seats一致
+        平面图初始化的座位使用平面图的邻接关系（含同桌座位）；手工搭建的座位第一次使用时按坐标的8邻域构建，
+        之后替换或修改座位列表需调用invalidate_neighbour_graph
+
+        Returns:
+            NeighbourGraph: 邻接图
+        """
+        if self._graph is None:
+            from .floorplan import NeighbourGraph
+            self._graph = NeighbourGraph.from_seats(self.seats)
+        return self._graph
+
+    def invalidate_neighbour_graph(self):
+        """座位列表被替换或修改后丢弃邻接图的缓存，下次使用时按当前座位重新构建"""
+        self._graph = None
 
     def visualize_seats_taken_state(self):
         print("\n","="*self.rows*4)
@@ -314,6 +353,7 @@ class Library:
             science (float): 理科生比例，默认为0.3
         """
         self.students.clear()  # 清空现有学生列表
+        schedule_provider.clear()  # 每批学生使用新请求的候选日程
         # 根据比例计算各专业学生数量
         humanities_num = int((num * humanities))
         science_num = int(num * science)
@@ -472,18 +512,189 @@ class Library:
         推进时间，更新座位和学生状态，处理学生行为
         这是模拟系统的核心更新函数
         """
-        self.clear_seat()
+        profiler = self.profiler
+        with profiler.phase("sign_clear"):
+            self.clear_seat()
         self.current_time+=self.time_delta  # 推进系统时间
+        events.log.sim_time = self.current_time  # 事件日志使用模拟时间作为时间戳
+        # 空闲座位数，学生选座和离座时增减；没有空位时选座无需逐座比较
+        self._vacant = sum(1 for seat in self.seats if seat.status == Status.vacant)
         # 更新所有学生状态和行为
         for student in self.students:
             student.update()  # 更新学生时间
             self.next_step_of_each_student(student)  # 处理学生下一步行为
-        # 更新所有座位的状态和拥挤参数
+        if self.waitlist is not None:
+            with profiler.phase("seat_selection"):
+                self.serve_waitlist()
+        # 更新所有座位的状态
         for seat in self.seats:
             seat.update()  # 更新座位时间
-            self.calculate_each_seat_crowded_para()  # 计算座位拥挤参数
-        self.sign_seat()
-        
+        # 拥挤参数每个tick整体计算一次（原先在座位循环内对每个座位都重算一遍全部座位）
+        with profiler.phase("crowding"):
+            self.calculate_each_seat_crowded_para()
+        with profiler.phase("sign_clear"):
+            self.sign_seat()
+        if self.prefetcher is not None:
+            with profiler.phase("leave_decision"):
+                self.prefetch_leave_decisions()
+
+    def start_new_day(self):
+        """
+        开始新的一天（多日模拟）
+        保留座位布局和学生，时间回到07:00，座位全部空闲，学生离开图书馆，计数器清零，取消未取用的预取
+        """
+        self.current_time = datetime(1900,1,1,7)
+        events.log.sim_time = self.current_time
+        for seat in self.seats:
+            seat.status = Status.vacant
+            seat.owner = None
+            seat.taken_time = datetime(1900,1,1,7)
+            seat.crowded_para = 0
+        for student in self.students:
+            student.start_day()
+        if self.waitlist is not None:
+            self.waitlist.clear()
+        self.unsatisfied = 0
+        self.count_cleared_seat = 0
+        if self.prefetcher is not None:
+            self.prefetcher.retain(())
+
+    def enable_waitlist(self):
+        """
+        开启等座队列
+        没有空位时，要学习的学生按先后排队，不再每个tick逐座比较；空出的座位在每个tick的学生行为之后
+        按排队先后分配给等待的学生（各自在空位中选择最满意的），有人排队时新来的学生不能插队。
+        开启后不满意数为每个tick结束时仍在排队的人数（另加休眠中却要学习的次数），
+        排队的学生日程转为非学习动作时离开队列
+        """
+        if self.waitlist is None:
+            self.waitlist = OrderedDict()
+
+    def serve_waitlist(self):
+        """
+        将空闲座位按排队先后分配给等待的学生，并按仍在排队的人数增加不满意计数
+        有排队学生和空位时才扫描一次座位，每名学生只在空位中选择，开销与空位数成正比
+        """
+        waitlist = self.waitlist
+        if waitlist and self._vacant:
+            vacant = [seat for seat in self.seats if seat.status == Status.vacant]
+            while waitlist and vacant:
+                _, student = waitlist.popitem(last=False)
+                student.choose_seat(vacant)
+                vacant.remove(student.seat)
+                self._vacant -= 1
+                events.log.debug("学生",student.student_id,"排到了座位",sep="")
+        self.unsatisfied += len(waitlist)
+
+    def _choose_seat(self, student: Student, new_seat: bool = True) -> bool:
+        """
+        学生选座并维护空闲座位数
+        没有空位（或new_seat为False）时只尝试回到原座位，不逐座比较，结果与逐座比较相同
+
+        Args:
+            student (Student): 不在学习状态的学生
+            new_seat (bool): 是否允许选择新座位
+
+        Returns:
+            bool: 是否选到座位
+        """
+        returning = student.state == StudentState.AWAY and student.seat is not None \
+            and student.seat.status == Status.reverse  # 只有占座中的原座位能回去
+        took = student.choose_seat(self.seats if new_seat and self._vacant != 0 else [])
+        if took and not returning and self._vacant is not None:
+            self._vacant -= 1
+        return took
+
+    def _join_waitlist(self, student: Student):
+        """
+        要学习的学生选座（有人排队时只尝试回到原座位），没有座位时排队
+        排队的学生不再持有原座位（原座位已空出、被他人占用或已被标记）
+        """
+        if student.state == StudentState.SLEEP:
+            self.get_unsatisfied()  # 与不排队时一致：休眠中的学生无法选座
+            return
+        if student.student_id in self.waitlist:
+            return  # 继续排队，本tick结束时计入不满意数
+        if self._choose_seat(student, new_seat=not self.waitlist):
+            return
+        student.state = StudentState.GONE
+        student.seat = None
+        self.waitlist[student.student_id] = student
+        events.log.debug("学生",student.student_id,"开始排队等座",sep="")
+
+    def _leave_seat(self, student: Student):
+        """学生离座，完全离开时空闲座位数加一"""
+        with self.profiler.phase("leave_decision"):
+            student.leave_seat(self.prefetcher)  # 学生离开座位，根据智能决策决定是否占座
+        if student.state == StudentState.GONE and self._vacant is not None:
+            self._vacant += 1
+
+    def enable_prefetch(self, max_workers: int = None):
+        """
+        开启离座决策预取
+        每个tick结束时为预计在下一个tick离座的学生在后台请求决策
+
+        Args:
+            max_workers (int): 后台线程数，默认与LLM连接池的最大连接数一致
+        """
+        if self.prefetcher is None:
+            self.prefetcher = LeavePrefetcher(max_workers)
+
+    def prefetch_leave_decisions(self):
+        """
+        为预计在下一个tick离座的学生提交预取请求
+        在座位更新、拥挤参数计算和标记之后调用，此时的满意度即为下一个tick离座时的满意度；
+        提示词使用下一个tick的时间，离座时若状态有变（提示词不同）则重新请求
+        """
+        next_time = self.current_time + self.time_delta
+        expected = set()
+        for student in self.students:
+            if student.state != StudentState.LEARNING or student.seat is None:
+                continue
+            if student.get_next_action() in STAY_ACTIONS:
+                continue
+            prompt = student.leave_prompt(at=next_time)
+            if prompt is not None:
+                self.prefetcher.submit(student, prompt)
+                expected.add(student.student_id)
+        self.prefetcher.retain(expected)  # 预测不再离座的学生，取消其预取请求
+
+    def close(self):
+        """关闭离座决策预取的后台线程"""
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+
+    def pause_prefetch(self):
+        """
+        停止离座决策预取的后台线程，之后由resume_prefetch重新提交
+        fork子进程前调用：子进程只复制调用fork的线程，后台线程持有的锁在子进程中永远不会释放
+
+        Returns:
+            dict: 未取用的预取学生ID和统计，格式与检查点中的prefetch相同；未开启预取时为None
+        """
+        if self.prefetcher is None:
+            return None
+        state = {"pending": self.prefetcher.pending_students(), "stats": dict(self.prefetcher.stats)}
+        self.prefetcher.close()
+        return state
+
+    def resume_prefetch(self, state):
+        """
+        开启离座决策预取，按下一个tick的时间重新提交未取用的请求，重新提交不计入统计
+
+        Args:
+            state (dict): pause_prefetch的返回值或检查点中的prefetch
+        """
+        self.enable_prefetch()
+        pending = set(state["pending"])
+        next_time = self.current_time + self.time_delta
+        for student in self.students:
+            if student.student_id in pending:
+                prompt = student.leave_prompt(at=next_time)
+                if prompt is not None:
+                    self.prefetcher.submit(student, prompt)
+        self.prefetcher.stats.update(state["stats"])
+
 
     def sign_seat(self):
         """
@@ -545,29 +756,39 @@ class Library:
         Args:
             student (Student): 需要处理行为的学生对象
         """
-        action = student.get_current_action()  # 获取学生当前应执行的动作
-        print(student.student_id)
-        print(student.state,action)
+        profiler = self.profiler
+        with profiler.phase("schedule_lookup"):
+            action = student.get_current_action()  # 获取学生当前应执行的动作
+        events.log.debug(student.student_id)
+        events.log.debug(student.state,action)
+        if self.waitlist and action != "learn" and student.student_id in self.waitlist:
+            del self.waitlist[student.student_id]  # 不再要学习，离开队列
         match action:
             case "start":  # 开始一天的活动
                 # 当学生处于SLEEP状态且时间到达start时间点时，需要转换状态以便开始选座
                 if student.state == StudentState.SLEEP:
                     student.state = StudentState.GONE  # 转换为GONE状态，这样学生就可以选座了
-                    print(f"学生{student.student_id}苏醒了")
+                    events.log.debug("学生",student.student_id,"苏醒了",sep="")
             case "learn":  # 学习动作
-                if student.state != StudentState.LEARNING:  # 如果学生不在学习状态
-                    take_seat = student.choose_seat(self.seats)  # 尝试选择座位
+                if student.state != StudentState.LEARNING and self.waitlist is not None:
+                    with profiler.phase("seat_selection"):
+                        self._join_waitlist(student)  # 选座，没有座位时排队
+                elif student.state != StudentState.LEARNING:  # 如果学生不在学习状态
+                    with profiler.phase("seat_selection"):
+                        take_seat = self._choose_seat(student)  # 尝试选择座位
                     if not take_seat:  # 如果没有选到座位
                         self.get_unsatisfied()  # 增加不满意计数
-                        print(f"学生{student.student_id}因为没有选到座位而心生不满")
+                        if self.overflow is not None and student.state != StudentState.SLEEP:  # 休眠的学生不分流
+                            self.overflow.append(student)
+                        events.log.debug("学生",student.student_id,"因为没有选到座位而心生不满",sep="")
             case "end":  # 结束一天的活动
                 student.state = StudentState.SLEEP  # 学生进入休眠状态
-                print(f"学生{student.student_id}的一天结束了")
+                events.log.debug("学生",student.student_id,"的一天结束了",sep="")
             case "away":  # 临时离开
                 # 学生离开座位，根据智能决策决定是否占座
                 if student.state == StudentState.LEARNING:
-                    student.leave_seat()  # 学生离开座位，根据智能决策决定是否占座
-                    print(f"学生{student.student_id}离开了座位")
+                    self._leave_seat(student)
+                    events.log.debug("学生",student.student_id,"离开了座位",sep="")
             case _:  # 其他动作（如吃饭、上课等）
                 # 为其他动作提供更灵活的处理
                 self._handle_other_actions(student, action)
@@ -583,14 +804,14 @@ class Library:
         # 对于各种非学习动作，学生需要暂时离开座位
         # 离开座位时，会根据学生的性格和满意度智能决定是否占座
         if student.state == StudentState.LEARNING:
-            student.leave_seat()
-            print(f"学生{student.student_id}离开了座位")
+            self._leave_seat(student)
+            events.log.debug("学生",student.student_id,"离开了座位",sep="")
         elif student.state == StudentState.AWAY:
             # 如果已经在暂时离开状态，检查是否需要返回
             if student.seat and (student.seat.status in [Status.vacant, Status.taken]):
                 # 如果原座位已空出或被占用，需要学生重新选择座位
                 student.state = StudentState.GONE
-                print(f"学生{student.student_id}的座位被清理了")
+                events.log.debug("学生",student.student_id,"的座位被清理了",sep="")
 
     def count_taken_seats(self):
         """
@@ -625,30 +846,10 @@ class Library:
         """
         计算每个座位的拥挤参数
         考虑周围座位的占用情况和窗户因素，影响学生对座位的满意度
-        使用8个方向的邻近座位进行计算
+        用邻接矩阵与占用向量的乘积一次算出所有座位：(被占用的邻居数 - 0.5×靠窗的邻居数) / 邻居数
         """
-        # 8个方向：左上、上、右上、左、右、左下、下、右下
-        directions = [(-1, -1), (-1, 0), (-1, 1),
-                      (0, -1),          (0, 1),
-                      (1, -1),  (1, 0), (1, 1)]
-        
-        for seat in self.seats:
-            x,y = seat.coordinate  # 获取座位坐标
-            crowded_para = 0  # 初始化拥挤参数
-            len_around_seat = 0  # 邻近座位总数
-            # 遍历8个方向的邻近座位
-            for dx,dy in directions:
-                nx = x + dx  # 邻近座位x坐标
-                ny = y + dy  # 邻近座位y坐标
-                around_seat = self.seats_map.get((nx,ny),None)  # 获取邻近座位对象
-                if around_seat:  # 如果邻近位置有座位
-                    len_around_seat += 1  # 邻近座位数加1
-                    if around_seat.status != Status.vacant:  # 如果邻近座位被占用
-                        crowded_para += 1  # 拥挤参数加1
-                    if around_seat.window:  # 如果邻近是窗户
-                        crowded_para -= 0.5  # 窗户减少拥挤感
-            # 计算平均拥度
-            crowded_para =crowded_para/len_around_seat if len_around_seat>0 else 0
+        occupied = [seat.status != Status.vacant for seat in self.seats]
+        for seat, crowded_para in zip(self.seats, self.neighbour_graph().crowding(occupied).tolist()):
             seat.set_crowded_para(crowded_para)  # 设置座位的拥挤参数
 
     def output_seats_info(self):
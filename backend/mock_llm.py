@@ -0,0 +1,326 @@
+"""
+mock_llm.py
+本地模拟LLM服务
+实现兼容OpenAI的POST /v1/chat/completions接口，针对现有的日程提示词和离座决策提示词生成合法的JSON回复，
+并可配置延迟分布、错误率和格式错误率，用于在没有网络和API密钥的情况下测试真实请求路径和测量吞吐
+
+在config.py中设置LLM_BACKEND = "mock"（或环境变量LIBRARY_LLM_BACKEND=mock）后，
+Clients会连接MOCK_LLM_URL指定的服务，未指定时在进程内自动启动一个
+
+用法（在项目根目录单独启动）：
+    python -m backend.mock_llm --port 8765 --latency-ms 300 --error-rate 0.02 --malformed-rate 0.05
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 模拟服务的默认配置
+MOCK_LLM_CONFIG = {
+    "latency_ms": 0.0,       # 延迟中位数（毫秒）
+    "latency_sigma": 0.0,    # 对数正态分布的形状参数，0表示固定延迟
+    "tail_rate": 0.0,        # 长尾请求的比例
+    "tail_ms": 3000.0,       # 长尾请求的额外延迟（毫秒）
+    "error_rate": 0.0,       # 返回HTTP 500/429的比例
+    "malformed_rate": 0.0,   # 返回格式错误回复（夹杂文字、被截断、无法判断）的比例
+    "seed": 0,               # 随机数种子，相同提示词的第k次请求总是得到相同回复
+}
+
+_SCHEDULE_MARK = "规划学生一天的日程"
+_LEAVE_MARK = "是否选择占座"
+_PARAM_PATTERN = re.compile(r"(作息类型|专注类型|课程情况)：(\S+)")
+_FIELD_PATTERN = re.compile(r"(性格|满意度|剩余):(\S+)")
+
+
+def _format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}:00"
+
+
+def generate_schedule(schedule_type: str, focus_type: str, course_situation: str, rng: random.Random) -> list[dict]:
+    """
+    按学生特征生成一份满足schedule_prompt约束的日程
+
+    Args:
+        schedule_type (str): 作息类型（早/正常/晚）
+        focus_type (str): 专注类型（高/中/低）
+        course_situation (str): 课程情况（多/中/少）
+        rng (random.Random): 随机数生成器
+
+    Returns:
+        list[dict]: [{"time":"HH:MM:SS","action":...}]形式的日程
+    """
+    first = {"早": 450, "晚": rng.choice([570, 600, 630])}.get(schedule_type, rng.choice([480, 495, 510]))
+    end = {"早": rng.choice([1230, 1260]), "晚": rng.choice([1365, 1380, 1395])}.get(schedule_type, rng.choice([1290, 1320]))
+    rest_start = end - 30
+    slots = {}  # 15分钟网格上的时间点 -> 动作
+
+    def free(start, stop):
+        return all(minute not in slots for minute in range(start, stop, 15))
+
+    def put(start, stop, action):
+        for minute in range(start, stop, 15):
+            slots[minute] = action
+
+    put(first, first + rng.choice([30, 45]), "eat")  # 早餐
+    lunch = rng.choice([690, 705, 720, 735])
+    put(lunch, lunch + rng.choice([30, 45, 60]), "eat")
+    dinner = rng.choice([1050, 1065, 1080, 1095])
+    put(dinner, dinner + rng.choice([30, 45, 60]), "eat")
+
+    course_total = 0
+    courses = 0
+    target = {"多": 4, "中": 3, "少": 2}.get(course_situation, 3)
+    for _ in range(200):
+        if courses >= target:
+            break
+        length = rng.choice(range(60, 151, 15))
+        latest = min(1140, rest_start) - length
+        if latest < first + 45 or course_total + length > 480:
+            continue
+        start = rng.randrange(first + 45, latest + 1, 15)
+        if free(start - 15, start + length + 15):  # 课程之间至少间隔15分钟，避免相邻课程被合并为一节
+            put(start, start + length, "course")
+            course_total += length
+            courses += 1
+
+    # 空闲时段整段填为学习或休息，专注度越低越容易休息
+    rest_probability = {"高": 0.1, "中": 0.25, "低": 0.5}.get(focus_type, 0.25)
+    minute = first
+    while minute < rest_start:
+        if minute in slots:
+            minute += 15
+            continue
+        gap_end = minute
+        while gap_end < rest_start and gap_end not in slots:
+            gap_end += 15
+        put(minute, gap_end, "rest" if rng.random() < rest_probability else "learn")
+        minute = gap_end
+    put(rest_start, end, "rest")
+
+    schedule = [{"time": _format_minute(420), "action": "start"}]
+    previous = None
+    for minute in range(first, end, 15):
+        action = slots[minute]
+        if action != previous:
+            schedule.append({"time": _format_minute(minute), "action": action})
+            previous = action
+    schedule.append({"time": _format_minute(end), "action": "end"})
+    return schedule
+
+
+def decide_leave(prompt: str, rng: random.Random) -> dict:
+    """
+    按离座提示词中的性格、满意度和剩余时间生成占座决策
+
+    Args:
+        prompt (str): 离座决策提示词（紧凑后缀或完整提示词）
+        rng (random.Random): 随机数生成器
+
+    Returns:
+        dict: {"action":"leave"}或{"action":"reverse"}
+    """
+    fields = dict(_FIELD_PATTERN.findall(prompt))
+    try:
+        satisfaction = float(fields.get("满意度", "3"))
+    except ValueError:
+        satisfaction = 3.0
+    probability = (0.6 if fields.get("性格", "守序") == "守序" else 0.35) + 0.1 * (satisfaction - 3)
+    if "已超过" in fields.get("剩余", ""):
+        probability = 0.1  # 已超过占座时限，大多不再占座
+    return {"action": "reverse" if rng.random() < min(max(probability, 0.0), 1.0) else "leave"}
+
+
+def _malformed(content: str, rng: random.Random) -> str:
+    """把合法回复改写为常见的格式错误：夹杂文字、被截断或无法判断"""
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f"好的，结果如下：\n{content}\n希望对你有帮助。"
+    if kind == 1:
+        return content[:max(1, len(content) * 2 // 3)]
+    return "我觉得应该离开(leave)也可以占座(reverse)"
+
+
+class MockLLM:
+    """
+    模拟LLM的回复生成与故障注入
+    随机数按(种子, 提示词, 该提示词第几次出现)派生，与请求到达的线程顺序无关
+    """
+
+    def __init__(self, config: dict = None) -> None:
+        self.config = dict(MOCK_LLM_CONFIG)
+        self.config.update(config or {})
+        self.requests = 0
+        self._seen = {}  # 提示词摘要 -> 出现次数
+        self._lock = threading.Lock()
+
+    def _rng(self, text: str) -> random.Random:
+        digest = hashlib.md5(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            self.requests += 1
+            count = self._seen[digest] = self._seen.get(digest, 0) + 1
+        return random.Random(f"{self.config['seed']}:{digest}:{count}")
+
+    def delay(self, rng: random.Random) -> float:
+        """本次请求的模拟延迟（秒）"""
+        config = self.config
+        latency = config["latency_ms"]
+        if config["latency_sigma"] > 0 and latency > 0:
+            latency = rng.lognormvariate(0, config["latency_sigma"]) * latency
+        if rng.random() < config["tail_rate"]:
+            latency += config["tail_ms"]
+        return latency / 1000
+
+    def complete(self, request: dict) -> tuple[int, dict, float]:
+        """
+        处理一次chat.completions请求
+
+        Args:
+            request (dict): 请求体
+
+        Returns:
+            tuple: (HTTP状态码, 响应体, 延迟秒数)
+        """
+        from .prompt import estimate_tokens
+        messages = request.get("messages", [])
+        text = "\n".join(str(message.get("content", "")) for message in messages)
+        rng = self._rng(text)
+        delay = self.delay(rng)
+        if rng.random() < self.config["error_rate"]:
+            status = rng.choice([429, 500])
+            return status, {"error": {"message": "mock failure", "type": "server_error", "code": status}}, delay
+
+        choices = []
+        completion_tokens = 0
+        for index in range(max(1, int(request.get("n") or 1))):
+            if _SCHEDULE_MARK in text:
+                params = dict(_PARAM_PATTERN.findall(text))
+                content = json.dumps(generate_schedule(params.get("作息类型", "正常"), params.get("专注类型", "中"),
+                                                       params.get("课程情况", "中"), rng), ensure_ascii=False)
+            elif _LEAVE_MARK in text:
+                content = json.dumps(decide_leave(text, rng))
+            else:
+                content = json.dumps({"action": None})
+            if rng.random() < self.config["malformed_rate"]:
+                content = _malformed(content, rng)
+            finish_reason = "stop"
+            for stop in request.get("stop") or []:
+                if stop in content:
+                    content = content[:content.index(stop)]  # 与真实接口一致，停止序列本身不返回
+            max_tokens = request.get("max_tokens")
+            if max_tokens and estimate_tokens(content) > max_tokens:
+                content = content[:max_tokens * 4]
+                finish_reason = "length"
+            completion_tokens += estimate_tokens(content)
+            choices.append({"index": index, "finish_reason": finish_reason,
+                            "message": {"role": "assistant", "content": content}})
+        prompt_tokens = estimate_tokens(text)
+        body = {
+            "id": f"mock-{self.requests}", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model", "mock"), "choices": choices,
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+        return 200, body, delay
+
+
+class _CompletionHandler(BaseHTTPRequestHandler):
+    """chat/completions接口，由server.llm生成回复"""
+    protocol_version = "HTTP/1.1"  # 支持长连接
+    disable_nagle_algorithm = True  # 响应头和响应体分两次写出，不关闭Nagle会与延迟ACK叠加出40ms延迟
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send(400, {"error": {"message": "invalid json", "type": "invalid_request_error"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        status, body, delay = self.server.llm.complete(request)
+        if delay > 0:
+            time.sleep(delay)
+        self._send(status, body)
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端已超时断开或对冲请求的另一路已返回
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_server(config: dict = None, host: str = "127.0.0.1", port: int = 0):
+    """
+    在后台线程启动模拟服务
+
+    Args:
+        config (dict): 覆盖MOCK_LLM_CONFIG的配置项
+        host (str): 监听地址
+        port (int): 端口，0表示自动分配
+
+    Returns:
+        tuple: (server, base_url)，server.llm为MockLLM实例，用server.shutdown()停止
+    """
+    server = ThreadingHTTPServer((host, port), _CompletionHandler)
+    server.daemon_threads = True
+    server.llm = MockLLM(config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+_local_lock = threading.Lock()
+_local_server = None
+_local_pid = None
+
+
+def local_base_url() -> str:
+    """
+    返回进程内模拟服务的地址，首次调用时按MOCK_LLM_CONFIG启动
+    fork出的子进程会重新启动自己的服务
+    """
+    global _local_server, _local_pid
+    with _local_lock:
+        if _local_server is None or _local_pid != os.getpid():
+            _local_server, _ = start_mock_server()
+            _local_pid = os.getpid()
+        return f"http://127.0.0.1:{_local_server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地模拟LLM服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="端口")
+    parser.add_argument("--latency-ms", type=float, default=MOCK_LLM_CONFIG["latency_ms"], help="延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=MOCK_LLM_CONFIG["latency_sigma"], help="对数正态延迟的形状参数")
+    parser.add_argument("--tail-rate", type=float, default=MOCK_LLM_CONFIG["tail_rate"], help="长尾请求比例")
+    parser.add_argument("--tail-ms", type=float, default=MOCK_LLM_CONFIG["tail_ms"], help="长尾请求的额外延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=MOCK_LLM_CONFIG["error_rate"], help="错误响应比例")
+    parser.add_argument("--malformed-rate", type=float, default=MOCK_LLM_CONFIG["malformed_rate"], help="格式错误回复比例")
+    parser.add_argument("--seed", type=int, default=MOCK_LLM_CONFIG["seed"], help="随机数种子")
+    args = parser.parse_args(argv)
+    config = {key: getattr(args, key) for key in MOCK_LLM_CONFIG}
+    server, base_url = start_mock_server(config, args.host, args.port)
+    print(f"模拟LLM服务已启动: {base_url}（Ctrl+C停止）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
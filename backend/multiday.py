@@ -0,0 +1,195 @@
+"""
+multiday.py
+多日模拟
+Simulation.run只模拟07:00到午夜的一天，按天新建Simulation会重新请求每名学生的日程并重建座位网格。
+多日模式保留同一个图书馆和学生，每种日期类型（工作日/周末）的日程只生成一次，
+之后每天复用并整体平移少量时间步作为扰动；每天开始时计数器清零。
+所有天的tick以JSON Lines格式流式写入同一个数据文件，每条记录带有天序号：
+第一行为头部信息，之后每行一条tick记录，每天结束时追加一行day_end（当天的总数），
+最后一行为summary（各天总数和LLM用量）；read_multiday把文件读回为与单日数据相同的列表形式
+"""
+import json
+import os
+import random
+import time
+from array import array
+
+from . import events
+from .agents import llm_stats, summarize_usage
+from .prompt import day_type_notes
+from .students import ACTIONS
+
+DAY_TYPES = tuple(day_type_notes)
+_START = ACTIONS.index("start")
+_LAST_SECOND = 23 * 3600 + 45 * 60  # 平移后的最晚时间，午夜前的最后一个时间步
+
+
+def week_day_types(days: int, first_weekday: int = 0) -> list[str]:
+    """
+    按星期排列的日期类型
+
+    Args:
+        days (int): 天数
+        first_weekday (int): 第一天是星期几，0为星期一
+
+    Returns:
+        list[str]: 每天的日期类型，星期六、日为weekend
+    """
+    return ["weekend" if (first_weekday + day) % 7 >= 5 else "weekday" for day in range(days)]
+
+
+def perturb_schedule(times, actions, shift_steps: int, step: int = 15 * 60):
+    """
+    将日程除start外的各项整体平移若干时间步，保持各项的间隔和先后顺序
+
+    Args:
+        times (array | None): 日程时间（秒），日程格式错误时为None
+        actions (bytes | tuple): 动作编码
+        shift_steps (int): 平移的时间步数，可为负
+        step (int): 时间步长（秒）
+
+    Returns:
+        tuple: (平移后的时间, 动作编码)，日程格式错误或不平移时原样返回（数组不可变，可直接共享）
+    """
+    if times is None or not shift_steps:
+        return times, actions
+    start = times[0]
+    shift = shift_steps * step
+    shifted = [t if code == _START else min(max(t + shift, start), _LAST_SECOND)
+               for t, code in zip(times, actions)]
+    return array('I', shifted), actions
+
+
+def read_multiday(path: str) -> list[dict]:
+    """
+    读取多日模拟的数据文件
+
+    Args:
+        path (str): MultiDayRun写入的.jsonl文件
+
+    Returns:
+        list[dict]: 第一项为头部信息（合并summary，未运行完时days只含已结束的天），之后为tick记录
+    """
+    data = []
+    days = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            item = json.loads(line)
+            if "day_end" in item:
+                days.append(item["day_end"])
+            elif "summary" in item:
+                data[0].update(item["summary"])
+            else:
+                data.append(item)
+    data[0].setdefault("days", days)
+    return data
+
+
+class MultiDayRun:
+    """
+    在同一个图书馆上连续模拟多天
+    第一种日期类型的日程沿用学生初始化时生成的日程（工作日），其他日期类型在第一次用到时各请求一次
+    """
+
+    def __init__(self, sim, day_types: list[str], perturb_steps: int = 1, seed: int = None) -> None:
+        """
+        Args:
+            sim (Simulation): 已初始化的模拟，其图书馆和学生在各天之间保留
+            day_types (list[str]): 每天的日期类型，取值见DAY_TYPES
+            perturb_steps (int): 每名学生每天的日程最多平移的时间步数，为0时原样复用
+            seed (int): 日程扰动的随机数种子，默认从全局随机数生成器取得
+        """
+        unknown = set(day_types) - set(DAY_TYPES)
+        if unknown:
+            raise KeyError(f"未知的日期类型: {sorted(unknown)}，可选 {list(DAY_TYPES)}")
+        self.sim = sim
+        self.library = sim.library
+        self.day_types = list(day_types)
+        self.perturb_steps = perturb_steps
+        self._rng = random.Random(random.random() if seed is None else seed)  # 独立的生成器，不影响模拟的随机序列
+        # 日期类型 -> 每名学生的(时间, 动作编码)
+        self.schedules = {"weekday": [(s._times, s._actions) for s in self.library.students]}
+
+        seats = len(self.library.seats)
+        self.header = {key: sim.jm.data[0][key] for key in ("test_name", "test_scale", "seat_info")}
+        name = os.path.splitext(os.path.basename(sim.jm.file_path))[0] + ".jsonl"
+        self.path = os.path.join(os.path.dirname(os.path.dirname(sim.jm.file_path)), f"{seats}_seats_multiday", name)
+
+    def _schedules_for(self, day_type: str) -> list:
+        """日期类型的基础日程，第一次用到时为每名学生请求（同原型的学生共用一次请求）"""
+        if day_type not in self.schedules:
+            events.log.info(f"生成{day_type}日程")
+            for student in self.library.students:
+                student.generate_schedule(day_type=day_type)
+            self.schedules[day_type] = [(s._times, s._actions) for s in self.library.students]
+        return self.schedules[day_type]
+
+    def _start_day(self, day: int) -> None:
+        """重置图书馆并为每名学生设置当天（扰动后）的日程"""
+        self.library.start_new_day()
+        base = self._schedules_for(self.day_types[day])
+        for student, (times, actions) in zip(self.library.students, base):
+            shift = self._rng.randint(-self.perturb_steps, self.perturb_steps) if self.perturb_steps else 0
+            student._times, student._actions = perturb_schedule(times, actions, shift, student._step)
+
+    def run(self, save: bool = True) -> dict:
+        """
+        运行所有天，tick记录不在内存中累积
+        保存时每天结束时把当天的记录追加到数据文件；模拟设置了checkpoint_every时，每隔这么多个tick追加一次
+
+        Args:
+            save (bool): 是否写入数据文件（覆盖同名的旧文件）
+
+        Returns:
+            dict: 头部信息，含各天的总数（days）和LLM用量；tick记录见数据文件
+        """
+        sim, library = self.sim, self.library
+        profiler = library.profiler
+        flush_every = sim.checkpoint_every
+        days = []
+        pending = []
+        out = None
+        if save:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            out = open(self.path, "w", encoding="utf-8")
+
+        def write(items):
+            if out is not None:
+                out.writelines(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+                out.flush()
+            items.clear()
+
+        try:
+            write([self.header])
+            ticks = 0
+            for day, day_type in enumerate(self.day_types):
+                self._start_day(day)
+                events.log.info(f"第{day + 1}天（{day_type}）开始")
+                while True:
+                    profiler.begin_tick()
+                    library.update()
+                    with profiler.phase("serialization"):
+                        record = sim.tick_record()
+                        record["day"] = day
+                        pending.append(record)
+                        ticks += 1
+                        if flush_every and ticks % flush_every == 0:
+                            write(pending)
+                    profiler.end_tick()
+                    if library.current_time.strftime('%H:%M') == "00:00":
+                        break
+                days.append({"day": day, "day_type": day_type, "unstisfied_num": library.unsatisfied,
+                             "cleared_seats": library.count_cleared_seat})
+                pending.append({"day_end": days[-1]})
+                write(pending)
+            library.close()
+            usage = llm_stats.since(sim._llm_stats_before)
+            summary = {"days": days, "llm_usage": usage,
+                       "llm_summary": summarize_usage(usage, time.perf_counter() - sim._started_at)}
+            if profiler.enabled and sim.save_profile:
+                summary["profile"] = profiler.summary()
+            write([{"summary": summary}])
+        finally:
+            if out is not None:
+                out.close()
+        return dict(self.header, **summary)
@@ -1,16 +1,25 @@
 import json
-import matplotlib
-matplotlib.use('Agg')  # Use non-GUI backend
-import matplotlib.pyplot as plt
-import pandas as pd
 import re
 from datetime import datetime
-import matplotlib.dates as mdates
 import os
+from .figure_cache import FigureManifest, compute_signature
 
-# Configure font settings for proper character display on Windows
-plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans', 'Liberation Sans']  # Use fonts that support English characters properly
-plt.rcParams['axes.unicode_minus'] = False  # Used to properly display minus signs
+
+def load_pyplot():
+    """
+    首次绘图时才导入matplotlib并完成配置
+    模拟进程（包括前端派生的每个工作进程）只有真正绘图时才承担matplotlib的导入开销
+
+    Returns:
+        module: 已配置好的matplotlib.pyplot模块
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-GUI backend
+    import matplotlib.pyplot as plt
+    # Configure font settings for proper character display on Windows
+    plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans', 'Liberation Sans']  # Use fonts that support English characters properly
+    plt.rcParams['axes.unicode_minus'] = False  # Used to properly display minus signs
+    return plt
 
 def parse_json_data(json_file_path):
     """
@@ -206,13 +215,19 @@ def plot_simulation(json_file_path):
     plt.show()
 '''
 
-def save_figure(seats: int, students: int, simulation_number: int = 1, show_plot: bool = True):
+MAX_COMBINED_RUNS = 3  # 整合图像中最多使用的重复实验次数
+FIGURE_DPI = 300  # 图像保存分辨率
+
+
+def save_figure(seats: int, students: int, simulation_number: int = 1, show_plot: bool = True, force: bool = False):
     """
     根据标准化参数保存图像 - 将相同参数的实验整合到一张图像中
+    输入模拟文件和绘图参数未变化时跳过重新渲染
     :param seats: 座位数量
     :param students: 学生数量
     :param simulation_number: 模拟次数（默认为1）
     :param show_plot: 是否显示图表（默认为True）
+    :param force: 是否忽略指纹缓存强制重新生成（默认为False）
     """
     import os
     from config import simulations_base_path
@@ -257,44 +272,52 @@ def save_figure(seats: int, students: int, simulation_number: int = 1, show_plot
     # 完整的保存路径
     image_path = os.path.join(full_save_path, image_filename)
 
-    # 生成整合图像
-    plot_combined_simulation(all_json_files, image_path)
+    # 整合图像只使用前几次实验，指纹也只覆盖这些输入
+    used_json_files = all_json_files[:MAX_COMBINED_RUNS]
+    manifest = FigureManifest(full_save_path)
+    signature = compute_signature(used_json_files, _combined_plot_params(students))
 
-    if show_plot:
-        plt.show()
+    if not force and manifest.is_fresh(image_path, signature):
+        print(f"输入未变化，跳过整合图像: {image_path}")
     else:
-        plt.close()
+        # 生成整合图像
+        plot_combined_simulation(used_json_files, image_path)
+        manifest.record(image_path, signature)
+
+        plt = load_pyplot()
+        if show_plot:
+            plt.show()
+        else:
+            plt.close()
     
     # 自动plot所有未plot的实验并更新平均实验图像
-    update_average_analysis(seats)
+    update_average_analysis(seats, force=force)
     
     return True
 
 
+def _combined_plot_params(students: int) -> dict:
+    """整合图像的绘图参数，参与指纹计算"""
+    return {"kind": "students", "students": students,
+            "max_runs": MAX_COMBINED_RUNS, "dpi": FIGURE_DPI}
+
+
 def plot_combined_simulation(json_files, save_path=None):
     """
     将相同参数的多次实验整合到一张图像中
     :param json_files: 相同参数的JSON文件列表
     :param save_path: 保存路径
     """
-    import json
-    import matplotlib.pyplot as plt
     import matplotlib.dates as mdates
-    from datetime import datetime
-    import re
-    import os
+    plt = load_pyplot()
 
-    # 解析所有JSON文件的数据
+    # 只解析前3次重复实验（如果有多于3次的话）
+    json_files = json_files[:MAX_COMBINED_RUNS]
     all_data = []
     for file_path in json_files:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
         parsed = parse_json_data(file_path)  # 复用现有的解析函数
         all_data.append(parsed)
     
-    # 只取前3次重复实验（如果有多于3次的话）
-    if len(all_data) > 3:
-        all_data = all_data[:3]
     
     # Set English label support
     plt.rcParams['axes.unicode_minus'] = False  # Used to properly display minus signs
@@ -511,63 +534,84 @@ def plot_combined_simulation(json_files, save_path=None):
     
     # 保存图像
     if save_path:
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
+        plt.savefig(save_path, dpi=FIGURE_DPI, bbox_inches='tight')
         plt.close()
         print(f"整合图像已保存到: {save_path}")
     else:
         plt.show()
 
 
-def auto_plot_remaining_simulations(seats: int, students: int):
+def auto_plot_remaining_simulations(seats: int, students: int, force: bool = False):
     """
-    自动绘制所有未绘制的模拟实验（整合形式）
+    自动绘制所有未绘制或输入已变化的模拟实验（整合形式）
+
+    Returns:
+        bool: 是否重新生成了图像
     """
     import os
     from config import simulations_base_path
     import glob
+    import re
 
     # 查找所有属于相同学生数的模拟文件
     seat_folder_name = f"{seats}_seats_simulations"
     path = os.path.join(simulations_base_path, seat_folder_name)
     
     if not os.path.exists(path):
-        return
+        return False
 
     # 查找所有匹配的JSON文件
     json_files = glob.glob(os.path.join(path, f"{students}-*.json"))
     
     if not json_files:
-        return
+        return False
+
+    # 与save_figure保持相同的文件顺序，保证指纹一致
+    def extract_simulation_number(file_path):
+        match = re.search(rf"{students}-(\d+)\.json", os.path.basename(file_path))
+        return int(match.group(1)) if match else 0
 
-    # 检查整合图像是否已存在
+    json_files.sort(key=extract_simulation_number)
+    used_json_files = json_files[:MAX_COMBINED_RUNS]
+
+    # 检查整合图像是否已由相同输入生成
     save_path = os.path.join('simulation_data', 'figures', f"seats_{seats}")
+    os.makedirs(save_path, exist_ok=True)
     image_filename = f"students_{students}.png"  # 整合形式
     image_path = os.path.join(save_path, image_filename)
+    manifest = FigureManifest(save_path)
+    signature = compute_signature(used_json_files, _combined_plot_params(students))
     
-    if not os.path.exists(image_path):
-        # 生成整合图像
-        plot_combined_simulation(json_files, image_path)
-        print(f"已自动生成整合图像: {image_path}")
+    if not force and manifest.is_fresh(image_path, signature):
+        print(f"输入未变化，跳过整合图像: {image_path}")
+        return False
+
+    # 生成整合图像
+    plot_combined_simulation(used_json_files, image_path)
+    manifest.record(image_path, signature)
+    print(f"已自动生成整合图像: {image_path}")
+    return True
 
 
-def update_average_analysis(seats: int):
+def update_average_analysis(seats: int, force: bool = False):
     """
-    更新平均分析图像
+    更新平均分析图像，输入未变化时跳过重新渲染
     """
     from .data_analysis import run_analysis
-    run_analysis(seats)
+    run_analysis(seats, force=force)
 
 
-def plot_analysis(seat_count: int, min_students: int = None, max_students: int = None, output_dir: str = None):
+def plot_analysis(seat_count: int, min_students: int = None, max_students: int = None, output_dir: str = None, force: bool = False):
     """
     调用数据分析模块绘制整合分析图
     :param seat_count: 座位数量
     :param min_students: 最小学生数
     :param max_students: 最大学生数
     :param output_dir: 输出目录
+    :param force: 是否忽略指纹缓存强制重新生成
     """
     from .data_analysis import run_analysis
-    results = run_analysis(seat_count, min_students, max_students, output_dir)
+    results = run_analysis(seat_count, min_students, max_students, output_dir, force=force)
     return results
 
 
@@ -578,6 +622,9 @@ def plot_simulation(json_file_path, save_to_path=None):
     2. Unsatisfied Count及其增长数和Cleared Seats Count及其增长数
     3. 图书馆中座位的拥挤程度（还是用library的评分）然后平均归一化与Seat Occupancy Rate
     """
+    import matplotlib.dates as mdates
+    plt = load_pyplot()
+
     # 解析数据
     data = parse_json_data(json_file_path)
     
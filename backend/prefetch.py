@@ -0,0 +1,115 @@
+"""
+prefetch.py
+离座决策预取
+学生日程在初始化时已知，图书馆在tick t结束时即可确定哪些学生会在t+1离座。
+LeavePrefetcher按预测状态（t+1的时间、当前座位满意度和占座时限）构建提示词并在后台线程请求，
+真正离座时若提示词与预取时一致则直接使用结果，否则丢弃并同步请求，从而把LLM延迟隐藏在模拟计算之后
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from . import events
+from .agents import POOL_CONFIG
+
+
+class LeavePrefetcher:
+    """
+    离座决策的后台预取
+    每名学生最多保留一个预取请求，键为学生ID，值为(提示词, Future)；
+    预测状态变化（提示词不同）时取消旧请求并重新提交
+    """
+    STATS_FIELDS = ("submitted", "hits", "stale", "misses", "cancelled")
+
+    def __init__(self, max_workers: int = None) -> None:
+        """
+        Args:
+            max_workers (int): 后台线程数，默认与LLM连接池的最大连接数一致
+        """
+        self.max_workers = max_workers or POOL_CONFIG["max_connections"]
+        self._executor = None  # 第一次提交时创建
+        self._pending = {}     # 学生ID -> (提示词, Future)
+        self._lock = Lock()
+        self.stats = dict.fromkeys(self.STATS_FIELDS, 0)
+
+    def submit(self, student, prompt: tuple[str, str]) -> None:
+        """
+        为学生提交预取请求，已有相同提示词的请求时不重复提交
+
+        Args:
+            student (Student): 预计在下一个时间步离座的学生
+            prompt (tuple[str, str]): 按预测状态构建的(前缀, 后缀)
+        """
+        with self._lock:
+            entry = self._pending.get(student.student_id)
+            if entry is not None:
+                if entry[0] == prompt:
+                    return
+                self._cancel(entry)  # 预测状态变化，重新计算
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="leave-prefetch")
+            prefix, suffix = prompt
+            future = self._executor.submit(student.client.response, suffix, max_retries=3, prefix=prefix, kind="leave")
+            self._pending[student.student_id] = (prompt, future)
+            self.stats["submitted"] += 1
+
+    def retain(self, student_ids) -> None:
+        """
+        取消不在student_ids中的预取请求（预测不再离座的学生）
+
+        Args:
+            student_ids: 本次预测会离座的学生ID集合
+        """
+        with self._lock:
+            for student_id in [sid for sid in self._pending if sid not in student_ids]:
+                self._cancel(self._pending.pop(student_id))
+
+    def take(self, student_id, prompt: tuple[str, str]):
+        """
+        取出预取结果，必要时等待请求完成
+
+        Args:
+            student_id: 学生ID
+            prompt (tuple[str, str]): 离座时实际构建的(前缀, 后缀)
+
+        Returns:
+            预取到的LLM响应；没有预取、提示词已变化或请求出错时返回None
+        """
+        with self._lock:
+            entry = self._pending.pop(student_id, None)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if entry[0] != prompt:
+                self.stats["stale"] += 1
+                self._cancel(entry)
+                return None
+        try:
+            response = entry[1].result()
+        except Exception as e:
+            events.log.warning(f"学生{student_id}的离座决策预取失败: {e}")
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        return response
+
+    def pending_students(self) -> list:
+        """尚未取用的预取请求对应的学生ID，写入检查点以便恢复后重新提交"""
+        with self._lock:
+            return list(self._pending)
+
+    def close(self) -> None:
+        """取消所有未完成的预取并关闭后台线程"""
+        with self._lock:
+            for entry in self._pending.values():
+                self._cancel(entry)
+            self._pending.clear()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _cancel(self, entry) -> None:
+        """取消一个预取请求（需持有锁），已经开始的请求无法中止，其结果被丢弃"""
+        if entry[1].cancel():
+            self.stats["cancelled"] += 1
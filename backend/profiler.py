@@ -0,0 +1,135 @@
+"""
+profiler.py
+模拟热路径的分阶段计时
+按阶段（日程查询、选座、离座决策、拥挤度计算、标记/清理、序列化）累计墙钟时间和调用次数，
+未开启时使用空计时器，热路径只多一次方法调用
+"""
+import time
+
+# 固定的阶段顺序，汇总时按此顺序输出
+PHASES = ("schedule_lookup", "seat_selection", "leave_decision",
+          "crowding", "sign_clear", "serialization")
+
+
+class _Phase:
+    """单个阶段的计时上下文，按阶段名缓存复用以避免每次调用都创建对象"""
+    __slots__ = ("stats", "start")
+
+    def __init__(self, stats: list) -> None:
+        self.stats = stats  # [累计秒数, 调用次数]
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats[0] += time.perf_counter() - self.start
+        self.stats[1] += 1
+        return False
+
+
+class _NullPhase:
+    """空计时上下文，不做任何记录"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class PhaseProfiler:
+    """
+    分阶段计时器
+    通过 with profiler.phase("crowding"): ... 记录一个阶段的耗时，
+    每个tick结束时调用end_tick记录tick数和tick总耗时
+    """
+    enabled = True
+
+    def __init__(self) -> None:
+        self.stats = {}    # 阶段名 -> [累计秒数, 调用次数]
+        self._phases = {}  # 阶段名 -> 复用的计时上下文
+        self.ticks = 0
+        self.tick_seconds = 0.0
+        self._tick_start = None
+
+    def phase(self, name: str):
+        """
+        获取指定阶段的计时上下文
+
+        Args:
+            name (str): 阶段名，建议使用PHASES中的名称
+
+        Returns:
+            上下文管理器，退出时累计该阶段耗时
+        """
+        ctx = self._phases.get(name)
+        if ctx is None:
+            stats = self.stats.setdefault(name, [0.0, 0])
+            ctx = self._phases[name] = _Phase(stats)
+        return ctx
+
+    def begin_tick(self) -> None:
+        """标记一个tick开始"""
+        self._tick_start = time.perf_counter()
+
+    def end_tick(self) -> None:
+        """标记一个tick结束，累计tick数和耗时"""
+        if self._tick_start is not None:
+            self.tick_seconds += time.perf_counter() - self._tick_start
+            self._tick_start = None
+        self.ticks += 1
+
+    def summary(self) -> dict:
+        """
+        生成计时汇总
+
+        Returns:
+            dict: 包含tick数、tick总耗时和各阶段耗时/调用次数/占比的字典
+        """
+        names = [name for name in PHASES if name in self.stats]
+        names += sorted(name for name in self.stats if name not in PHASES)
+        phases = {}
+        for name in names:
+            seconds, calls = self.stats[name]
+            phases[name] = {
+                "seconds": round(seconds, 6),
+                "calls": calls,
+                "per_tick_ms": round(seconds / self.ticks * 1000, 4) if self.ticks else 0.0,
+                "share": round(seconds / self.tick_seconds, 4) if self.tick_seconds else 0.0
+            }
+        return {"ticks": self.ticks, "tick_seconds": round(self.tick_seconds, 6), "phases": phases}
+
+    def format_summary(self) -> str:
+        """
+        将计时汇总格式化为表格文本
+
+        Returns:
+            str: 可直接打印的汇总表
+        """
+        summary = self.summary()
+        lines = [f"分阶段耗时汇总：{summary['ticks']} 个tick，共 {summary['tick_seconds']:.3f}s",
+                 f"{'阶段':<18}{'总耗时(s)':>12}{'调用次数':>10}{'每tick(ms)':>12}{'占比':>8}"]
+        for name, item in summary["phases"].items():
+            lines.append(f"{name:<20}{item['seconds']:>12.4f}{item['calls']:>12}"
+                         f"{item['per_tick_ms']:>12.3f}{item['share']*100:>9.1f}%")
+        return "\n".join(lines)
+
+
+class NullProfiler(PhaseProfiler):
+    """空计时器，默认使用，不记录任何数据"""
+    enabled = False
+
+    def phase(self, name: str):
+        return _NULL_PHASE
+
+    def begin_tick(self) -> None:
+        pass
+
+    def end_tick(self) -> None:
+        pass
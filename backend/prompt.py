@@ -47,6 +47,12 @@ schedule_prompt = """你是一个图书馆学生行为模拟器。请根据以
 [{{"time":"xx:xx:00","action":"(六种行为之一)"}}]
 """
 
+# 日程提示词按日期类型追加的说明，工作日沿用原提示词
+day_type_notes = {
+    "weekday": "",
+    "weekend": "\n补充：今天是周末，学生没有课程，日程中不要安排course行为，学生一天开始时间可以更晚\n",
+}
+
 leave_prompt = """你是一个图书馆学生行为模拟器。请根据以下信息判断学生离开图书馆时是否选择占座行为。
 
 - 个人性格：{character}
@@ -79,4 +85,78 @@ leave_prompt = """你是一个图书馆学生行为模拟器。请根据以下
 请严格按照以下JSON格式回复，不要添加其他内容：
 {{
   "action":"leave"或"reverse"(不占座和占座)
-}}"""
\ No newline at end of file
+}}"""
+
+# 离座决策提示词的紧凑版本：静态说明放在固定前缀中（作为system消息，便于服务端前缀缓存），
+# 每次变化的学生数据放在简短的后缀中（作为user消息），日程编码为"HH:MM 行为"的短字符串
+leave_prompt_prefix = """你是一个图书馆学生行为模拟器。请根据学生信息判断学生离开图书馆时是否选择占座行为。
+学生信息字段：性格(守序/利己)、满意度(座位满意度，5分制)、时间(当前时间)、容忍(图书馆对占座可能最大容忍时间)、剩余(到占座时间限制)、容量(图书馆最大容量)、人数(总学生数)、日程。
+日程格式为"HH:MM 行为"，以分号分隔；除learn外的行为均不在图书馆。
+示例：
+性格:守序 满意度:2 时间:12:00 容忍:2:00:00 剩余:剩余 1:00:00 时间限制 容量:90 人数:60
+日程:07:00 start;07:30 eat;08:00 course;09:00 learn;12:00 eat;13:00 course;14:15 rest;16:15 course;17:00 learn;18:00 eat;18:45 learn;20:00 rest;20:30 end
+回复：{"action":"leave"}
+请严格按照以下JSON格式回复，不要添加其他内容：
+{"action":"leave"或"reverse"(不占座和占座)}"""
+
+leave_prompt_suffix = """性格:{character} 满意度:{satisfaction} 时间:{time} 容忍:{limit_time} 剩余:{time_to_limit} 容量:{library_capacity} 人数:{total_students}
+日程:{schedule}"""
+
+
+def format_schedule_compact(schedule: list[dict]) -> str:
+    """
+    将日程编码为"HH:MM 行为"的短字符串
+
+    Args:
+        schedule (list[dict]): [{"time":"HH:MM:SS","action":...}] 形式的日程
+
+    Returns:
+        str: 如"07:00 start;09:00 learn"
+    """
+    return ";".join(f"{item['time'][:5]} {item['action']}" for item in schedule)
+
+
+def build_leave_prompt(character: str, satisfaction: float, time: str, limit_time: str, time_to_limit: str,
+                       schedule: str, library_capacity, total_students) -> tuple[str, str]:
+    """
+    构建离座决策提示词
+
+    Args:
+        character (str): 个人性格
+        satisfaction (float): 座位满意度
+        time (str): 当前时间（HH:MM）
+        limit_time (str): 占座最大容忍时间
+        time_to_limit (str): 到占座时间限制的描述
+        schedule (str): format_schedule_compact编码后的日程
+        library_capacity: 图书馆最大容量
+        total_students: 总学生数
+
+    Returns:
+        tuple[str, str]: (固定前缀, 学生数据后缀)
+    """
+    suffix = leave_prompt_suffix.format(
+        character=character,
+        satisfaction=f"{satisfaction:.1f}",
+        time=time,
+        limit_time=limit_time,
+        time_to_limit=time_to_limit,
+        library_capacity=library_capacity,
+        total_students=total_students,
+        schedule=schedule
+    )
+    return leave_prompt_prefix, suffix
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数
+    不依赖具体分词器：中日韩字符按每字1个token，其余字符按每4个字符1个token
+
+    Args:
+        text (str): 文本
+
+    Returns:
+        int: 估算的token数
+    """
+    wide = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return wide + (len(text) - wide + 3) // 4
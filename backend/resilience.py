@@ -0,0 +1,135 @@
+"""
+resilience.py
+LLM请求的延迟控制
+    LatencyHistogram: 按对数分桶记录请求延迟，给出分位数，用于推导超时和对冲请求的等待时间
+    CircuitBreaker:   端点连续失败时熔断，熔断期间直接使用本地兜底逻辑，冷却后放行一次试探请求
+    backoff_delay:    带抖动的指数退避
+"""
+import math
+import random
+import time
+from threading import Lock
+
+_jitter = random.Random()  # 独立的随机数生成器，退避抖动不影响模拟使用的全局随机序列
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    带抖动的指数退避时间（full jitter）
+
+    Args:
+        attempt (int): 第几次重试，从1开始
+        base (float): 第一次重试的退避上限（秒）
+        cap (float): 退避上限（秒）
+
+    Returns:
+        float: 在[0, min(cap, base * 2^(attempt-1))]内均匀分布的等待时间
+    """
+    return _jitter.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class LatencyHistogram:
+    """
+    对数分桶的延迟直方图
+    每个2的幂区间分为BUCKETS_PER_OCTAVE个桶，分位数误差约为相对9%，内存占用固定
+    """
+    MIN_SECONDS = 0.001           # 最小可区分的延迟
+    BUCKETS_PER_OCTAVE = 8
+    NUM_BUCKETS = 8 * 18          # 覆盖1ms到约260s
+
+    def __init__(self) -> None:
+        self.counts = [0] * self.NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self._lock = Lock()
+
+    @classmethod
+    def bucket_of(cls, seconds: float) -> int:
+        """延迟所在桶的下标"""
+        if seconds <= cls.MIN_SECONDS:
+            return 0
+        index = int(math.log2(seconds / cls.MIN_SECONDS) * cls.BUCKETS_PER_OCTAVE)
+        return min(index, cls.NUM_BUCKETS - 1)
+
+    def record(self, seconds: float) -> None:
+        """记录一次延迟（秒）"""
+        with self._lock:
+            self.counts[self.bucket_of(seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def quantile(self, q: float) -> float | None:
+        """
+        估算分位数
+
+        Args:
+            q (float): 分位点，如0.95
+
+        Returns:
+            float | None: 分位数所在桶的上界（秒），没有记录时返回None
+        """
+        with self._lock:
+            return self.quantile_of(self.counts, q)
+
+    @classmethod
+    def quantile_of(cls, counts: list, q: float) -> float | None:
+        """
+        由桶计数估算分位数，可用于两次快照之差
+
+        Args:
+            counts (list): 各桶的计数
+            q (float): 分位点
+
+        Returns:
+            float | None: 分位数所在桶的上界（秒），没有记录时返回None
+        """
+        total = sum(counts)
+        if not total:
+            return None
+        rank = max(1, math.ceil(q * total))
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return cls.MIN_SECONDS * 2 ** ((index + 1) / cls.BUCKETS_PER_OCTAVE)
+        return None
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    连续失败failure_threshold次后打开，reset_timeout秒内的请求直接拒绝；
+    冷却后进入半开状态，只放行一次试探请求，成功则关闭，失败则重新打开
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = Lock()
+
+    def allow(self) -> bool:
+        """当前是否允许发出请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True  # 放行一次试探请求
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self._clock()
@@ -0,0 +1,332 @@
+"""
+schedule.py
+日程的本地校验与修复
+LLM生成的日程在generate_schedule中只规整一次：解析、排序、对齐到15分钟网格、去重，
+并以最小改动满足schedule_prompt中的约束；只有无法修复时才需要重新请求LLM
+日程提示词只取决于学生原型，ScheduleProvider按提示词分组，一次请求多个候选日程供同组学生分用
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+
+from . import events
+from .agents import POOL_CONFIG, llm_stats
+
+VALID_ACTIONS = ("start", "learn", "eat", "course", "rest", "end", "away")
+# 常见的同义写法
+ACTION_ALIASES = {
+    "study": "learn", "library": "learn", "read": "learn", "学习": "learn",
+    "class": "course", "lecture": "course", "上课": "course",
+    "meal": "eat", "breakfast": "eat", "lunch": "eat", "dinner": "eat", "吃饭": "eat", "进食": "eat",
+    "break": "rest", "sleep": "rest", "休息": "rest",
+    "begin": "start", "wake": "start", "开始": "start",
+    "finish": "end", "结束": "end",
+}
+
+GRID = 15                  # 时间网格（分钟），与模拟步长一致
+DAY_START = 7 * 60         # 一天从07:00开始
+DAY_END = 24 * 60          # 午夜，对应学生日程中的"23:59:00"（原有约定）
+_TIME_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?\s*$")
+
+
+def _parse_minute(value) -> int | None:
+    """将"HH:MM[:SS]"解析为分钟数，"00:00"和"24:00"视为午夜，无法解析时返回None"""
+    if not isinstance(value, str):
+        return None
+    match = _TIME_PATTERN.match(value)
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if minute > 59 or hour > 24 or (hour == 24 and minute > 0):
+        return None
+    if hour in (0, 24) and minute == 0:
+        return DAY_END
+    return hour * 60 + minute
+
+
+def _format_minute(minute: int) -> str:
+    """将分钟数格式化为日程使用的"HH:MM:00"，午夜按原有约定写作"23:59:00\""""
+    if minute >= DAY_END:
+        return "23:59:00"
+    return f"{minute // 60:02d}:{minute % 60:02d}:00"
+
+
+def _snap(minute: int) -> int:
+    """对齐到网格并限制在[07:00, 午夜]范围内；07:00之前的项放在start之后的第一个网格点，不与start重合"""
+    if minute >= DAY_END:
+        return DAY_END
+    if minute < DAY_START:
+        return DAY_START + GRID
+    snapped = (minute + GRID // 2) // GRID * GRID  # 四舍五入到最近的网格点
+    return min(snapped, DAY_END)
+
+
+def _only_learn(items: list, index: int) -> bool:
+    """items[index]是否为其中唯一的learn，修复时不能移除或改写它，否则学生一整天都不会学习"""
+    return items[index][1] == "learn" and sum(action == "learn" for _, action in items) == 1
+
+
+def normalize_schedule(schedule) -> tuple[list[dict] | None, list[str]]:
+    """
+    校验并修复日程
+
+    Args:
+        schedule: LLM返回的日程，期望为[{"time":"HH:MM:SS","action":...}]
+
+    Returns:
+        tuple: (规整后的日程，无法修复时为None, 所做修改的说明列表)
+    """
+    edits = []
+    if not isinstance(schedule, list):
+        return None, ["日程不是列表"]
+
+    # 1. 解析：丢弃缺少字段、时间无法解析或动作未知的项
+    items = []
+    for raw in schedule:
+        if not isinstance(raw, dict):
+            edits.append(f"丢弃非字典项 {raw!r}")
+            continue
+        minute = _parse_minute(raw.get("time"))
+        action = raw.get("action")
+        action = action.strip().lower() if isinstance(action, str) else None
+        action = ACTION_ALIASES.get(action, action)
+        if minute is None or action not in VALID_ACTIONS:
+            edits.append(f"丢弃无法解析的项 {raw!r}")
+            continue
+        snapped = _snap(minute)
+        if snapped != minute:
+            edits.append(f"{action} 的时间 {raw.get('time')} 调整为 {_format_minute(snapped)}")
+        items.append([snapped, action])
+    if not any(action not in ("start", "end") for _, action in items):
+        return None, edits + ["没有可用的日程项"]
+
+    # 2. 排序（稳定排序，保留同一时间多项的原有先后）
+    items.sort(key=lambda item: item[0])
+
+    # 3. start只保留一个，放在07:00；与之同时的其他项顺延一个网格（与顺延后同时的项在去重时处理）
+    body = [item for item in items if item[1] != "start"]
+    if len(body) != len(items) - 1 or items[0] != [DAY_START, "start"]:
+        edits.append("start 调整为 07:00:00")
+    for item in body:
+        if item[0] != DAY_START:
+            break
+        edits.append(f"{item[1]} 与 start 重合，顺延到 {_format_minute(DAY_START + GRID)}")
+        item[0] = DAY_START + GRID
+
+    # 4. end只保留最后一个，其后的项丢弃；没有end时以午夜结束
+    end_positions = [i for i, item in enumerate(body) if item[1] == "end"]
+    if end_positions:
+        end_index = end_positions[-1]
+        if len(end_positions) > 1 or end_index != len(body) - 1:
+            edits.append("移除多余的 end 及其后的项")
+        end_minute = body[end_index][0]
+        body = [item for item in body[:end_index] if item[1] != "end"]
+    else:
+        edits.append("缺少 end，以午夜结束")
+        end_minute = DAY_END
+
+    # 5. 去重：同一时间的多项只保留最后一项（查询时只有它生效），相邻的相同动作合并；
+    #    被覆盖的是唯一的learn时改为把后一项顺延一个网格，顺延后到达end时移除后一项
+    deduped = []
+    for i, item in enumerate(body):
+        if deduped and item[0] <= deduped[-1][0]:  # 同一时间（或前一项已被顺延到其后）
+            if _only_learn(deduped + body[i:], len(deduped) - 1) and item[1] != "learn":
+                shifted = deduped[-1][0] + GRID
+                if shifted < end_minute:
+                    edits.append(f"{item[1]} 与唯一的 learn 同时，顺延到 {_format_minute(shifted)}")
+                    deduped.append([shifted, item[1]])
+                else:
+                    edits.append(f"{_format_minute(item[0])} 的 {item[1]} 与唯一的 learn 同时且无法顺延，移除")
+                continue
+            edits.append(f"{_format_minute(item[0])} 的 {deduped[-1][1]} 被同时间的 {item[1]} 覆盖，移除")
+            deduped[-1] = [deduped[-1][0], item[1]]
+        elif deduped and deduped[-1][1] == item[1]:
+            edits.append(f"合并重复的 {item[1]}（{_format_minute(item[0])}）")
+        else:
+            deduped.append(item)
+    body = deduped
+    if not body:
+        return None, edits + ["没有可用的日程项"]
+
+    # 6. end之前必须是rest，且两者时间不重合
+    if body[-1][1] != "rest":
+        rest_minute = end_minute - GRID
+        if rest_minute > body[-1][0] or _only_learn(body, len(body) - 1):
+            rest_minute = max(rest_minute, body[-1][0] + GRID)
+            edits.append(f"在 end 前插入 rest（{_format_minute(rest_minute)}）")
+            body.append([rest_minute, "rest"])
+        else:
+            edits.append(f"{body[-1][1]} 改为 rest 以满足 end 前必须休息")
+            body[-1][1] = "rest"
+            if len(body) > 1 and body[-2][1] == "rest":
+                body.pop()
+    if body[-1][0] >= end_minute:
+        if body[-1][0] + GRID <= DAY_END:
+            end_minute = body[-1][0] + GRID
+            edits.append(f"end 顺延到 {_format_minute(end_minute)}，避免与 rest 重合")
+        else:
+            # 午夜之前没有空间：end定在午夜，rest及其前面挤在一起的项依次提前一个网格
+            end_minute = DAY_END
+            limit = end_minute
+            for item in reversed(body):
+                if item[0] < limit:
+                    break
+                item[0] = limit - GRID
+                edits.append(f"{item[1]} 提前到 {_format_minute(item[0])}，避免与其后的项重合")
+                limit = item[0]
+            if body[0][0] <= DAY_START:
+                return None, edits + ["日程项过多，无法在午夜之前排开"]
+
+    normalized = [{"time": _format_minute(DAY_START), "action": "start"}]
+    normalized += [{"time": _format_minute(minute), "action": action} for minute, action in body]
+    normalized.append({"time": _format_minute(end_minute), "action": "end"})
+    return normalized, edits
+
+
+def check_schedule(schedule: list[dict]) -> list[str]:
+    """
+    检查规整后的日程是否符合schedule_prompt中的软约束（不做修改）
+    包括每天2-4节课、课程总时长不超过8小时、进食时长0.5-1小时；
+    ScheduleProvider对每个候选调用，违反约束的候选计入llm_stats的constraint_violations
+
+    Args:
+        schedule (list[dict]): normalize_schedule返回的日程
+
+    Returns:
+        list[str]: 违反的约束说明，全部满足时为空列表
+    """
+    problems = []
+    minutes = [_parse_minute(item["time"]) for item in schedule]
+    durations = {"course": [], "eat": []}
+    for i, item in enumerate(schedule[:-1]):
+        if item["action"] in durations:
+            durations[item["action"]].append(minutes[i + 1] - minutes[i])
+    if not 2 <= len(durations["course"]) <= 4:
+        problems.append(f"课程数为 {len(durations['course'])}，应为2-4节")
+    if sum(durations["course"]) > 8 * 60:
+        problems.append("课程总时长超过8小时")
+    for length in durations["eat"]:
+        if not 30 <= length <= 60:
+            problems.append(f"进食时长 {length} 分钟，应为30-60分钟")
+    return problems
+
+
+SCHEDULE_REQUESTS = 2        # 候选日程全部无法在本地修复时最多请求LLM的次数
+SAMPLES_PER_REQUEST = 16     # 每个提示词请求的候选日程数（chat completions的n参数）
+
+
+class _Flight:
+    """同一提示词正在进行的请求，其他线程等待其结束"""
+    __slots__ = ("done",)
+
+    def __init__(self) -> None:
+        self.done = Event()
+
+
+class ScheduleProvider:
+    """
+    按提示词分组的日程供给
+    同一提示词只请求一次，一次取n个候选日程（端点忽略n时逐个补齐）并在本地规整，
+    同组学生按key（学生ID）取pool[key % len(pool)]，分配结果与学生创建的线程先后无关；
+    并发的相同请求合并为一次（single flight），其余线程等待该请求结束后直接取用。
+    Library.initialize_students在每批学生之前调用clear()，下一批学生重新请求
+    """
+
+    def __init__(self, samples_per_request: int = SAMPLES_PER_REQUEST) -> None:
+        self.samples_per_request = samples_per_request
+        self._pools = {}    # 提示词 -> 规整后的候选日程列表
+        self._flights = {}  # 提示词 -> _Flight
+        self._lock = Lock()
+
+    def get(self, prompt: str, client, key: int = 0) -> list[dict] | None:
+        """
+        获取一份规整后的日程
+
+        Args:
+            prompt (str): 格式化后的日程提示词
+            client: LLM客户端，提供sample或response方法
+            key (int): 选择候选的键，通常为学生ID
+
+        Returns:
+            list[dict] | None: 日程，请求失败或全部无法修复时返回None
+        """
+        with self._lock:
+            pool = self._pools.get(prompt)
+            flight = self._flights.get(prompt) if pool is None else None
+            leader = pool is None and flight is None
+            if leader:
+                flight = self._flights[prompt] = _Flight()
+        if pool is None and not leader:
+            flight.done.wait()
+            with self._lock:
+                pool = self._pools.get(prompt)
+        elif leader:
+            samples = []
+            try:
+                samples = self._fetch(prompt, client)
+            finally:
+                with self._lock:
+                    if samples:
+                        self._pools[prompt] = samples
+                    del self._flights[prompt]
+                flight.done.set()
+            pool = samples
+        if not pool:
+            return None  # 请求失败时同一批等待者不再重复请求，之后的学生会重新请求
+        return [dict(item) for item in pool[key % len(pool)]]
+
+    def clear(self) -> None:
+        """清空所有候选日程，之后的学生重新请求"""
+        with self._lock:
+            self._pools.clear()
+
+    def _fetch(self, prompt: str, client) -> list[list[dict]]:
+        """请求一批候选日程并在本地规整，全部无法修复时重新请求"""
+        for _ in range(SCHEDULE_REQUESTS):
+            responses = self._request(prompt, client)
+            if not responses:
+                break  # 请求本身已重试耗尽，不再追加请求
+            samples = []
+            for response in responses:
+                normalized, edits = normalize_schedule(response)
+                if normalized is None:
+                    llm_stats.record_event("schedule", "parse_failures")
+                    events.log.warning(f"候选日程无法修复: {edits[-1]}")
+                    continue
+                if edits:
+                    llm_stats.record_event("schedule", "repairs")
+                    events.log.debug("候选日程已修复:", *edits, sep="\n  ")
+                problems = check_schedule(normalized)
+                if problems:  # 软约束只记录不修改，候选仍可使用
+                    llm_stats.record_event("schedule", "constraint_violations")
+                    events.log.debug("候选日程不满足约束:", *problems, sep="\n  ")
+                samples.append(normalized)
+            if samples:
+                return samples
+        return []
+
+    def _request(self, prompt: str, client) -> list:
+        """
+        请求候选日程，客户端不支持sample时退化为单次response
+        部分端点（如默认的DeepSeek）忽略n参数，只返回一个候选；返回数量不足时用单个候选的请求并发补齐，
+        否则同一提示词的学生都会分到同一份日程。补齐的结果按请求顺序排列，与线程完成先后无关
+        """
+        sample = getattr(client, "sample", None)
+        if not callable(sample):
+            response = client.response(prompt, max_retries=3, kind="schedule")
+            return [] if response is None else [response]
+        responses = sample(prompt, n=self.samples_per_request, max_retries=3, kind="schedule")
+        missing = self.samples_per_request - len(responses)
+        if not responses or missing <= 0:
+            return responses
+        events.log.debug(f"端点只返回了 {len(responses)}/{self.samples_per_request} 个候选日程，逐个补齐")
+        with ThreadPoolExecutor(max_workers=min(missing, POOL_CONFIG["max_connections"]),
+                                thread_name_prefix="schedule-sample") as pool:
+            extra = pool.map(lambda _: sample(prompt, n=1, max_retries=3, kind="schedule"), range(missing))
+            for result in extra:
+                responses.extend(result)
+        return responses
+
+
+# 进程内共享的日程供给
+schedule_provider = ScheduleProvider()
@@ -1,5 +1,6 @@
 from enum import Enum
 from datetime import datetime,timedelta
+from . import events
 
 class Status(Enum):
     """座位状态枚举
@@ -17,26 +18,25 @@ class Seat:
     
     def __init__(self,x:int,y:int,
                  lamp:bool=False,
-                 socket:bool=False) -> None:
+                 socket:bool=False,
+                 window:bool=False) -> None:
         """
         初始化座位对象
 
         Args:
-            x (int): 座位的x坐标，范围0-19对应20x20网格
-            y (int): 座位的y坐标，范围0-19对应20x20网格
+            x (int): 座位的x坐标（平面图中的行号）
+            y (int): 座位的y坐标（平面图中的列号）
             lamp (bool): 座位是否有台灯，影响学生满意度，默认为False
             socket (bool): 座位是否有插座，影响学生满意度，默认为False
+            window (bool): 座位是否靠窗，由平面图决定（矩形网格为四周边缘），默认为False
         """
-        self.coordinate = (x,y)  # 座位坐标，用于在20x20网格中唯一标识座位
+        self.coordinate = (x,y)  # 座位坐标，用于在平面图中唯一标识座位
         self.lamp = lamp          # 是否有台灯，影响学生满意度
         self.socket = socket      # 是否有插座，影响学生满意度
         self.status = Status.vacant  # 座位状态，初始为空闲
         self.owner = None         # 座位当前使用者ID（学生索引），无使用者时为None
         self.taken_time = datetime(1900,1,1,7)  # 座位被占用的时间，用于计算占座时长
-        self.window = False       # 是否靠窗，边缘座位自动为靠窗座位，影响学生满意度
-        # 判断是否为靠窗座位：x或y为0表示左边缘或上边缘，x或y为19表示右边缘或下边缘
-        if x == 0 or y == 0 or x == 19 or y == 19:
-            self.window  = True
+        self.window = window      # 是否靠窗，影响学生满意度
 
         self.crowded_para = 0           # 拥挤参数，表示周围座位的占用情况，影响学生满意度
         self.time_delta = timedelta(minutes=15)  # 时间更新步长，与学生时间更新同步
@@ -71,6 +71,8 @@ class Seat:
         if self.status == Status.vacant:  # 只有空闲座位才能被占用
             self.status = Status.taken
             self.owner = student_index
+            if events.log.events_enabled:
+                events.log.event("take", seat=self.coordinate, student=student_index)
 
     def leave(self,reverse:bool):
         """
@@ -83,13 +85,15 @@ class Seat:
                 - True: 学生暂时离开但占座（座位状态改为reverse），保留座位使用权
         """
         if self.status == Status.taken:  # 确保座位有使用者才允许离开操作
+            if events.log.events_enabled:
+                events.log.event("reserve" if reverse else "leave", seat=self.coordinate, student=self.owner)
             if not reverse:
-                print('Seat接收到',False,'预期行为：学生完全离开，座位变为空闲，清除使用者信息')
+                events.log.debug('Seat接收到',False,'预期行为：学生完全离开，座位变为空闲，清除使用者信息')
                 # 学生完全离开，座位变为空闲，清除使用者信息
                 self.status = Status.vacant
                 self.owner = None
             else:
-                print('Seat接收到',True,'预期行为：学生暂时离开但占座，座位状态改为占座状态，保留使用者信息')
+                events.log.debug('Seat接收到',True,'预期行为：学生暂时离开但占座，座位状态改为占座状态，保留使用者信息')
                 # 学生暂时离开但占座，座位状态改为占座状态，保留使用者信息
                 self.status = Status.reverse
 
@@ -109,6 +113,8 @@ class Seat:
         """
         if self.status == Status.reverse:  # 只能标记占座状态的座位
             self.status = Status.signed
+            if events.log.events_enabled:
+                events.log.event("sign", seat=self.coordinate, student=self.owner)
 
     def clear(self):
         """
@@ -117,6 +123,8 @@ class Seat:
         图书馆管理系统清理超时占座时调用此方法
         """
         if self.status == Status.signed:  # 只清理被标记的座位
+            if events.log.events_enabled:
+                events.log.event("clear", seat=self.coordinate, student=self.owner)
             self.status = Status.vacant
             self.owner = None
 
@@ -6,14 +6,20 @@ simulation.py
 from .library import Library
 from datetime import datetime, timedelta
 from .json_manager import JsonManager
+from . import events
+from .profiler import PhaseProfiler
+from .agents import llm_stats, merge_usage, summarize_usage
+from .checkpoint import library_state, read_checkpoint, restore_library, write_checkpoint
 from config import simulations_base_path, test_simulation_path
 import os
+import random
+import time
 class Simulation:
     """
     模拟主类，协调图书馆、学生和座位系统
     提供交互式命令行界面，支持 step, status, seats, time, quit, help 命令
     """
-    def __init__(self,row=20, column=20, num_students=200, humanities_rate=0.3, science_rate=0.3, simulation_number=1):
+    def __init__(self,row=20, column=20, num_students=200, humanities_rate=0.3, science_rate=0.3, simulation_number=1, log_level=None, event_log_path=None, profile=False, save_profile=False, prefetch=False, checkpoint_every=None, checkpoint_path=None, waitlist=False, floor_plan=None):
         """
         初始化模拟系统
 
@@ -24,37 +30,233 @@ class Simulation:
             humanities_rate (float): 文科生比例，默认0.3
             science_rate (float): 理科生比例，默认0.3
             simulation_number (int): 模拟次数，默认为1
+            log_level (events.Level): 文本日志级别，为None时沿用进程级设置；批量运行可设为WARNING或SILENT
+            event_log_path (str): 结构化事件流（JSON Lines）文件路径，为None时不记录事件
+            profile (bool): 是否记录分阶段耗时，运行结束时输出汇总
+            save_profile (bool): 是否将分阶段耗时汇总写入模拟数据文件的头部信息
+            prefetch (bool): 是否在后台预取下一个tick的离座决策，隐藏LLM请求延迟；默认关闭：
+                预取是投机请求，学生状态在下一个tick变化时结果作废，会多出LLM调用和费用，需要时显式开启
+            checkpoint_every (int): 每隔多少个tick写一次检查点，为None时不写
+            checkpoint_path (str): 检查点路径，默认为模拟数据文件同目录下的同名.checkpoint.json.gz
+            waitlist (bool): 是否开启等座队列，没有空位的学生按先后排队等待空出的座位，见Library.enable_waitlist
+            floor_plan (str | FloorPlan): 平面图或平面图文件路径（JSON/CSV），指定时忽略row和column，见floorplan.load_floor_plan
         """
+        events.configure_events(level=log_level, event_stream_path=event_log_path)
+        self._llm_stats_before = llm_stats.snapshot()  # 学生初始化时就会请求日程，需在此之前记录
+        self._started_at = time.perf_counter()
         self.library = Library()
-        # 使用新的初始化方法，支持自定义座位数量
-        self.library.initialize_seats(row, column)
+        # 使用新的初始化方法，支持自定义座位数量或任意平面图
+        if floor_plan is None:
+            self.library.initialize_seats(row, column)
+        else:
+            from .floorplan import FloorPlan, load_floor_plan
+            if not isinstance(floor_plan, FloorPlan):
+                floor_plan = load_floor_plan(floor_plan)
+            self.library.initialize_floor_plan(floor_plan)
         self.library.initialize_students(num_students, humanities_rate, science_rate)
+        if profile or save_profile:
+            self.library.profiler = PhaseProfiler()
+        if prefetch:
+            self.library.enable_prefetch()
+        if waitlist:
+            self.library.enable_waitlist()
+        self.save_profile = save_profile
         # 保存simulation_number作为实例属性，以便在前端中使用
         self.simulation_number = simulation_number
         
         # 设置默认的占座时间限制为1小时
         self.library.set_limit_reversed_time(timedelta(hours=1))
-        total_seats = row * column
-        scale = str(row)+"*"+str(column)+f"->{num_students}"
+        total_seats = len(self.library.seats)
+        if floor_plan is None:
+            scale = str(row)+"*"+str(column)+f"->{num_students}"
+        else:
+            scale = f"{floor_plan.name or 'floor_plan'}({total_seats})->{num_students}"
         stru:list[dict] = [{"test_name":f"{num_students}-{simulation_number}","test_scale":scale,"seat_info":self.library.output_seats_info()}]
         # 根据座椅数量创建分类路径
         seat_folder_name = f"{total_seats}_seats_simulations"
         path = os.path.join(simulations_base_path, seat_folder_name)
         self.jm = JsonManager(os.path.join(path,f"{num_students}-{simulation_number}.json"),stru)
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_path = checkpoint_path or os.path.splitext(self.jm.file_path)[0] + ".checkpoint.json.gz"
+        self._resumed_usage = None  # 恢复运行时，检查点之前的LLM用量
+
+    @classmethod
+    def resume(cls, path, log_level=None, event_log_path=None, profile=False):
+        """
+        从检查点继续运行
+        重建图书馆和学生，恢复随机数状态，打开原模拟数据文件并截去检查点之后写入的tick，
+        之后的数据继续追加到同一文件
+
+        Args:
+            path (str): 检查点路径
+            log_level (events.Level): 文本日志级别
+            event_log_path (str): 结构化事件流路径
+            profile (bool): 是否记录分阶段耗时（只统计恢复之后的tick）
+
+        Returns:
+            Simulation: 可继续调用run或step的模拟
+        """
+        events.configure_events(level=log_level, event_stream_path=event_log_path)
+        state = read_checkpoint(path)
+        jm = JsonManager(state["log_path"])
+        del jm.data[1 + state["records"]:]  # 检查点之后写入的tick会重新模拟
+        sim = cls._from_snapshot(state, jm, profile=profile)
+        sim._resumed_usage = state["llm_usage"]
+        sim.checkpoint_path = path
+        events.log.info(f"从检查点恢复模拟: {sim.library.current_time.strftime('%H:%M')}，已记录{state['records']}个tick")
+        return sim
+
+    @classmethod
+    def _from_snapshot(cls, state, jm, profile=False):
+        """由snapshot()的结果重建模拟，恢复随机数状态，数据写入jm"""
+        sim = cls.__new__(cls)
+        sim._llm_stats_before = llm_stats.snapshot()
+        sim._started_at = time.perf_counter() - state["elapsed_seconds"]
+        sim._resumed_usage = None
+        sim.library = restore_library(state["library"])
+        if profile or state["save_profile"]:
+            sim.library.profiler = PhaseProfiler()
+        sim.save_profile = state["save_profile"]
+        sim.simulation_number = state["simulation_number"]
+        sim.jm = jm
+        sim.checkpoint_every = state["checkpoint_every"]
+        sim.checkpoint_path = os.path.splitext(jm.file_path)[0] + ".checkpoint.json.gz"
+        version, internal, gauss = state["random"]
+        random.setstate((version, tuple(internal), gauss))
+        events.log.sim_time = sim.library.current_time
+        return sim
+
+    def snapshot(self):
+        """
+        当前模拟的完整状态，可由JSON序列化，写入检查点或作为分支的起点
+
+        Returns:
+            dict: 模拟参数、已记录的tick数、LLM用量、随机数状态和图书馆状态
+        """
+        usage = llm_stats.since(self._llm_stats_before)
+        if self._resumed_usage is not None:
+            usage = merge_usage([self._resumed_usage, usage])
+        return {
+            "simulation_number": self.simulation_number,
+            "save_profile": self.save_profile,
+            "checkpoint_every": self.checkpoint_every,
+            "log_path": self.jm.file_path,
+            "records": len(self.jm.data) - 1,
+            "elapsed_seconds": time.perf_counter() - self._started_at,
+            "llm_usage": usage,
+            "random": random.getstate(),
+            "library": library_state(self.library),
+        }
+
+    def fork(self, at_time, overrides, parallel=False, max_workers=None):
+        """
+        推进到分支时刻后，从同一快照运行多个策略变体，见fork.fork_simulation
+        各分支的数据文件只保存分支之后的tick并引用本模拟数据文件中的共同前缀
+
+        Args:
+            at_time: 分支时刻，"HH:MM"字符串或datetime
+            overrides: 分支名 -> 策略覆盖（如{"limit_reversed_time": "00:30"}）
+            parallel (bool): 是否在子进程中并行运行分支
+            max_workers (int): 并行时的进程数
+
+        Returns:
+            dict: 分支名 -> 拼接共同前缀后的完整模拟数据
+        """
+        from .fork import fork_simulation
+        return fork_simulation(self, at_time, overrides, parallel=parallel, max_workers=max_workers)
+
+    @classmethod
+    def run_replicas(cls, replicas, row=20, column=20, num_students=200, humanities_rate=0.3, science_rate=0.3,
+                     simulation_number=1, limit_reversed_time=None, save=True, **options):
+        """
+        同一配置的多个副本在锁步引擎中一起推进（规则离座），见ensemble.run_ensemble
+
+        Args:
+            replicas (int): 副本数
+            row, column, num_students, humanities_rate, science_rate: 见Simulation
+            simulation_number (int): 第一个副本的模拟序号，第i个副本的序号为simulation_number+i
+            limit_reversed_time (timedelta): 占座时间限制，默认1小时
+            save (bool): 是否保存模拟文件
+            **options: 传给Simulation的其他参数，如log_level
+
+        Returns:
+            list[list[dict]]: 每个副本的模拟数据
+        """
+        from .ensemble import run_ensemble
+        return run_ensemble(replicas, row=row, column=column, num_students=num_students,
+                            humanities_rate=humanities_rate, science_rate=science_rate,
+                            simulation_number=simulation_number, limit_reversed_time=limit_reversed_time,
+                            save=save, **options)
+
+    def run_zoned(self, zones=None, zone_of_seat=None, parallel=True):
+        """
+        以分区并行引擎运行到午夜（规则离座），见zones.ZonedEngine；
+        图书馆对象停留在开始运行时的状态，不随引擎推进
+
+        Args:
+            zones (int): 按行划分的区域数，默认为CPU核数
+            zone_of_seat (callable): 座位坐标 -> 区域编号（如楼层），给出时忽略zones
+            parallel (bool): 是否每个区域使用一个工作进程
+
+        Returns:
+            list[dict]: 模拟数据（第一项为头部信息）
+        """
+        from .zones import ZonedEngine
+        with ZonedEngine(self.library, zones=zones, zone_of_seat=zone_of_seat, parallel=parallel) as engine:
+            records = engine.run()[0]
+        self.jm.data[0]["zones"] = {"zones": engine.zones, "leave_decisions": "rule"} # type: ignore
+        self.jm.data.extend(records)
+        self.finish_run()
+        events.log.close_event_stream()
+        return self.jm.data
+
+    def run_days(self, days=7, day_types=None, perturb_steps=1, seed=None, save=True):
+        """
+        多日模拟：保留图书馆和学生连续模拟多天，见multiday.MultiDayRun
+        数据逐天流式写入{座位数}_seats_multiday文件夹中与单日数据同名的.jsonl文件，每条tick记录带有day字段，
+        可由multiday.read_multiday读回
+
+        Args:
+            days (int): 天数，day_types给出时忽略
+            day_types (list[str]): 每天的日期类型（weekday/weekend），默认从星期一开始按星期排列
+            perturb_steps (int): 每名学生每天的日程最多平移的时间步数
+            seed (int): 日程扰动的随机数种子
+            save (bool): 是否保存数据文件
+
+        Returns:
+            dict: 头部信息，含各天的总数和LLM用量
+        """
+        from .multiday import MultiDayRun, week_day_types
+        run = MultiDayRun(self, day_types or week_day_types(days), perturb_steps=perturb_steps, seed=seed)
+        header = run.run(save=save)
+        events.log.close_event_stream()
+        return header
+
+    def checkpoint(self, path=None):
+        """
+        写入检查点，同时保存模拟数据文件，使两者的tick数一致
+
+        Args:
+            path (str): 检查点路径，默认为checkpoint_path
+        """
+        self.jm.save_json()
+        write_checkpoint(path or self.checkpoint_path, self.snapshot())
 
     def run(self, run_all = True):
         """
         运行模拟系统
         提供交互式命令行界面，用户可以控制模拟过程
         """
-        print("图书馆座位占用行为模拟系统已启动")
-        print("输入 'help' 查看可用命令")
-        print("当前图书馆座位信息为：")
-        self.library.visualize_seats_infomation()
+        events.log.info("图书馆座位占用行为模拟系统已启动")
+        events.log.info("输入 'help' 查看可用命令")
+        if events.log.enabled(events.Level.INFO):
+            events.log.info("当前图书馆座位信息为：")
+            self.library.visualize_seats_infomation()
         if run_all:
             while f"{self.library.current_time.strftime('%H:%M')}" != "00:00":
-                self.step()
-                self.jm.save_json()
+                self.step(save=True)
+            self.finish_run()
+            events.log.close_event_stream()
             return
             
         while True:
@@ -73,14 +275,16 @@ class Simulation:
                     self.set_limit_time(command)
                 elif command == "quit" or command == "exit":
                     print("退出模拟系统")
-                    self.jm.save_json()
+                    self.finish_run()
+                    events.log.close_event_stream()
                     break
                 elif command == "help":
                     self.show_help()
                 elif command == "run all":
                     while f"{self.library.current_time.strftime('%H:%M')}" != "00:00":
-                        self.step()
-                        self.jm.save_json()
+                        self.step(save=True)
+                    self.finish_run()
+                    events.log.close_event_stream()
                     break
                 else:
                     print("未知命令，输入 'help' 查看可用命令")
@@ -91,23 +295,66 @@ class Simulation:
             except Exception as e:
                 print(f"发生错误: {e}")
 
-    def step(self):
+    def step(self, save=False):
         """
         执行单步模拟
         更新图书馆系统状态，包括时间推进、座位和学生状态更新
+
+        Args:
+            save (bool): 是否在本步结束时保存模拟数据到文件
         """
+        profiler = self.library.profiler
+        profiler.begin_tick()
         self.library.update()
+        with profiler.phase("serialization"):
+            self.jm.data.append(self.tick_record()) # type: ignore
+            if self.checkpoint_every and (len(self.jm.data) - 1) % self.checkpoint_every == 0:
+                self.checkpoint()  # 同时保存模拟数据文件
+            elif save:
+                self.jm.save_json()
+        profiler.end_tick()
+
+    def tick_record(self):
+        """
+        当前tick写入模拟数据的记录
+
+        Returns:
+            dict: 时间、座位状态、不满意数、清理数、占座数和占用率，开启等座队列时另有排队人数
+        """
         total_seats = len(self.library.seats)
         taken_seats = self.library.count_taken_seats()
         reversed_seats = self.library.count_reversed_seats()
+        record = {"time":self.library.current_time.strftime('%H:%M'),
+                  "seats_taken_state":self.library.output_seats_taken_state(),
+                  "unstisfied_num":self.library.unsatisfied,
+                  "cleared_seats":self.library.count_cleared_seat,
+                  "reversed_seats":reversed_seats,
+                  "taken_rate":f" {taken_seats} ({taken_seats/total_seats*100:.1f}%)"}
+        if self.library.waitlist is not None:
+            record["waitlist_num"] = len(self.library.waitlist)
+        return record
 
-        current_state = {"time":self.library.current_time.strftime('%H:%M'),
-                         "seats_taken_state":self.library.output_seats_taken_state(),
-                         "unstisfied_num":self.library.unsatisfied,
-                         "cleared_seats":self.library.count_cleared_seat,
-                         "reversed_seats":reversed_seats,
-                         "taken_rate":f" {taken_seats} ({taken_seats/total_seats*100:.1f}%)"}
-        self.jm.data.append(current_state) # type: ignore
+    def finish_run(self):
+        """
+        结束模拟时的收尾工作
+        将本次模拟按调用类型统计的LLM用量（token、重试、修复、延迟分位数等）及其汇总、离座决策预取的命中情况写入数据文件头部
+        （从检查点恢复的模拟合并检查点前后的用量），
+        输出分阶段耗时汇总并按需写入头部，最后保存
+        """
+        self.library.close()  # 先结束后台预取，使其LLM用量计入统计
+        usage = llm_stats.since(self._llm_stats_before)
+        if self._resumed_usage is not None:
+            usage = merge_usage([self._resumed_usage, usage])  # 合并后不含延迟分位数
+        self.jm.data[0]["llm_usage"] = usage # type: ignore
+        self.jm.data[0]["llm_summary"] = summarize_usage(usage, time.perf_counter() - self._started_at) # type: ignore
+        if self.library.prefetcher is not None:
+            self.jm.data[0]["leave_prefetch"] = dict(self.library.prefetcher.stats) # type: ignore
+        profiler = self.library.profiler
+        if profiler.enabled:
+            print(profiler.format_summary())
+            if self.save_profile:
+                self.jm.data[0]["profile"] = profiler.summary() # type: ignore
+        self.jm.save_json()
 
     def show_status(self):
         """
@@ -3,10 +3,14 @@
 学生是图书馆模拟系统中的智能体，根据个人属性、座位偏好和日程安排
 做出占用座位、离开座位、占座等决策
 """
-from .agents import Clients
+from .agents import get_shared_client
+from array import array
+from bisect import bisect_right
 from enum import Enum
 from datetime import datetime, timedelta
 from .seats import Seat,Status
+from .schedule import schedule_provider
+from . import events
 
 class StudentState(Enum):
     """学生状态枚举
@@ -17,6 +21,110 @@ class StudentState(Enum):
     AWAY = 3        # 暂时离开但占座状态，座位被保留
     GONE = 4        # 完全离开状态，未占用任何座位
 
+# 九种工厂原型的参数表：名称 -> (学生基本属性, 座位偏好)
+ARCHETYPES = {
+    "humanities_diligent": (
+        {"character": "守序",  # 性格守序，遵守规则
+         "schedule_type": "正常",  # 正常作息
+         "focus_type": "高",  # 专注度高
+         "course_situation": "多"},  # 课程多
+        {"lamp": 0.7,      # 文科生喜欢光线好的环境阅读
+         "socket": 0.4,    # 对插座需求一般
+         "space": 0.6}),   # 需要安静宽松的环境
+    "humanities_medium": (
+        {"character": "守序", "schedule_type": "正常", "focus_type": "中", "course_situation": "中"},
+        {"lamp": 0.5, "socket": 0.5, "space": 0.5}),  # 各项需求中等
+    "humanities_lazy": (
+        {"character": "利己",  # 性格利己
+         "schedule_type": "晚",  # 晚间作息
+         "focus_type": "低",  # 专注度低
+         "course_situation": "少"},  # 课程少
+        {"lamp": 0.3,      # 对光线要求不高
+         "socket": 0.6,    # 可能需要给设备充电
+         "space": 0.4}),   # 对环境要求不高
+    "science_diligent": (
+        {"character": "守序", "schedule_type": "早", "focus_type": "高", "course_situation": "多"},
+        {"lamp": 0.8,      # 理科生需要好的光线来计算和阅读图表
+         "socket": 0.7,    # 需要给计算器或笔记本供电
+         "space": 0.5}),   # 需要足够的桌面空间
+    "science_medium": (
+        {"character": "守序", "schedule_type": "正常", "focus_type": "中", "course_situation": "中"},
+        {"lamp": 0.6, "socket": 0.6, "space": 0.5}),  # 中等需求
+    "science_lazy": (
+        {"character": "利己", "schedule_type": "晚", "focus_type": "低", "course_situation": "少"},
+        {"lamp": 0.4,      # 中等对台灯需求
+         "socket": 0.7,    # 可能需要设备充电
+         "space": 0.3}),   # 对空间要求不高
+    "engineering_diligent": (
+        {"character": "守序", "schedule_type": "早", "focus_type": "高", "course_situation": "多"},
+        {"lamp": 0.9,      # 工科生需要极好的光线进行复杂设计和编程
+         "socket": 0.9,    # 需要给电脑、设备供电
+         "space": 0.7}),   # 需要大量桌面空间进行设计和计算
+    "engineering_medium": (
+        {"character": "守序", "schedule_type": "正常", "focus_type": "中", "course_situation": "中"},
+        {"lamp": 0.7, "socket": 0.7, "space": 0.6}),  # 较高需求
+    "engineering_lazy": (
+        {"character": "利己", "schedule_type": "晚", "focus_type": "低", "course_situation": "少"},
+        {"lamp": 0.5,      # 中等对台灯需求
+         "socket": 0.8,    # 仍需给设备充电
+         "space": 0.4}),   # 对空间要求不高
+}
+
+# 原型参数驻留表：相同参数的学生共享同一对字典，学生只保存下标
+_archetype_table: list[tuple[dict, dict]] = []
+_archetype_index: dict[tuple, int] = {}
+
+# 日程动作驻留表：日程中的动作以一个字节的编码保存
+ACTIONS = ["start", "learn", "eat", "course", "rest", "away", "end"]
+_action_codes = {action: code for code, action in enumerate(ACTIONS)}
+
+_DAY_START = datetime(1900,1,1)  # 学生时钟的零点，时钟以距此时刻的秒数保存
+_LATEST_SECOND = 23*3600 + 59*60  # 超出范围或无法解析的日程时间按23:59处理
+_DEFAULT_LIMIT = timedelta(hours=1)  # 默认占座时间限制，所有学生共享同一对象
+
+
+def intern_archetype(student_para: dict, seat_preference: dict) -> int:
+    """
+    将学生参数登记到原型驻留表
+
+    Args:
+        student_para (dict): 学生基本属性
+        seat_preference (dict): 座位偏好
+
+    Returns:
+        int: 原型在驻留表中的下标
+    """
+    key = (tuple(student_para.items()), tuple(seat_preference.items()))
+    index = _archetype_index.get(key)
+    if index is None:
+        index = len(_archetype_table)
+        _archetype_table.append((student_para, seat_preference))
+        _archetype_index[key] = index
+    return index
+
+
+def _action_code(action: str) -> int:
+    """获取动作编码，未见过的动作追加到驻留表"""
+    code = _action_codes.get(action)
+    if code is None:
+        code = len(ACTIONS)
+        ACTIONS.append(action)
+        _action_codes[action] = code
+    return code
+
+
+def _parse_schedule_second(time_str: str) -> int:
+    """将日程中的"HH:MM:SS"转换为当天的秒数，规则与原逐项解析一致"""
+    if time_str == "00:00:00":  # 特殊处理 "00:00:00"，将其视为23:59:00（即一天的结束）
+        return _LATEST_SECOND
+    try:
+        parsed = datetime.strptime(time_str, "%H:%M:%S")
+    except (ValueError, TypeError):
+        return _LATEST_SECOND  # 如果时间格式不正确，使用默认值
+    second = parsed.hour*3600 + parsed.minute*60 + parsed.second
+    return min(second, _LATEST_SECOND)  # 超出23:59的时间限制在有效范围内
+
+
 class Student:
     """
     学生类，模拟图书馆中学生的行为
@@ -26,7 +134,16 @@ class Student:
         3.行为判断逻辑：
             1.选择座位
             2.状态改变
+
+    为支持上万名学生的模拟，实例采用紧凑表示：
+        - 使用__slots__（保留__dict__以便测试中patch实例方法，未使用时不分配）
+        - 学生属性和座位偏好保存在共享的原型驻留表中，实例只保存下标
+        - 日程按时间排序后保存为秒数数组和动作编码字节串
+        - 时钟保存为整数秒，不持有LLM客户端，调用时取进程级共享客户端
     """
+    __slots__ = ("student_id", "_archetype", "library_capacity", "total_students", "seat", "state",
+                 "_times", "_actions", "_clock", "_step", "limit_reverse_time", "satisfaction", "__dict__")
+
     def __init__(self,student_id,student_para:dict,seat_preference:dict,schedule = None, library_capacity=None, total_students=None) -> None:
         """
         初始化学生对象
@@ -46,21 +163,82 @@ class Student:
             total_students: 总学生数
         """
         self.student_id = student_id  # 学生唯一标识符
-        self._initialize_student_para(**student_para)  # 初始化学生基本属性
-        self._initialize_seat_preference(**seat_preference)  # 初始化座位偏好
+        self._archetype = intern_archetype(self._initialize_student_para(**student_para),  # 初始化学生基本属性
+                                           self._initialize_seat_preference(**seat_preference))  # 初始化座位偏好
         self.library_capacity = library_capacity  # 图书馆最大容量
         self.total_students = total_students  # 总学生数
         self.seat = None  # 当前占用的座位对象，无座位时为None
         self.state = StudentState.GONE  # 当前状态，默认为离开状态
-        self.client = Clients()  # LLM客户端，用于智能决策
+        self.satisfaction = 1  # 最近一次计算的座位满意度
+        self._clock = 7*3600  # 当前时间，从7:00:00开始（距1900-01-01零点的秒数）
+        self._step = 15*60  # 时间更新步长（秒），与座位时间同步
         self.schedule = []  # 学生日程表，由LLM生成
         self.generate_schedule(schedule)  # 初始化时生成日程表
-        self.current_time = datetime(1900,1,1,7,0,0)  # 当前时间，从7:00:00开始
-        self.time_delta = timedelta(minutes=15)  # 时间更新步长，与座位时间同步
-        self.know_library_limit_reverse_time(timedelta(hours=1))  # 了解图书馆占座时间限制
-        print(student_id,student_para,self.schedule,sep="\n")
-    
-    def _initialize_seat_preference(self,lamp:float,socket:float,space:float):
+        self.know_library_limit_reverse_time(_DEFAULT_LIMIT)  # 了解图书馆占座时间限制
+        if events.log.enabled(events.Level.DEBUG):  # schedule每次访问都会重新生成，只在需要时输出
+            events.log.debug(student_id,student_para,self.schedule,sep="\n")
+
+    @property
+    def client(self):
+        """进程内共享的LLM客户端，用于智能决策"""
+        return get_shared_client()
+
+    @property
+    def student_para(self) -> dict:
+        """学生基本属性（与同原型的学生共享，只读）"""
+        return _archetype_table[self._archetype][0]
+
+    @property
+    def seat_preference(self) -> dict:
+        """座位偏好（与同原型的学生共享，只读）"""
+        return _archetype_table[self._archetype][1]
+
+    @property
+    def current_time(self) -> datetime:
+        """当前时间"""
+        return _DAY_START + timedelta(seconds=self._clock)
+
+    @current_time.setter
+    def current_time(self, value: datetime):
+        self._clock = int((value - _DAY_START).total_seconds())
+
+    @property
+    def time_delta(self) -> timedelta:
+        """时间更新步长"""
+        return timedelta(seconds=self._step)
+
+    @time_delta.setter
+    def time_delta(self, value: timedelta):
+        self._step = int(value.total_seconds())
+
+    @property
+    def schedule(self) -> list[dict]:
+        """
+        学生日程表，按时间排序的 [{"time":"HH:MM:SS","action":...}] 列表
+        每次访问都会从紧凑表示重新生成
+        """
+        if self._times is None:
+            return list(self._actions)  # 格式错误的日程原样保存
+        return [{"time": f"{t//3600:02d}:{t%3600//60:02d}:{t%60:02d}", "action": ACTIONS[code]}
+                for t, code in zip(self._times, self._actions)]
+
+    @schedule.setter
+    def schedule(self, schedule: list[dict]):
+        try:
+            # 转换每个日程项的时间为秒数，并按时间正序排列（解决AI生成的无序问题，排序稳定）
+            items = sorted(((_parse_schedule_second(item["time"]), _action_code(item["action"]))
+                            for item in schedule), key=lambda x: x[0])
+        except (KeyError, TypeError) as e:
+            # 处理日程格式错误（如缺少time字段），查询动作时使用默认动作
+            events.log.warning(f"日程格式错误: {e}，使用默认动作")
+            self._times = None
+            self._actions = tuple(schedule)
+            return
+        self._times = array('I', [t for t, _ in items])
+        self._actions = bytes(code for _, code in items)
+
+    @staticmethod
+    def _initialize_seat_preference(lamp:float,socket:float,space:float) -> dict:
         """
         初始化座位偏好参数
 
@@ -68,14 +246,18 @@ class Student:
             lamp (float): 对台灯的偏好程度（0.0-1.0）
             socket (float): 对插座的偏好程度（0.0-1.0）
             space (float): 对空间充裕的偏好程度（0.0-1.0）
+
+        Returns:
+            dict: 座位偏好
         """
-        self.seat_preference = {
+        return {
             "lamp": lamp,      # 对台灯的偏好
             "socket": socket,    # 对插座的偏好
             "space": space      # 对空间充裕的偏好
         }
 
-    def _initialize_student_para(self,character="守序", schedule_type="正常", focus_type="中", course_situation="中"):
+    @staticmethod
+    def _initialize_student_para(character="守序", schedule_type="正常", focus_type="中", course_situation="中") -> dict:
         """
         初始化学生基本属性参数
 
@@ -84,32 +266,39 @@ class Student:
             schedule_type (str): 作息类型（早鸟/正常/夜猫子）
             focus_type (str): 专注程度（高/中/低）
             course_situation (str): 课程情况（多/中/少）
+
+        Returns:
+            dict: 学生基本属性
         """
-        self.student_para = {"character":character,
-                             "schedule_type":schedule_type,
-                             "focus_type":focus_type,
-                             "course_situation":course_situation}
+        return {"character":character,
+                "schedule_type":schedule_type,
+                "focus_type":focus_type,
+                "course_situation":course_situation}
 
-    def generate_schedule(self,schedule = None):
+    def generate_schedule(self,schedule = None, day_type="weekday"):
         """
         使用LLM生成学生日程表
         根据学生的个人属性生成一天的学习、生活安排
         日程表包含时间点和对应的行为动作
+
+        Args:
+            schedule (list[dict]): 给定的日程，提供时不调用LLM
+            day_type (str): 日期类型（weekday/weekend），见prompt.day_type_notes
         """
         if schedule:
             self.schedule = schedule
             return  # 如果提供了日程，则直接返回，不调用LLM
 
-        from .prompt import schedule_prompt
+        from .prompt import schedule_prompt, day_type_notes
         try:
             formatted_prompt = schedule_prompt.format(
                 schedule_type=self.student_para["schedule_type"],
                 focus_type=self.student_para["focus_type"],
                 course_situation=self.student_para["course_situation"]
-            )
+            ) + day_type_notes[day_type]
         except KeyError as e:
-            print(f"格式化提示词时出错: {e}")
-            print(f"student_para内容: {self.student_para}")
+            events.log.warning(f"格式化提示词时出错: {e}")
+            events.log.warning(f"student_para内容: {self.student_para}")
             # 使用默认日程避免程序崩溃
             self.schedule = [
                 {"time": "08:00:00", "action": "start"},
@@ -123,22 +312,23 @@ class Student:
             ]
             return
 
-        response = self.client.response(formatted_prompt, max_retries=3)
-        if isinstance(response, list):
-            self.schedule = response
-        else:
-            # 如果LLM响应格式不正确，使用默认日程
-            self.schedule = [
-                {"time": "08:00:00", "action": "start"},
-                {"time": "08:00:00", "action": "eat"},
-                {"time": "09:00:00", "action": "learn"},
-                {"time": "12:00:00", "action": "eat"},
-                {"time": "13:00:00", "action": "learn"},
-                {"time": "17:00:00", "action": "eat"},
-                {"time": "18:00:00", "action": "learn"},
-                {"time": "22:00:00", "action": "end"}
-            ]
-            print("LLM回答格式错误！")
+        # 同一提示词的学生共用一批候选日程，候选已在本地规整；全部无法修复时才重新请求
+        schedule = schedule_provider.get(formatted_prompt, self.client, key=self.student_id)
+        if schedule is not None:
+            self.schedule = schedule
+            return
+        # 如果LLM响应格式不正确或无法修复，使用默认日程
+        self.schedule = [
+            {"time": "08:00:00", "action": "start"},
+            {"time": "08:00:00", "action": "eat"},
+            {"time": "09:00:00", "action": "learn"},
+            {"time": "12:00:00", "action": "eat"},
+            {"time": "13:00:00", "action": "learn"},
+            {"time": "17:00:00", "action": "eat"},
+            {"time": "18:00:00", "action": "learn"},
+            {"time": "22:00:00", "action": "end"}
+        ]
+        events.log.warning("LLM回答格式错误！")
 
     def know_library_limit_reverse_time(self,limit_reverse_time:timedelta):
         """
@@ -152,59 +342,32 @@ class Student:
     def get_current_action(self):
         """
         根据当前时间获取应该执行的动作
-        遍历日程表找到当前时间对应的行为动作
+        在按时间排序的日程中二分查找当前时间对应的行为动作
 
         Returns:
             str: 当前时间对应的行为动作（start, learn, eat, course, rest, end等）
         """
-        if not self.schedule:
+        return self._action_at(self._clock)
+
+    def get_next_action(self):
+        """
+        获取下一个时间步应该执行的动作，用于预测学生在下一个tick是否离座
+
+        Returns:
+            str: 下一个时间步对应的行为动作
+        """
+        return self._action_at(self._clock + self._step)
+
+    def _action_at(self, clock: int) -> str:
+        """查找时间不晚于clock（秒）的最后一项日程动作"""
+        if not self._actions:
             return "end"  # 无日程直接返回结束
-        
-        # 1. 处理日程表：转换时间格式并按时间排序（解决AI生成的无序问题）
-        try:
-            # 转换每个日程项的时间为datetime对象，便于排序和比较
-            scheduled_items = []
-            for item in self.schedule:
-                time_str = item["time"]
-                # 特殊处理 "00:00:00"，将其视为23:59:00（即一天的结束）
-                if time_str == "00:00:00":
-                    time_obj = datetime.strptime("23:59:00", "%H:%M:%S")
-                else:
-                    try:
-                        time_obj = datetime.strptime(time_str, "%H:%M:%S")
-                        # 检查时间是否超出合理范围（23:59:59），如果超出则限制在有效范围内
-                        if time_obj.time() > datetime.strptime("23:59:00", "%H:%M:%S").time():
-                            time_obj = datetime.strptime("23:59:00", "%H:%M:%S")
-                    except ValueError:
-                        # 如果时间格式不正确，使用默认值
-                        time_obj = datetime.strptime("23:59:00", "%H:%M:%S")
-                        
-                scheduled_items.append({
-                    "time_obj": time_obj,
-                    "action": item["action"]
-                })
-            
-            # 按时间正序排列（从早到晚）
-            scheduled_items.sort(key=lambda x: x["time_obj"])
-            
-            # 2. 查找当前时间对应的最近动作
-            latest_action = None
-            for item in scheduled_items:
-                if item["time_obj"] <= self.current_time:
-                    latest_action = item["action"]  # 不断更新为最近的过去动作
-                else:
-                    break  # 因为已排序，后续时间更大，可提前退出
-            
-            # 3. 处理所有时间都在当前时间之后的情况
-            if latest_action is None:
-                return scheduled_items[0]["action"]  # 返回最早的动作
-            
-            return latest_action
-        
-        except (KeyError, ValueError) as e:
-            # 处理日程格式错误（如缺少time字段、时间格式错误）
-            print(f"日程格式错误: {e}，使用默认动作")
-            return "start" if self.schedule else "end"
+        if self._times is None:
+            return "start"  # 日程格式错误时使用默认动作
+        index = bisect_right(self._times, clock)
+        if index == 0:
+            return ACTIONS[self._actions[0]]  # 所有时间都在当前时间之后，返回最早的动作
+        return ACTIONS[self._actions[index - 1]]
 
     def calculate_seat_satisfaction(self,seat=None):
         """
@@ -234,60 +397,83 @@ class Student:
             self.satisfaction += 3*(1-seat.crowded_para)*self.seat_preference["space"]
         return self.satisfaction
 
-    def _should_reverse_seat(self) -> bool: 
+    def _should_reverse_seat(self, prefetcher=None) -> bool:
         """
         使用LLM判断离开时是否占座
         根据当前满意度、个人性格、图书馆规则等因素智能决策
 
+        Args:
+            prefetcher (LeavePrefetcher): 离座决策预取器，提示词与预取时一致则直接使用预取结果
+
         Returns:
             bool: True表示占座离开，False表示完全离开
         """
         if self.seat is None:
             return False  # 没有座位时不需要判断占座
 
+        prompt = self.leave_prompt()
+        if prompt is None:
+            # 使用默认逻辑避免程序崩溃
+            return self._default_reverse_logic()
+        prefix, formatted_prompt = prompt
+
+        response = prefetcher.take(self.student_id, prompt) if prefetcher is not None else None
+        if response is None:  # 没有可用的预取结果时同步请求
+            response = self.client.response(formatted_prompt, max_retries=3, prefix=prefix, kind="leave")
+
+        action = response.get("action") if isinstance(response, dict) else None
+        if action in ("reverse", "leave"):
+            return action == "reverse"  # reverse表示占座
+        # LLM响应格式不正确、重试耗尽或端点熔断时，使用更智能的默认逻辑
+        return self._default_reverse_logic()
+
+    def leave_prompt(self, at: datetime = None) -> tuple[str, str] | None:
+        """
+        构建离座决策提示词
+        静态说明为固定前缀，学生数据和紧凑编码的日程为后缀
+
+        Args:
+            at (datetime): 决策时刻，默认为学生当前时间；预取时传入下一个时间步
+
+        Returns:
+            tuple[str, str] | None: (固定前缀, 变化后缀)，格式化失败时返回None
+        """
         # 获取座位相关因素
         self.calculate_seat_satisfaction()  # 计算当前座位满意度
-        time_to_limit = self._get_time_to_limit()  # 获取到占座时间限制的时间
+        now = at or self.current_time
+        time_to_limit = self._get_time_to_limit(now)  # 获取到占座时间限制的时间
 
-        # 构建更全面的提示，包括时间因素
-        from .prompt import leave_prompt
+        from .prompt import build_leave_prompt, format_schedule_compact
         try:
-            formatted_prompt = leave_prompt.format(
+            return build_leave_prompt(
                 character=self.student_para["character"],
                 satisfaction=self.satisfaction,
-                time=str(self.current_time.time()),
+                time=now.strftime('%H:%M'),
                 limit_time=str(self.limit_reverse_time),
-                schedule=self.schedule,
                 time_to_limit=time_to_limit,
+                schedule=format_schedule_compact(self.schedule),
                 library_capacity=self.library_capacity,
                 total_students=self.total_students
             )
         except KeyError as e:
-            print(f"格式化占座提示词时出错: {e}")
-            print(f"student_para内容: {self.student_para}")
-            print(f"schedule内容: {self.schedule}")
-            # 使用默认逻辑避免程序崩溃
-            return self._default_reverse_logic()
-            
-        response = self.client.response(formatted_prompt, max_retries=3)
-
-        if isinstance(response, dict) and "action" in response:
-            action = response["action"]
-            return action == "reverse"  # reverse表示占座
-        else:
-            # 如果LLM响应格式不正确，使用更智能的默认逻辑
-            return self._default_reverse_logic()
+            events.log.warning(f"格式化占座提示词时出错: {e}")
+            events.log.warning(f"student_para内容: {self.student_para}")
+            events.log.warning(f"schedule内容: {self.schedule}")
+            return None
 
-    def _get_time_to_limit(self) -> str:
+    def _get_time_to_limit(self, now: datetime = None) -> str:
         """
         获取到占座时间限制的时间描述
 
+        Args:
+            now (datetime): 计算时刻，默认为学生当前时间
+
         Returns:
             str: 时间描述字符串
         """
         # 计算当前座位占用时间
         if hasattr(self.seat, 'taken_time') and self.seat.taken_time: # type: ignore
-            current_occupy_duration = self.current_time - self.seat.taken_time # type: ignore
+            current_occupy_duration = (now or self.current_time) - self.seat.taken_time # type: ignore
             remaining_time = self.limit_reverse_time - current_occupy_duration
             if remaining_time.total_seconds() > 0:
                 return f"剩余 {remaining_time} 时间限制"
@@ -348,25 +534,38 @@ class Student:
                                         评分，选
                                         '''
 
-    def leave_seat(self):
+    def leave_seat(self, prefetcher=None):
         """
         离开座位
         根据智能决策决定是完全离开还是占座离开
+
+        Args:
+            prefetcher (LeavePrefetcher): 离座决策预取器，为None时同步请求
         """
         if self.state == StudentState.LEARNING:  # 只有学习状态下才可离开
-            boolean = self._should_reverse_seat()  # 智能决策是否占座
+            boolean = self._should_reverse_seat(prefetcher)  # 智能决策是否占座
             self.seat.leave(boolean)  # type: ignore # 通知座位离开  
             if boolean:  # 根据决策更新学生状态
                 self.state = StudentState.AWAY  # 占座离开，状态为暂时离开
             else:
                 self.state = StudentState.GONE  # 完全离开，状态为完全离开
 
+    def start_day(self):
+        """
+        开始新的一天（多日模拟）
+        时钟回到07:00，不持有座位，状态与新建学生相同
+        """
+        self.seat = None
+        self.state = StudentState.GONE
+        self.satisfaction = 1
+        self._clock = 7*3600
+
     def update(self):
         """
         更新学生时间
         每次系统时间步进时调用，保持学生时间与系统同步
         """
-        self.current_time += self.time_delta
+        self._clock += self._step
 
     def choose_seat(self,seats:list[Seat]):
         """
@@ -380,21 +579,21 @@ class Student:
             bool: 是否成功选择到座位
         """
         if self.state == StudentState.LEARNING:
-            print("Student输出choose_seat:",True)
+            events.log.debug("Student输出choose_seat:",True)
             return True  # 已在学习状态，无需选择
         elif self.state == StudentState.AWAY:
             # 暂时离开状态，先尝试回到原座位
             if self._try_return_to_original_seat():
-                print("Student输出choose_seat:",True)
+                events.log.debug("Student输出choose_seat:",True)
                 return True
             else:
                 # 如果无法回到原座位，则选择新座位
-                print("Student输出choose_seat:?")
+                events.log.debug("Student输出choose_seat:?")
                 return self._choose_new_seat(seats)
         elif self.state == StudentState.GONE:
             # 完全离开状态，选择新座位
             return self._choose_new_seat(seats)
-        print("Student输出choose_seat:",False)
+        events.log.debug("Student输出choose_seat:",False)
         return False
 
     def _try_return_to_original_seat(self) -> bool:
@@ -405,16 +604,16 @@ class Student:
             bool: 是否成功回到原始座位
         """
         if not self.seat or (self.seat.status != Status.reverse and self.seat.status != Status.signed):
-            print(False)
+            events.log.debug(False)
             return False  # 没有原始座位或原始座位状态不允许返回
 
         # 尝试回到原始座位
         self.seat.back()  # type: ignore # 回到原始座位
         if self.seat.status in [Status.taken, Status.reverse]:  # 如果成功回到座位
             self.state = StudentState.LEARNING
-            print(True)
+            events.log.debug(True)
             return True
-        print(False)
+        events.log.debug(False)
         return False
 
     def _choose_new_seat(self, seats: list[Seat]) -> bool:
@@ -430,7 +629,7 @@ class Student:
         # 过滤出真正空闲的座位
         available_seats = [seat for seat in seats if seat.status == Status.vacant]
         if not available_seats:
-            print(False,"没有可用座位")
+            events.log.debug(False,"没有可用座位")
             return False  # 没有可用座位
 
         # 根据学生偏好和座位满意度选择最佳座位
@@ -485,147 +684,65 @@ class Student:
             return True
         return False  # 没有找到合适的座位
 
-    # 以下为工厂方法，用于创建不同类型的学生
+    # 以下为工厂方法，用于创建不同类型的学生，参数见ARCHETYPES
+    @classmethod
+    def from_archetype(cls, archetype: str, student_id, library_capacity=None, total_students=None):
+        """
+        按原型名称创建学生
+
+        Args:
+            archetype (str): ARCHETYPES中的原型名称，如"science_diligent"
+            student_id: 学生唯一标识符
+            library_capacity: 图书馆最大容量
+            total_students: 总学生数
+
+        Returns:
+            Student: 新建的学生
+        """
+        student_para, seat_preference = ARCHETYPES[archetype]
+        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
+
     @classmethod
     def create_humanities_diligent_student(cls, student_id, library_capacity=None, total_students=None):
         """创建勤奋的文科生"""
-        student_para = {
-            "character": "守序",  # 性格守序，遵守规则
-            "schedule_type": "正常",  # 正常作息
-            "focus_type": "高",  # 专注度高
-            "course_situation": "多"  # 课程多
-        }
-        seat_preference = {
-            "lamp": 0.7,      # 文科生喜欢光线好的环境阅读
-            "socket": 0.4,    # 对插座需求一般
-            "space": 0.6      # 需要安静宽松的环境
-        }
-        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
-    
+        return cls.from_archetype("humanities_diligent", student_id, library_capacity=library_capacity, total_students=total_students)
+
     @classmethod
     def create_humanities_medium_student(cls, student_id, library_capacity=None, total_students=None):
         """创建中等程度的文科生"""
-        student_para = {
-            "character": "守序",  # 性格守序
-            "schedule_type": "正常",  # 正常作息
-            "focus_type": "中",  # 专注度中等
-            "course_situation": "中"  # 课程中等
-        }
-        seat_preference = {
-            "lamp": 0.5,  # 中等对台灯需求
-            "socket": 0.5,  # 中等对插座需求
-            "space": 0.5   # 中等对空间需求
-        }
-        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
-    
+        return cls.from_archetype("humanities_medium", student_id, library_capacity=library_capacity, total_students=total_students)
+
     @classmethod
     def create_humanities_lazy_student(cls, student_id, library_capacity=None, total_students=None):
         """创建懒惰的文科生"""
-        student_para = {
-            "character": "利己",  # 性格利己
-            "schedule_type": "晚",  # 晚间作息
-            "focus_type": "低",  # 专注度低
-            "course_situation": "少"  # 课程少
-        }
-        seat_preference = {
-            "lamp": 0.3,      # 对光线要求不高
-            "socket": 0.6,    # 可能需要给设备充电
-            "space": 0.4      # 对环境要求不高
-        }
-        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
-    
+        return cls.from_archetype("humanities_lazy", student_id, library_capacity=library_capacity, total_students=total_students)
+
     @classmethod
     def create_science_diligent_student(cls, student_id, library_capacity=None, total_students=None):
         """创建勤奋的理科生"""
-        student_para = {
-            "character": "守序",  # 性格守序
-            "schedule_type": "早",  # 早起作息
-            "focus_type": "高",  # 专注度高
-            "course_situation": "多"  # 课程多
-        }
-        seat_preference = {
-            "lamp": 0.8,      # 理科生需要好的光线来计算和阅读图表
-            "socket": 0.7,    # 需要给计算器或笔记本供电
-            "space": 0.5      # 需要足够的桌面空间
-        }
-        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
-    
+        return cls.from_archetype("science_diligent", student_id, library_capacity=library_capacity, total_students=total_students)
+
     @classmethod
     def create_science_medium_student(cls, student_id, library_capacity=None, total_students=None):
         """创建中等程度的理科生"""
-        student_para = {
-            "character": "守序",  # 性格守序
-            "schedule_type": "正常",  # 正常作息
-            "focus_type": "中",  # 专注度中等
-            "course_situation": "中"  # 课程中等
-        }
-        seat_preference = {
-            "lamp": 0.6,  # 中等对台灯需求
-            "socket": 0.6,  # 中等对插座需求
-            "space": 0.5   # 中等对空间需求
-        }
-        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
-    
+        return cls.from_archetype("science_medium", student_id, library_capacity=library_capacity, total_students=total_students)
+
     @classmethod
     def create_science_lazy_student(cls, student_id, library_capacity=None, total_students=None):
         """创建懒惰的理科生"""
-        student_para = {
-            "character": "利己",  # 性格利己
-            "schedule_type": "晚",  # 晚间作息
-            "focus_type": "低",  # 专注度低
-            "course_situation": "少"  # 课程少
-        }
-        seat_preference = {
-            "lamp": 0.4,  # 中等对台灯需求
-            "socket": 0.7,    # 可能需要设备充电
-            "space": 0.3      # 对空间要求不高
-        }
-        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
-    
+        return cls.from_archetype("science_lazy", student_id, library_capacity=library_capacity, total_students=total_students)
+
     @classmethod
     def create_engineering_diligent_student(cls, student_id, library_capacity=None, total_students=None):
         """创建勤奋的工科生"""
-        student_para = {
-            "character": "守序",  # 性格守序
-            "schedule_type": "早",  # 早起作息
-            "focus_type": "高",  # 专注度高
-            "course_situation": "多"  # 课程多
-        }
-        seat_preference = {
-            "lamp": 0.9,      # 工科生需要极好的光线进行复杂设计和编程
-            "socket": 0.9,    # 需要给电脑、设备供电
-            "space": 0.7      # 需要大量桌面空间进行设计和计算
-        }
-        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
-    
+        return cls.from_archetype("engineering_diligent", student_id, library_capacity=library_capacity, total_students=total_students)
+
     @classmethod
     def create_engineering_medium_student(cls, student_id, library_capacity=None, total_students=None):
         """创建中等程度的工科生"""
-        student_para = {
-            "character": "守序",  # 性格守序
-            "schedule_type": "正常",  # 正常作息
-            "focus_type": "中",  # 专注度中等
-            "course_situation": "中"  # 课程中等
-        }
-        seat_preference = {
-            "lamp": 0.7,  # 较高对台灯需求
-            "socket": 0.7,  # 较高对插座需求
-            "space": 0.6   # 较高对空间需求
-        }
-        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
-    
+        return cls.from_archetype("engineering_medium", student_id, library_capacity=library_capacity, total_students=total_students)
+
     @classmethod
     def create_engineering_lazy_student(cls, student_id, library_capacity=None, total_students=None):
         """创建懒惰的工科生"""
-        student_para = {
-            "character": "利己",  # 性格利己
-            "schedule_type": "晚",  # 晚间作息
-            "focus_type": "低",  # 专注度低
-            "course_situation": "少"  # 课程少
-        }
-        seat_preference = {
-            "lamp": 0.5,  # 中等对台灯需求
-            "socket": 0.8,    # 仍需给设备充电
-            "space": 0.4      # 对空间要求不高
-        }
-        return cls(student_id, student_para, seat_preference, library_capacity=library_capacity, total_students=total_students)
\ No newline at end of file
+        return cls.from_archetype("engineering_lazy", student_id, library_capacity=library_capacity, total_students=total_students)
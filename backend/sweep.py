@@ -0,0 +1,132 @@
+"""
+sweep.py
+按方差自适应分配重复次数的参数扫描
+固定repeat_count时，方差很小的参数点和噪声很大的参数点得到同样多的模拟。
+AdaptiveReplicas先为每个参数点运行min_replicas次，估计关键指标的标准误，
+只为标准误仍高于容差的参数点追加重复，并报告每个参数点实际达到的精度
+"""
+import math
+from statistics import fmean, stdev
+from typing import Callable, Dict, Iterable, List
+
+from . import events
+from .data_analysis import analyze_seat_occupancy_rate, get_final_unsatisfied_and_cleared
+
+# 关键指标: 名称 -> 由模拟数据计算指标的函数
+KEY_METRICS: Dict[str, Callable[[List[Dict]], float]] = {
+    "final_unsatisfied": lambda data: get_final_unsatisfied_and_cleared(data)[0],
+    "final_cleared": lambda data: get_final_unsatisfied_and_cleared(data)[1],
+    "occupancy_rate": analyze_seat_occupancy_rate,
+}
+
+# 各指标标准误的默认容差：人数类指标为1人，占用指标为0.02
+DEFAULT_TOLERANCE = {"final_unsatisfied": 1.0, "final_cleared": 1.0, "occupancy_rate": 0.02}
+
+
+def standard_error(values: List[float]) -> float:
+    """均值的标准误，少于两个值时为无穷大"""
+    if len(values) < 2:
+        return math.inf
+    return stdev(values) / math.sqrt(len(values))
+
+
+class AdaptiveReplicas:
+    """
+    序贯分配重复次数
+    每一轮只为仍有指标的标准误高于容差、且未达到max_replicas的参数点各追加一次重复，
+    所有参数点达到容差或重复次数上限时结束
+    """
+
+    def __init__(self, run: Callable[[int], List[Dict]], tolerance: Dict[str, float] = None,
+                 min_replicas: int = 3, max_replicas: int = 10) -> None:
+        """
+        Args:
+            run (callable): 参数点（学生数） -> 一次模拟的数据（第一项为头部信息）
+            tolerance (dict): 指标名称 -> 标准误容差，默认为DEFAULT_TOLERANCE；只统计其中的指标
+            min_replicas (int): 每个参数点的最少重复次数
+            max_replicas (int): 每个参数点的最多重复次数
+
+        Raises:
+            KeyError: tolerance中有未知的指标
+            ValueError: tolerance为空或容差不为正数
+        """
+        tolerance = DEFAULT_TOLERANCE if tolerance is None else tolerance
+        unknown = set(tolerance) - set(KEY_METRICS)
+        if unknown:
+            raise KeyError(f"未知的指标: {sorted(unknown)}，可选 {sorted(KEY_METRICS)}")
+        if not tolerance:
+            raise ValueError(f"容差至少包含一个指标，可选 {sorted(KEY_METRICS)}")
+        invalid = {name: limit for name, limit in tolerance.items() if not limit > 0}
+        if invalid:
+            raise ValueError(f"容差必须为正数: {invalid}")
+        self.run = run
+        self.tolerance = dict(tolerance)
+        self.min_replicas = max(2, min_replicas)
+        self.max_replicas = max(self.min_replicas, max_replicas)
+        self.samples: Dict[int, Dict[str, List[float]]] = {}  # 参数点 -> 指标名称 -> 各次重复的值
+        self.counts: Dict[int, int] = {}  # 参数点 -> 已运行的重复次数
+
+    def _sample(self, point: int) -> None:
+        """运行一次模拟并记录各指标"""
+        data = self.run(point)
+        self.counts[point] = self.counts.get(point, 0) + 1
+        values = self.samples.setdefault(point, {name: [] for name in self.tolerance})
+        for name, series in values.items():
+            series.append(float(KEY_METRICS[name](data)))
+
+    def replicas(self, point: int) -> int:
+        """参数点已运行的重复次数"""
+        return self.counts.get(point, 0)
+
+    def converged(self, point: int) -> bool:
+        """参数点的所有指标的标准误是否都不高于容差"""
+        values = self.samples.get(point, {})
+        return bool(values) and all(standard_error(values[name]) <= limit for name, limit in self.tolerance.items())
+
+    def sweep(self, points: Iterable[int]) -> Dict[int, Dict]:
+        """
+        对一组参数点运行扫描
+
+        Args:
+            points: 参数点（学生数）
+
+        Returns:
+            dict: 参数点 -> precision()的结果
+        """
+        points = list(points)
+        for point in points:
+            while self.replicas(point) < self.min_replicas:
+                self._sample(point)
+        while True:
+            pending = [point for point in points
+                       if not self.converged(point) and self.replicas(point) < self.max_replicas]
+            if not pending:
+                break
+            for point in pending:
+                self._sample(point)
+        report = {point: self.precision(point) for point in points}
+        for point, item in report.items():
+            if not item["converged"]:
+                events.log.warning(f"参数点{point}在{item['replicas']}次重复后仍未达到容差: "
+                                   + ", ".join(f"{name} 标准误 {metric['std_error']:.3f}"
+                                               for name, metric in item["metrics"].items()))
+        return report
+
+    def precision(self, point: int) -> Dict:
+        """
+        参数点实际达到的精度
+
+        Args:
+            point (int): 参数点
+
+        Returns:
+            dict: replicas为重复次数，converged为是否达到容差，metrics为各指标的均值、标准误和容差
+        """
+        values = self.samples.get(point, {})
+        return {
+            "replicas": self.replicas(point),
+            "converged": self.converged(point),
+            "metrics": {name: {"mean": fmean(series), "std_error": standard_error(series),
+                               "tolerance": self.tolerance[name]}
+                        for name, series in values.items()},
+        }
@@ -0,0 +1,28 @@
+"""
+helpers.py
+测试共用的辅助工具
+"""
+import tempfile
+from contextlib import contextmanager, nullcontext
+from unittest.mock import patch
+
+from backend.test.stubs import StubClients
+
+
+@contextmanager
+def simulation_sandbox(clients=StubClients, quiet=True):
+    """
+    在临时目录中运行模拟：学生使用clients代替真实的LLM客户端，模拟数据写入临时目录，退出时删除
+
+    Args:
+        clients: 替换backend.students.get_shared_client的客户端类，见benchmarks.stubs
+        quiet (bool): 是否屏蔽print输出
+
+    Yields:
+        str: 临时目录，即simulations_base_path
+    """
+    with tempfile.TemporaryDirectory() as tmp, \
+            patch('backend.students.get_shared_client', clients), \
+            patch('backend.simulation.simulations_base_path', tmp), \
+            (patch('builtins.print') if quiet else nullcontext()):
+        yield tmp
@@ -0,0 +1,67 @@
+"""
+stubs.py
+测试和基准测试使用的确定性LLM客户端替身
+按提示词内容的哈希选择日程模板和离座决策，同一输入在任何进程中都得到相同输出，
+使基准结果只反映模拟引擎本身的开销
+"""
+import hashlib
+
+# 日程模板，均满足schedule_prompt中的约束（07:00开始、分钟为15的倍数、rest后end）
+SCHEDULE_TEMPLATES = [
+    [{"time": "07:00:00", "action": "start"}, {"time": "07:30:00", "action": "eat"},
+     {"time": "08:00:00", "action": "course"}, {"time": "10:00:00", "action": "learn"},
+     {"time": "12:00:00", "action": "eat"}, {"time": "13:00:00", "action": "learn"},
+     {"time": "17:00:00", "action": "eat"}, {"time": "18:00:00", "action": "learn"},
+     {"time": "21:30:00", "action": "rest"}, {"time": "22:00:00", "action": "end"}],
+    [{"time": "07:00:00", "action": "start"}, {"time": "08:15:00", "action": "eat"},
+     {"time": "09:00:00", "action": "learn"}, {"time": "11:00:00", "action": "course"},
+     {"time": "12:30:00", "action": "eat"}, {"time": "13:30:00", "action": "rest"},
+     {"time": "14:30:00", "action": "learn"}, {"time": "18:00:00", "action": "eat"},
+     {"time": "19:00:00", "action": "learn"}, {"time": "22:45:00", "action": "rest"},
+     {"time": "23:15:00", "action": "end"}],
+    [{"time": "07:00:00", "action": "start"}, {"time": "10:00:00", "action": "eat"},
+     {"time": "10:30:00", "action": "course"}, {"time": "12:00:00", "action": "eat"},
+     {"time": "13:00:00", "action": "course"}, {"time": "15:00:00", "action": "learn"},
+     {"time": "17:30:00", "action": "eat"}, {"time": "18:15:00", "action": "learn"},
+     {"time": "20:00:00", "action": "rest"}, {"time": "20:30:00", "action": "end"}],
+]
+
+
+def _digest(text: str) -> int:
+    """计算与进程无关的稳定哈希（内置hash受PYTHONHASHSEED影响）"""
+    return int.from_bytes(hashlib.md5(text.encode('utf-8')).digest()[:4], 'little')
+
+
+class StubClients:
+    """
+    确定性的Clients替身，接口与backend.agents.Clients的response和sample一致
+    日程请求返回模板之一，离座请求以约三分之一的概率返回reverse
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        self.calls = 0
+
+    def response(self, prompt: str, max_retries: int = 3, **kwargs):
+        self.calls += 1
+        key = _digest(prompt)
+        if "规划学生一天的日程" in prompt:
+            template = SCHEDULE_TEMPLATES[key % len(SCHEDULE_TEMPLATES)]
+            return [dict(item) for item in template]
+        return {"action": "reverse" if key % 3 == 0 else "leave"}
+
+    def sample(self, prompt: str, n: int = 1, max_retries: int = 3, **kwargs) -> list:
+        self.calls += 1
+        key = _digest(prompt)
+        return [[dict(item) for item in SCHEDULE_TEMPLATES[(key + i) % len(SCHEDULE_TEMPLATES)]]
+                for i in range(n)]
+
+
+class RuleLeaveStubClients(StubClients):
+    """
+    离座请求返回无效响应的替身，学生走Student._default_reverse_logic兜底逻辑
+    与EnsembleEngine的离座决策方式相同，用于对比逐对象引擎和锁步引擎
+    """
+    def response(self, prompt: str, max_retries: int = 3, **kwargs):
+        if "规划学生一天的日程" in prompt:
+            return super().response(prompt, max_retries, **kwargs)
+        self.calls += 1
+        return {"action": None}
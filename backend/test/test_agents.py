@@ -0,0 +1,278 @@
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from backend import agents
+from backend.resilience import CircuitBreaker, LatencyHistogram, backoff_delay
+from backend.prompt import build_leave_prompt, format_schedule_compact
+
+
+class TestSharedClient(unittest.TestCase):
+    """测试进程级共享的LLM客户端"""
+
+    def setUp(self):
+        agents.configure_pool()  # 清空已创建的共享客户端
+
+    def tearDown(self):
+        agents.configure_pool()
+
+    @patch('backend.agents.Clients')
+    def test_shared_within_process(self, mock_clients_class):
+        """同一进程内多次获取应返回同一个客户端"""
+        mock_clients_class.side_effect = lambda **options: Mock()
+        first = agents.get_shared_client()
+        second = agents.get_shared_client()
+        self.assertIs(first, second)
+        self.assertEqual(mock_clients_class.call_count, 1)
+
+    @patch('backend.agents.Clients')
+    def test_rebuilt_in_child_process(self, mock_clients_class):
+        """进程号变化（fork出的工作进程）时应重新创建客户端"""
+        mock_clients_class.side_effect = lambda **options: Mock()
+        parent = agents.get_shared_client()
+        with patch('backend.agents.os.getpid', return_value=-1):
+            child = agents.get_shared_client()
+        self.assertIsNot(parent, child)
+
+    @patch('backend.agents.Clients')
+    def test_configure_pool_applies_to_new_client(self, mock_clients_class):
+        """修改连接池配置后，新建的共享客户端应使用新配置"""
+        default = agents.POOL_CONFIG["max_connections"]
+        try:
+            agents.configure_pool(max_connections=3)
+            agents.get_shared_client()
+            self.assertEqual(mock_clients_class.call_args.kwargs["max_connections"], 3)
+        finally:
+            agents.configure_pool(max_connections=default)
+        with self.assertRaises(KeyError):
+            agents.configure_pool(max_conn=3)
+
+
+
+def make_client(replies, structured_output=None):
+    """创建一个跳过连接池、依次返回给定回复文本的Clients"""
+    client = agents.Clients.__new__(agents.Clients)
+    client.model = "mock"
+    client.structured_output = structured_output
+    client._init_resilience(read_timeout=60.0)
+    responses = []
+    for text in replies:
+        reply = Mock(usage=None)
+        reply.choices = [Mock()]
+        reply.choices[0].message.content = text
+        responses.append(reply)
+    client.client = Mock()
+    if len(responses) == 1:
+        client.client.chat.completions.create.return_value = responses[0]
+    else:
+        client.client.chat.completions.create.side_effect = responses
+    return client
+
+
+class TestLeavePrompt(unittest.TestCase):
+    """测试离座决策提示词的紧凑编码和token统计"""
+
+    def test_prefix_stable_and_schedule_compact(self):
+        """不同学生的提示词前缀应完全相同，日程编码为HH:MM 行为"""
+        schedule = [{"time": "07:00:00", "action": "start"}, {"time": "09:00:00", "action": "learn"}]
+        compact = format_schedule_compact(schedule)
+        self.assertEqual(compact, "07:00 start;09:00 learn")
+        prefix_a, suffix_a = build_leave_prompt("守序", 3.25, "12:00", "1:00:00", "未开始计时", compact, 400, 200)
+        prefix_b, suffix_b = build_leave_prompt("利己", 1.0, "18:15", "0:30:00", "已超过时间限制", "", 9, 18)
+        self.assertIs(prefix_a, prefix_b)
+        self.assertIn("满意度:3.2", suffix_a)
+        self.assertTrue(suffix_a.endswith("日程:07:00 start;09:00 learn"))
+
+    def test_response_records_tokens_per_kind(self):
+        """每次调用应按类型记录估算token和服务端用量"""
+        client = make_client(['{"action":"leave"}'])
+        client.client.chat.completions.create.return_value.usage = \
+            Mock(prompt_tokens=120, completion_tokens=6, prompt_tokens_details=Mock(cached_tokens=100))
+
+        before = agents.llm_stats.snapshot()
+        prefix, suffix = build_leave_prompt("守序", 3.0, "12:00", "1:00:00", "未开始计时", "07:00 start", 9, 18)
+        self.assertEqual(client.response(suffix, prefix=prefix, kind="leave"), {"action": "leave"})
+        messages = client.client.chat.completions.create.call_args.kwargs["messages"]
+        self.assertEqual([m["role"] for m in messages], ["system", "user"])
+
+        usage = agents.llm_stats.since(before)["leave"]
+        self.assertEqual(usage["calls"], 1)
+        self.assertGreater(usage["prefix_tokens_est"], 0)
+        self.assertGreater(usage["prompt_tokens_est"], usage["prefix_tokens_est"])
+        self.assertEqual((usage["prompt_tokens"], usage["completion_tokens"], usage["cached_tokens"]), (120, 6, 100))
+
+
+
+class TestResponseSpec(unittest.TestCase):
+    """测试按调用类型的响应规格、本地修复和统计"""
+
+    def setUp(self):
+        self.before = agents.llm_stats.snapshot()
+
+    def stats(self, kind):
+        return agents.llm_stats.since(self.before).get(kind, {})
+
+    def test_leave_budget_without_stop(self):
+        """离座决策应使用小token预算且不设停止序列，完整的回复不计修复，截断的回复在本地补全"""
+        client = make_client(['{"action":"leave"}'])
+        self.assertEqual(client.response("p", kind="leave"), {"action": "leave"})
+        kwargs = client.client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs["max_tokens"], 16)
+        self.assertNotIn("stop", kwargs)
+        self.assertNotIn("response_format", kwargs)
+        self.assertEqual(self.stats("leave")["repairs"], 0)
+
+        truncated = make_client(['{"action":"reverse"'])
+        self.assertEqual(truncated.response("p", kind="leave"), {"action": "reverse"})
+        self.assertEqual(truncated.client.chat.completions.create.call_count, 1)  # 修复成功不消耗重试
+        self.assertEqual(self.stats("leave")["repairs"], 1)
+
+    def test_structured_output_mode(self):
+        """端点支持json_schema时应随请求发送Schema"""
+        client = make_client(['{"action":"leave"}'], structured_output="json_schema")
+        client.response("p", kind="leave")
+        response_format = client.client.chat.completions.create.call_args.kwargs["response_format"]
+        self.assertEqual(response_format["type"], "json_schema")
+        self.assertEqual(response_format["json_schema"]["schema"], agents.LEAVE_SCHEMA)
+
+    def test_schedule_repair_unwraps_and_truncated(self):
+        """包装在对象中或被截断的日程应在本地修复"""
+        wrapped = make_client(['{"schedule":[{"time":"07:00:00","action":"start"}]}'])
+        self.assertEqual(wrapped.response("p", kind="schedule"), [{"time": "07:00:00", "action": "start"}])
+        truncated = make_client(['好的：[{"time":"07:00:00","action":"start"},{"time":"08:00:00","act'])
+        self.assertEqual(truncated.response("p", kind="schedule"), [{"time": "07:00:00", "action": "start"}])
+        self.assertEqual(self.stats("schedule")["repairs"], 2)
+
+    def test_unrecoverable_retries_then_fallback(self):
+        """无法修复的回复才重试，重试耗尽后返回兜底结果并计数"""
+        client = make_client(["我觉得应该离开(leave)也可以占座(reverse)"] * 3)
+        with patch('backend.agents.events.log'):
+            self.assertEqual(client.response("p", max_retries=3, kind="leave"), {"action": None})
+        stats = self.stats("leave")
+        self.assertEqual((stats["retries"], stats["parse_failures"], stats["fallbacks"]), (2, 3, 1))
+
+        schedule_client = make_client(["无法生成"] * 2)
+        with patch('backend.agents.events.log'):
+            self.assertIsNone(schedule_client.response("p", max_retries=2, kind="schedule"))
+
+
+class TestResilience(unittest.TestCase):
+    """测试超时推导、退避和熔断"""
+
+    def setUp(self):
+        self.before = agents.llm_stats.snapshot()
+
+    def test_histogram_quantile(self):
+        """直方图分位数误差应在一个桶的宽度内"""
+        histogram = LatencyHistogram()
+        for i in range(1, 101):
+            histogram.record(i / 100)  # 10ms到1s均匀分布
+        self.assertAlmostEqual(histogram.quantile(0.95), 0.95, delta=0.95 * 0.1)
+        self.assertAlmostEqual(histogram.quantile(0.5), 0.5, delta=0.5 * 0.1)
+
+    def test_timeout_derived_from_latency(self):
+        """样本足够后超时按p99推导，并限制在上下限内"""
+        client = make_client(['{"action":"leave"}'])
+        self.assertEqual(client.request_timeout("leave"), 60.0)
+        for _ in range(agents.RESILIENCE_CONFIG["min_samples"]):
+            client._histogram("leave").record(1.0)
+        self.assertAlmostEqual(client.request_timeout("leave"), 3.0, delta=0.3)
+        client.response("p", kind="leave")
+        self.assertLess(client.client.chat.completions.create.call_args.kwargs["timeout"], 60.0)
+
+    def test_backoff_jitter_bounds(self):
+        """退避时间应在指数上限内随机分布"""
+        delays = [backoff_delay(3, 0.5, 8.0) for _ in range(200)]
+        self.assertTrue(all(0 <= delay <= 2.0 for delay in delays))
+        self.assertLessEqual(max(backoff_delay(10, 0.5, 8.0) for _ in range(50)), 8.0)
+
+    def test_breaker_opens_and_short_circuits(self):
+        """连续失败后熔断，熔断期间不再请求，冷却后放行试探请求"""
+        now = [0.0]
+        client = make_client(['{"action":"leave"}'])
+        client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=lambda: now[0])
+        create = client.client.chat.completions.create
+        create.side_effect = ConnectionError("down")
+        with patch('backend.agents.time.sleep') as sleep, patch('backend.agents.events.log'):
+            self.assertEqual(client.response("p", max_retries=3, kind="leave"), {"action": None})
+            self.assertEqual(create.call_count, 2)  # 第二次失败后熔断，第三次不再请求
+            self.assertEqual(sleep.call_count, 2)
+            client.response("p", kind="leave")
+            self.assertEqual(create.call_count, 2)
+        stats = agents.llm_stats.since(self.before)["leave"]
+        self.assertEqual((stats["errors"], stats["short_circuits"]), (2, 2))
+
+        now[0] = 11.0
+        create.side_effect = None
+        create.return_value.choices[0].message.content = '{"action":"reverse"}'
+        self.assertEqual(client.response("p", kind="leave"), {"action": "reverse"})
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_hedged_request(self):
+        """超过p95仍未返回时发出对冲请求，取先返回的结果"""
+        client = make_client(['{"action":"leave"}'])
+        for _ in range(agents.RESILIENCE_CONFIG["min_samples"]):
+            client._histogram("leave").record(0.01)
+        fast = client.client.chat.completions.create.return_value
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                time.sleep(0.5)  # 第一个请求卡住
+            return fast
+
+        client.client.chat.completions.create.side_effect = create
+        try:
+            agents.configure_resilience(hedge=True)
+            start = time.perf_counter()
+            self.assertEqual(client.response("p", kind="leave"), {"action": "leave"})
+            self.assertLess(time.perf_counter() - start, 0.4)
+        finally:
+            agents.configure_resilience(hedge=False)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(agents.llm_stats.since(self.before)["leave"]["hedges"], 1)
+        with self.assertRaises(KeyError):
+            agents.configure_resilience(hedging=True)
+
+
+class TestCallTelemetry(unittest.TestCase):
+    """测试调用耗时、延迟分位数、正则提取计数和成本汇总"""
+
+    def setUp(self):
+        self.before = agents.llm_stats.snapshot()
+
+    def test_latency_percentiles_and_regex_fallbacks(self):
+        """每次调用的耗时应计入分位数，从代码块中提取的回复计入regex_fallbacks"""
+        client = make_client(['```json\n{"action":"leave"}\n```', '{"action":"leave"}'])
+        self.assertEqual(client.response("p", kind="leave"), {"action": "leave"})
+        self.assertEqual(client.response("p", kind="leave"), {"action": "leave"})
+        usage = agents.llm_stats.since(self.before)["leave"]
+        self.assertEqual(usage["regex_fallbacks"], 1)
+        self.assertEqual(usage["calls"], 2)
+        self.assertGreater(usage["seconds"], 0)
+        latency = usage["latency_ms"]
+        self.assertLessEqual(latency["p50"], latency["p99"])
+        self.assertIsNotNone(latency["mean"])
+
+    def test_cost_and_summary(self):
+        """成本按实际token计价，缓存命中部分按缓存价格；汇总给出各类调用的耗时占比"""
+        usage = {"prompt_tokens": 1_000_000, "cached_tokens": 400_000, "completion_tokens": 100_000,
+                 "prompt_tokens_est": 0}
+        pricing = {"prompt": 2.0, "cached_prompt": 0.5, "completion": 8.0}
+        self.assertAlmostEqual(agents.estimate_cost(usage, pricing), 0.6 * 2 + 0.4 * 0.5 + 0.1 * 8)
+
+        per_kind = dict.fromkeys(agents.CallStats.FIELDS, 0)
+        schedule = dict(per_kind, calls=2, seconds=3.0, cost=0.01)
+        leave = dict(per_kind, calls=8, seconds=1.0, fallbacks=2, cost=0.002)
+        merged = agents.merge_usage([{"schedule": schedule, "leave": leave}, {"leave": leave}])
+        self.assertEqual(merged["leave"]["calls"], 16)
+        summary = agents.summarize_usage(merged, wall_seconds=10.0)
+        self.assertEqual(summary["calls"], 18)
+        self.assertEqual(summary["seconds_share"], {"schedule": 0.6, "leave": 0.4})
+        self.assertEqual(summary["llm_wall_ratio"], 0.5)
+        self.assertAlmostEqual(summary["fallback_rate"], 4 / 18, places=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
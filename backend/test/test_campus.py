@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import patch
+
+from backend.test.stubs import RuleLeaveStubClients
+
+LIBRARIES = [{"name": "main", "row": 4, "column": 5, "num_students": 60, "position": (0, 0)},
+             {"name": "east", "row": 5, "column": 5, "num_students": 10, "position": (300, 0)},
+             {"name": "far", "row": 5, "column": 5, "num_students": 10, "position": (3000, 0)}]
+
+
+class TestRouter(unittest.TestCase):
+    """测试跨馆分流的路由规则"""
+
+    def test_routes_by_preference_distance_and_capacity(self):
+        from backend.campus import Router
+        router = Router({"a": (0, 0), "b": (100, 0), "c": (1000, 0)}, distance_weight=0.005)
+        lamp_lover = {"preference": {"lamp": 1.0, "socket": 0.0, "space": 0.0}}
+        vacancies = {"a": [],
+                     "b": [[False, False, False, 1, 0.0]],  # 满意度1，距离成本0.5
+                     "c": [[True, False, False, 1, 0.0]]}   # 满意度4，距离成本5
+        inbox, routes = router.route({"a": [lamp_lover, lamp_lover, lamp_lover]}, vacancies)
+        # 近处的普通座位优于远处的台灯座位；空位用完后去远处，全校没有空位时留在原馆
+        self.assertEqual(routes, [("a", "b", 100.0), ("a", "c", 1000.0), ("a", None, 0.0)])
+        self.assertEqual([len(inbox[name]) for name in "abc"], [1, 1, 1])
+
+        inbox, routes = Router({"a": (0, 0), "c": (1000, 0)}, max_distance=500).route(
+            {"a": [lamp_lover]}, {"a": [], "c": [[True, False, False, 1, 0.0]]})
+        self.assertEqual(routes, [("a", None, 0.0)])
+
+    def test_library_specs(self):
+        from backend.campus import library_specs
+        specs = library_specs([{"num_students": 5}, {"name": "b", "num_students": 7}])
+        self.assertEqual([spec["name"] for spec in specs], ["library-0", "b"])
+        self.assertEqual([spec["id_base"] for spec in specs], [0, 5])
+        with self.assertRaises(KeyError):
+            library_specs([{"seats": 10}])
+        with self.assertRaises(ValueError):
+            library_specs([{"name": "a"}, {"name": "a"}])
+
+    def test_sleeping_students_are_not_routed(self):
+        """选座失败时只收集醒着的学生，休眠的学生不分流"""
+        from backend.library import Library
+        from backend.students import Student, StudentState
+        para = {"character": "守序", "schedule_type": "正常", "focus_type": "中", "course_situation": "中"}
+        schedule = [{"time": "07:00:00", "action": "learn"}, {"time": "22:00:00", "action": "end"}]
+        library = Library()
+        library.overflow = []  # 没有座位，所有学生都选座失败
+        library.students = [Student(i, para, {"lamp": 0.0, "socket": 0.0, "space": 0.0}, schedule=list(schedule))
+                            for i in range(2)]
+        library.students[0].state = StudentState.SLEEP
+        with patch('backend.students.get_shared_client', RuleLeaveStubClients):
+            for student in library.students:
+                library.next_step_of_each_student(student)
+        self.assertEqual([student.student_id for student in library.overflow], [1])
+
+
+class TestCampus(unittest.TestCase):
+    """测试校园多图书馆模拟"""
+
+    def _run(self, workers):
+        from backend.campus import Campus
+        from backend.events import Level
+        with patch('backend.students.get_shared_client', RuleLeaveStubClients):
+            campus = Campus(LIBRARIES, workers=workers, seed=3, log_level=Level.SILENT)
+            return campus, campus.run()
+
+    def test_overflow_is_routed_and_students_are_conserved(self):
+        campus, result = self._run(workers=0)
+        summary, libraries = result["campus"], result["libraries"]
+        self.assertEqual(result["ticks"][-1]["time"], "00:00")
+        self.assertEqual(summary["seats"], 70)
+        # 主馆过载，学生被分流到其他图书馆
+        self.assertGreater(libraries["main"]["departed"], 0)
+        self.assertEqual(summary["routed"], sum(item["arrived"] for item in libraries.values()))
+        self.assertEqual(summary["routed"], sum(item["departed"] for item in libraries.values()))
+        waiting = sum(len(students) for students in campus.inbox.values())
+        self.assertEqual(sum(item["students_at_close"] for item in libraries.values()) + waiting, 80)
+        for record in result["ticks"]:
+            self.assertEqual(record["taken"], sum(item["taken"] for item in record["libraries"].values()))
+
+    def test_worker_processes(self):
+        """多进程运行的结果格式与主进程一致，学生总数守恒"""
+        campus, result = self._run(workers=2)
+        self.assertEqual(set(result["libraries"]), {"main", "east", "far"})
+        self.assertEqual(len(result["ticks"]), 68)
+        waiting = sum(len(students) for students in campus.inbox.values())
+        self.assertEqual(sum(item["students_at_close"] for item in result["libraries"].values()) + waiting, 80)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import random
+import unittest
+
+from backend.capacity import CapacitySearch, mean_interval, t_critical
+from backend.test.helpers import simulation_sandbox
+from backend.test.stubs import StubClients
+
+
+def fake_run(capacity, noise, seed=0):
+    """最终不满意数在容量以上按学生数线性增长、带随机噪声的模拟替身"""
+    rng = random.Random(seed)
+
+    def run(num_students):
+        unsatisfied = max(0, num_students - capacity) * 2 + rng.uniform(-noise, noise)
+        return [{"test_scale": f"3*3->{num_students}"}, {"unstisfied_num": max(0.0, unsatisfied)}]
+    return run
+
+
+class TestCapacitySearch(unittest.TestCase):
+    """测试自适应容量搜索"""
+
+    def test_t_critical(self):
+        """临界值应与t分布表一致"""
+        for df, expected in ((1, 12.706), (2, 4.303), (5, 2.571), (30, 2.042)):
+            self.assertAlmostEqual(t_critical(df, 0.95), expected, delta=0.01)
+        mean, low, high = mean_interval([1.0, 1.0, 1.0])
+        self.assertEqual((mean, low, high), (1.0, 1.0, 1.0))
+
+    def test_finds_capacity_with_few_runs(self):
+        """应找到容量，且总模拟次数远少于逐个学生数的扫描"""
+        searcher = CapacitySearch(fake_run(capacity=37, noise=0.6), metric="final_unsatisfied",
+                                  threshold=1.0, min_replicas=2, max_replicas=6)
+        result = searcher.search(10, 110)
+        self.assertTrue(result["bracketed"])
+        self.assertEqual(result["capacity"], 37)
+        self.assertLess(result["runs"], 101 * 3 // 10)
+        # 远离容量的学生数只运行最少次数
+        self.assertEqual(result["points"][110]["replicas"], 2)
+
+    def test_capacity_outside_range(self):
+        """容量超出搜索范围时应如实报告"""
+        searcher = CapacitySearch(fake_run(capacity=200, noise=0.0), metric="final_unsatisfied", threshold=1.0)
+        result = searcher.search(10, 20)
+        self.assertFalse(result["bracketed"])
+        self.assertEqual(result["capacity"], 20)
+        with self.assertRaises(KeyError):
+            CapacitySearch(fake_run(10, 0.0), metric="unknown")
+
+    def test_runner_does_not_overwrite_existing_runs(self):
+        """默认的模拟序号从已有文件的最大序号之后开始"""
+        import os
+        from backend.capacity import simulation_runner
+        with simulation_sandbox(StubClients) as tmp:
+            folder = os.path.join(tmp, "9_seats_simulations")
+            os.makedirs(folder)
+            for name in ("6-1.json", "6-4.json", "7-9.json"):
+                with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+                    f.write("[]")
+            run = simulation_runner(3, 3, prefetch=False)
+            self.assertEqual(run(6)[0]["test_name"], "6-5")
+            self.assertEqual(run(6)[0]["test_name"], "6-6")
+            self.assertEqual(run(8)[0]["test_name"], "8-1")
+            with open(os.path.join(folder, "6-4.json"), encoding="utf-8") as f:
+                self.assertEqual(f.read(), "[]")
+
+
+if __name__ == '__main__':
+    unittest.main()
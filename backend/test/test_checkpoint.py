@@ -0,0 +1,61 @@
+import os
+import shutil
+import unittest
+
+from backend.test.stubs import StubClients
+from backend.test.helpers import simulation_sandbox
+
+
+class TestCheckpoint(unittest.TestCase):
+    """测试模拟检查点与恢复"""
+
+    def test_resume_continues_run(self):
+        """从中途的检查点恢复后，输出应与不中断的运行一致，并追加到同一数据文件"""
+        from backend.simulation import Simulation
+        with simulation_sandbox(StubClients) as tmp:
+            sim = Simulation(row=4, column=4, num_students=24, checkpoint_every=10, prefetch=True)
+            for _ in range(25):
+                sim.step(save=True)
+            saved = os.path.join(tmp, "saved.checkpoint.json.gz")
+            shutil.copy(sim.checkpoint_path, saved)  # 第20个tick的检查点，之后的5个tick已写入数据文件
+            sim.run(run_all=True)
+            expected = sim.jm.data[1:]
+
+            resumed = Simulation.resume(saved)
+            self.assertEqual(resumed.library.current_time.strftime('%H:%M'), expected[19]["time"])
+            self.assertEqual(len(resumed.jm.data), 21)
+            resumed.run(run_all=True)
+            self.assertEqual(resumed.jm.data[1:], expected)
+            self.assertEqual(resumed.jm.file_path, sim.jm.file_path)
+            header = resumed.jm.data[0]
+        self.assertEqual(header["test_name"], "24-1")
+        self.assertIn("llm_summary", header)
+
+    def test_state_round_trip(self):
+        """座位引用、日程和随机数状态应在检查点中保留"""
+        import random
+        from backend.checkpoint import library_state, restore_library
+        from backend.simulation import Simulation
+        with simulation_sandbox(StubClients, quiet=False):
+            sim = Simulation(row=3, column=3, num_students=12, prefetch=False)
+            for _ in range(12):
+                sim.step()
+            library = restore_library(library_state(sim.library))
+            sim.checkpoint()
+            before = random.random()
+            random.seed(99)
+            Simulation.resume(sim.checkpoint_path)
+            self.assertEqual(random.random(), before)
+        for old, new in zip(sim.library.students, library.students):
+            self.assertEqual(old.schedule, new.schedule)
+            self.assertEqual((old.state, old.current_time), (new.state, new.current_time))
+            self.assertEqual(None if old.seat is None else old.seat.coordinate,
+                             None if new.seat is None else new.seat.coordinate)
+        for student in library.students:
+            if student.seat is not None:
+                self.assertIs(student.seat, library.seats_map[student.seat.coordinate])
+        self.assertEqual(library.output_seats_taken_state(), sim.library.output_seats_taken_state())
+
+
+if __name__ == '__main__':
+    unittest.main()
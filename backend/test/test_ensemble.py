@@ -0,0 +1,56 @@
+import random
+import unittest
+
+from backend.test.stubs import RuleLeaveStubClients
+from backend.test.helpers import simulation_sandbox
+
+
+class TestEnsembleEngine(unittest.TestCase):
+    """测试多副本锁步引擎"""
+
+    def test_matches_object_engine(self):
+        """离座决策走兜底逻辑时，每个副本的逐tick输出应与Simulation一致"""
+        from backend.ensemble import EnsembleEngine
+        from backend.simulation import Simulation
+        with simulation_sandbox(RuleLeaveStubClients, quiet=False):
+            random.seed(7)
+            simulations = [Simulation(row=4, column=5, num_students=30, simulation_number=i + 1, prefetch=False)
+                           for i in range(3)]
+            engine = EnsembleEngine([sim.library for sim in simulations])  # 初始化时复制状态，之后不再读取图书馆
+            for sim in simulations:
+                sim.run(run_all=True)
+            outputs = engine.run()
+        self.assertEqual(len(outputs), 3)
+        for sim, records in zip(simulations, outputs):
+            self.assertEqual(sim.jm.data[1:], records)
+        # 各副本的布局不同，结果不应完全相同
+        self.assertNotEqual(outputs[0], outputs[1])
+
+    def test_run_ensemble_writes_replica_files(self):
+        """run_ensemble应为每个副本写入与Simulation相同格式的文件"""
+        from backend.ensemble import run_ensemble
+        from backend.json_manager import open_fuc
+        with simulation_sandbox(RuleLeaveStubClients, quiet=False) as tmp:
+            data = run_ensemble(2, row=3, column=3, num_students=8, simulation_number=5)
+            saved = open_fuc('utf-8', f"{tmp}/9_seats_simulations/8-6.json")
+        self.assertEqual(saved, data[1])
+        self.assertEqual(data[1][0]["ensemble"], {"replicas": 2, "replica": 1, "leave_decisions": "rule"})
+        self.assertEqual(data[0][-1]["time"], "00:00")
+        self.assertEqual(set(data[0][1]), {"time", "seats_taken_state", "unstisfied_num", "cleared_seats",
+                                           "reversed_seats", "taken_rate"})
+
+    def test_simulation_run_replicas(self):
+        """Simulation.run_replicas与run_ensemble结果一致，头部注明离座决策为规则"""
+        from backend.ensemble import run_ensemble
+        from backend.simulation import Simulation
+        results = []
+        for run in (run_ensemble, Simulation.run_replicas):
+            random.seed(3)
+            with simulation_sandbox(RuleLeaveStubClients, quiet=False):
+                results.append(run(2, row=3, column=3, num_students=8, save=False))
+        self.assertEqual([data[1:] for data in results[0]], [data[1:] for data in results[1]])
+        self.assertEqual(results[1][0][0]["ensemble"]["leave_decisions"], "rule")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from datetime import datetime
+
+from backend import events
+from backend.events import EventLog, Level
+from backend.seats import Seat
+
+
+class TestEventLog(unittest.TestCase):
+    """测试分级日志与结构化事件流"""
+
+    def test_level_filter(self):
+        """低于设定级别的日志不应输出"""
+        stream = io.StringIO()
+        log = EventLog(level=Level.WARNING, stream=stream)
+        log.debug("调试信息")
+        log.info("概要信息")
+        log.warning("警告信息")
+        self.assertEqual(stream.getvalue(), "警告信息\n")
+
+        log.level = Level.SILENT
+        log.error("错误信息")
+        self.assertEqual(stream.getvalue(), "警告信息\n")  # 静默模式下不输出任何内容
+
+    def test_seat_events_written_as_jsonl(self):
+        """座位状态变化应以JSON Lines格式写入事件流"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "events.jsonl")
+            old_log = events.log
+            events.log = EventLog(level=Level.SILENT)
+            try:
+                events.log.open_event_stream(path)
+                events.log.sim_time = datetime(1900, 1, 1, 8, 15)
+                seat = Seat(0, 0)
+                seat.take(3)
+                seat.leave(True)
+                seat.sign()
+                seat.clear()
+                events.log.close_event_stream()
+            finally:
+                events.log = old_log
+
+            with open(path, encoding='utf-8') as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual([r["event"] for r in records], ["take", "reserve", "sign", "clear"])
+        self.assertTrue(all(r["student"] == 3 and r["sim_time"] == "08:15" for r in records))
+        self.assertIn("wall_time", records[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import json
+import tempfile
+import unittest
+
+from backend.figure_cache import FigureManifest, compute_signature
+
+
+class TestFigureCache(unittest.TestCase):
+    """测试图像指纹缓存"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.run_file = os.path.join(self.tmp.name, "9-1.json")
+        with open(self.run_file, 'w', encoding='utf-8') as f:
+            json.dump([{"test_name": "9-1"}, {"time": "07:15"}], f)
+        self.image_path = os.path.join(self.tmp.name, "students_9.png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fresh_after_record(self):
+        """记录后相同输入应判定为无需重新生成"""
+        manifest = FigureManifest(self.tmp.name)
+        signature = compute_signature([self.run_file], {"students": 9})
+        self.assertFalse(manifest.is_fresh(self.image_path, signature))  # 图像尚不存在
+
+        open(self.image_path, 'wb').close()
+        manifest.record(self.image_path, signature)
+        # 重新加载清单，验证指纹已持久化
+        self.assertTrue(FigureManifest(self.tmp.name).is_fresh(self.image_path, signature))
+
+    def test_stale_when_input_or_params_change(self):
+        """输入文件内容或绘图参数变化时应重新生成"""
+        manifest = FigureManifest(self.tmp.name)
+        open(self.image_path, 'wb').close()
+        manifest.record(self.image_path, compute_signature([self.run_file], {"students": 9}))
+
+        self.assertFalse(manifest.is_fresh(self.image_path, compute_signature([self.run_file], {"students": 10})))
+
+        with open(self.run_file, 'a', encoding='utf-8') as f:
+            f.write(" ")
+        self.assertFalse(manifest.is_fresh(self.image_path, compute_signature([self.run_file], {"students": 9})))
+
+
+if __name__ == '__main__':
+    unittest.main()
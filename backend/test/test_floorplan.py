@@ -0,0 +1,116 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from backend.test.stubs import RuleLeaveStubClients
+from backend.test.helpers import simulation_sandbox
+
+# 两张桌子之间隔一条过道，右上角有柱子，左侧有窗户
+ROOM = ["W?N#",
+        "WLT.",
+        "WST?",
+        "W?.B",
+        "..TT",
+        ".N.?"]
+
+
+class TestFloorPlan(unittest.TestCase):
+    """测试平面图读取与座位邻接图"""
+
+    def test_load_json_and_csv(self):
+        from backend.floorplan import FloorPlan, load_floor_plan
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, "room.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump({"grid": ROOM, "window_edges": ["bottom"]}, f)
+            csv_path = os.path.join(tmp, "hall.csv")
+            with open(csv_path, "w", encoding="utf-8") as f:
+                f.write("N,,L\nS,T,B\n")
+            plan, hall = load_floor_plan(json_path), load_floor_plan(csv_path)
+        self.assertEqual(plan.name, "room")
+        self.assertEqual((plan.rows, plan.columns), (6, 4))
+        self.assertEqual(plan.coordinates, [(0, 1), (0, 2), (1, 1), (2, 1), (2, 3), (3, 1), (3, 3), (5, 1), (5, 3)])
+        # 与窗户相邻或位于底边的座位靠窗
+        self.assertEqual(plan.window, [True, False, True, True, False, True, False, True, True])
+        seats = hall.build_seats()
+        self.assertEqual([(seat.lamp, seat.socket) for seat in seats],
+                         [(False, False), (True, False), (False, True), (True, True)])
+        self.assertEqual(hall.neighbour_graph().degree.tolist(), [1, 1, 2, 2])  # 第二行的两个座位隔着桌子也是邻居
+        with self.assertRaises(ValueError):
+            FloorPlan(["N?X"])
+        with self.assertRaises(ValueError):
+            FloorPlan(["N"], window_edges=["north"])
+
+    def test_table_neighbours_and_crowding(self):
+        from backend.floorplan import FloorPlan
+        plan = FloorPlan(ROOM)
+        graph = plan.neighbour_graph()
+        index = {coordinate: s for s, coordinate in enumerate(plan.coordinates)}
+        neighbours = lambda coordinate: sorted(plan.coordinates[t] for t in
+                                               graph.indices[graph.indptr[index[coordinate]]:graph.indptr[index[coordinate] + 1]])
+        # (2,3)与(0,2)、(1,1)、(2,1)围坐同一张桌子，(3,3)与(5,3)都挨着下方的桌子
+        self.assertEqual(neighbours((2, 3)), [(0, 2), (1, 1), (2, 1), (3, 3)])
+        self.assertEqual(neighbours((5, 3)), [(3, 3)])
+        self.assertEqual(neighbours((5, 1)), [])
+        occupied = [coordinate in {(1, 1), (3, 3)} for coordinate in plan.coordinates]
+        crowding = dict(zip(plan.coordinates, graph.crowding(occupied).tolist()))
+        self.assertEqual(crowding[(2, 3)], (2 - 0.5 * 2) / 4)
+        self.assertEqual(crowding[(5, 3)], 1.0)
+        self.assertEqual(crowding[(5, 1)], 0.0)
+
+    def test_rectangle_matches_per_seat_lookup(self):
+        """矩形网格的拥挤参数与逐座位查找8个邻居的结果逐位一致，靠窗座位为实际的四周边缘"""
+        from backend.library import Library
+        from backend.seats import Status
+        random.seed(2)
+        library = Library()
+        library.initialize_seats(7, 11)
+        self.assertEqual(sum(seat.window for seat in library.seats), 7 * 11 - 5 * 9)
+        for seat in library.seats:
+            if random.random() < 0.5:
+                seat.status = Status.taken
+        library.calculate_each_seat_crowded_para()
+        for seat in library.seats:
+            x, y = seat.coordinate
+            around = [library.seats_map[(x + dx, y + dy)] for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                      if (dx, dy) != (0, 0) and (x + dx, y + dy) in library.seats_map]
+            expected = sum((s.status != Status.vacant) - 0.5 * s.window for s in around) / len(around)
+            self.assertEqual(seat.crowded_para, expected)
+
+    def test_graph_rebuilt_after_invalidation(self):
+        """替换座位列表并丢弃缓存后，邻接图按新的座位重新构建"""
+        from backend.library import Library
+        from backend.seats import Seat
+        library = Library()
+        library.initialize_seats(3, 3)
+        self.assertEqual(library.neighbour_graph().size, 9)
+        library.seats = [Seat(0, 0), Seat(0, 1), Seat(5, 5)]
+        library.invalidate_neighbour_graph()
+        self.assertEqual(library.neighbour_graph().degree.tolist(), [1, 1, 0])
+
+    def test_simulation_engine_and_checkpoint(self):
+        """按平面图运行的模拟：数组引擎的输出一致，检查点恢复后沿用平面图的邻接图"""
+        from backend.checkpoint import library_state, restore_library
+        from backend.ensemble import EnsembleEngine
+        from backend.floorplan import FloorPlan
+        from backend.simulation import Simulation
+        with simulation_sandbox(RuleLeaveStubClients):
+            random.seed(4)
+            sim = Simulation(num_students=15, prefetch=False, floor_plan=FloorPlan(ROOM, name="room"))
+            engine = EnsembleEngine([sim.library])
+            for _ in range(12):
+                sim.step()
+            restored = restore_library(library_state(sim.library))
+            sim.run(run_all=True)
+            records = engine.run()[0]
+        self.assertEqual(len(sim.library.seats), 9)
+        self.assertEqual(sim.jm.data[0]["test_scale"], "room(9)->15")
+        self.assertEqual(sim.jm.data[1:], records)
+        self.assertEqual(restored.floor_plan.to_dict(), sim.library.floor_plan.to_dict())
+        self.assertEqual(restored.neighbour_graph().indices.tolist(), sim.library.neighbour_graph().indices.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from backend.test.stubs import StubClients
+from backend.test.helpers import simulation_sandbox
+
+
+class TestFork(unittest.TestCase):
+    """测试从共同前缀分支运行策略变体"""
+
+    POLICIES = {"same": {"limit_reversed_time": "01:00"}, "strict": {"limit_reversed_time": "00:15"}}
+
+    def test_branches_share_prefix(self):
+        """与父模拟策略相同的分支应得到与不分支时相同的结果，分支文件只保存分支之后的tick"""
+        from backend.json_manager import open_fuc
+        from backend.simulation import Simulation
+        with simulation_sandbox(StubClients) as tmp:
+            sim = Simulation(row=4, column=4, num_students=24)
+            branches = sim.fork("12:00", self.POLICIES)
+            stored = open_fuc('utf-8', f"{tmp}/16_seats_simulations/forks/24-1/strict.json")
+            sim.run(run_all=True)  # 父模拟在分支后继续运行
+        self.assertEqual(branches["same"][1:], sim.jm.data[1:])
+        prefix = stored[0]["fork"]["prefix_records"]
+        self.assertEqual(sim.jm.data[prefix]["time"], "12:00")
+        self.assertEqual(len(stored) - 1 + prefix, len(sim.jm.data) - 1)
+        self.assertEqual(stored[0]["fork"]["overrides"], {"limit_reversed_time": "00:15"})
+        strict = branches["strict"]
+        self.assertEqual(strict[1:prefix + 1], sim.jm.data[1:prefix + 1])
+        self.assertEqual(stored[1]["time"], "12:15")
+        self.assertEqual(strict[prefix + 1:], stored[1:])
+
+    def test_parallel_matches_sequential(self):
+        """并行运行的分支应与顺序运行一致，开启预取时fork前停止后台线程，之后恢复"""
+        from backend.simulation import Simulation
+        with simulation_sandbox(StubClients):
+            sim = Simulation(row=4, column=4, num_students=24, prefetch=True)
+            sequential = sim.fork("11:45", self.POLICIES)  # 11:45时有学生预计在下一个tick离座
+            pending = sim.library.prefetcher.pending_students()
+            self.assertTrue(pending)
+            parallel = sim.fork("11:45", self.POLICIES, parallel=True)
+            self.assertEqual(sim.library.prefetcher.pending_students(), pending)
+            sim.library.close()
+        for name in sequential:
+            self.assertEqual(parallel[name][1:], sequential[name][1:])
+
+    def test_invalid_branch_time_leaves_parent_untouched(self):
+        """不在时间步长上或已经过去的分支时刻应在推进父模拟之前报错"""
+        from backend.simulation import Simulation
+        with simulation_sandbox(StubClients):
+            sim = Simulation(row=3, column=3, num_students=6)
+            for _ in range(4):
+                sim.step()
+            for at in ("12:07", "07:30", "03:00", "noon"):
+                with self.assertRaises(ValueError):
+                    sim.fork(at, self.POLICIES)
+            self.assertEqual(sim.library.current_time.strftime('%H:%M'), "08:00")
+            self.assertEqual(len(sim.jm.data) - 1, 4)
+
+    def test_unknown_policy(self):
+        """未知的策略应在运行前报错"""
+        from backend.fork import fork_simulation
+        with self.assertRaises(KeyError):
+            fork_simulation(None, "12:00", [{"lamp_rate": 0.1}])
+
+
+if __name__ == '__main__':
+    unittest.main()
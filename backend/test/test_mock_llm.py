@@ -0,0 +1,82 @@
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import config
+from backend import agents
+from backend.mock_llm import generate_schedule, start_mock_server
+from backend.prompt import schedule_prompt, build_leave_prompt
+from backend.schedule import normalize_schedule
+
+
+class TestMockLLM(unittest.TestCase):
+    """测试本地模拟LLM服务与真实请求路径"""
+
+    def setUp(self):
+        self.before = agents.llm_stats.snapshot()
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+
+    def client(self, **mock_config):
+        server, base_url = start_mock_server(mock_config)
+        self.servers.append(server)
+        client = agents.Clients(base_url=base_url, api_key="mock", model="mock")
+        self.addCleanup(client.close)
+        return client
+
+    def test_generated_schedules_valid(self):
+        """生成的日程无需本地修复"""
+        rng = random.Random(0)
+        for params in [("早", "高", "多"), ("正常", "中", "中"), ("晚", "低", "少")]:
+            for _ in range(50):
+                _, edits = normalize_schedule(generate_schedule(*params, rng))
+                self.assertEqual(edits, [])
+
+    def test_schedule_and_leave_requests(self):
+        """日程请求按n返回多个候选，完整的离座决策回复不计入本地修复"""
+        client = self.client()
+        prompt = schedule_prompt.format(schedule_type="晚", focus_type="低", course_situation="少")
+        samples = client.sample(prompt, n=4, kind="schedule")
+        self.assertEqual(len(samples), 4)
+        self.assertGreater(len({str(sample) for sample in samples}), 1)
+        prefix, suffix = build_leave_prompt("守序", 4.0, "12:00", "1:00:00", "未开始计时", "07:00 start", 9, 18)
+        self.assertIn(client.response(suffix, prefix=prefix, kind="leave")["action"], ("leave", "reverse"))
+        stats = agents.llm_stats.since(self.before)
+        self.assertEqual(stats["leave"]["repairs"], 0)  # 不设停止序列，回复含右花括号
+        self.assertGreater(stats["schedule"]["completion_tokens"], 0)
+
+    def test_errors_fall_back(self):
+        """错误响应计入统计，重试耗尽后返回兜底结果"""
+        client = self.client(error_rate=1.0)
+        with patch('backend.agents.time.sleep'), patch('backend.agents.events.log'):
+            self.assertEqual(client.response("是否选择占座", max_retries=2, kind="leave"), {"action": None})
+        stats = agents.llm_stats.since(self.before)["leave"]
+        self.assertEqual((stats["errors"], stats["fallbacks"]), (2, 1))
+
+    def test_config_switch_runs_simulation(self):
+        """LLM_BACKEND为mock时，完整模拟通过真实请求路径运行"""
+        from backend.simulation import Simulation
+        server, base_url = start_mock_server()
+        self.servers.append(server)
+        agents.configure_pool()
+        self.addCleanup(agents.configure_pool)
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.object(config, 'LLM_BACKEND', 'mock'), \
+                patch.object(config, 'MOCK_LLM_URL', base_url), \
+                patch('backend.simulation.simulations_base_path', tmp), \
+                patch('builtins.print'):
+            sim = Simulation(row=3, column=3, num_students=6)
+            sim.run(run_all=True)
+        usage = sim.jm.data[0]["llm_usage"]
+        self.assertGreater(usage["schedule"]["calls"], 0)
+        self.assertGreater(usage["leave"]["calls"], 0)
+        self.assertEqual(usage["leave"]["fallbacks"], 0)
+        self.assertGreater(server.llm.requests, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
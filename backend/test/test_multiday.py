@@ -0,0 +1,91 @@
+import os
+import unittest
+from array import array
+
+from backend.test.stubs import StubClients
+from backend.test.helpers import simulation_sandbox
+
+
+class CountingClients(StubClients):
+    """记录日程请求提示词的替身"""
+    schedule_prompts = []
+
+    def sample(self, prompt, n=1, max_retries=3, **kwargs):
+        CountingClients.schedule_prompts.append(prompt)
+        return super().sample(prompt, n, max_retries, **kwargs)
+
+
+class TestMultiDay(unittest.TestCase):
+    """测试多日模拟"""
+
+    def test_perturb_schedule(self):
+        """平移应保持start不变、顺序不变，并限制在午夜之前"""
+        from backend.multiday import perturb_schedule
+        from backend.students import ACTIONS
+        times = array('I', [7 * 3600, 8 * 3600, 23 * 3600 + 45 * 60])
+        actions = bytes([ACTIONS.index("start"), ACTIONS.index("learn"), ACTIONS.index("end")])
+        shifted, same = perturb_schedule(times, actions, 1)
+        self.assertEqual(list(shifted), [7 * 3600, 8 * 3600 + 900, 23 * 3600 + 45 * 60])
+        self.assertIs(same, actions)
+        self.assertIs(perturb_schedule(times, actions, 0)[0], times)
+
+    def test_days_share_population(self):
+        """各天应复用学生和日程，计数器每天清零，相同日程的两天结果相同"""
+        from backend.multiday import read_multiday
+        from backend.simulation import Simulation
+        CountingClients.schedule_prompts = []
+        with simulation_sandbox(CountingClients):
+            sim = Simulation(row=4, column=4, num_students=24)
+            initial = len(CountingClients.schedule_prompts)
+            students = list(sim.library.students)
+            summary = sim.run_days(day_types=["weekday", "weekend", "weekday", "weekend"], perturb_steps=0)
+            saved_path = os.path.splitext(sim.jm.file_path.replace("16_seats_simulations", "16_seats_multiday"))[0]
+            data = read_multiday(saved_path + ".jsonl")
+        self.assertEqual(sim.library.students, students)
+        # 周末日程只为每种提示词请求一次
+        weekend = CountingClients.schedule_prompts[initial:]
+        self.assertTrue(weekend)
+        self.assertEqual(len(weekend), len(set(weekend)))
+        self.assertTrue(all("周末" in prompt for prompt in weekend))
+
+        header, records = data[0], data[1:]
+        self.assertEqual(header, summary)
+        self.assertEqual([item["day_type"] for item in header["days"]], ["weekday", "weekend", "weekday", "weekend"])
+        days = [[{k: v for k, v in r.items() if k != "day"} for r in records if r["day"] == d] for d in range(4)]
+        self.assertEqual(days[0], days[2])
+        self.assertEqual(days[1], days[3])
+        self.assertEqual(days[0][0]["time"], "07:15")
+        self.assertEqual(days[0][-1]["time"], "00:00")
+        self.assertEqual(header["days"][2]["unstisfied_num"], days[2][-1]["unstisfied_num"])
+        with self.assertRaises(KeyError):
+            sim.run_days(day_types=["holiday"])
+
+    def test_days_stream_to_file(self):
+        """每天结束时（设置checkpoint_every时每隔这么多个tick）把记录追加到数据文件，不在内存中累积"""
+        from backend.multiday import MultiDayRun, read_multiday
+        from backend.simulation import Simulation
+        with simulation_sandbox(StubClients):
+            sim = Simulation(row=4, column=4, num_students=12, checkpoint_every=10)
+            run = MultiDayRun(sim, ["weekday", "weekday"], perturb_steps=0)
+            flushed = []
+            update = sim.library.update
+
+            def update_and_count():
+                update()
+                with open(run.path, encoding="utf-8") as f:
+                    flushed.append(sum(1 for _ in f))
+
+            sim.library.update = update_and_count
+            run.run()
+            data = read_multiday(run.path)
+        ticks_per_day = len(data[1:]) // 2
+        # 第一天的第11个tick之前已写入头部和前10个tick
+        self.assertEqual(flushed[10], 11)
+        # 第二天的第一个tick之前第一天已完整写入（含day_end）
+        self.assertEqual(flushed[ticks_per_day], ticks_per_day + 2)
+        self.assertEqual([r["day"] for r in data[1:]], [0] * ticks_per_day + [1] * ticks_per_day)
+        self.assertEqual(len(data[0]["days"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from backend.prefetch import LeavePrefetcher
+from backend.test.stubs import StubClients
+from backend.test.helpers import simulation_sandbox
+
+
+class _Student:
+    """只提供预取所需属性的学生替身"""
+    def __init__(self, student_id, client):
+        self.student_id = student_id
+        self.client = client
+
+
+class _BlockingClients:
+    """在放行前阻塞的客户端，用于观察未完成的预取请求"""
+    def __init__(self):
+        self.release = threading.Event()
+        self.prompts = []
+
+    def response(self, prompt, max_retries=3, **kwargs):
+        self.prompts.append(prompt)
+        self.release.wait(5)
+        return {"action": "reverse"}
+
+
+class TestLeavePrefetcher(unittest.TestCase):
+    """测试离座决策预取"""
+
+    def test_hit_and_stale(self):
+        """提示词一致时使用预取结果，不一致时丢弃"""
+        prefetcher = LeavePrefetcher(max_workers=2)
+        client = _BlockingClients()
+        client.release.set()
+        prefetcher.submit(_Student(1, client), ("前缀", "a"))
+        prefetcher.submit(_Student(2, client), ("前缀", "b"))
+        self.assertEqual(prefetcher.take(1, ("前缀", "a")), {"action": "reverse"})
+        self.assertIsNone(prefetcher.take(2, ("前缀", "changed")))
+        self.assertIsNone(prefetcher.take(3, ("前缀", "c")))
+        prefetcher.close()
+        self.assertEqual(prefetcher.stats["hits"], 1)
+        self.assertEqual(prefetcher.stats["stale"], 1)
+        self.assertEqual(prefetcher.stats["misses"], 1)
+
+    def test_resubmit_and_retain(self):
+        """相同提示词不重复提交，不再预计离座的学生的请求被取消"""
+        prefetcher = LeavePrefetcher(max_workers=1)
+        client = _BlockingClients()
+        prefetcher.submit(_Student(1, client), ("前缀", "a"))  # 占住唯一的线程
+        prefetcher.submit(_Student(2, client), ("前缀", "b"))
+        prefetcher.submit(_Student(2, client), ("前缀", "b"))
+        prefetcher.retain({1})
+        client.release.set()
+        prefetcher.close()
+        self.assertEqual(prefetcher.stats["submitted"], 2)
+        self.assertEqual(prefetcher.stats["cancelled"], 1)
+        self.assertEqual(client.prompts, ["a"])
+
+    def test_simulation_uses_prefetched_decisions(self):
+        """完整模拟中离座决策应全部来自预取，结果与不预取时一致"""
+        from backend.simulation import Simulation
+        runs = []
+        for prefetch in (False, True):
+            with simulation_sandbox(StubClients), \
+                    patch('backend.library.random.random', side_effect=lambda: 0.5):
+                sim = Simulation(row=4, column=4, num_students=20, prefetch=prefetch)
+                sim.run(run_all=True)
+            runs.append(sim.jm.data)
+        stats = runs[1][0]["leave_prefetch"]
+        self.assertGreater(stats["hits"], 0)
+        self.assertEqual(stats["stale"] + stats["misses"], 0)
+        self.assertEqual(runs[0][1:], runs[1][1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
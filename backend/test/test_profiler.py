@@ -0,0 +1,55 @@
+import unittest
+
+from backend.profiler import PhaseProfiler, NullProfiler
+from backend.test.helpers import simulation_sandbox
+
+
+class StubClients:
+    """固定返回日程和离座决策的LLM客户端替身"""
+    def response(self, prompt, max_retries=3, **kwargs):
+        if kwargs.get("kind") == "schedule":
+            return [{"time": "08:00:00", "action": "start"},
+                    {"time": "08:00:00", "action": "learn"},
+                    {"time": "12:00:00", "action": "eat"},
+                    {"time": "13:00:00", "action": "learn"},
+                    {"time": "22:00:00", "action": "end"}]
+        return {"action": "leave"}
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    """测试分阶段计时器"""
+
+    def test_phase_accumulates_calls(self):
+        """同一阶段多次计时应累计调用次数"""
+        profiler = PhaseProfiler()
+        for _ in range(3):
+            profiler.begin_tick()
+            with profiler.phase("crowding"):
+                pass
+            profiler.end_tick()
+        summary = profiler.summary()
+        self.assertEqual(summary["ticks"], 3)
+        self.assertEqual(summary["phases"]["crowding"]["calls"], 3)
+
+    def test_null_profiler_records_nothing(self):
+        """空计时器不应记录任何阶段"""
+        profiler = NullProfiler()
+        with profiler.phase("crowding"):
+            pass
+        profiler.end_tick()
+        self.assertEqual(profiler.summary(), {"ticks": 0, "tick_seconds": 0, "phases": {}})
+
+    def test_simulation_saves_profile(self):
+        """开启save_profile时分阶段汇总应写入模拟数据文件头部"""
+        from backend.simulation import Simulation
+        with simulation_sandbox(StubClients):
+            sim = Simulation(row=3, column=3, num_students=6, save_profile=True)
+            sim.run(run_all=True)
+        header = sim.jm.data[0]
+        self.assertEqual(header["profile"]["ticks"], len(sim.jm.data) - 1)
+        for name in ("schedule_lookup", "seat_selection", "crowding", "sign_clear", "serialization"):
+            self.assertIn(name, header["profile"]["phases"])
+
+
+if __name__ == '__main__':
+    unittest.main()
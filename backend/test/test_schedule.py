@@ -0,0 +1,182 @@
+import threading
+import time
+import unittest
+
+from backend.schedule import normalize_schedule, check_schedule, ScheduleProvider
+from backend.test.stubs import StubClients
+
+
+def actions(schedule):
+    return [(item["time"][:5], item["action"]) for item in schedule]
+
+
+class TestNormalizeSchedule(unittest.TestCase):
+    """测试日程的本地校验与修复"""
+
+    def test_valid_schedule_unchanged(self):
+        """符合约束的日程不应被修改"""
+        schedule = [{"time": "07:00:00", "action": "start"},
+                    {"time": "07:30:00", "action": "eat"},
+                    {"time": "08:00:00", "action": "course"},
+                    {"time": "10:00:00", "action": "learn"},
+                    {"time": "12:00:00", "action": "eat"},
+                    {"time": "12:45:00", "action": "course"},
+                    {"time": "14:00:00", "action": "learn"},
+                    {"time": "21:30:00", "action": "rest"},
+                    {"time": "22:00:00", "action": "end"}]
+        normalized, edits = normalize_schedule(schedule)
+        self.assertEqual(normalized, schedule)
+        self.assertEqual(edits, [])
+        self.assertEqual(check_schedule(normalized), [])
+
+    def test_repairs_with_minimal_edits(self):
+        """乱序、未对齐、同义动作、缺少start和rest的日程应被修复"""
+        schedule = [{"time": "12:07", "action": "Lunch"},
+                    {"time": "9:00:00", "action": "study"},
+                    {"time": "07:00:00", "action": "eat"},
+                    {"time": "13:00:00", "action": "learn"},
+                    {"time": "13:00:00", "action": "learn"},
+                    {"time": "22:00:00", "action": "end"},
+                    {"time": "23:00:00", "action": "learn"},
+                    {"time": "25:00:00", "action": "learn"}]
+        normalized, edits = normalize_schedule(schedule)
+        self.assertEqual(actions(normalized), [("07:00", "start"), ("07:15", "eat"), ("09:00", "learn"),
+                                               ("12:00", "eat"), ("13:00", "learn"), ("21:45", "rest"),
+                                               ("22:00", "end")])
+        self.assertTrue(edits)
+
+    def test_missing_end_runs_until_midnight(self):
+        """缺少end时以午夜结束，并在之前插入rest"""
+        normalized, _ = normalize_schedule([{"time": "07:00:00", "action": "start"},
+                                            {"time": "08:00:00", "action": "learn"}])
+        self.assertEqual(actions(normalized)[-2:], [("23:45", "rest"), ("23:59", "end")])
+
+    def test_early_items_keep_the_only_learn(self):
+        """07:00之前的项放在start之后，同时间去重时不移除唯一的learn"""
+        normalized, _ = normalize_schedule([{"time": "06:00", "action": "learn"},
+                                            {"time": "06:30", "action": "eat"},
+                                            {"time": "22:00", "action": "end"}])
+        self.assertEqual(actions(normalized), [("07:00", "start"), ("07:15", "learn"), ("07:30", "eat"),
+                                               ("21:45", "rest"), ("22:00", "end")])
+
+    def test_no_room_before_midnight_pulls_rest_earlier(self):
+        """午夜之前放不下rest时提前rest及其前面的项，end不与rest重合"""
+        normalized, _ = normalize_schedule([{"time": "07:00", "action": "start"},
+                                            {"time": "23:59", "action": "learn"}])
+        self.assertEqual(actions(normalized), [("07:00", "start"), ("23:30", "learn"), ("23:45", "rest"),
+                                               ("23:59", "end")])
+
+    def test_unrecoverable(self):
+        """没有任何可用日程项时应判定为无法修复"""
+        self.assertIsNone(normalize_schedule({"action": "leave"})[0])
+        self.assertIsNone(normalize_schedule([{"time": "xx", "action": "learn"},
+                                              {"time": "07:00:00", "action": "start"}])[0])
+
+    def test_check_soft_constraints(self):
+        """课程数和进食时长不符合要求时应报告但不修改"""
+        normalized, _ = normalize_schedule([{"time": "07:00:00", "action": "start"},
+                                            {"time": "08:00:00", "action": "eat"},
+                                            {"time": "10:00:00", "action": "learn"},
+                                            {"time": "20:00:00", "action": "rest"},
+                                            {"time": "20:30:00", "action": "end"}])
+        problems = check_schedule(normalized)
+        self.assertEqual(len(problems), 2)  # 没有课程、进食时长2小时
+
+
+class TestScheduleProvider(unittest.TestCase):
+    """测试按提示词分组的日程供给"""
+
+    def test_one_request_per_prompt(self):
+        """同一提示词的学生共用一次请求，按key选择候选"""
+        client = StubClients()
+        provider = ScheduleProvider(samples_per_request=3)
+        prompt = "规划学生一天的日程 A"
+        schedules = [provider.get(prompt, client, key=i) for i in range(6)]
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(len({str(s) for s in schedules[:3]}), 3)  # 不同学生分到不同的候选
+        self.assertEqual(schedules[0], schedules[3])
+        provider.get("规划学生一天的日程 B", client)
+        self.assertEqual(client.calls, 2)
+        provider.clear()
+        provider.get(prompt, client)
+        self.assertEqual(client.calls, 3)  # 清空后重新请求
+
+    def test_concurrent_requests_single_flight(self):
+        """并发的相同请求只发出一次"""
+        class SlowClients(StubClients):
+            def sample(self, prompt, n=1, **kwargs):
+                time.sleep(0.05)
+                return super().sample(prompt, n=n, **kwargs)
+
+        client = SlowClients()
+        provider = ScheduleProvider(samples_per_request=4)
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(provider.get("规划学生一天的日程", client, key=i)))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is not None for result in results))
+
+    def test_endpoint_ignoring_n_is_topped_up(self):
+        """端点忽略n只返回一个候选时逐个补齐，同组学生仍分到不同的日程"""
+        class IgnoresN(StubClients):
+            def sample(self, prompt, n=1, **kwargs):
+                return super().sample(prompt + str(self.calls), n=1, **kwargs)
+
+        client = IgnoresN()
+        provider = ScheduleProvider(samples_per_request=4)
+        schedules = [provider.get("规划学生一天的日程", client, key=i) for i in range(4)]
+        self.assertEqual(client.calls, 4)  # 1次带n的请求 + 3次补齐
+        self.assertGreater(len({str(s) for s in schedules}), 1)
+
+    def test_assignment_independent_of_thread_order(self):
+        """同一学生ID分到的日程与请求的线程先后无关"""
+        def assign(order):
+            provider = ScheduleProvider(samples_per_request=3)
+            result = {}
+            threads = [threading.Thread(target=lambda i=i: result.__setitem__(i, provider.get("规划学生一天的日程",
+                                                                                             StubClients(), key=i)))
+                       for i in order]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return result
+
+        self.assertEqual(assign(range(6)), assign(reversed(range(6))))
+
+    def test_constraint_violations_recorded(self):
+        """规整后的候选逐个检查软约束，违反时计数但仍可使用"""
+        from backend.agents import llm_stats
+
+        class ResponseOnly:
+            def response(self, prompt, max_retries=3, **kwargs):
+                return [{"time": "07:00:00", "action": "start"}, {"time": "09:00:00", "action": "learn"}]
+
+        before = llm_stats.snapshot()
+        self.assertIsNotNone(ScheduleProvider().get("p", ResponseOnly()))
+        self.assertEqual(llm_stats.snapshot()["schedule"]["constraint_violations"]
+                         - before.get("schedule", {}).get("constraint_violations", 0), 1)
+
+    def test_response_only_client(self):
+        """只有response方法的客户端按单个候选处理，失败时返回None"""
+        class ResponseOnly:
+            def __init__(self, reply):
+                self.reply = reply
+
+            def response(self, prompt, max_retries=3, **kwargs):
+                return self.reply
+
+        provider = ScheduleProvider()
+        self.assertIsNone(provider.get("p", ResponseOnly(None)))
+        schedule = provider.get("p", ResponseOnly([{"time": "07:00:00", "action": "start"},
+                                                   {"time": "09:00:00", "action": "learn"}]))
+        self.assertEqual(schedule[-1]["action"], "end")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 模拟核心冷启动时不允许加载的重型依赖
+HEAVY_MODULES = ("matplotlib", "pandas", "numpy", "openai", "httpx")
+# 模拟工作进程导入模拟核心的时间预算（微秒），远低于导入matplotlib/pandas/openai所需的秒级时间
+IMPORT_BUDGET_US = 500_000
+
+
+def import_profile(module: str) -> dict:
+    """
+    在全新的解释器中用 -X importtime 导入指定模块
+
+    Returns:
+        dict: 模块名到累计导入时间（微秒）的映射
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+(.*)$", line)
+        if match:
+            profile[match.group(2).strip()] = int(match.group(1))
+    return profile
+
+
+class TestStartup(unittest.TestCase):
+    """保护模拟工作进程的冷启动时间"""
+
+    def test_simulation_core_has_no_heavy_imports(self):
+        """导入模拟核心不应加载绘图、分析或LLM依赖"""
+        for module in ("backend.simulation", "backend.plot", "backend.data_analysis"):
+            profile = import_profile(module)
+            loaded = [name for name in profile if name.split(".")[0] in HEAVY_MODULES]
+            self.assertEqual(loaded, [], f"{module} 在导入时加载了重型依赖: {loaded}")
+
+    def test_simulation_core_import_budget(self):
+        """模拟核心的累计导入时间应在预算之内"""
+        profile = import_profile("backend.simulation")
+        self.assertLess(profile["backend.simulation"], IMPORT_BUDGET_US)
+
+
+if __name__ == '__main__':
+    unittest.main()
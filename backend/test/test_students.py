@@ -2,12 +2,14 @@ import unittest
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch
 from backend.students import Student, StudentState
+from backend.schedule import schedule_provider
 from backend.seats import Seat, Status
 
 
 class TestStudent(unittest.TestCase):
     def setUp(self):
         """为每个测试设置初始学生"""
+        schedule_provider.clear()
         student_para = {
             "character": "守序",
             "schedule_type": "正常",
@@ -45,15 +47,16 @@ class TestStudent(unittest.TestCase):
         self.assertIsNotNone(self.student.schedule)
         self.assertGreater(len(self.student.schedule), 0)
 
-    @patch('backend.students.Clients')
+    @patch('backend.students.get_shared_client')
     def test_generate_schedule_with_mock_client(self, mock_client_class):
         """测试生成日程表（模拟客户端）"""
         mock_client = Mock()
-        mock_client.response.return_value = [
+        schedule = [
             {"time": "07:00:00", "action": "start"},
             {"time": "08:00:00", "action": "learn"},
             {"time": "12:00:00", "action": "eat"}
         ]
+        mock_client.sample.return_value = [schedule]
         mock_client_class.return_value = mock_client
         
         # 重新创建学生以使用mock客户端
@@ -68,10 +71,14 @@ class TestStudent(unittest.TestCase):
             "socket": 0.5,
             "space": 0.5
         }
-        student = Student(1, student_para, seat_preference)
+        schedule_provider.clear()  # setUp中的学生已缓存了同一提示词的日程
+        with patch.object(schedule_provider, 'samples_per_request', 1):  # 只取一个候选，不触发补齐
+            student = Student(1, student_para, seat_preference)
         
-        self.assertEqual(len(student.schedule), 3)
-        self.assertEqual(student.schedule[0]["action"], "start")
+        # 日程经过本地规整：原有三项保留，缺少的rest和end被补全
+        self.assertEqual(student.schedule[:3], schedule)
+        self.assertEqual([item["action"] for item in student.schedule[3:]], ["rest", "end"])
+        self.assertEqual(mock_client.sample.call_count, 1)  # 可修复的日程不会重新请求
 
     def test_get_current_action(self):
         """测试获取当前动作"""
@@ -224,5 +231,68 @@ class TestStudent(unittest.TestCase):
         self.assertEqual(self.student.seat, seat1)  # 应该选择满意度更高的seat1
 
 
+
+class TestCompactStudent(unittest.TestCase):
+    """测试学生的紧凑表示"""
+
+    def setUp(self):
+        schedule_provider.clear()
+
+    def test_archetype_shared(self):
+        """同一原型的学生应共享属性字典"""
+        with patch('backend.students.get_shared_client'):
+            a = Student.create_science_medium_student(1)
+            b = Student.create_science_medium_student(2)
+        self.assertIs(a.student_para, b.student_para)
+        self.assertIs(a.seat_preference, b.seat_preference)
+        self.assertEqual(a.seat_preference["lamp"], 0.6)
+
+    def test_unrecoverable_schedule_requests_again(self):
+        """无法在本地修复的日程才会重新请求LLM"""
+        valid = [{"time": "07:00:00", "action": "start"},
+                 {"time": "09:00:00", "action": "learn"},
+                 {"time": "21:00:00", "action": "rest"},
+                 {"time": "21:30:00", "action": "end"}]
+        with patch('backend.students.get_shared_client') as get_client, patch('backend.students.events.log'), \
+                patch.object(schedule_provider, 'samples_per_request', 1):  # 只取一个候选，不触发补齐
+            get_client.return_value.sample.side_effect = [[[{"time": "?", "action": "learn"}]], [valid]]
+            student = Student.create_science_lazy_student(1)
+        self.assertEqual(get_client.return_value.sample.call_count, 2)
+        self.assertEqual(student.schedule, valid)
+
+    def test_fallback_uses_default_logic(self):
+        """LLM返回兜底结果（重试耗尽或熔断）时应使用本地默认占座逻辑"""
+        with patch('backend.students.get_shared_client') as get_client:
+            student = Student.create_humanities_diligent_student(1)
+            seat = Seat(0, 0)
+            student.take_seat(seat)
+            get_client.return_value.response.return_value = {"action": None}
+            with patch.object(student, '_default_reverse_logic', return_value=True) as default_logic:
+                student.leave_seat()
+        default_logic.assert_called_once()
+        self.assertEqual(seat.status, Status.reverse)
+
+    def test_unsorted_schedule_lookup(self):
+        """乱序日程应按时间排序后查询，00:00:00视为一天结束"""
+        schedule = [{"time": "12:00:00", "action": "eat"},
+                    {"time": "00:00:00", "action": "end"},
+                    {"time": "07:00:00", "action": "start"},
+                    {"time": "08:00:00", "action": "learn"}]
+        with patch('backend.students.get_shared_client'):
+            student = Student.create_humanities_lazy_student(1)
+        student.schedule = schedule
+        self.assertEqual([item["action"] for item in student.schedule], ["start", "learn", "eat", "end"])
+        self.assertEqual(student.schedule[-1]["time"], "23:59:00")
+
+        student.current_time = datetime(1900, 1, 1, 6, 45, 0)
+        self.assertEqual(student.get_current_action(), "start")  # 早于所有日程时返回最早的动作
+        student.current_time = datetime(1900, 1, 1, 11, 45, 0)
+        student.update()
+        self.assertEqual(student.current_time, datetime(1900, 1, 1, 12, 0, 0))
+        self.assertEqual(student.get_current_action(), "eat")
+        student.current_time = datetime(1900, 1, 2, 0, 0, 0)
+        self.assertEqual(student.get_current_action(), "end")
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from backend.sweep import AdaptiveReplicas, standard_error
+
+
+def noisy_run(noise_by_point, seed=0):
+    """最终不满意数的噪声随学生数变化的模拟替身"""
+    rng = random.Random(seed)
+
+    def run(num_students):
+        unsatisfied = num_students + rng.gauss(0, noise_by_point.get(num_students, 0.0))
+        return [{"test_scale": f"3*3->{num_students}"}, {"unstisfied_num": unsatisfied, "cleared_seats": 0}]
+    return run
+
+
+class TestAdaptiveReplicas(unittest.TestCase):
+    """测试按方差自适应分配重复次数"""
+
+    def test_noisy_points_get_more_replicas(self):
+        """只有标准误高于容差的参数点追加重复"""
+        sweeper = AdaptiveReplicas(noisy_run({10: 0.0, 11: 3.0}),
+                                   tolerance={"final_unsatisfied": 1.0, "final_cleared": 1.0},
+                                   min_replicas=3, max_replicas=40)
+        report = sweeper.sweep([10, 11])
+        self.assertEqual(report[10]["replicas"], 3)
+        self.assertGreater(report[11]["replicas"], 3)
+        self.assertTrue(report[11]["converged"])
+        self.assertLessEqual(report[11]["metrics"]["final_unsatisfied"]["std_error"], 1.0)
+
+    def test_max_replicas_caps_unconverged_point(self):
+        """达到重复次数上限仍未满足容差时应停止并报告"""
+        sweeper = AdaptiveReplicas(noisy_run({10: 50.0}), tolerance={"final_unsatisfied": 0.01},
+                                   min_replicas=2, max_replicas=5)
+        report = sweeper.sweep([10])
+        self.assertEqual(report[10]["replicas"], 5)
+        self.assertFalse(report[10]["converged"])
+        self.assertEqual(standard_error([1.0]), float("inf"))
+        with self.assertRaises(KeyError):
+            AdaptiveReplicas(noisy_run({}), tolerance={"unknown": 1.0})
+
+    def test_rejects_empty_or_non_positive_tolerance(self):
+        """没有指标或容差不为正数时无法判断收敛，应在运行前报错"""
+        for tolerance in ({}, {"final_unsatisfied": 0.0}, {"occupancy_rate": -0.1}):
+            with self.assertRaises(ValueError):
+                AdaptiveReplicas(noisy_run({}), tolerance=tolerance)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from backend.test.stubs import RuleLeaveStubClients
+from backend.test.helpers import simulation_sandbox
+
+PARA = {"character": "守序", "schedule_type": "正常", "focus_type": "中", "course_situation": "中"}
+NO_PREFERENCE = {"lamp": 0.0, "socket": 0.0, "space": 0.0}  # 满意度为1，离座时不占座
+
+
+def _schedule(*items):
+    return [{"time": f"{time}:00", "action": action} for time, action in items]
+
+
+class TestWaitlist(unittest.TestCase):
+    """测试等座队列"""
+
+    def _library(self, waitlist):
+        from backend.library import Library
+        from backend.seats import Seat
+        from backend.students import Student
+        library = Library()
+        library.seats = [Seat(5, 5), Seat(5, 7)]
+        library.seats_map = {seat.coordinate: seat for seat in library.seats}
+        schedules = [
+            _schedule(("07:00", "start"), ("07:15", "learn"), ("08:00", "eat"), ("22:00", "end")),
+            _schedule(("07:00", "start"), ("07:15", "learn"), ("22:00", "end")),
+            _schedule(("07:00", "start"), ("07:30", "learn"), ("09:00", "eat"), ("22:00", "end")),  # 后到
+            _schedule(("07:00", "start"), ("07:15", "learn"), ("22:00", "end")),  # 先到
+        ]
+        library.students = [Student(i, PARA, NO_PREFERENCE, schedule=schedule) for i, schedule in enumerate(schedules)]
+        if waitlist:
+            library.enable_waitlist()
+        return library
+
+    def _run_until(self, library, time):
+        with patch('backend.students.get_shared_client', RuleLeaveStubClients):
+            while library.current_time.strftime('%H:%M') != time:
+                library.update()
+
+    def test_freed_seat_goes_to_first_in_line(self):
+        from backend.students import StudentState
+        library = self._library(waitlist=True)
+        self._run_until(library, "07:45")
+        self.assertEqual(list(library.waitlist), [3, 2])
+        self.assertEqual(library.unsatisfied, 1 + 2 + 2)  # 每个tick结束时仍在排队的人数
+        self._run_until(library, "08:00")  # 学生0离开，空出的座位给先排队的学生3
+        students = library.students
+        self.assertEqual(students[3].state, StudentState.LEARNING)
+        self.assertIs(students[3].seat, library.seats[0])
+        self.assertEqual(list(library.waitlist), [2])
+        self.assertEqual(library.unsatisfied, 6)
+        self._run_until(library, "09:00")  # 日程转为非学习动作时离开队列
+        self.assertEqual(list(library.waitlist), [])
+        self.assertEqual(library.unsatisfied, 6 + 3)  # 08:15至08:45仍在排队
+
+    def test_without_waitlist_first_in_list_order_wins(self):
+        """不开启队列时保持原有规则：按学生顺序逐个选座，每次选座失败计一次不满意"""
+        from backend.students import StudentState
+        library = self._library(waitlist=False)
+        self._run_until(library, "08:00")
+        self.assertEqual(library.students[2].state, StudentState.LEARNING)
+        self.assertEqual(library.unsatisfied, 1 + 2 + 2 + 1)
+
+    def test_simulation_records_and_checkpoint(self):
+        from backend.checkpoint import library_state, restore_library
+        from backend.simulation import Simulation
+        with simulation_sandbox(RuleLeaveStubClients):
+            random.seed(5)
+            sim = Simulation(row=3, column=3, num_students=30, prefetch=False, waitlist=True)
+            while sim.library.current_time.strftime('%H:%M') != "10:00":
+                sim.step()
+            waiting = list(sim.library.waitlist)
+            restored = restore_library(library_state(sim.library))
+        self.assertGreater(sim.jm.data[-1]["waitlist_num"], 0)
+        self.assertEqual(sim.jm.data[-1]["waitlist_num"], len(waiting))
+        self.assertEqual(list(restored.waitlist), waiting)
+        self.assertTrue(all(restored.waitlist[i] is next(s for s in restored.students if s.student_id == i)
+                            for i in waiting))
+
+
+if __name__ == '__main__':
+    unittest.main()
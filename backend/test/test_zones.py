@@ -0,0 +1,94 @@
+import gc
+import random
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from backend.test.stubs import RuleLeaveStubClients
+from backend.test.helpers import simulation_sandbox
+
+
+class TestZonedEngine(unittest.TestCase):
+    """测试分区并行引擎"""
+
+    def _library(self, number, row=6, column=5, num_students=40):
+        from backend.simulation import Simulation
+        random.seed(11)
+        return Simulation(row=row, column=column, num_students=num_students, simulation_number=number,
+                          prefetch=False)
+
+    def test_single_zone_matches_object_engine(self):
+        """只有一个区域时，逐tick输出应与Simulation一致"""
+        from backend.zones import ZonedEngine
+        with simulation_sandbox(RuleLeaveStubClients, quiet=False):
+            sim = self._library(1)
+            engine = ZonedEngine(sim.library, zones=1, parallel=False)  # 初始化时复制状态
+            sim.run(run_all=True)
+            records = engine.run()[0]
+        self.assertEqual(sim.jm.data[1:], records)
+
+    def test_worker_processes_match_in_process_zones(self):
+        """多进程与主进程中依次执行的区域结果应一致，且座位与学生状态保持一致"""
+        from backend.ensemble import LEARNING, RESERVED, SIGNED, TAKEN
+        from backend.zones import ZonedEngine
+        with simulation_sandbox(RuleLeaveStubClients, quiet=False):
+            library = self._library(2).library
+            local = ZonedEngine(library, zones=3, parallel=False)
+            workers = ZonedEngine(library, zones=3, parallel=True)
+            self.assertEqual(workers.run(), local.run())
+        self.assertIsNone(workers.shared)
+        self.assertEqual(sorted(set(local.zone_of_seat.tolist())), [0, 1, 2])
+        # 学习中的学生各占一个座位，且归属其座位所在的区域
+        learning = np.nonzero(local.state[0] == LEARNING)[0]
+        seats = local.seat_of[0, learning]
+        self.assertEqual(len(set(seats.tolist())), len(learning))
+        self.assertTrue(np.isin(local.status[0, seats], (TAKEN, RESERVED, SIGNED)).all())
+        self.assertTrue((local.zone_of_student[learning] == local.zone_of_seat[seats]).all())
+
+    def test_run_zoned_matches_run(self):
+        """Simulation.run_zoned只有一个区域时与run结果一致，头部注明离座决策为规则"""
+        with simulation_sandbox(RuleLeaveStubClients, quiet=False):
+            sim = self._library(3)
+            sim.run(run_all=True)
+            zoned = self._library(4)
+            data = zoned.run_zoned(zones=1, parallel=False)
+        self.assertEqual(data[1:], sim.jm.data[1:])
+        self.assertEqual(data[0]["zones"], {"zones": 1, "leave_decisions": "rule"})
+
+    def test_shared_memory_released_on_failed_init_and_collection(self):
+        """初始化失败或引擎未关闭就被回收时，共享内存都会被释放"""
+        from multiprocessing import shared_memory
+        from backend import zones
+
+        def assert_released(specs):
+            for block_name, _, _ in specs.values():
+                with self.assertRaises(FileNotFoundError):
+                    shared_memory.SharedMemory(name=block_name)
+
+        with simulation_sandbox(RuleLeaveStubClients, quiet=False):
+            library = self._library(5).library
+            with patch.object(zones.SharedArrays, 'close', autospec=True,
+                              side_effect=zones.SharedArrays.close) as close, \
+                    patch.object(zones, '_Zone', side_effect=RuntimeError("zone")):
+                with self.assertRaises(RuntimeError):
+                    zones.ZonedEngine(library, zones=2, parallel=False)
+            close.assert_called_once()
+            assert_released(close.call_args[0][0].specs)
+
+            engine = zones.ZonedEngine(library, zones=2, parallel=False)
+            specs = engine.shared.specs
+            del engine
+            gc.collect()
+            assert_released(specs)
+
+    def test_row_bands_clamped_to_row_count(self):
+        """区域数多于行数时每行一个区域，编号从0开始连续"""
+        from backend.zones import row_bands
+        coordinates = [(x, y) for x in range(3) for y in range(4)]
+        self.assertEqual(sorted(set(row_bands(coordinates, 8).tolist())), [0, 1, 2])
+        self.assertEqual(set(row_bands(coordinates, 2).tolist()), {0, 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
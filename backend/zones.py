@@ -0,0 +1,305 @@
+"""
+zones.py
+分区并行的tick
+大型阅览室每个tick的选座、拥挤参数和标记/清理都在一个Python线程中遍历全部座位，受GIL限制，多线程无法加速。
+ZonedEngine把座位网格划分为若干区域（楼层或按行划分的矩形块），每个区域由一个工作进程处理，
+座位和学生状态保存在共享内存的NumPy数组中：
+    - 阶段一（各区域并行）：清理本区域超时的座位，按学生下标顺序处理归属本区域的学生；
+      学生只会读写自己所在区域的座位，区域之间互不冲突
+    - 协调（主进程）：在本区域找不到空位的学生按下标顺序在其他区域选座，成功后归属转移到座位所在区域
+    - 阶段二（各区域并行）：更新本区域座位的计时和拥挤参数、标记违规占座；
+      拥挤参数读取相邻区域边界上的座位状态，由于阶段一和协调都已结束，共享数组即完成了边界交换
+只有一个区域时，输出与Simulation逐tick一致；模拟中通过Simulation.run_zoned显式开启
+"""
+import multiprocessing as mp
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .ensemble import (AWAY, AWAY_ACTION, END, GONE, LEARN, LEARNING, OTHER, RESERVED, SIGNED, SLEEP, START,
+                       TAKEN, VACANT, EnsembleEngine, reserve_rule, satisfaction)
+
+# 放入共享内存的数组；副本维度为1的数组去掉副本维
+_REPLICA_ARRAYS = ("status", "taken_seconds", "crowded", "lamp", "socket", "window", "window_neighbours",
+                   "state", "seat_of", "preference", "lawful", "selfish", "actions")
+_STATIC_ARRAYS = ("neighbours", "neighbour_count", "_neighbour_valid", "_neighbour_safe", "zone_of_seat",
+                  "zone_of_student")
+
+
+def row_bands(coordinates: list, zones: int) -> np.ndarray:
+    """
+    按行把座位划分为连续的横向区域，区域数多于行数时每行一个区域
+
+    Args:
+        coordinates (list): 座位坐标
+        zones (int): 区域数
+
+    Returns:
+        np.ndarray: 每个座位所在的区域，从0开始连续编号
+    """
+    rows = sorted({x for x, _ in coordinates})
+    zones = max(1, min(zones, len(rows)))
+    band = {x: i * zones // len(rows) for i, x in enumerate(rows)}
+    return np.array([band[x] for x, _ in coordinates], dtype=np.int32)
+
+
+class SharedArrays:
+    """一组共享内存中的NumPy数组，工作进程按名称附加"""
+
+    def __init__(self, arrays: dict = None, specs: dict = None) -> None:
+        """
+        Args:
+            arrays (dict): 名称 -> 数组，创建共享内存并复制
+            specs (dict): 名称 -> (共享内存名称, 形状, 类型)，附加到已有的共享内存
+        """
+        self._blocks = []
+        self.arrays = {}
+        self.specs = {}
+        self._owner = arrays is not None
+        if arrays is not None:
+            for name, array in arrays.items():
+                block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+                view[...] = array
+                self._blocks.append(block)
+                self.arrays[name] = view
+                self.specs[name] = (block.name, array.shape, array.dtype.str)
+        else:
+            for name, (block_name, shape, dtype) in specs.items():
+                block = shared_memory.SharedMemory(name=block_name)
+                self._blocks.append(block)
+                self.arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            self.specs = dict(specs)
+
+    def close(self) -> None:
+        """释放映射，创建者同时删除共享内存"""
+        self.arrays.clear()
+        for block in self._blocks:
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks.clear()
+
+
+class _Zone:
+    """一个区域的tick逻辑，在工作进程或主进程中运行"""
+
+    def __init__(self, zone: int, arrays: dict, limit_seconds: float, step_seconds: int) -> None:
+        self.zone = zone
+        for name, array in arrays.items():
+            setattr(self, name.lstrip("_"), array)
+        self.seats = np.nonzero(self.zone_of_seat == zone)[0]
+        self.limit_seconds = limit_seconds
+        self.step_seconds = step_seconds
+
+    def students(self, tick: int, hour: int) -> tuple[int, int, list]:
+        """
+        阶段一：清理本区域超时的座位，处理归属本区域的学生
+
+        Returns:
+            tuple: (清理数, 不满意数, 需要在其他区域选座的学生下标)
+        """
+        status, seat_of, state = self.status, self.seat_of, self.state
+        seats = self.seats
+        cleared = seats[(status[seats] == SIGNED) & (self.taken_seconds[seats] > self.limit_seconds)]
+        status[cleared] = VACANT
+
+        members = np.nonzero(self.zone_of_student == self.zone)[0]
+        action = self.actions[members, tick]
+        before = state[members].copy()  # 本tick开始时的状态
+        state[members[(action == START) & (before == SLEEP)]] = GONE
+        state[members[action == END]] = SLEEP
+        unsatisfied = int(((action == LEARN) & (before == SLEEP)).sum())
+
+        leaving = ((action == AWAY_ACTION) | (action == OTHER)) & (before == LEARNING)
+        checking = (action == OTHER) & (before == AWAY)
+        seeking = (action == LEARN) & ((before == AWAY) | (before == GONE))
+        reserve = np.zeros(len(members), dtype=bool)
+        if leaving.any():
+            n, s = members[leaving], seat_of[members[leaving]]
+            value = satisfaction(self.preference[n], self.lamp[s], self.socket[s], self.window[s], self.crowded[s])
+            reserve[leaving] = reserve_rule(value, self.lawful[n], self.selfish[n], hour)
+
+        overflow = []
+        for i in np.nonzero(leaving | checking | seeking)[0]:
+            n = members[i]
+            s = seat_of[n]
+            if leaving[i]:
+                if status[s] == TAKEN:  # Seat.leave只处理占用中的座位
+                    status[s] = RESERVED if reserve[i] else VACANT
+                state[n] = AWAY if reserve[i] else GONE
+            elif checking[i]:
+                if s >= 0 and status[s] in (VACANT, TAKEN):
+                    state[n] = GONE  # 座位已被清理或被他人占用
+            else:
+                if before[i] == AWAY and s >= 0 and status[s] == RESERVED:
+                    status[s] = TAKEN
+                    state[n] = LEARNING
+                elif not self.choose(n, seats):
+                    overflow.append(int(n))
+        return len(cleared), unsatisfied, overflow
+
+    def choose(self, n: int, seats: np.ndarray) -> bool:
+        """在seats中为学生n选择第一个满意度最高的空闲座位"""
+        vacant = seats[self.status[seats] == VACANT]
+        if not len(vacant):
+            return False
+        scores = satisfaction(self.preference[n], self.lamp[vacant], self.socket[vacant], self.window[vacant],
+                              self.crowded[vacant])
+        best = vacant[scores.argmax()]
+        self.status[best] = TAKEN
+        self.seat_of[n] = best
+        self.state[n] = LEARNING
+        return True
+
+    def seats_update(self) -> None:
+        """阶段二：本区域座位的计时、拥挤参数和违规标记"""
+        status, seats = self.status, self.seats
+        signed = seats[status[seats] == SIGNED]
+        self.taken_seconds[signed] += self.step_seconds
+        occupied = (status[self.neighbour_safe[seats]] != VACANT) & self.neighbour_valid[seats]
+        crowded = occupied.sum(axis=1) - 0.5 * self.window_neighbours[seats]
+        count = self.neighbour_count[seats]
+        self.crowded[seats] = np.where(count > 0, crowded / np.maximum(count, 1), 0.0)
+        reserved = seats[status[seats] == RESERVED]
+        status[reserved] = SIGNED
+
+
+def _serve(conn, zone: int, specs: dict, limit_seconds: float, step_seconds: int) -> None:
+    """工作进程：附加共享内存，按协调进程的指令执行阶段一和阶段二"""
+    shared = SharedArrays(specs=specs)
+    worker = _Zone(zone, shared.arrays, limit_seconds, step_seconds)
+    try:
+        while True:
+            command, *args = conn.recv()
+            if command == "students":
+                conn.send(worker.students(*args))
+            elif command == "seats":
+                worker.seats_update()
+                conn.send(None)
+            else:
+                break
+    finally:
+        del worker
+        shared.close()
+        conn.close()
+
+
+def _release(shared: SharedArrays, workers: list) -> None:
+    """停止工作进程并释放共享内存，由ZonedEngine.close或引擎被回收时的finalize调用"""
+    for process, conn in workers:
+        try:
+            conn.send(("stop",))
+        except (BrokenPipeError, OSError):
+            pass
+        process.join(timeout=5)
+        conn.close()
+    workers.clear()
+    shared.close()
+
+
+class ZonedEngine(EnsembleEngine):
+    """
+    按区域划分、多进程并行推进的单副本引擎，离座决策与EnsembleEngine相同使用本地规则，见ensemble模块说明
+    学生最初按下标轮流归属各区域，之后归属其座位所在的区域
+    """
+
+    def __init__(self, library, zones: int = None, zone_of_seat=None, parallel: bool = True) -> None:
+        """
+        Args:
+            library (Library): 已初始化的图书馆
+            zones (int): 按行划分的区域数，默认为CPU核数；zone_of_seat给出时忽略
+            zone_of_seat (callable): 座位坐标 -> 区域编号（如楼层），从0开始连续编号
+            parallel (bool): 是否每个区域使用一个工作进程，为False时在主进程中依次执行（结果相同）
+        """
+        super().__init__([library])
+        if zone_of_seat is not None:
+            self.zone_of_seat = np.array([zone_of_seat(c) for c in self.coordinates], dtype=np.int32)
+        else:
+            self.zone_of_seat = row_bands(self.coordinates, zones or mp.cpu_count())
+        self.zones = int(self.zone_of_seat.max()) + 1
+        self.zone_of_student = (np.arange(self.num_students) % self.zones).astype(np.int32)
+
+        arrays = {name: getattr(self, name)[0] for name in _REPLICA_ARRAYS}
+        arrays.update({name: getattr(self, name) for name in _STATIC_ARRAYS})
+        self._workers = []
+        self._local = []
+        self.shared = SharedArrays(arrays)
+        # 未调用close（如忘记使用with或run）时，引擎被回收或解释器退出时仍会停止工作进程并释放共享内存
+        self._finalizer = weakref.finalize(self, _release, self.shared, self._workers)
+        try:
+            for name in _REPLICA_ARRAYS:  # 主进程以副本维度为1的视图访问，snapshot等沿用EnsembleEngine
+                setattr(self, name, self.shared.arrays[name][None])
+            for name in _STATIC_ARRAYS:
+                setattr(self, name, self.shared.arrays[name])
+            limit, step = float(self.limit_seconds[0]), int(self.time_delta.total_seconds())
+
+            if parallel:
+                ctx = mp.get_context()
+                for zone in range(self.zones):
+                    parent, child = ctx.Pipe()
+                    process = ctx.Process(target=_serve, args=(child, zone, self.shared.specs, limit, step),
+                                          daemon=True)
+                    process.start()
+                    self._workers.append((process, parent))
+                    child.close()
+            else:
+                self._local = [_Zone(zone, self.shared.arrays, limit, step) for zone in range(self.zones)]
+            self._coordinator = _Zone(-1, self.shared.arrays, limit, step)
+        except BaseException:
+            self.close()  # 初始化失败时已创建的共享内存和已启动的工作进程不会再被使用
+            raise
+
+    def _broadcast(self, *command) -> list:
+        """向所有区域发送指令并等待全部完成"""
+        if self._local:
+            if command[0] == "students":
+                return [zone.students(*command[1:]) for zone in self._local]
+            return [zone.seats_update() for zone in self._local]
+        for _, conn in self._workers:
+            conn.send(command)
+        return [conn.recv() for _, conn in self._workers]
+
+    def step(self) -> None:
+        """推进一个tick"""
+        self.current_time += self.time_delta
+        results = self._broadcast("students", self.tick, self.current_time.hour)
+        self.tick += 1
+        overflow = []
+        for cleared, unsatisfied, students in results:
+            self.cleared[0] += cleared
+            self.unsatisfied[0] += unsatisfied
+            overflow.extend(students)
+        # 协调：本区域没有空位的学生按下标顺序在其他区域选座
+        seat_zone = self.zone_of_seat
+        for n in sorted(overflow):
+            others = np.nonzero(seat_zone != self.zone_of_student[n])[0]
+            if self._coordinator.choose(n, others):
+                self.zone_of_student[n] = seat_zone[self.seat_of[0, n]]
+            else:
+                self.unsatisfied[0] += 1
+        self._broadcast("seats")
+
+    def run(self) -> list[list[dict]]:
+        """运行到午夜后关闭工作进程并释放共享内存"""
+        try:
+            return super().run()
+        finally:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """关闭工作进程并释放共享内存，可重复调用"""
+        self._local = []
+        if self.shared is not None:
+            arrays = {name: getattr(self, name).copy() for name in _REPLICA_ARRAYS + _STATIC_ARRAYS}
+            self._finalizer()  # 只执行一次
+            self.shared = None
+            for name, array in arrays.items():  # 释放共享内存后仍可读取最终状态
+                setattr(self, name, array)
@@ -0,0 +1,93 @@
+"""
+bench_campus.py
+校园多图书馆模拟基准测试
+在一条直线上等距布置若干个相同规模的图书馆（第一个过载，其余正常），分别在主进程中和多个工作进程中运行一整天，
+比较每秒推进的tick数以及分流的人次。离座决策走兜底规则；建馆（日程请求）单独计时，不计入推进耗时
+
+用法（在项目根目录）：
+    python -m benchmarks.bench_campus
+    python -m benchmarks.bench_campus --libraries 8 32 --workers 0 4 --grid 10x10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_LIBRARIES = [4, 16, 32]
+DEFAULT_WORKERS = [0, 4]
+
+
+def campus_config(count: int, row: int, column: int, ratio: float, spacing: float = 200) -> list[dict]:
+    """count个图书馆的配置，第一个的学生数为其余的3倍"""
+    students = max(1, int(row * column * ratio))
+    return [{"name": f"library-{i}", "row": row, "column": column, "position": (i * spacing, 0),
+             "num_students": students * 3 if i == 0 else students} for i in range(count)]
+
+
+def run_case(count: int, workers: int, row: int, column: int, ratio: float, seed: int = 0) -> dict:
+    """
+    运行一个基准用例
+
+    Returns:
+        dict: 建馆耗时、推进耗时、每秒tick数和全校指标
+    """
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    from unittest.mock import patch
+    from backend.campus import Campus
+    from backend.events import Level
+    from benchmarks.stubs import RuleLeaveStubClients
+
+    with patch("backend.students.get_shared_client", RuleLeaveStubClients):
+        start = time.perf_counter()
+        campus = Campus(campus_config(count, row, column, ratio), workers=workers, seed=seed, log_level=Level.SILENT)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        with campus:
+            while campus.time != "00:00":
+                campus.step()
+            seconds = time.perf_counter() - start
+            summary = campus.finish()["campus"]
+    return {
+        "libraries": count,
+        "workers": workers,
+        "grid": f"{row}x{column}",
+        "build_seconds": round(build_seconds, 4),
+        "seconds": round(seconds, 4),
+        "ticks_per_second": round(len(campus.ticks) / seconds, 2),
+        "routed": summary["routed"],
+        "unsatisfied": summary["unsatisfied"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="校园多图书馆模拟基准测试")
+    parser.add_argument("--libraries", nargs="+", type=int, default=DEFAULT_LIBRARIES, help="图书馆数")
+    parser.add_argument("--workers", nargs="+", type=int, default=DEFAULT_WORKERS, help="工作进程数，0为主进程")
+    parser.add_argument("--grid", default="10x10", help="每个图书馆的座位网格")
+    parser.add_argument("--ratio", type=float, default=1.0, help="正常图书馆的学生数与座位数的比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--output", default=None, help="结果JSON路径，不指定时只打印")
+    args = parser.parse_args(argv)
+
+    row, column = (int(part) for part in args.grid.lower().split("x"))
+    print(f"CPU核数: {os.cpu_count()}")
+    results = []
+    for count in args.libraries:
+        for workers in args.workers:
+            result = run_case(count, workers, row, column, args.ratio, args.seed)
+            results.append(result)
+            print(f"{count:>4} 个图书馆 {workers:>3} 个工作进程: 建馆 {result['build_seconds']:>7.2f}s, "
+                  f"{result['ticks_per_second']:>8.2f} tick/s, 分流 {result['routed']} 人次")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基准结果已保存到 {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+bench_engine.py
+模拟引擎基准测试
+使用确定性的LLM替身，在不同座位网格和学生数量组合下运行完整的一天模拟，
+记录每秒tick数、峰值内存和分阶段耗时，结果保存为JSON以便在不同提交之间对比；
+--llm mock时改为通过真实请求路径连接本地模拟LLM服务，可配置延迟和故障率，测量含LLM延迟的吞吐
+
+用法（在项目根目录）：
+    python -m benchmarks.bench_engine
+    python -m benchmarks.bench_engine --grids 3x3 20x20 --ratios 1.0 --output bench.json
+    python -m benchmarks.bench_engine --compare old.json new.json
+    python -m benchmarks.bench_engine --grids 10x10 --ratios 1.5 --llm mock --latency-ms 200 --latency-sigma 0.5
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import multiprocessing as mp
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+DEFAULT_GRIDS = ["3x3", "20x20", "50x50", "100x100"]
+DEFAULT_RATIOS = [0.5, 1.0, 2.0]  # 学生数 = 座位数 × 比例，覆盖空闲、饱和与超载三种情况
+DEFAULT_MAX_STUDENTS = 5000  # 更大的用例单次运行需要数十分钟，需要时用--max-students放开
+
+
+def parse_grid(text: str) -> tuple:
+    """将"20x20"形式的字符串解析为(行, 列)"""
+    row, column = text.lower().split("x")
+    return int(row), int(column)
+
+
+def _peak_rss_kb():
+    """返回当前进程的峰值常驻内存（KB），平台不支持时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS以字节为单位
+
+
+def run_case(row: int, column: int, num_students: int, seed: int = 0, trace_memory: bool = False,
+             llm: str = "stub", mock_config: dict = None, waitlist: bool = False) -> dict:
+    """
+    在当前进程中运行一个基准用例
+
+    Args:
+        row (int): 座位行数
+        column (int): 座位列数
+        num_students (int): 学生数量
+        seed (int): 随机数种子，保证选座等随机行为可复现
+        trace_memory (bool): 是否用tracemalloc统计Python对象峰值内存（会明显拖慢运行）
+        llm (str): "stub"使用进程内替身，"mock"通过HTTP连接本地模拟LLM服务
+        mock_config (dict): 模拟服务的配置（延迟、错误率等），见backend.mock_llm.MOCK_LLM_CONFIG
+        waitlist (bool): 是否开启等座队列
+
+    Returns:
+        dict: 用例结果，包含耗时、tick速率、内存和分阶段耗时
+    """
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    import random
+    from contextlib import ExitStack
+    from unittest.mock import patch
+    import config
+    from backend.events import Level, configure_events
+    from benchmarks.stubs import StubClients
+
+    random.seed(seed)
+    configure_events(level=Level.SILENT)
+    if trace_memory:
+        tracemalloc.start()
+    with ExitStack() as stack:
+        tmp = stack.enter_context(tempfile.TemporaryDirectory())
+        if llm == "mock":
+            from backend.mock_llm import start_mock_server
+            server, base_url = start_mock_server(dict(mock_config or {}, seed=seed))
+            stack.callback(server.shutdown)
+            stack.enter_context(patch.object(config, "LLM_BACKEND", "mock"))
+            stack.enter_context(patch.object(config, "MOCK_LLM_URL", base_url))
+        else:
+            stack.enter_context(patch("backend.students.get_shared_client", StubClients))
+        stack.enter_context(patch("backend.simulation.simulations_base_path", tmp))
+        stack.enter_context(patch("builtins.print"))
+        from backend.simulation import Simulation
+        start = time.perf_counter()
+        sim = Simulation(row=row, column=column, num_students=num_students, profile=True, waitlist=waitlist,
+                         prefetch=True)
+        setup_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        sim.run(run_all=True)
+        run_seconds = time.perf_counter() - start
+        header = sim.jm.data[0]
+    traced_peak = None
+    if trace_memory:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    summary = sim.library.profiler.summary()
+    return {
+        "grid": f"{row}x{column}",
+        "seats": row * column,
+        "students": num_students,
+        "seed": seed,
+        "setup_seconds": round(setup_seconds, 4),
+        "run_seconds": round(run_seconds, 4),
+        "ticks": summary["ticks"],
+        "ticks_per_second": round(summary["ticks"] / run_seconds, 3) if run_seconds else None,
+        "peak_rss_kb": _peak_rss_kb(),
+        "traced_peak_bytes": traced_peak,
+        "phases": summary["phases"],
+        "llm": llm,
+        "waitlist": waitlist,
+        "llm_usage": header.get("llm_usage"),
+        "leave_prefetch": header.get("leave_prefetch"),
+    }
+
+
+def _git_commit():
+    """获取当前提交号，用于标记结果来源"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_matrix(grids: list, ratios: list, seed: int = 0, trace_memory: bool = False,
+               max_students: int = None, llm: str = "stub", mock_config: dict = None, waitlist: bool = False) -> list:
+    """
+    运行网格 × 学生数量的基准矩阵
+    每个用例在独立的子进程中运行，使峰值内存互不影响
+
+    Args:
+        grids (list): 网格字符串列表，如["3x3", "20x20"]
+        ratios (list): 学生数与座位数的比例列表
+        seed (int): 随机数种子
+        trace_memory (bool): 是否启用tracemalloc
+        max_students (int): 学生数上限，超过的用例跳过
+        llm (str): "stub"或"mock"，见run_case
+        mock_config (dict): 模拟服务的配置
+        waitlist (bool): 是否开启等座队列
+
+    Returns:
+        list: 各用例结果
+    """
+    results = []
+    ctx = mp.get_context("spawn")
+    for grid in grids:
+        row, column = parse_grid(grid)
+        for ratio in ratios:
+            num_students = max(1, int(row * column * ratio))
+            if max_students is not None and num_students > max_students:
+                print(f"跳过 {grid} × {num_students} 名学生（超过上限 {max_students}）")
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                result = pool.submit(run_case, row, column, num_students, seed, trace_memory, llm, mock_config,
+                                     waitlist).result()
+            result["ratio"] = ratio
+            results.append(result)
+            print(f"{grid:>8} {num_students:>6} 名学生: {result['run_seconds']:>9.3f}s, "
+                  f"{result['ticks_per_second']:>8.2f} tick/s, 峰值RSS {result['peak_rss_kb']} KB")
+    return results
+
+
+def compare_reports(old_path: str, new_path: str) -> list:
+    """
+    对比两次基准结果中相同用例的tick速率
+
+    Args:
+        old_path (str): 基线结果JSON路径
+        new_path (str): 新结果JSON路径
+
+    Returns:
+        list: 每个共同用例的(网格, 学生数, 旧速率, 新速率, 加速比)
+    """
+    with open(old_path, encoding="utf-8") as f:
+        old = {(r["grid"], r["students"]): r for r in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = {(r["grid"], r["students"]): r for r in json.load(f)["results"]}
+    rows = []
+    for key in sorted(old.keys() & new.keys(), key=lambda k: (parse_grid(k[0]), k[1])):
+        old_rate, new_rate = old[key]["ticks_per_second"], new[key]["ticks_per_second"]
+        speedup = new_rate / old_rate if old_rate else None
+        rows.append((key[0], key[1], old_rate, new_rate, speedup))
+        print(f"{key[0]:>8} {key[1]:>6} 名学生: {old_rate:>8.2f} -> {new_rate:>8.2f} tick/s "
+              f"({speedup:.2f}x)" if speedup else f"{key[0]:>8} {key[1]:>6} 名学生: 无法比较")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟引擎基准测试")
+    parser.add_argument("--grids", nargs="+", default=DEFAULT_GRIDS, help="座位网格，如 3x3 20x20")
+    parser.add_argument("--ratios", nargs="+", type=float, default=DEFAULT_RATIOS, help="学生数与座位数的比例")
+    parser.add_argument("--max-students", type=int, default=DEFAULT_MAX_STUDENTS,
+                        help="学生数上限，超过的用例跳过（默认5000，100x100只运行0.5倍用例）")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--trace-memory", action="store_true", help="用tracemalloc统计Python对象峰值内存")
+    parser.add_argument("--output", default=None, help="结果JSON路径，默认保存到benchmarks/results/")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="对比两次基准结果，不运行基准")
+    parser.add_argument("--llm", choices=("stub", "mock"), default="stub",
+                        help="stub: 进程内确定性替身；mock: 经HTTP连接本地模拟LLM服务")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="模拟服务的延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.0, help="模拟服务对数正态延迟的形状参数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务的错误响应比例")
+    parser.add_argument("--waitlist", action="store_true", help="开启等座队列")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="模拟服务的格式错误回复比例")
+    args = parser.parse_args(argv)
+    if args.compare:
+        return compare_reports(*args.compare)
+
+    mock_config = {"latency_ms": args.latency_ms, "latency_sigma": args.latency_sigma,
+                   "error_rate": args.error_rate, "malformed_rate": args.malformed_rate}
+    results = run_matrix(args.grids, args.ratios, args.seed, args.trace_memory, args.max_students,
+                         args.llm, mock_config, args.waitlist)
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "llm": args.llm,
+        "waitlist": args.waitlist,
+        "mock_config": mock_config if args.llm == "mock" else None,
+        "results": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"engine_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"基准结果已保存到 {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+bench_ensemble.py
+多副本锁步引擎基准测试
+对同一组已初始化的图书馆，分别用逐对象引擎逐个运行和用EnsembleEngine锁步运行一整天，
+比较每秒完成的副本数；两种方式的离座决策都走兜底规则，并校验输出逐tick一致。
+只计模拟推进的耗时，不含学生初始化（日程请求）和逐tick写文件
+
+用法（在项目根目录）：
+    python -m benchmarks.bench_ensemble
+    python -m benchmarks.bench_ensemble --grids 10x10 20x20 --replicas 1 8 32 --ratio 1.5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_GRIDS = ["10x10", "20x20"]
+DEFAULT_REPLICAS = [1, 4, 16]
+
+
+def run_case(row: int, column: int, num_students: int, replicas: int, seed: int = 0) -> dict:
+    """
+    运行一个基准用例
+
+    Args:
+        row (int): 座位行数
+        column (int): 座位列数
+        num_students (int): 学生数量
+        replicas (int): 副本数
+        seed (int): 随机数种子
+
+    Returns:
+        dict: 两种方式的耗时、每秒副本数、加速比以及输出是否一致
+    """
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    import random
+    from unittest.mock import patch
+    from backend.ensemble import EnsembleEngine
+    from backend.events import Level, configure_events
+    from benchmarks.stubs import RuleLeaveStubClients
+
+    random.seed(seed)
+    configure_events(level=Level.SILENT)
+    with tempfile.TemporaryDirectory() as tmp, \
+            patch("backend.students.get_shared_client", RuleLeaveStubClients), \
+            patch("backend.simulation.simulations_base_path", tmp), \
+            patch("builtins.print"):
+        from backend.simulation import Simulation
+        simulations = [Simulation(row=row, column=column, num_students=num_students, simulation_number=i + 1,
+                                  prefetch=False) for i in range(replicas)]
+        start = time.perf_counter()
+        engine = EnsembleEngine([sim.library for sim in simulations])  # 初始化时复制各图书馆的状态
+        outputs = engine.run()
+        ensemble_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for sim in simulations:
+            while sim.library.current_time.strftime('%H:%M') != "00:00":
+                sim.step()
+        separate_seconds = time.perf_counter() - start
+        identical = all(sim.jm.data[1:] == records for sim, records in zip(simulations, outputs))
+    return {
+        "grid": f"{row}x{column}",
+        "students": num_students,
+        "replicas": replicas,
+        "separate_seconds": round(separate_seconds, 4),
+        "ensemble_seconds": round(ensemble_seconds, 4),
+        "separate_replicas_per_second": round(replicas / separate_seconds, 3),
+        "ensemble_replicas_per_second": round(replicas / ensemble_seconds, 3),
+        "speedup": round(separate_seconds / ensemble_seconds, 2),
+        "identical": identical,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多副本锁步引擎基准测试")
+    parser.add_argument("--grids", nargs="+", default=DEFAULT_GRIDS, help="座位网格，如 10x10 20x20")
+    parser.add_argument("--replicas", nargs="+", type=int, default=DEFAULT_REPLICAS, help="副本数")
+    parser.add_argument("--ratio", type=float, default=1.5, help="学生数与座位数的比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--output", default=None, help="结果JSON路径，不指定时只打印")
+    args = parser.parse_args(argv)
+
+    results = []
+    for grid in args.grids:
+        row, column = (int(part) for part in grid.lower().split("x"))
+        num_students = max(1, int(row * column * args.ratio))
+        for replicas in args.replicas:
+            result = run_case(row, column, num_students, replicas, args.seed)
+            results.append(result)
+            print(f"{grid:>8} {num_students:>6} 名学生 × {replicas:>3} 副本: "
+                  f"逐个运行 {result['separate_replicas_per_second']:>8.2f} 副本/s, "
+                  f"锁步 {result['ensemble_replicas_per_second']:>8.2f} 副本/s "
+                  f"({result['speedup']:.1f}x){'' if result['identical'] else '，输出不一致'}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基准结果已保存到 {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+bench_floorplan.py
+平面图邻接图基准测试
+生成由若干张桌子、过道和柱子组成的不规则阅览室平面图（座位数从几百到几千），随机占用一部分座位，
+比较逐座位在seats_map中查找8个邻居计算拥挤参数（原先的实现）与邻接图稀疏乘积的耗时，并核对两者结果一致
+
+用法（在项目根目录）：
+    python -m benchmarks.bench_floorplan
+    python -m benchmarks.bench_floorplan --blocks 4 8 16 --repeat 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BLOCKS = [4, 8, 16]
+_DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def reading_room(blocks: int) -> list[str]:
+    """
+    blocks×blocks个区块的平面图，每个区块为一张2×4的桌子，四周围坐10个座位，区块之间隔一条过道，
+    每隔3个区块有一根柱子；左侧有一排窗户
+
+    Returns:
+        list[str]: 网格的每一行
+    """
+    block = ["?????.", "?TTTT?", "?TTTT?", "??????", "......"]
+    grid = []
+    for bx in range(blocks):
+        for line in block:
+            row = "W"
+            for by in range(blocks):
+                row += "#" if line == "......" and (bx + by) % 3 == 0 else line
+            grid.append(row)
+    return grid
+
+
+def dict_crowding(library) -> list[float]:
+    """原先的实现：逐座位在seats_map中查找8个邻居"""
+    from backend.seats import Status
+    result = []
+    for seat in library.seats:
+        x, y = seat.coordinate
+        crowded, count = 0, 0
+        for dx, dy in _DIRECTIONS:
+            around = library.seats_map.get((x + dx, y + dy))
+            if around:
+                count += 1
+                if around.status != Status.vacant:
+                    crowded += 1
+                if around.window:
+                    crowded -= 0.5
+        result.append(crowded / count if count > 0 else 0)
+    return result
+
+
+def run_case(blocks: int, repeat: int, occupancy: float, seed: int = 0) -> dict:
+    """
+    运行一个基准用例
+
+    Returns:
+        dict: 座位数、边数和两种实现每次计算的耗时
+    """
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    from backend.floorplan import FloorPlan
+    from backend.library import Library
+    from backend.seats import Status
+
+    random.seed(seed)
+    start = time.perf_counter()
+    library = Library()
+    library.initialize_floor_plan(FloorPlan(reading_room(blocks), name=f"room-{blocks}"))
+    build_seconds = time.perf_counter() - start
+    for seat in library.seats:
+        if random.random() < occupancy:
+            seat.status = Status.taken
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        reference = dict_crowding(library)
+    dict_seconds = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        library.calculate_each_seat_crowded_para()
+    graph_seconds = (time.perf_counter() - start) / repeat
+
+    # 平面图的邻接图含同桌座位，不能直接与原实现比较；按坐标的8邻域构建的邻接图应与原实现逐位一致
+    from backend.floorplan import NeighbourGraph
+    occupied = [seat.status != Status.vacant for seat in library.seats]
+    assert NeighbourGraph.from_seats(library.seats).crowding(occupied).tolist() == reference
+    graph = library.neighbour_graph()
+    return {
+        "blocks": blocks,
+        "seats": graph.size,
+        "edges": len(graph.indices),
+        "build_seconds": round(build_seconds, 4),
+        "dict_ms": round(dict_seconds * 1000, 3),
+        "graph_ms": round(graph_seconds * 1000, 3),
+        "speedup": round(dict_seconds / graph_seconds, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="平面图邻接图基准测试")
+    parser.add_argument("--blocks", nargs="+", type=int, default=DEFAULT_BLOCKS, help="每边的桌子区块数")
+    parser.add_argument("--repeat", type=int, default=20, help="每种实现重复计算的次数")
+    parser.add_argument("--occupancy", type=float, default=0.6, help="被占用座位的比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--output", default=None, help="结果JSON路径，不指定时只打印")
+    args = parser.parse_args(argv)
+
+    results = []
+    for blocks in args.blocks:
+        result = run_case(blocks, args.repeat, args.occupancy, args.seed)
+        results.append(result)
+        print(f"{result['seats']:>6} 个座位 {result['edges']:>7} 条边: 建图 {result['build_seconds']:>6.2f}s, "
+              f"逐座位查找 {result['dict_ms']:>8.3f}ms, 邻接图 {result['graph_ms']:>8.3f}ms, "
+              f"加速 {result['speedup']:>5.2f}x")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基准结果已保存到 {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+bench_llm_client.py
+LLM客户端连接复用基准
+在本地启动模拟LLM服务（backend.mock_llm），分别测量：
+    per_student: 每个学生各自创建一个Clients（旧做法，每个客户端一个连接池）
+    shared:      所有学生共享同一个Clients（即get_shared_client的用法）
+两种方式下的单次调用延迟和进程常驻内存
+
+用法（在项目根目录）：
+    python -m benchmarks.bench_llm_client --students 200 --calls 400
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_mock_server():
+    """在后台线程启动本地模拟服务（backend.mock_llm，零延迟），返回(server, base_url)"""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    from backend.mock_llm import start_mock_server as start
+    return start()
+
+
+def _current_rss_kb():
+    """当前进程常驻内存（KB），仅Linux可用，其他平台返回峰值RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_mode(mode: str, base_url: str, num_students: int, num_calls: int) -> dict:
+    """
+    在当前进程中运行一种客户端模式
+
+    Args:
+        mode (str): per_student 或 shared
+        base_url (str): 模拟服务地址
+        num_students (int): 学生数量（per_student模式下的客户端数量）
+        num_calls (int): 总调用次数，按学生轮流发起
+
+    Returns:
+        dict: 延迟分位数和内存数据
+    """
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    from backend import agents
+    from backend.events import Level, configure_events
+    configure_events(level=Level.SILENT)
+    options = {"base_url": base_url, "api_key": "bench", "model": "mock"}
+
+    rss_before = _current_rss_kb()
+    start = time.perf_counter()
+    if mode == "per_student":
+        clients = [agents.Clients(**options) for _ in range(num_students)]
+    else:
+        shared = agents.Clients(**options)
+        clients = [shared] * num_students
+    setup_seconds = time.perf_counter() - start
+
+    latencies = []
+    for i in range(num_calls):
+        start = time.perf_counter()
+        clients[i % num_students].response("离座决策", max_retries=1)
+        latencies.append((time.perf_counter() - start) * 1000)
+    rss_after = _current_rss_kb()
+    latencies.sort()
+    return {
+        "mode": mode,
+        "students": num_students,
+        "calls": num_calls,
+        "setup_seconds": round(setup_seconds, 4),
+        "latency_ms_p50": round(statistics.median(latencies), 3),
+        "latency_ms_p95": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "latency_ms_mean": round(statistics.fmean(latencies), 3),
+        "rss_kb_before": rss_before,
+        "rss_kb_after": rss_after,
+        "rss_kb_delta": rss_after - rss_before,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LLM客户端连接复用基准")
+    parser.add_argument("--students", type=int, default=200, help="学生数量")
+    parser.add_argument("--calls", type=int, default=400, help="总调用次数")
+    parser.add_argument("--output", default=None, help="结果JSON路径")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_mock_server()
+    results = []
+    try:
+        ctx = mp.get_context("spawn")
+        for mode in ("per_student", "shared"):
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                result = pool.submit(run_mode, mode, base_url, args.students, args.calls).result()
+            results.append(result)
+            print(f"{mode:>12}: p50 {result['latency_ms_p50']:.2f} ms, p95 {result['latency_ms_p95']:.2f} ms, "
+                  f"创建耗时 {result['setup_seconds']:.2f}s, RSS增加 {result['rss_kb_delta']} KB")
+    finally:
+        server.shutdown()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
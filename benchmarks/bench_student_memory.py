@@ -0,0 +1,77 @@
+"""
+bench_student_memory.py
+学生对象内存基准
+用tracemalloc统计创建大量学生（九种原型轮流）后每名学生占用的字节数，
+日程由确定性的LLM替身生成
+
+用法（在项目根目录）：
+    python -m benchmarks.bench_student_memory --students 10000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+FACTORIES = [f"create_{major}_{level}_student"
+             for major in ("humanities", "science", "engineering")
+             for level in ("diligent", "medium", "lazy")]
+
+
+def measure(num_students: int) -> dict:
+    """
+    创建指定数量的学生并统计内存
+
+    Args:
+        num_students (int): 学生数量
+
+    Returns:
+        dict: 总字节数和每名学生的字节数
+    """
+    from unittest.mock import patch
+    from backend.events import Level, configure_events
+    from backend.students import Student
+    from benchmarks.stubs import StubClients
+    configure_events(level=Level.SILENT)
+
+    stub = StubClients()
+    with patch("backend.students.get_shared_client", new=lambda: stub):  # 不用Mock，避免调用记录计入内存
+        Student.create_science_medium_student(-1)  # 预热：完成模块内的惰性导入和驻留表初始化
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        students = [getattr(Student, FACTORIES[i % len(FACTORIES)])(i, library_capacity=400, total_students=num_students)
+                    for i in range(num_students)]
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    total = after - before
+    return {
+        "students": len(students),
+        "total_bytes": total,
+        "bytes_per_student": round(total / num_students, 1),
+        "peak_bytes": peak - before,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="学生对象内存基准")
+    parser.add_argument("--students", type=int, default=10000, help="学生数量")
+    parser.add_argument("--output", default=None, help="结果JSON路径")
+    args = parser.parse_args(argv)
+    result = measure(args.students)
+    print(f"{result['students']} 名学生共 {result['total_bytes'] / 1024 / 1024:.2f} MB，"
+          f"每名学生 {result['bytes_per_student']:.0f} 字节")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+bench_zones.py
+分区并行引擎基准测试
+对同一个已初始化的大型阅览室，分别用不同的区域数运行一整天，比较每秒推进的tick数：
+单区域（即逐学生顺序处理）、多区域在主进程中依次执行、多区域每区一个工作进程。
+离座决策走兜底规则；只计模拟推进的耗时，不含学生初始化（日程请求）和工作进程的启动
+注意：多进程的加速受CPU核数限制，区域数超过核数时只会增加进程间同步的开销
+
+用法（在项目根目录）：
+    python -m benchmarks.bench_zones
+    python -m benchmarks.bench_zones --grids 100x100 --zones 1 2 4 8 --ratio 1.2
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_GRIDS = ["50x50", "100x100"]
+DEFAULT_ZONES = [1, 2, 4]
+
+
+def run_case(row: int, column: int, num_students: int, zones_list: list, seed: int = 0) -> list[dict]:
+    """
+    运行一个网格上的所有区域数
+
+    Args:
+        row (int): 座位行数
+        column (int): 座位列数
+        num_students (int): 学生数量
+        zones_list (list[int]): 区域数
+        seed (int): 随机数种子
+
+    Returns:
+        list[dict]: 每个区域数、每种执行方式的耗时和每秒tick数
+    """
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    import random
+    from unittest.mock import patch
+    from backend.events import Level, configure_events
+    from backend.zones import ZonedEngine
+    from benchmarks.stubs import RuleLeaveStubClients
+
+    random.seed(seed)
+    configure_events(level=Level.SILENT)
+    with tempfile.TemporaryDirectory() as tmp, \
+            patch("backend.students.get_shared_client", RuleLeaveStubClients), \
+            patch("backend.simulation.simulations_base_path", tmp), \
+            patch("builtins.print"):
+        from backend.simulation import Simulation
+        library = Simulation(row=row, column=column, num_students=num_students, prefetch=False).library
+
+    results = []
+    for zones in zones_list:
+        for parallel in ([False, True] if zones > 1 else [False]):
+            with ZonedEngine(library, zones=zones, parallel=parallel) as engine:  # 引擎初始化时复制图书馆的状态
+                start = time.perf_counter()
+                while engine.tick < engine.ticks:
+                    engine.step()
+                seconds = time.perf_counter() - start
+                results.append({
+                    "grid": f"{row}x{column}",
+                    "students": num_students,
+                    "zones": zones,
+                    "parallel": parallel,
+                    "seconds": round(seconds, 4),
+                    "ticks_per_second": round(engine.ticks / seconds, 2),
+                    "unsatisfied": int(engine.unsatisfied[0]),
+                })
+    base = results[0]["seconds"]
+    for result in results:
+        result["speedup"] = round(base / result["seconds"], 2)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分区并行引擎基准测试")
+    parser.add_argument("--grids", nargs="+", default=DEFAULT_GRIDS, help="座位网格，如 50x50 100x100")
+    parser.add_argument("--zones", nargs="+", type=int, default=DEFAULT_ZONES, help="区域数")
+    parser.add_argument("--ratio", type=float, default=1.2, help="学生数与座位数的比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    parser.add_argument("--output", default=None, help="结果JSON路径，不指定时只打印")
+    args = parser.parse_args(argv)
+
+    print(f"CPU核数: {os.cpu_count()}")
+    results = []
+    for grid in args.grids:
+        row, column = (int(part) for part in grid.lower().split("x"))
+        num_students = max(1, int(row * column * args.ratio))
+        for result in run_case(row, column, num_students, args.zones, args.seed):
+            results.append(result)
+            mode = "多进程" if result["parallel"] else "主进程"
+            print(f"{grid:>8} {num_students:>6} 名学生 {result['zones']:>3} 区域 {mode}: "
+                  f"{result['ticks_per_second']:>8.2f} tick/s ({result['speedup']:.2f}x)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基准结果已保存到 {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""
+stubs.py
+基准测试使用的确定性LLM客户端替身，与测试共用，定义在backend/test/stubs.py
+"""
+from backend.test.stubs import SCHEDULE_TEMPLATES, RuleLeaveStubClients, StubClients
@@ -7,4 +7,9 @@ simulation_data_path = os.path.join(current_dir, 'simulation_data')
 simulations_base_path = os.path.join(simulation_data_path, 'simulations')
 
 # 测试模拟路径（保留但不再使用）
-test_simulation_path = os.path.join(simulation_data_path, 'test')
\ No newline at end of file
+test_simulation_path = os.path.join(simulation_data_path, 'test')
+
+# LLM后端："remote"使用utils中配置的API；"mock"使用本地模拟服务（backend/mock_llm.py），无需网络和API密钥
+LLM_BACKEND = os.environ.get('LIBRARY_LLM_BACKEND', 'remote')
+# 模拟服务地址，如"http://127.0.0.1:8765/v1"；为None时在进程内自动启动一个
+MOCK_LLM_URL = os.environ.get('LIBRARY_MOCK_LLM_URL')
@@ -14,9 +14,7 @@ import subprocess
 
 import multiprocessing as mp
 
-import pandas as pd
-
-import matplotlib.pyplot as plt
+import queue
 
 import io
 
@@ -33,7 +31,10 @@ sys.path.insert(0, PROJECT_ROOT)
 from backend.simulation import Simulation
 from backend.library import Library
 from backend.students import Student
-from backend.plot import save_figure
+from backend.events import Level, configure_events
+from backend.agents import llm_stats, merge_usage, summarize_usage
+from backend.json_manager import open_fuc, test_form
+# 绘图模块在生成图像的接口中按需导入，避免每个模拟进程承担matplotlib的导入开销
 
 def get_next_simulation_number(total_seats, total_students):
     """获取下一个可用的模拟编号，用于自动确定simulation_number"""
@@ -161,6 +162,53 @@ def get_simulation_records():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/llm_usage')
+def get_llm_usage():
+    """Get LLM call statistics recorded in simulation headers, optionally filtered by seat_folder"""
+    try:
+        seat_folder = request.args.get('seat_folder')
+        runs = []
+        if os.path.exists(SIMULATIONS_PATH):
+            for seat_dir in sorted(os.listdir(SIMULATIONS_PATH)):
+                seat_dir_path = os.path.join(SIMULATIONS_PATH, seat_dir)
+                if not os.path.isdir(seat_dir_path) or (seat_folder and seat_dir != seat_folder):
+                    continue
+                for file in sorted(os.listdir(seat_dir_path)):
+                    if not file.endswith('.json'):
+                        continue
+                    file_path = os.path.join(seat_dir_path, file)
+                    try:
+                        header = open_fuc(test_form(file_path), file_path)[0]
+                    except Exception:
+                        continue
+                    if 'llm_usage' not in header:
+                        continue  # 早于调用统计的模拟数据
+                    runs.append({
+                        'path': os.path.join(seat_dir, file),  # 相对于SIMULATIONS_PATH的路径
+                        'test_scale': header.get('test_scale'),
+                        'llm_usage': header['llm_usage'],
+                        'llm_summary': header.get('llm_summary') or summarize_usage(header['llm_usage']),
+                    })
+
+        # 按模拟规模汇总，便于比较不同批次之间的吞吐变化
+        by_scale = {}
+        for run in runs:
+            by_scale.setdefault(run['test_scale'], []).append(run['llm_usage'])
+        totals = {}
+        for scale, usages in by_scale.items():
+            merged = merge_usage(usages)
+            totals[scale] = dict(summarize_usage(merged), runs=len(usages), by_kind=merged)
+
+        # 当前进程中的调用统计（模拟在子进程中运行时不包含其用量）
+        process = llm_stats.since({})
+        return jsonify({
+            'runs': runs,
+            'totals': totals,
+            'process': {'llm_usage': process, 'llm_summary': summarize_usage(process)},
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/plots')
 def get_plots():
     """Get plot data"""
@@ -204,6 +252,7 @@ def serve_simulation_data(filepath):
 
 def run_single_simulation(params, result_queue, simulation_id):
     """运行单个模拟的函数，用于多进程"""
+    configure_events(level=Level.WARNING)  # 后台进程不需要逐学生的调试输出
     try:
         # 创建模拟参数
         rows, cols = params['rows'], params['cols']
@@ -389,8 +438,24 @@ def start_simulation_api():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+def run_rule_ensemble(total_students, repeat_count, rows, cols, cleaning_time, humanities_ratio, science_ratio):
+    """
+    以锁步引擎一起运行同一学生数的repeat_count次重复模拟，见Simulation.run_replicas
+
+    Returns:
+        list[tuple[int, str]]: 每个副本的模拟序号和数据文件路径
+    """
+    simulation_number = get_next_simulation_number(rows * cols, total_students)
+    Simulation.run_replicas(repeat_count, row=rows, column=cols, num_students=total_students,
+                            humanities_rate=humanities_ratio / 100, science_rate=science_ratio / 100,
+                            simulation_number=simulation_number, limit_reversed_time=timedelta(minutes=cleaning_time))
+    seat_simulation_path = os.path.join(SIMULATIONS_PATH, f"{rows * cols}_seats_simulations")
+    return [(number, os.path.join(seat_simulation_path, f"{total_students}-{number}.json"))
+            for number in range(simulation_number, simulation_number + repeat_count)]
+
 def run_range_simulation(params, result_queue):
     """Run range simulation function, for multiprocessing"""
+    configure_events(level=Level.WARNING)  # 批量模拟只保留警告和错误输出
     try:
         min_students = params['min_students']
         max_students = params['max_students']
@@ -405,78 +470,106 @@ def run_range_simulation(params, result_queue):
 
         results = []
 
-        for total_students in range(min_students, max_students + 1, step):
-            for run in range(repeat_count):
-                # Use the next available simulation number for each run
-                simulation_number = get_next_simulation_number(rows * cols, total_students)
-                
-                # Create library and students
-                library = Library()
-                library.initialize_seats(rows, cols)
-                library.set_limit_reversed_time(timedelta(minutes=cleaning_time))
-                
-                # 计算各专业学生数量
-                humanities_count = int(total_students * humanities_ratio / 100)
-                science_count = int(total_students * science_ratio / 100)
-                engineering_count = total_students - humanities_count - science_count  # Remaining as Engineering
-                
-                # 创建学生
-                students = []
-                for i in range(humanities_count):
-                    if i < humanities_count // 3:
-                        students.append(Student.create_humanities_diligent_student(i, library_capacity=rows*cols, total_students=total_students))
-                    elif i < 2 * humanities_count // 3:
-                        students.append(Student.create_humanities_medium_student(i, library_capacity=rows*cols, total_students=total_students))
-                    else:
-                        students.append(Student.create_humanities_lazy_student(i, library_capacity=rows*cols, total_students=total_students))
+        def run_once(total_students):
+            """运行并保存一次模拟，返回模拟数据"""
+            # Use the next available simulation number for each run
+            simulation_number = get_next_simulation_number(rows * cols, total_students)
+            
+            # Create library and students
+            library = Library()
+            library.initialize_seats(rows, cols)
+            library.set_limit_reversed_time(timedelta(minutes=cleaning_time))
+            
+            # 计算各专业学生数量
+            humanities_count = int(total_students * humanities_ratio / 100)
+            science_count = int(total_students * science_ratio / 100)
+            engineering_count = total_students - humanities_count - science_count  # Remaining as Engineering
+            
+            # 创建学生
+            students = []
+            for i in range(humanities_count):
+                if i < humanities_count // 3:
+                    students.append(Student.create_humanities_diligent_student(i, library_capacity=rows*cols, total_students=total_students))
+                elif i < 2 * humanities_count // 3:
+                    students.append(Student.create_humanities_medium_student(i, library_capacity=rows*cols, total_students=total_students))
+                else:
+                    students.append(Student.create_humanities_lazy_student(i, library_capacity=rows*cols, total_students=total_students))
 
-                for i in range(science_count):
-                    if i < science_count // 3:
-                        students.append(Student.create_science_diligent_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
-                    elif i < 2 * science_count // 3:
-                        students.append(Student.create_science_medium_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
-                    else:
-                        students.append(Student.create_science_lazy_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
+            for i in range(science_count):
+                if i < science_count // 3:
+                    students.append(Student.create_science_diligent_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
+                elif i < 2 * science_count // 3:
+                    students.append(Student.create_science_medium_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
+                else:
+                    students.append(Student.create_science_lazy_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
 
-                for i in range(engineering_count):
-                    if i < engineering_count // 3:
-                        students.append(Student.create_engineering_diligent_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
-                    elif i < 2 * engineering_count // 3:
-                        students.append(Student.create_engineering_medium_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
-                    else:
-                        students.append(Student.create_engineering_lazy_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
+            for i in range(engineering_count):
+                if i < engineering_count // 3:
+                    students.append(Student.create_engineering_diligent_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
+                elif i < 2 * engineering_count // 3:
+                    students.append(Student.create_engineering_medium_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
+                else:
+                    students.append(Student.create_engineering_lazy_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
 
-                # 将学生添加到图书馆
-                library.students = students
-                library._count = total_students  # Set student counter
-                
-                # 运行模拟
-                simulation = Simulation(row=rows, column=cols, num_students=total_students, humanities_rate=humanities_count/total_students if total_students > 0 else 0, science_rate=science_count/total_students if total_students > 0 else 0, simulation_number=simulation_number)
-                simulation.library = library  # 替换模拟中的图书馆实例
-                simulation.run(run_all=True)
+            # 将学生添加到图书馆
+            library.students = students
+            library._count = total_students  # Set student counter
+            
+            # 运行模拟
+            simulation = Simulation(row=rows, column=cols, num_students=total_students, humanities_rate=humanities_count/total_students if total_students > 0 else 0, science_rate=science_count/total_students if total_students > 0 else 0, simulation_number=simulation_number)
+            simulation.library = library  # 替换模拟中的图书馆实例
+            simulation.run(run_all=True)
 
-                # 保存结果到对应的座位数目录
-                total_seats = rows * cols
-                seat_folder_name = f"{total_seats}_seats_simulations"
-                seat_simulation_path = os.path.join(SIMULATIONS_PATH, seat_folder_name)
-                os.makedirs(seat_simulation_path, exist_ok=True)
+            # 保存结果到对应的座位数目录
+            total_seats = rows * cols
+            seat_folder_name = f"{total_seats}_seats_simulations"
+            seat_simulation_path = os.path.join(SIMULATIONS_PATH, seat_folder_name)
+            os.makedirs(seat_simulation_path, exist_ok=True)
 
-                filename = f"{total_students}-{simulation.simulation_number}.json"
-                filepath = os.path.join(seat_simulation_path, filename)
+            filename = f"{total_students}-{simulation.simulation_number}.json"
+            filepath = os.path.join(seat_simulation_path, filename)
 
-                # 保存模拟数据
-                simulation.save_to_json(filepath)  # Use Simulation's save_to_json method to save data
+            # 保存模拟数据
+            simulation.save_to_json(filepath)  # Use Simulation's save_to_json method to save data
 
-                results.append({
-                    'student_count': total_students,
-                    'simulation_number': simulation.simulation_number,
-                    'filepath': filepath,
-                    'status': 'completed'
-                })
+            results.append({
+                'student_count': total_students,
+                'simulation_number': simulation.simulation_number,
+                'filepath': filepath,
+                'status': 'completed'
+            })
+            return simulation.jm.data
+
+        tolerance = params.get('tolerance')
+        precision = None
+        if tolerance is not None:
+            # 按方差自适应分配重复次数，repeat_count作为每个学生数的重复次数上限
+            from backend.sweep import AdaptiveReplicas, DEFAULT_TOLERANCE
+            if not isinstance(tolerance, dict):  # 单个数值按比例缩放各指标的默认容差
+                tolerance = {name: limit * tolerance for name, limit in DEFAULT_TOLERANCE.items()}
+            sweeper = AdaptiveReplicas(run_once, tolerance=tolerance,
+                                       min_replicas=params.get('min_replicas', 3), max_replicas=repeat_count)
+            precision = sweeper.sweep(range(min_students, max_students + 1, step))
+        elif params.get('rule_ensemble'):
+            # 每个学生数的重复模拟在锁步引擎中一起运行，见Simulation.run_replicas
+            for total_students in range(min_students, max_students + 1, step):
+                for number, filepath in run_rule_ensemble(total_students, repeat_count, rows, cols, cleaning_time,
+                                                          humanities_ratio, science_ratio):
+                    results.append({
+                        'student_count': total_students,
+                        'simulation_number': number,
+                        'filepath': filepath,
+                        'status': 'completed'
+                    })
+        else:
+            for total_students in range(min_students, max_students + 1, step):
+                for run in range(repeat_count):
+                    run_once(total_students)
 
         result_queue.put({
             'status': 'completed',
             'results': results,
+            'precision': precision,
             'message': f'Range simulation completed successfully'
         })
 
@@ -487,125 +580,102 @@ def run_range_simulation(params, result_queue):
             'message': f'Range simulation failed: {str(e)}'
         })
 
-@app.route('/api/repeat_simulation', methods=['POST'])
-def repeat_simulation_api():
-    """Repeat simulation API"""
+def run_capacity_search(params, result_queue):
+    """Run adaptive capacity search, for multiprocessing"""
+    configure_events(level=Level.WARNING)  # 批量模拟只保留警告和错误输出
     try:
-        data = request.json
-        use_multiprocessing = data.get('useMultiprocessing', False)
-        
-        if use_multiprocessing:
-            # Use multiprocessing to run simulation
-            result_queue = mp.Queue()
-            
-            # Prepare parameters
-            params = {
-                'min_students': data['minStudents'],
-                'max_students': data['maxStudents'],
-                'student_step': data.get('studentStep', 1),  # 默认步长为1
-                'repeat_count': data['repeatCount'],
-                'rows': data['rows'],
-                'cols': data['cols'],
-                'cleaning_time': data['cleaningTime'],
-                'humanities_ratio': data['humanitiesRatio'],
-                'science_ratio': data['scienceRatio'],
-                'engineering_ratio': data['engineeringRatio']
-            }
-            
-            # Create and start process
-            process = mp.Process(target=run_range_simulation, args=(params, result_queue))
-            process.start()
-            process.join()  # Wait for process to complete
-            
-            # Get result
-            result = result_queue.get()
-            if result['status'] == 'error':
-                return jsonify({'status': 'error', 'message': result['error']})
-        else:
-            # Run simulation in single thread
-            min_students = data['minStudents']
-            max_students = data['maxStudents']
-            student_step = data.get('studentStep', 1)  # 默认步长为1
-            repeat_count = data['repeatCount']
-            rows = data['rows']
-            cols = data['cols']
-            cleaning_time = data['cleaningTime']
-            humanities_ratio = data['humanitiesRatio']
-            science_ratio = data['scienceRatio']
-            engineering_ratio = data['engineeringRatio']
-
-            results = []
-            for total_students in range(min_students, max_students + 1, student_step):
-                for run in range(repeat_count):
-                    # Use the next available simulation number for each run
-                    simulation_number = get_next_simulation_number(rows * cols, total_students)
-                    
-                    # Create library and students
-                    library = Library()
-                    library.initialize_seats(rows, cols)
-                    library.set_limit_reversed_time(timedelta(minutes=cleaning_time))
-                    
-                    # 计算各专业学生数量
-                    humanities_count = int(total_students * humanities_ratio / 100)
-                    science_count = int(total_students * science_ratio / 100)
-                    engineering_count = total_students - humanities_count - science_count  # Remaining as Engineering
-                    
-                    # 创建学生
-                    students = []
-                    for i in range(humanities_count):
-                        if i < humanities_count // 3:
-                            students.append(Student.create_humanities_diligent_student(i, library_capacity=rows*cols, total_students=total_students))
-                        elif i < 2 * humanities_count // 3:
-                            students.append(Student.create_humanities_medium_student(i, library_capacity=rows*cols, total_students=total_students))
-                        else:
-                            students.append(Student.create_humanities_lazy_student(i, library_capacity=rows*cols, total_students=total_students))
-
-                    for i in range(science_count):
-                        if i < science_count // 3:
-                            students.append(Student.create_science_diligent_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
-                        elif i < 2 * science_count // 3:
-                            students.append(Student.create_science_medium_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
-                        else:
-                            students.append(Student.create_science_lazy_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
-
-                    for i in range(engineering_count):
-                        if i < engineering_count // 3:
-                            students.append(Student.create_engineering_diligent_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
-                        elif i < 2 * engineering_count // 3:
-                            students.append(Student.create_engineering_medium_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
-                        else:
-                            students.append(Student.create_engineering_lazy_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
-
-                    # 将学生添加到图书馆
-                    library.students = students
-                    library._count = total_students  # Set student counter
-                    
-                    # 运行模拟
-                    simulation = Simulation(row=rows, column=cols, num_students=total_students, humanities_rate=humanities_count/total_students if total_students > 0 else 0, science_rate=science_count/total_students if total_students > 0 else 0, simulation_number=simulation_number)
-                    simulation.library = library  # 替换模拟中的图书馆实例
-                    simulation.run(run_all=True)
-
-                    # 保存结果到对应的座位数目录
-                    total_seats = rows * cols
-                    seat_folder_name = f"{total_seats}_seats_simulations"
-                    seat_simulation_path = os.path.join(SIMULATIONS_PATH, seat_folder_name)
-                    os.makedirs(seat_simulation_path, exist_ok=True)
-
-                    filename = f"{total_students}-{simulation.simulation_number}.json"
-                    filepath = os.path.join(seat_simulation_path, filename)
-
-                    # 保存模拟数据
-                    simulation.save_to_json(filepath)  # Use Simulation's save_to_json method to save data
+        from backend.capacity import search_capacity
+        result = search_capacity(
+            params['rows'], params['cols'], low=params['min_students'], high=params['max_students'],
+            metric=params['metric'], threshold=params['threshold'], resolution=params['resolution'],
+            max_replicas=params['max_replicas'], simulation_number=get_next_simulation_number,
+            limit_reversed_time=timedelta(minutes=params['cleaning_time']),
+            humanities_rate=params['humanities_ratio'] / 100, science_rate=params['science_ratio'] / 100)
+        result_queue.put({'status': 'completed', 'result': result})
+    except Exception as e:
+        result_queue.put({'status': 'error', 'error': str(e)})
 
-                    results.append({
-                        'student_count': total_students,
-                        'simulation_number': simulation.simulation_number,
-                        'filepath': filepath,
-                        'status': 'completed'
-                    })
+@app.route('/api/capacity_search', methods=['POST'])
+def capacity_search_api():
+    """Search library capacity by adaptive bisection over student counts"""
+    try:
+        data = request.json
+        rows, cols = data['rows'], data['cols']
+        params = {
+            'rows': rows,
+            'cols': cols,
+            'min_students': data.get('minStudents', rows * cols),
+            'max_students': data.get('maxStudents', 2 * rows * cols),
+            'metric': data.get('metric', 'dynamic_capacity_ratio'),
+            'threshold': data.get('threshold', 0.9),
+            'resolution': data.get('resolution', 1),
+            'max_replicas': data.get('maxReplicas', 8),
+            'cleaning_time': data.get('cleaningTime', 60),
+            'humanities_ratio': data.get('humanitiesRatio', 30),
+            'science_ratio': data.get('scienceRatio', 30),
+        }
+        result_queue = mp.Queue()
+        process = mp.Process(target=run_capacity_search, args=(params, result_queue))
+        process.start()
+        result = result_queue.get()  # 先取结果再join，避免结果较大时子进程阻塞在队列上
+        process.join()
+        if result['status'] == 'error':
+            return jsonify({'status': 'error', 'message': result['error']})
+        return jsonify({'status': 'success', **result['result']})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)})
 
-        return jsonify({'status': 'success', 'message': 'Range simulation completed successfully', 'results': results})
+def range_simulation_params(data):
+    """把前端的范围模拟请求转换为run_range_simulation的参数"""
+    return {
+        'min_students': data['minStudents'],
+        'max_students': data['maxStudents'],
+        'student_step': data.get('studentStep', 1),  # 默认步长为1
+        'repeat_count': data['repeatCount'],
+        'rows': data['rows'],
+        'cols': data['cols'],
+        'cleaning_time': data['cleaningTime'],
+        'humanities_ratio': data['humanitiesRatio'],
+        'science_ratio': data['scienceRatio'],
+        'engineering_ratio': data['engineeringRatio'],
+        'tolerance': data.get('tolerance'),  # 给出时按方差自适应分配重复次数
+        'min_replicas': data.get('minReplicas', 3),
+        'rule_ensemble': data.get('ruleBasedEnsemble', False)  # 见Simulation.run_replicas
+    }
+
+def execute_range_simulation(data):
+    """
+    按请求运行范围模拟，多进程与单进程都经过run_range_simulation（固定重复、自适应重复或规则离座的锁步运行）
+
+    Returns:
+        dict: run_range_simulation放入队列的结果
+    """
+    params = range_simulation_params(data)
+    if data.get('useMultiprocessing', False):
+        result_queue = mp.Queue()
+        process = mp.Process(target=run_range_simulation, args=(params, result_queue))
+        process.start()
+        result = result_queue.get()  # 先取结果再join，避免结果较大时子进程阻塞在队列上
+        process.join()
+    else:
+        result_queue = queue.Queue()
+        run_range_simulation(params, result_queue)
+        result = result_queue.get()
+    return result
 
+@app.route('/api/repeat_simulation', methods=['POST'])
+def repeat_simulation_api():
+    """Repeat simulation API"""
+    try:
+        result = execute_range_simulation(request.json)
+        if result['status'] == 'error':
+            return jsonify({'status': 'error', 'message': result['error']})
+        return jsonify({
+            'status': 'success',
+            'message': 'Range simulation completed successfully',
+            'results': result['results'],
+            'precision': result.get('precision')  # 自适应重复时各学生数达到的精度
+        })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
@@ -613,144 +683,30 @@ def repeat_simulation_api():
 def start_range_simulation_api():
     """Start range simulation API - for compatibility with frontend"""
     try:
-        data = request.json
-        use_multiprocessing = data.get('useMultiprocessing', False)
-        
-        if use_multiprocessing:
-            # Use multiprocessing to run simulation
-            result_queue = mp.Queue()
-            
-            # Prepare parameters
-            params = {
-                'min_students': data['minStudents'],
-                'max_students': data['maxStudents'],
-                'student_step': data.get('studentStep', 1),  # 默认步长为1
-                'repeat_count': data['repeatCount'],
-                'rows': data['rows'],
-                'cols': data['cols'],
-                'cleaning_time': data['cleaningTime'],
-                'humanities_ratio': data['humanitiesRatio'],
-                'science_ratio': data['scienceRatio'],
-                'engineering_ratio': data['engineeringRatio']
-            }
-            
-            # Create and start process
-            process = mp.Process(target=run_range_simulation, args=(params, result_queue))
-            process.start()
-            process.join()  # Wait for process to complete
-            
-            # Get result
-            result = result_queue.get()
-            if result['status'] == 'error':
-                return jsonify({'status': 'error', 'message': result['error']})
-            
-            # Format results for frontend
-            formatted_results = []
-            if 'results' in result:
-                for res in result['results']:
-                    formatted_results.append({
-                        'students': res.get('student_count', 0),
-                        'number': res.get('simulation_number', 0),
-                        'path': res.get('filepath', ''),
-                        'status': res.get('status', 'completed')
-                    })
-            
-            return jsonify({
-                'status': 'success', 
-                'message': f'Range simulation completed successfully with {len(formatted_results)} runs', 
-                'results': formatted_results
+        result = execute_range_simulation(request.json)
+        if result['status'] == 'error':
+            return jsonify({'status': 'error', 'message': result['error']})
+
+        # Format results for frontend
+        formatted_results = []
+        for res in result.get('results', []):
+            formatted_results.append({
+                'students': res.get('student_count', 0),
+                'number': res.get('simulation_number', 0),
+                'path': res.get('filepath', ''),
+                'status': res.get('status', 'completed')
             })
-        else:
-            # Run simulation in single thread
-            min_students = data['minStudents']
-            max_students = data['maxStudents']
-            student_step = data.get('studentStep', 1)  # 默认步长为1
-            repeat_count = data['repeatCount']
-            rows = data['rows']
-            cols = data['cols']
-            cleaning_time = data['cleaningTime']
-            humanities_ratio = data['humanitiesRatio']
-            science_ratio = data['scienceRatio']
-            engineering_ratio = data['engineeringRatio']
-
-            results = []
-            for total_students in range(min_students, max_students + 1, student_step):
-                for run in range(repeat_count):
-                    # Use the next available simulation number for each run
-                    simulation_number = get_next_simulation_number(rows * cols, total_students)
-                    
-                    # Create library and students
-                    library = Library()
-                    library.initialize_seats(rows, cols)
-                    library.set_limit_reversed_time(timedelta(minutes=cleaning_time))
-                    
-                    # 计算各专业学生数量
-                    humanities_count = int(total_students * humanities_ratio / 100)
-                    science_count = int(total_students * science_ratio / 100)
-                    engineering_count = total_students - humanities_count - science_count  # Remaining as Engineering
-                    
-                    # 创建学生
-                    students = []
-                    for i in range(humanities_count):
-                        if i < humanities_count // 3:
-                            students.append(Student.create_humanities_diligent_student(i, library_capacity=rows*cols, total_students=total_students))
-                        elif i < 2 * humanities_count // 3:
-                            students.append(Student.create_humanities_medium_student(i, library_capacity=rows*cols, total_students=total_students))
-                        else:
-                            students.append(Student.create_humanities_lazy_student(i, library_capacity=rows*cols, total_students=total_students))
-
-                    for i in range(science_count):
-                        if i < science_count // 3:
-                            students.append(Student.create_science_diligent_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
-                        elif i < 2 * science_count // 3:
-                            students.append(Student.create_science_medium_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
-                        else:
-                            students.append(Student.create_science_lazy_student(humanities_count + i, library_capacity=rows*cols, total_students=total_students))
-
-                    for i in range(engineering_count):
-                        if i < engineering_count // 3:
-                            students.append(Student.create_engineering_diligent_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
-                        elif i < 2 * engineering_count // 3:
-                            students.append(Student.create_engineering_medium_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
-                        else:
-                            students.append(Student.create_engineering_lazy_student(humanities_count + science_count + i, library_capacity=rows*cols, total_students=total_students))
-
-                    # 将学生添加到图书馆
-                    library.students = students
-                    library._count = total_students  # Set student counter
-                    
-                    # 运行模拟
-                    simulation = Simulation(row=rows, column=cols, num_students=total_students, humanities_rate=humanities_count/total_students if total_students > 0 else 0, science_rate=science_count/total_students if total_students > 0 else 0, simulation_number=simulation_number)
-                    simulation.library = library  # 替换模拟中的图书馆实例
-                    simulation.run(run_all=True)
-
-                    # 保存结果到对应的座位数目录
-                    total_seats = rows * cols
-                    seat_folder_name = f"{total_seats}_seats_simulations"
-                    seat_simulation_path = os.path.join(SIMULATIONS_PATH, seat_folder_name)
-                    os.makedirs(seat_simulation_path, exist_ok=True)
-
-                    filename = f"{total_students}-{simulation.simulation_number}.json"
-                    filepath = os.path.join(seat_simulation_path, filename)
 
-                    # 保存模拟数据
-                    simulation.save_to_json(filepath)  # Use Simulation's save_to_json method to save data
-
-                    results.append({
-                        'students': total_students,
-                        'number': simulation.simulation_number,
-                        'path': filepath,
-                        'status': 'completed'
-                    })
-
-            return jsonify({
-                'status': 'success', 
-                'message': f'Range simulation completed successfully with {len(results)} runs', 
-                'results': results
-            })
+        return jsonify({
+            'status': 'success',
+            'message': f'Range simulation completed successfully with {len(formatted_results)} runs',
+            'results': formatted_results,
+            'precision': result.get('precision')  # 自适应重复时各学生数达到的精度
+        })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)})
 
+
 # Add new API endpoint for generating plots
 @app.route('/api/generate_plots', methods=['POST'])
 def generate_plots_api():
@@ -764,7 +720,7 @@ def generate_plots_api():
             # Generate student simulation plot
             student_count = data['student_count']
             from backend.plot import save_figure
-            success = save_figure(seats=seat_count, students=student_count, show_plot=False)
+            success = save_figure(seats=seat_count, students=student_count, show_plot=False, force=data.get('force', False))
             if success:
                 # Determine expected path
                 seat_folder = f"seats_{seat_count}"
@@ -785,7 +741,7 @@ def generate_plots_api():
             min_students = data['min_students']
             max_students = data['max_students']
             from backend.data_analysis import run_analysis
-            results = run_analysis(seat_count, min_students, max_students)
+            results = run_analysis(seat_count, min_students, max_students, force=data.get('force', False))
             if results is not None:
                 # Determine expected path
                 seat_folder = f"seats_{seat_count}"
@@ -820,13 +776,14 @@ def generate_batch_plots_api():
         max_students = data['max_students']
         generate_analysis = data.get('generate_analysis', True)
         generate_student_plots = data.get('generate_student_plots', True)
+        force = data.get('force', False)  # 忽略指纹缓存强制重新生成
         
         results = []
         
         # Generate analysis plot if requested
         if generate_analysis:
             from backend.data_analysis import run_analysis
-            analysis_results = run_analysis(seat_count, min_students, max_students)
+            analysis_results = run_analysis(seat_count, min_students, max_students, force=force)
             if analysis_results is not None:
                 seat_folder = f"seats_{seat_count}"
                 file_name = f"analysis({seat_count}-{min_students}-{max_students}).png"
@@ -849,7 +806,7 @@ def generate_batch_plots_api():
             from backend.plot import save_figure
             student_results = []
             for student_count in range(min_students, max_students + 1):
-                success = save_figure(seats=seat_count, students=student_count, show_plot=False)
+                success = save_figure(seats=seat_count, students=student_count, show_plot=False, force=force)
                 if success:
                     seat_folder = f"seats_{seat_count}"
                     image_filename = f"students_{student_count}.png"
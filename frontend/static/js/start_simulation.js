@@ -226,7 +226,8 @@ function startRangeSimulation() {
         scienceRatio: parseInt(document.getElementById('scienceRatioRange').value),
         engineeringRatio: parseInt(document.getElementById('engineeringRatioRange').value),
         cleaningTime: parseInt(document.getElementById('cleaningTimeRange').value),
-        useMultiprocessing: document.getElementById('useMultiprocessingRange').checked
+        useMultiprocessing: document.getElementById('useMultiprocessingRange').checked,
+        ruleBasedEnsemble: document.getElementById('ruleBasedEnsemble').checked
     };
 
     // Validate inputs
@@ -1,8 +1,9 @@
 from backend.simulation import Simulation
-from backend.plot import save_figure
+from backend.events import Level, configure_events
 from config import simulations_base_path
 import os
 import glob
+import argparse
 current_dir = os.path.dirname(os.path.abspath(__file__))
     # 将工作目录设置为脚本所在目录
 os.chdir(current_dir)
@@ -41,8 +42,18 @@ def get_next_simulation_number(seats: int, students: int) -> int:
     return max(simulation_numbers) + 1  # 返回最大序号+1
 
 
-def main(n):
-    """主函数，启动图书馆座位模拟"""
+def main(n, profile=False, save_profile=False, checkpoint_every=None, prefetch=False, zones=None):
+    """
+    主函数，启动图书馆座位模拟
+
+    Args:
+        n (int): 学生数量
+        profile (bool): 是否输出分阶段耗时汇总
+        save_profile (bool): 是否将分阶段耗时汇总写入模拟数据文件
+        checkpoint_every (int): 每隔多少个tick写一次检查点，为None时不写
+        prefetch (bool): 是否在后台预取离座决策（投机请求，会增加LLM调用和费用）
+        zones (int): 给出时以分区并行引擎运行，见Simulation.run_zoned
+    """
     print("启动图书馆座位占用行为模拟系统...")
     # 创建模拟实例并运行
     # 使用较小的规模进行演示
@@ -57,18 +68,188 @@ def main(n):
     simulation_number = get_next_simulation_number(total_seats, num_students)
     print(f"检测到这是第 {simulation_number} 次针对 {num_students} 个学生的模拟")
     
-    sim = Simulation(row=row, column=column, num_students=num_students, simulation_number=simulation_number) 
-    sim.run(run_all=True)
+    sim = Simulation(row=row, column=column, num_students=num_students, simulation_number=simulation_number,
+                     profile=profile, save_profile=save_profile, checkpoint_every=checkpoint_every,
+                     prefetch=prefetch)
+    if zones:
+        sim.run_zoned(zones=zones)
+    else:
+        sim.run(run_all=True)
     # 根据座椅数量确定保存路径
     seat_folder_name = f"{total_seats}_seats_simulations"
     path = os.path.join(simulations_base_path, seat_folder_name)
     file_name = f"{num_students}-{simulation_number}.json"
     file_path = os.path.join(path, file_name)
-    # 使用新的save_figure接口
+    # 使用新的save_figure接口（绘图模块在模拟结束后才导入）
+    from backend.plot import save_figure
     save_figure(seats=total_seats, students=num_students, simulation_number=simulation_number)
     print(f"模拟数据已保存到 {file_path}")
     print(f"图像已保存到对应的文件夹中")
+    return sim.jm.data
+
+
+def resume(path, profile=False):
+    """
+    从检查点继续运行中断的模拟，数据追加到原模拟文件
+
+    Args:
+        path (str): 检查点路径
+        profile (bool): 是否输出分阶段耗时汇总
+    """
+    sim = Simulation.resume(path, profile=profile)
+    sim.run(run_all=True)
+    print(f"模拟数据已保存到 {sim.jm.file_path}")
+    return sim.jm.data
+
+
+def run_batch(profile=False, save_profile=False, tolerance=None, max_replicas=10, checkpoint_every=None, prefetch=False,
+              zones=None):
+    """
+    按默认的学生数量范围批量运行模拟
+
+    Args:
+        profile (bool): 是否输出分阶段耗时汇总
+        save_profile (bool): 是否将分阶段耗时汇总写入模拟数据文件
+        tolerance (float): 给出时按方差自适应分配重复次数，为各关键指标默认标准误容差的倍数；
+            为None时每个学生数固定重复3次
+        max_replicas (int): 自适应重复时每个学生数的最多重复次数
+        checkpoint_every (int): 每次模拟每隔多少个tick写一次检查点
+        prefetch (bool): 是否在后台预取离座决策
+        zones (int): 给出时每次模拟以分区并行引擎运行，见Simulation.run_zoned
+    """
+    if tolerance is None:
+        for repeaten_time in range(3):
+            for students_numbers in range(9,19,1):
+                main(students_numbers, profile=profile, save_profile=save_profile, checkpoint_every=checkpoint_every,
+                     prefetch=prefetch, zones=zones)
+        return
+    from backend.sweep import AdaptiveReplicas, DEFAULT_TOLERANCE
+    sweeper = AdaptiveReplicas(lambda n: main(n, profile=profile, save_profile=save_profile,
+                                              checkpoint_every=checkpoint_every, prefetch=prefetch, zones=zones),
+                               tolerance={name: limit * tolerance for name, limit in DEFAULT_TOLERANCE.items()},
+                               max_replicas=max_replicas)
+    for students, item in sweeper.sweep(range(9, 19)).items():
+        metrics = ", ".join(f"{name}={metric['mean']:.2f}±{metric['std_error']:.2f}"
+                            for name, metric in item["metrics"].items())
+        print(f"{students:>4}名学生: {item['replicas']}次重复{'' if item['converged'] else '（未达到容差）'}, {metrics}")
+
+
+def run_rule_ensemble(replicas=3):
+    """
+    批量运行的锁步版本：每个学生数的重复模拟作为副本一起推进，见Simulation.run_replicas
+
+    Args:
+        replicas (int): 每个学生数的重复次数
+    """
+    from backend.plot import save_figure
+    row, column = 3, 3
+    total_seats = row * column
+    for students_numbers in range(9, 19, 1):
+        simulation_number = get_next_simulation_number(total_seats, students_numbers)
+        Simulation.run_replicas(replicas, row=row, column=column, num_students=students_numbers,
+                                simulation_number=simulation_number)
+        for i in range(replicas):
+            save_figure(seats=total_seats, students=students_numbers, simulation_number=simulation_number + i)
+        print(f"{students_numbers:>4}名学生: 第{simulation_number}~{simulation_number + replicas - 1}次模拟（规则离座）已保存")
+
+
+def run_capacity_search(low=9, high=18, metric="dynamic_capacity_ratio", threshold=0.9,
+                        resolution=1, min_replicas=2, max_replicas=8):
+    """
+    用自适应二分代替逐个学生数的批量运行，搜索3*3图书馆的容量
+
+    Args:
+        low (int): 搜索下界（学生数）
+        high (int): 搜索上界（学生数）
+        metric (str): data_analysis中的目标指标，见backend.capacity.METRICS
+        threshold (float): 指标阈值
+        resolution (int): 容量区间的目标宽度
+        min_replicas (int): 每个学生数的最少重复次数
+        max_replicas (int): 每个学生数的最多重复次数
+    """
+    from backend.capacity import search_capacity
+    result = search_capacity(3, 3, low=low, high=high, metric=metric, threshold=threshold,
+                             resolution=resolution, min_replicas=min_replicas, max_replicas=max_replicas,
+                             simulation_number=get_next_simulation_number)
+    for students, point in result["points"].items():
+        low_ci, high_ci = point["ci"]
+        print(f"{students:>4}名学生: {point['replicas']}次重复, {metric}={point['mean']:.3f} [{low_ci:.3f}, {high_ci:.3f}]")
+    print(f"容量估计: {result['capacity']}名学生，置信区间 {result['interval']}，共运行 {result['runs']} 次模拟"
+          f"（逐个扫描为 {3 * (high - low + 1)} 次）")
+    return result
+
+
+def run_campus(config_path, workers=None):
+    """
+    按配置文件运行校园多图书馆模拟，结果保存到simulations_base_path/campus/<配置文件名>
+
+    Args:
+        config_path (str): JSON配置，{"libraries": [图书馆配置...], 其余键为Campus的参数（如distance_weight）}
+        workers (int): 工作进程数，默认为min(图书馆数, CPU核数)
+    """
+    import json
+    from backend.campus import Campus
+    with open(config_path, encoding="utf-8") as f:
+        config = json.load(f)
+    libraries = config.pop("libraries")
+    path = os.path.join(simulations_base_path, "campus", os.path.basename(config_path))
+    result = Campus(libraries, workers=workers, **config).run(path)
+    summary = result["campus"]
+    for name, item in result["libraries"].items():
+        print(f"{name:>12}: {item['seats']}座, 峰值占用率{item['peak_occupancy']:.1%}, 平均占用率{item['mean_occupancy']:.1%}, "
+              f"拒绝{item['turned_away']}人次, 转入{item['arrived']}人, 转出{item['departed']}人")
+    print(f"全校{summary['libraries']}个图书馆{summary['seats']}座: 峰值占用率{summary['peak_occupancy']:.1%}, "
+          f"分流{summary['routed']}人次（平均{summary['mean_route_distance']:.0f}米）, 全校无座{summary['unsatisfied']}人次")
+    print(f"校园模拟结果已保存到 {path}")
+    return result
+
+
 if __name__ == "__main__":
-    for repeaten_time in range(3):
-        for students_numbers in range(9,19,1):
-            main(students_numbers)
+    parser = argparse.ArgumentParser(description="图书馆座位占用行为模拟批量运行")
+    parser.add_argument("--profile", action="store_true", help="记录并输出每次模拟的分阶段耗时")
+    parser.add_argument("--save-profile", action="store_true", help="将分阶段耗时汇总写入模拟数据文件头部")
+    parser.add_argument("--cprofile", metavar="PATH", nargs="?", const="simulation.prof", default=None,
+                        help="同时用cProfile包裹整个运行，并将统计结果保存到PATH（默认simulation.prof）")
+    parser.add_argument("--capacity-search", action="store_true",
+                        help="用自适应二分搜索容量，代替逐个学生数重复3次的批量运行")
+    parser.add_argument("--metric", default="dynamic_capacity_ratio", help="容量搜索的目标指标")
+    parser.add_argument("--threshold", type=float, default=0.9, help="目标指标的阈值")
+    parser.add_argument("--max-replicas", type=int, default=8, help="容量搜索或自适应重复时每个学生数的最多重复次数")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="按方差自适应分配批量运行的重复次数，值为各指标默认标准误容差的倍数")
+    parser.add_argument("--checkpoint-every", type=int, default=None, help="每次模拟每隔多少个tick写一次检查点")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="在后台预取下一个tick的离座决策以隐藏LLM延迟（投机请求，会增加LLM调用和费用）")
+    parser.add_argument("--zones", type=int, default=None,
+                        help="以分区并行引擎运行每次模拟，值为区域数（工作进程数），规则离座，见Simulation.run_zoned")
+    parser.add_argument("--rule-ensemble", type=int, metavar="REPLICAS", nargs="?", const=3, default=None,
+                        help="每个学生数重复REPLICAS次（默认3次）并在锁步引擎中一起运行（规则离座，"
+                             "见Simulation.run_replicas）")
+    parser.add_argument("--resume", metavar="PATH", default=None, help="从检查点继续运行中断的模拟")
+    parser.add_argument("--campus", metavar="CONFIG", default=None, help="按JSON配置运行校园多图书馆模拟")
+    parser.add_argument("--workers", type=int, default=None, help="校园模拟的工作进程数")
+    args = parser.parse_args()
+    # 批量运行时只输出警告及以上级别，逐学生的调试信息会显著拖慢模拟
+    configure_events(level=Level.WARNING)
+    if args.resume:
+        resume(args.resume, profile=args.profile)
+    elif args.campus:
+        run_campus(args.campus, workers=args.workers)
+    elif args.rule_ensemble:
+        run_rule_ensemble(replicas=args.rule_ensemble)
+    elif args.capacity_search:
+        run_capacity_search(metric=args.metric, threshold=args.threshold, max_replicas=args.max_replicas)
+    elif args.cprofile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.runcall(run_batch, profile=args.profile, save_profile=args.save_profile,
+                         tolerance=args.tolerance, max_replicas=args.max_replicas,
+                         checkpoint_every=args.checkpoint_every, prefetch=args.prefetch, zones=args.zones)
+        profiler.dump_stats(args.cprofile)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+        print(f"cProfile统计已保存到 {args.cprofile}")
+    else:
+        run_batch(profile=args.profile, save_profile=args.save_profile,
+                  tolerance=args.tolerance, max_replicas=args.max_replicas, checkpoint_every=args.checkpoint_every,
+                  prefetch=args.prefetch, zones=args.zones)